@@ -1,5 +1,8 @@
 import os
+import sys
 import shutil
+import functools
+import subprocess
 
 import pytest
 import numpy as np
@@ -10,6 +13,7 @@ if raw_path not in os.sys.path:
 
 import bioxtasraw.RAWAPI as raw
 import bioxtasraw.SASCalc as SASCalc
+import bioxtasraw.SASJobs as SASJobs
 
 @pytest.mark.atsas
 def test_ambimeter(gi_gnom_ift):
@@ -18,6 +22,21 @@ def test_ambimeter(gi_gnom_ift):
     assert score == 0
     assert categories == 1
 
+@pytest.mark.atsas
+def test_atsas_install_cache():
+    atsas_dir = raw.__default_settings.get('ATSASDir')
+
+    install = SASCalc.getATSASInstall(atsas_dir)
+
+    assert SASCalc.getATSASInstall(atsas_dir) is install
+    assert SASCalc.getATSASVersion(atsas_dir) == install['version']
+    assert 'dammif' in install['executables']
+
+    SASCalc.clearATSASInstallCache()
+
+    assert SASCalc.getATSASInstall(atsas_dir) is not install
+    assert SASCalc.getATSASInstall(atsas_dir)['version'] == install['version']
+
 @pytest.mark.atsas
 @pytest.mark.slow
 def test_dammif(gi_gnom_ift, temp_directory):
@@ -57,6 +76,117 @@ def test_dammif_interactive(gi_gnom_ift, temp_directory):
     assert os.path.exists(os.path.join(temp_directory, 'dammif_inter.fir'))
     assert os.path.exists(os.path.join(temp_directory, 'dammif_inter.in'))
 
+def _max_running(jobs):
+    times = sorted([(job.start_time, 1) for job in jobs]
+        + [(job.end_time, -1) for job in jobs], key=lambda x: (x[0], x[1]))
+
+    running = 0
+    max_running = 0
+    for _, step in times:
+        running += step
+        max_running = max(running, max_running)
+
+    return max_running
+
+def test_job_scheduler_groups():
+    scheduler = SASJobs.get_scheduler()
+
+    launch = functools.partial(subprocess.Popen, [sys.executable, '-c',
+        'import time; time.sleep(0.3); print("done")'], stdout=subprocess.PIPE)
+
+    group1 = SASJobs.JobGroup(1)
+    group2 = SASJobs.JobGroup(2)
+
+    output = []
+
+    jobs1 = [scheduler.submit(launch, 'g1', output.append, group=group1)
+        for j in range(3)]
+    jobs2 = [scheduler.submit(launch, 'g2', group=group2) for j in range(4)]
+
+    assert SASJobs.get_scheduler() is scheduler
+    assert scheduler.wait(jobs1 + jobs2, 60)
+
+    assert all([job.result() == 0 for job in jobs1 + jobs2])
+    assert all([job.state == 'finished' for job in jobs1 + jobs2])
+    assert len(output) == 3
+    assert _max_running(jobs1) == 1
+    assert _max_running(jobs2) <= 2
+
+def test_job_scheduler_calls():
+    scheduler = SASJobs.get_scheduler()
+    group = SASJobs.JobGroup(1)
+
+    jobs = [scheduler.submit_call(functools.partial(subprocess.call,
+        [sys.executable, '-c', 'import time; time.sleep(0.2)']), group=group)
+        for j in range(3)]
+    jobs.append(scheduler.submit_call(functools.partial(max, 1, 2),
+        group=group))
+
+    assert [job.result(60) for job in jobs] == [0, 0, 0, 2]
+    assert _max_running(jobs) == 1
+
+_old_dammif = """#!{}
+import os
+import sys
+
+if len(sys.argv) > 1 and sys.argv[1] in ('-v', '--version'):
+    print('dammif, ATSAS 2.8.4 (r10552)')
+    sys.exit(0)
+
+os.write(1, b'GNOM output file to read?:')
+sys.stdin.readline()
+os.write(1, b'Log opened:\\n' + b''.join([b'step %d\\n' %(i) for i in range(200)])
+    + b'done\\n')
+"""
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Fake dammif is a script')
+def test_job_scheduler_old_dammif_output(temp_directory):
+    # Old versions of dammif are run interactively, and all of the output
+    # after the prompts should reach the scheduler
+    atsas_dir = os.path.join(temp_directory, 'old_atsas')
+    os.mkdir(atsas_dir)
+
+    with open(os.path.join(atsas_dir, 'dammif'), 'w') as f:
+        f.write(_old_dammif.format(sys.executable))
+
+    os.chmod(os.path.join(atsas_dir, 'dammif'), 0o755)
+
+    args = {'mode': 'Custom', 'unit': 'Unknown', 'sym': 'P1',
+        'anisometry': 'Unknown', 'omitSolvent': False, 'chained': False,
+        'constant': '', 'modelFormat': 'pdb', 'shape': 'u', 'maxBead': -1}
+
+    launch = functools.partial(SASCalc.runDammif, 'test.out', 'test', args,
+        temp_directory, atsas_dir)
+
+    output = []
+
+    job = SASJobs.get_scheduler().submit(launch, 'test', output.append)
+
+    assert job.result(60) == 0
+
+    output = ''.join(output)
+
+    assert output.count('step') == 200
+    assert output.endswith('done\n')
+
+    SASCalc.clearATSASInstallCache()
+
+@pytest.mark.atsas
+@pytest.mark.slow
+def test_dammif_batch(gi_gnom_ift, temp_directory):
+    prefixes = ['dammif_batch_{:02d}'.format(i) for i in range(1, 4)]
+
+    results, run_times = raw.dammif_batch(gi_gnom_ift, prefixes,
+        temp_directory, max_jobs=2, mode='Fast')
+
+    assert len(results) == len(prefixes)
+    assert len(run_times) == len(prefixes)
+
+    for prefix, (chi_sq, rg, dmax, mw, excluded_volume) in zip(prefixes, results):
+        assert chi_sq > 0
+        assert rg > 0
+        assert os.path.exists(os.path.join(temp_directory, prefix+'.fir'))
+
 @pytest.mark.atsas
 @pytest.mark.very_slow
 def test_dammin(gi_gnom_ift, temp_directory):
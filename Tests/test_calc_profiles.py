@@ -1,6 +1,8 @@
 import os
 import copy
 import shutil
+import threading
+import multiprocessing
 
 import pytest
 import numpy as np
@@ -10,6 +12,8 @@ if raw_path not in os.sys.path:
     os.sys.path.append(raw_path)
 
 import bioxtasraw.RAWAPI as raw
+import bioxtasraw.SASExceptions as SASExceptions
+import bioxtasraw.BIFT as BIFT
 
 def test_auto_guinier(clean_gi_sub_profile):
     profile = copy.deepcopy(clean_gi_sub_profile)
@@ -45,6 +49,51 @@ def test_guinier_fit(clean_gi_sub_profile):
     assert qRg_max == 1.1431113847079795
     assert r_sqr == 0.9905176599909035
 
+def test_auto_guinier_cache(clean_gi_sub_profile, temp_directory):
+    cache_dir = os.path.join(temp_directory, 'analysis_cache')
+    raw.enable_analysis_cache(cache_dir=cache_dir)
+
+    try:
+        results = raw.auto_guinier(copy.deepcopy(clean_gi_sub_profile))
+        cached_results = raw.auto_guinier(copy.deepcopy(clean_gi_sub_profile))
+
+        stats = raw.get_analysis_cache_stats()
+
+        assert results == cached_results
+        assert stats['misses'] == 1
+        assert stats['memory_hits'] == 1
+
+        raw.enable_analysis_cache(cache_dir=cache_dir)
+        disk_results = raw.auto_guinier(copy.deepcopy(clean_gi_sub_profile))
+
+        stats = raw.get_analysis_cache_stats()
+
+        assert results == disk_results
+        assert stats['disk_hits'] == 1
+
+        raw.auto_guinier(copy.deepcopy(clean_gi_sub_profile), error_weight=False)
+
+        assert raw.get_analysis_cache_stats()['misses'] == 1
+
+    finally:
+        raw.clear_analysis_cache()
+        raw.disable_analysis_cache()
+
+def test_dift_cache(clean_gi_sub_profile, gi_dift_ift):
+    raw.enable_analysis_cache()
+
+    try:
+        raw.denss_ift(copy.deepcopy(clean_gi_sub_profile))
+        (ift, dmax, rg, i0, rg_err, i0_err, chi_sq,
+            alpha) = raw.denss_ift(copy.deepcopy(clean_gi_sub_profile))
+
+        assert raw.get_analysis_cache_stats()['hits'] == 1
+        assert np.allclose(dmax, gi_dift_ift.getParameter('dmax'))
+        assert np.allclose(ift.p, gi_dift_ift.p)
+
+    finally:
+        raw.disable_analysis_cache()
+
 def test_mw_ref(clean_gi_sub_profile, old_settings):
     profile = copy.deepcopy(clean_gi_sub_profile)
 
@@ -360,6 +409,57 @@ def test_bift_limited_proc(clean_gi_sub_profile, old_settings, gi_bift_ift):
     assert np.allclose(ift.r, gi_bift_ift.r)
     assert np.allclose(ift.p, gi_bift_ift.p)
 
+@pytest.mark.slow
+def test_bift_user_pool(clean_gi_sub_profile, old_settings, gi_bift_ift):
+    profile = copy.deepcopy(clean_gi_sub_profile)
+
+    pool = multiprocessing.Pool(processes=2)
+
+    try:
+        (ift, dmax, rg, i0, dmax_err, rg_err, i0_err, chi_sq, log_alpha,
+            log_alpha_err, evidence, evidence_err) = raw.bift(profile,
+            settings=old_settings, single_proc=False, pool=pool)
+    finally:
+        pool.close()
+        pool.join()
+
+    assert np.allclose(dmax, gi_bift_ift.getParameter('dmax'))
+    assert np.allclose(rg, gi_bift_ift.getParameter('rg'))
+    assert np.allclose(ift.r, gi_bift_ift.r)
+    assert np.allclose(ift.p, gi_bift_ift.p)
+
+@pytest.mark.slow
+def test_bift_concurrent_pool_sizes(clean_gi_sub_profile, old_settings,
+    gi_bift_ift, monkeypatch):
+    # Calls alternate between pool sizes, so the shared pool is replaced
+    # while other calls are still using it
+    monkeypatch.setattr(multiprocessing, 'cpu_count', lambda: 4)
+
+    results = [None for j in range(4)]
+
+    def run(j, nprocs):
+        profile = copy.deepcopy(clean_gi_sub_profile)
+        results[j] = raw.bift(profile, settings=old_settings,
+            single_proc=False, nprocs=nprocs)
+
+    threads = [threading.Thread(target=run, args=(j, nprocs), daemon=True)
+        for j, nprocs in enumerate([1, 2, 1, 2])]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join(600)
+
+    assert not any([thread.is_alive() for thread in threads])
+
+    for result in results:
+        ift, dmax, rg = result[:3]
+
+        assert np.allclose(dmax, gi_bift_ift.getParameter('dmax'))
+        assert np.allclose(rg, gi_bift_ift.getParameter('rg'))
+        assert np.allclose(ift.p, gi_bift_ift.p)
+
 @pytest.mark.slow
 def test_bift_single_proc(clean_gi_sub_profile, old_settings, gi_bift_ift):
     profile = copy.deepcopy(clean_gi_sub_profile)
@@ -373,6 +473,103 @@ def test_bift_single_proc(clean_gi_sub_profile, old_settings, gi_bift_ift):
     assert np.allclose(ift.r, gi_bift_ift.r)
     assert np.allclose(ift.p, gi_bift_ift.p)
 
+@pytest.mark.slow
+def test_bift_mc_retry_failed(clean_gi_sub_profile, old_settings, gi_bift_ift):
+    profile = copy.deepcopy(clean_gi_sub_profile)
+
+    (ift, dmax, rg, i0, dmax_err, rg_err, i0_err, chi_sq, log_alpha,
+        log_alpha_err, evidence, evidence_err) = raw.bift(profile,
+        settings=old_settings, mc_retry_failed=True)
+
+    assert np.allclose(dmax, gi_bift_ift.getParameter('dmax'))
+    assert np.allclose(rg, gi_bift_ift.getParameter('rg'))
+    assert np.allclose(ift.r, gi_bift_ift.r)
+    assert np.allclose(ift.p, gi_bift_ift.p)
+
+def _run_failing_bift_errors(profile, ift, monkeypatch, retry_failed):
+    # The evidence of the first round of these runs overflows
+    mc_runs = 20
+    failed_runs = [3, 7, 11]
+
+    calls = []
+    getEvidence = BIFT.getEvidence
+
+    def failing_evidence(params, q, i, err, N):
+        calls.append(params)
+        evidence, c, f, r = getEvidence(params, q, i, err, N)
+
+        if len(calls) <= mc_runs and len(calls)-1 in failed_runs:
+            evidence = 1e9
+
+        return evidence, c, f, r
+
+    monkeypatch.setattr(BIFT, 'getEvidence', failing_evidence)
+
+    opt_params = (ift.getParameter('alpha'), ift.getParameter('dmax'))
+
+    results = BIFT.calc_bift_errors(opt_params, profile.getQ(),
+        profile.getI(), profile.getErr(), 50, mc_runs=mc_runs,
+        abort_check=threading.Event(), single_proc=True,
+        retry_failed=retry_failed)
+
+    return results, calls, mc_runs, failed_runs
+
+def test_bift_mc_retry_failed_runs(clean_gi_sub_profile, gi_bift_ift,
+    monkeypatch):
+    results, calls, mc_runs, failed_runs = _run_failing_bift_errors(
+        clean_gi_sub_profile, gi_bift_ift, monkeypatch, True)
+
+    r, p, err = results[:3]
+    evidence = results[6][0]
+    dmax_opt = gi_bift_ift.getParameter('dmax')
+
+    # Only the failed runs are redrawn, with half the spread
+    assert len(calls) == mc_runs + len(failed_runs)
+    assert all([abs(params[1]-dmax_opt) <= 0.075*dmax_opt
+        for params in calls[mc_runs:]])
+
+    assert evidence < 9e8
+    assert r.size == p.size == err.size == 51
+    assert np.all(np.isfinite(p))
+    assert np.all(np.isfinite(err))
+
+def test_bift_mc_redraw_failed_runs(clean_gi_sub_profile, gi_bift_ift,
+    monkeypatch):
+    results, calls, mc_runs, failed_runs = _run_failing_bift_errors(
+        clean_gi_sub_profile, gi_bift_ift, monkeypatch, False)
+
+    # Without retry_failed all of the runs are redrawn
+    assert len(calls) == 2*mc_runs
+    assert results[6][0] < 9e8
+
+def test_bift_regrid_pr():
+    ref_r = np.linspace(0, 110, 51)
+    dmax_array = np.array([100., 105., 110.])
+    r_array = np.array([np.linspace(0, dmax, 51) for dmax in dmax_array])
+    f_array = np.sin(np.pi*r_array/dmax_array[:,None])
+
+    f_interp = BIFT.regridPr(r_array, f_array, dmax_array, ref_r)
+
+    for j, dmax in enumerate(dmax_array):
+        expected = np.interp(ref_r, r_array[j], f_array[j])
+        expected[ref_r >= dmax] = 0
+
+        assert np.allclose(f_interp[j], expected)
+
+@pytest.mark.slow
+def test_bift_batch(clean_gi_sub_profile, old_settings, gi_bift_ift):
+    profiles = [copy.deepcopy(clean_gi_sub_profile) for j in range(2)]
+
+    results = raw.bift_batch(profiles, settings=old_settings)
+
+    assert len(results) == 2
+    assert np.all(results.success)
+    assert np.allclose(results.dmax, gi_bift_ift.getParameter('dmax'))
+    assert np.allclose(results.rg, gi_bift_ift.getParameter('rg'))
+    assert np.allclose(results.r[1], gi_bift_ift.r)
+    assert np.allclose(results.p[1], gi_bift_ift.p)
+    assert 'BIFT' in profiles[1].getParameter('analysis')
+
 @pytest.mark.atsas
 def test_datgnom(clean_gi_sub_profile):
     profile = copy.deepcopy(clean_gi_sub_profile)
@@ -705,6 +902,30 @@ def test_gnom_file_idx_min_max(clean_gi_sub_profile):
     assert round(ift.q_orig[0], 7) == round(clean_gi_sub_profile.getQ()[30], 7)
     assert round(ift.q_orig[-1], 6) == round(clean_gi_sub_profile.getQ()[300], 6)
 
+@pytest.mark.atsas
+def test_datgnom_batch(clean_gi_sub_profile):
+    profiles = [copy.deepcopy(clean_gi_sub_profile) for i in range(3)]
+
+    results = raw.datgnom_batch(profiles, idx_min=[0, 30, 0], max_jobs=2)
+
+    single = raw.datgnom(copy.deepcopy(clean_gi_sub_profile), idx_min=30)
+
+    assert len(results) == 3
+    assert results[0][1] == 100.8
+    assert results[1][1:] == single[1:]
+    assert 'GNOM' in profiles[2].getParameter('analysis')
+
+@pytest.mark.atsas
+def test_gnom_batch(clean_gi_sub_profile, gi_gnom_ift):
+    profiles = [copy.deepcopy(clean_gi_sub_profile) for i in range(3)]
+
+    results = raw.gnom_batch(profiles, 101, max_jobs=2)
+
+    for ift, dmax, rg, i0, rg_err, i0_err, total_est, chi_sq, alpha, quality in results:
+        assert dmax == gi_gnom_ift.getParameter('dmax')
+        assert rg == gi_gnom_ift.getParameter('rg')
+        assert np.allclose(ift.p, gi_gnom_ift.p)
+
 # Currently not used
 # @pytest.mark.atsas
 # def test_gnom_interactive(clean_gi_sub_profile):
@@ -732,6 +953,49 @@ def test_auto_dmax_single_proc(clean_gi_sub_profile):
 
     assert dmax == 102
 
+@pytest.mark.atsas
+def test_auto_dmax_concurrent(clean_gi_sub_profile):
+    dmax, timings = raw.auto_dmax(clean_gi_sub_profile, concurrent=True,
+        return_timings=True)
+
+    assert dmax == 102
+    assert 'initial' in timings
+    assert timings['total'] >= timings['initial']
+
+@pytest.mark.slow
+def test_auto_dmax_concurrent_no_atsas(clean_gi_sub_profile):
+    analysis = clean_gi_sub_profile.getParameter('analysis')
+    analysis.pop('BIFT', None)
+    analysis.get('molecularWeight', {}).pop('ShapeAndSize', None)
+    clean_gi_sub_profile.setParameter('analysis', analysis)
+
+    profile = copy.deepcopy(clean_gi_sub_profile)
+
+    dmax = raw.auto_dmax(clean_gi_sub_profile, use_atsas=False)
+    concurrent_dmax, timings = raw.auto_dmax(profile, use_atsas=False,
+        concurrent=True, return_timings=True)
+
+    assert concurrent_dmax == dmax
+    assert all([stage in timings for stage in ['datclass', 'bift', 'datgnom']])
+    assert (profile.getParameter('analysis')['BIFT']['Dmax']
+        == clean_gi_sub_profile.getParameter('analysis')['BIFT']['Dmax'])
+
+def test_auto_dmax_concurrent_datclass(clean_gi_sub_profile):
+    analysis = clean_gi_sub_profile.getParameter('analysis')
+    analysis['molecularWeight']['ShapeAndSize'] = {'MW': '30.0',
+        'Shape': 'compact', 'Dmax': '98.4'}
+    clean_gi_sub_profile.setParameter('analysis', analysis)
+
+    # BIFT and DATGNOM aren't run if there's a DATCLASS Dmax
+    for concurrent in [False, True]:
+        dmax, timings = raw.auto_dmax(clean_gi_sub_profile, use_atsas=False,
+            concurrent=concurrent, return_timings=True)
+
+        assert dmax == 98
+        assert 'datclass' in timings
+        assert 'bift' not in timings
+        assert 'datgnom' not in timings
+
 @pytest.mark.slow
 def test_auto_dmax_no_atsas(clean_gi_sub_profile):
     dmax = raw.auto_dmax(clean_gi_sub_profile, use_atsas=False)
@@ -744,6 +1008,38 @@ def test_auto_dmax_single_proc_no_atsas(clean_gi_sub_profile):
 
     assert dmax == 106
 
+@pytest.mark.slow
+def test_auto_dmax_cache_analysis(clean_gi_sub_profile, temp_directory):
+    cache_dir = os.path.join(temp_directory, 'analysis_cache')
+    raw.enable_analysis_cache(cache_dir=cache_dir)
+
+    analysis = clean_gi_sub_profile.getParameter('analysis')
+    analysis.pop('BIFT', None)
+    analysis.pop('GNOM', None)
+    analysis.get('molecularWeight', {}).pop('ShapeAndSize', None)
+    clean_gi_sub_profile.setParameter('analysis', analysis)
+
+    try:
+        profile = copy.deepcopy(clean_gi_sub_profile)
+        cached_profile = copy.deepcopy(clean_gi_sub_profile)
+
+        dmax = raw.auto_dmax(profile, use_atsas=False)
+        cached_dmax = raw.auto_dmax(cached_profile, use_atsas=False)
+
+        assert raw.get_analysis_cache_stats()['memory_hits'] == 1
+        assert dmax == cached_dmax
+
+        analysis = profile.getParameter('analysis')
+        cached_analysis = cached_profile.getParameter('analysis')
+
+        assert 'BIFT' in cached_analysis
+        assert cached_analysis['BIFT'] == analysis['BIFT']
+        assert 'GNOM' not in cached_analysis
+
+    finally:
+        raw.clear_analysis_cache()
+        raw.disable_analysis_cache()
+
 def test_cormap_all(bsa_series_profiles):
     pvals, corrected_pvals, failed_comparisons = raw.cormap(bsa_series_profiles)
 
@@ -888,6 +1184,44 @@ def test_crysol_fit_settings(temp_directory, old_settings):
     assert fit_params['Chi_squared'] ==  1.089
     assert np.allclose(fit_profile.getI().sum(), 3.7260180941)
 
+@pytest.mark.atsas
+@pytest.mark.slow
+def test_crysol_fit_parallel(temp_directory):
+    models = []
+    for name in ['1XIB_4mer_a.pdb', '1XIB_4mer_b.pdb', '1XIB_4mer_c.pdb']:
+        shutil.copy2(os.path.join('./data/dammif_data', '1XIB_4mer.pdb'),
+            os.path.join(temp_directory, name))
+        models.append(os.path.join(temp_directory, name))
+
+    shutil.copy2(os.path.join('./data', 'glucose_isomerase.dat'),
+            os.path.join(temp_directory, 'glucose_isomerase.dat'))
+
+    profiles = [os.path.join(temp_directory, 'glucose_isomerase.dat')]
+
+    results = raw.crysol(list(models), list(profiles))
+    par_results = raw.crysol(list(models), list(profiles), single_proc=False,
+        nprocs=2)
+
+    assert list(par_results.keys()) == list(results.keys())
+
+    for name in results:
+        fit_params = results[name][0].getParameter('analysis')['crysol']
+        par_fit_params = par_results[name][0].getParameter('analysis')['crysol']
+
+        assert par_fit_params == fit_params
+        assert np.allclose(par_results[name][0].getI(), results[name][0].getI())
+
+def test_crysol_parallel_launch_error(temp_directory):
+    models = []
+    for name in ['model_a.pdb', 'model_b.pdb']:
+        shutil.copy2(os.path.join('./data/dammif_data', '1XIB_4mer.pdb'),
+            os.path.join(temp_directory, name))
+        models.append(os.path.join(temp_directory, name))
+
+    with pytest.raises(SASExceptions.ATSASError):
+        raw.crysol(models, atsas_dir=temp_directory, single_proc=False,
+            nprocs=2)
+
 def test_dift(clean_gi_sub_profile, old_settings, gi_dift_ift):
     (ift, dmax, rg, i0, rg_err, i0_err, chi_sq, alpha) = raw.denss_ift(clean_gi_sub_profile,)
 
@@ -930,6 +1264,18 @@ def test_pdb2sas_fit(temp_directory, clean_gi_sub_profile, gi_pdb2sas_fit_ift):
     assert np.allclose(pdb2sas.getI().sum(), 19475262858.907402)
     assert np.allclose(denss_analysis['Chi_squared'], 1.09)
 
+def test_warmup():
+    timings = raw.warmup()
+
+    assert 'SASCalc.autoRg_inner' in timings
+    assert 'BIFT.getEvidence' in timings
+    assert 'BIFT.bift_inner_loop' in timings
 
+    for name in timings:
+        assert timings[name]['time'] >= 0
 
+    timings = raw.warmup()
 
+    for name in timings:
+        assert timings[name]['compiled'] == 0
+        assert timings[name]['loaded'] == 0
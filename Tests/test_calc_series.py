@@ -9,6 +9,8 @@ if raw_path not in os.sys.path:
     os.sys.path.append(raw_path)
 
 import bioxtasraw.RAWAPI as raw
+import bioxtasraw.SASCalc as SASCalc
+import bioxtasraw.SASProc as SASProc
 
 
 @pytest.fixture(scope="function")
@@ -66,6 +68,20 @@ def test_svd_list(bsa_series):
     svd_s, svd_U, svd_V = raw.svd(sasms)
     assert np.allclose(svd_s[0], 7474.750264659797)
 
+def test_svd_truncated(bsa_series):
+    svd_s, svd_U, svd_V = raw.svd(bsa_series, nsvs=5)
+
+    assert svd_s.size == 5
+    assert svd_U.shape[1] == 5
+    assert svd_V.shape[1] == 5
+    assert np.allclose(svd_s[0], 7474.750264659797)
+
+def test_svd_auto(bsa_series):
+    full_svd_s, _, _ = raw.svd(bsa_series)
+    svd_s, svd_U, svd_V = raw.svd(bsa_series, nsvs='auto')
+
+    assert np.allclose(svd_s, full_svd_s[:svd_s.size])
+
 def test_efa(bsa_series):
     efa_profiles, converged, conv_data, rotation_data = raw.efa(bsa_series,
         [[130, 187], [149, 230]], framei=130, framef=230)
@@ -88,6 +104,58 @@ def test_efa_list(bsa_series):
     assert len(efa_profiles) == 2
     assert np.allclose(efa_profiles[0].getI().sum(), 75885.43573919893)
 
+def test_efa_incremental_svs(bsa_series):
+    results = raw.efa(bsa_series, [[130, 187], [149, 230]], framei=130,
+        framef=230, return_efa_svs=True)
+
+    inc_results = raw.efa(bsa_series, [[130, 187], [149, 230]], framei=130,
+        framef=230, return_efa_svs=True, efa_nsvs=3)
+
+    forward_svs, backward_svs = results[4:]
+    inc_forward_svs, inc_backward_svs = inc_results[4:]
+
+    assert forward_svs.shape == inc_forward_svs.shape
+    assert np.allclose(forward_svs[:2], inc_forward_svs[:2], rtol=1e-5, atol=0)
+    assert np.allclose(backward_svs[:2], inc_backward_svs[:2], rtol=1e-5,
+        atol=0)
+    assert np.allclose(forward_svs[2], inc_forward_svs[2], rtol=0.1, atol=0)
+    assert np.allclose(backward_svs[2], inc_backward_svs[2], rtol=0.1, atol=0)
+
+    # Refined frames match the full calculation
+    refined = [24, 49, 74, 99, 100]
+    assert np.allclose(forward_svs[:3, refined], inc_forward_svs[:3, refined],
+        rtol=1e-5, atol=0)
+    assert np.allclose(backward_svs[:3, refined], inc_backward_svs[:3, refined],
+        rtol=1e-5, atol=0)
+    assert np.all(inc_forward_svs[3:] == 0)
+    assert np.all(inc_backward_svs[3:] == 0)
+
+def test_incremental_efa_refine():
+    series = raw.load_series([os.path.join('.', 'data',
+            'clean_BSA_001.hdf5')])[0]
+
+    svd_a = SASCalc.SVDonSASMs(series.getSASMList(0, 200, 'unsub'),
+        do_binning=False, do_autocorr=False)[7]
+
+    for forward in [True, False]:
+        svs = SASCalc.runEFA(svd_a, forward)
+        inc_svs = SASCalc.runIncrementalEFA(svd_a, 3, forward, refine_every=50)
+
+        refined = [49, 99, 149, 199, 200]
+
+        assert np.allclose(svs[0], inc_svs[0], rtol=1e-5, atol=0)
+        assert np.allclose(svs[:3], inc_svs[:3], rtol=0.1, atol=0)
+        assert np.allclose(svs[:3, refined], inc_svs[:3, refined], rtol=1e-5,
+            atol=0)
+        assert np.all(inc_svs[3:] == 0)
+
+        # Short ranges use the full calculation
+        short_svs = SASCalc.runEFA(svd_a[:, :40], forward, 3)
+
+        assert np.allclose(short_svs[:3], SASCalc.runEFA(svd_a[:, :40],
+            forward)[:3])
+        assert np.all(short_svs[3:] == 0)
+
 def test_regals(bsa_series):
     prof1_settings = {
         'type'          : 'simple',
@@ -320,6 +388,224 @@ def test_validate_buffer_range_list(bsa_series):
     assert np.isclose(intI_results['intI_pval'], 0.16014409516640912)
     assert np.isclose(intI_results['smoothed_intI_pval'], 0.39653903414001357)
 
+def test_similarity_matrix(bsa_series_profiles):
+    sim_matrix = SASCalc.SimilarityMatrix(bsa_series_profiles)
+
+    qrange = bsa_series_profiles[0].getQrange()
+    frame_idx = np.arange(len(bsa_series_profiles))
+
+    pvals, corrected_pvals, failed_comparisons = raw.cormap(bsa_series_profiles,
+        correction='None')
+
+    for ref_idx in frame_idx:
+        assert np.allclose(sim_matrix.get_pvals(ref_idx, frame_idx, qrange),
+            pvals[ref_idx])
+
+def test_similarity_matrix_partial(bsa_series_profiles):
+    sim_matrix = SASCalc.SimilarityMatrix(bsa_series_profiles, block_size=4)
+
+    calc_idx = []
+    calc_pvals = sim_matrix._calc_pvals
+
+    def count_calc_pvals(ref_idx, frame_idx, qrange):
+        calc_idx.extend([(ref_idx, idx) for idx in frame_idx])
+        return calc_pvals(ref_idx, frame_idx, qrange)
+
+    sim_matrix._calc_pvals = count_calc_pvals
+
+    qi, qf = bsa_series_profiles[0].getQrange()
+    low_qrange = (qi, qi+100)
+
+    pvals, corrected_pvals, failed_comparisons = raw.cormap(bsa_series_profiles,
+        correction='None')
+
+    part_pvals = sim_matrix.get_pvals(2, [0, 1, 2, 3], (qi, qf))
+
+    assert np.allclose(part_pvals, pvals[2][:4])
+    assert len(calc_idx) == 4
+
+    # Only the missing comparisons are calculated, across blocks
+    all_pvals = sim_matrix.get_pvals(2, np.arange(10), (qi, qf))
+
+    assert np.allclose(all_pvals, pvals[2])
+    assert len(calc_idx) == 10
+
+    # The reverse comparisons are stored as well
+    rev_pvals = sim_matrix.get_pvals(7, [2], (qi, qf))
+
+    assert np.allclose(rev_pvals, pvals[7][2])
+    assert len(calc_idx) == 10
+
+    # Each q range is stored separately
+    low_q_profiles = [sasm.copy_no_metadata() for sasm in bsa_series_profiles]
+    for sasm in low_q_profiles:
+        sasm.setQrange(low_qrange)
+
+    low_q_pvals, corrected_pvals, failed_comparisons = raw.cormap(
+        low_q_profiles, correction='None')
+
+    similar, outliers = sim_matrix.similarity_test(2, np.arange(10),
+        low_qrange, 0.01)
+
+    assert len(calc_idx) == 20
+    assert np.allclose(sim_matrix.get_pvals(2, np.arange(10), low_qrange),
+        low_q_pvals[2])
+    assert similar == np.all(low_q_pvals[2] >= 0.01)
+    assert np.all(outliers == np.argwhere(low_q_pvals[2] < 0.01).flatten())
+
+def test_similarity_matrix_scale(bsa_series_profiles):
+    sim_matrix = SASCalc.SimilarityMatrix(bsa_series_profiles, scale=True)
+
+    qrange = bsa_series_profiles[0].getQrange()
+    frame_idx = np.arange(len(bsa_series_profiles))
+
+    ref_profile = bsa_series_profiles[4].copy_no_metadata()
+    profiles = [sasm.copy_no_metadata() for sasm in bsa_series_profiles]
+    SASProc.superimpose(ref_profile, profiles, 'Scale')
+
+    pvals, corrected_pvals, failed_comparisons = raw.cormap(profiles,
+        ref_profile, correction='None')
+
+    assert np.allclose(sim_matrix.get_pvals(4, frame_idx, qrange), pvals)
+
+def _assert_results_equal(results, ref_results):
+    if isinstance(ref_results, dict):
+        assert results.keys() == ref_results.keys()
+
+        for key in ref_results:
+            _assert_results_equal(results[key], ref_results[key])
+
+    elif isinstance(ref_results, tuple):
+        assert len(results) == len(ref_results)
+
+        for val, ref_val in zip(results, ref_results):
+            _assert_results_equal(val, ref_val)
+
+    elif isinstance(ref_results, (list, np.ndarray)):
+        # Singular vectors are only defined up to a sign
+        assert np.allclose(np.abs(results), np.abs(ref_results), equal_nan=True)
+
+    else:
+        assert results == ref_results or (np.isnan(results)
+            and np.isnan(ref_results))
+
+def test_series_analysis_context(bsa_series_profiles):
+    profiles = [sasm.copy_no_metadata() for sasm in bsa_series_profiles]
+    context = SASCalc.SeriesAnalysisContext(profiles)
+
+    intensity = np.array([sasm.getI().sum() for sasm in profiles])
+    rg = np.linspace(33, 33.5, len(profiles))
+    vcmw = np.linspace(65, 66, len(profiles))
+    vpmw = np.linspace(70, 71, len(profiles))
+
+    for start, end in [(0, 10), (2, 8), (0, 10)]:
+        frame_idx = np.arange(start, end)
+        sasms = profiles[start:end]
+
+        buffer_results = SASCalc.validateBuffer(sasms, frame_idx,
+            intensity[start:end], 'CorMap', 'Bonferroni', 0.01, False)
+        context_buffer_results = SASCalc.validateBuffer(sasms, frame_idx,
+            intensity[start:end], 'CorMap', 'Bonferroni', 0.01, False,
+            context)
+
+        _assert_results_equal(context_buffer_results, buffer_results)
+
+        sample_results = SASCalc.validateSample(sasms, frame_idx,
+            intensity[start:end], rg[start:end], vcmw[start:end],
+            vpmw[start:end], 'CorMap', 'Bonferroni', 0.01, False)
+        context_sample_results = SASCalc.validateSample(sasms, frame_idx,
+            intensity[start:end], rg[start:end], vcmw[start:end],
+            vpmw[start:end], 'CorMap', 'Bonferroni', 0.01, False, context)
+
+        _assert_results_equal(context_sample_results, sample_results)
+
+def test_validation_full_svd():
+    series = raw.load_series([os.path.join('.', 'data',
+            'clean_BSA_001.hdf5')])[0]
+
+    sasms = series.getSASMList(0, 149, 'unsub')
+    frame_idx = np.arange(150)
+    intensity = np.array([sasm.getI().sum() for sasm in sasms])
+    rg = np.linspace(33, 33.5, len(sasms))
+    vcmw = np.linspace(65, 66, len(sasms))
+    vpmw = np.linspace(70, 71, len(sasms))
+
+    # Validation uses the full SVD, even for long ranges
+    svd_a, i, err, q = SASCalc.prepareSASMsforSVD(sasms, do_binning=False)
+    svd_U, svd_s, svd_Vt = np.linalg.svd(svd_a, full_matrices=True)
+    u_autocor = SASCalc.svdAutocorrelation(svd_U)
+    v_autocor = SASCalc.svdAutocorrelation(svd_Vt.T)
+
+    ref_results = {'svals': SASCalc.findSignificantSingularValues(svd_s,
+            u_autocor, v_autocor),
+        'U': svd_U,
+        'V': svd_Vt.T,
+        'u_autocor': u_autocor,
+        'v_autocor': v_autocor,
+        }
+
+    context = SASCalc.SeriesAnalysisContext(sasms)
+
+    buffer_results = SASCalc.validateBuffer(sasms, frame_idx, intensity,
+        'CorMap', 'Bonferroni', 0.01, False)
+    sample_results = SASCalc.validateSample(sasms, frame_idx, intensity, rg,
+        vcmw, vpmw, 'CorMap', 'Bonferroni', 0.01, False)
+
+    _assert_results_equal(buffer_results[2], ref_results)
+    _assert_results_equal(sample_results[3], ref_results)
+    _assert_results_equal(context.get_svd_results(frame_idx), ref_results)
+
+def test_series_analysis_context_invalidate(bsa_series_profiles):
+    profiles = [sasm.copy_no_metadata() for sasm in bsa_series_profiles]
+    context = SASCalc.SeriesAnalysisContext(profiles)
+
+    frame_idx = np.arange(len(profiles))
+    qrange = profiles[0].getQrange()
+    intensity = np.array([sasm.getI().sum() for sasm in profiles])
+
+    sim_matrix = context.get_similarity_matrix()
+    sim_matrix.get_pvals(0, frame_idx, qrange)
+    svd_results = context.get_svd_results(frame_idx)
+    context.get_sn_results(frame_idx, intensity)
+
+    # Unchanged profiles reuse the stored results
+    assert context.get_similarity_matrix() is sim_matrix
+    assert context.get_svd_results(frame_idx) is svd_results
+
+    # Scaling a profile discards the stored results
+    profiles[3].scale(1.5)
+
+    new_sim_matrix = context.get_similarity_matrix()
+
+    pvals, corrected_pvals, failed_comparisons = raw.cormap(profiles,
+        profiles[0], correction='None')
+
+    assert new_sim_matrix is not sim_matrix
+    assert np.allclose(new_sim_matrix.get_pvals(0, frame_idx, qrange), pvals)
+
+    sort_idx, j, sn_valid = context.get_sn_results(frame_idx, intensity)
+
+    assert len(context._sn_results) == 1
+
+    # So does replacing or adding profiles
+    profiles[5] = profiles[6].copy_no_metadata()
+
+    _assert_results_equal(context.get_svd_results(frame_idx),
+        SASCalc.significantSingularValues(profiles))
+
+    profiles.append(profiles[0].copy_no_metadata())
+    frame_idx = np.arange(len(profiles))
+
+    assert context.get_similarity_matrix() is not new_sim_matrix
+    _assert_results_equal(context.get_svd_results(frame_idx),
+        SASCalc.significantSingularValues(profiles))
+
+    # As does changing a profile's q range
+    sim_matrix = context.get_similarity_matrix()
+    profiles[0].setQrange((10, qrange[1]))
+
+    assert context.get_similarity_matrix() is not sim_matrix
+
 def test_set_buffer_range(clean_bsa_series):
     (sub_profiles, rg, rger, i0, i0er, vcmw, vcmwer,
         vpmw) = raw.set_buffer_range(clean_bsa_series, [[18, 53]])
@@ -574,6 +860,47 @@ def test_set_baseline_correction_linear(clean_baseline_series):
     assert all(rg == clean_baseline_series.getRg()[0])
     assert clean_baseline_series.getIntI(int_type='baseline').sum() == 0.10684702672323632
 
+def test_set_baseline_correction_linear_profiles(series_images):
+    series = copy.deepcopy(series_images)
+    sub_profiles = series.getAllSASMs('sub')
+
+    (bl_cor_profiles, rg, rger, i0, i0er, vcmw, vcmwer, vpmw, bl_corr,
+        fit_results) = raw.set_baseline_correction(series, [0, 2], [17, 19],
+        'Linear')
+
+    assert len(bl_cor_profiles) == len(sub_profiles)
+    assert len(bl_corr) == len(sub_profiles)
+    assert len(fit_results) == len(sub_profiles[0].getQ())
+
+    a = np.array([fit[0] for fit in fit_results])
+    b = np.array([fit[1] for fit in fit_results])
+
+    for j in [0, 5, 19]:
+        baseline = a + b*j
+        assert np.allclose(bl_corr[j].getI(), baseline)
+        assert np.allclose(bl_cor_profiles[j].getI(),
+            sub_profiles[j].getI() - baseline)
+
+def test_set_baseline_correction_integral_profiles(series_images):
+    series = copy.deepcopy(series_images)
+    sub_profiles = series.getAllSASMs('sub')
+
+    (bl_cor_profiles, rg, rger, i0, i0er, vcmw, vcmwer, vpmw, bl_corr,
+        fit_results) = raw.set_baseline_correction(series, [0, 2], [17, 19],
+        'Integral')
+
+    assert len(bl_cor_profiles) == len(sub_profiles)
+    assert len(bl_corr) == 17 - 2 + 1
+    assert len(fit_results) == 0
+    assert all(bl_cor_profiles[0].getI() == sub_profiles[0].getI())
+
+    for j in [2, 10, 17]:
+        assert np.allclose(bl_cor_profiles[j].getI(),
+            sub_profiles[j].getI() - bl_corr[j-2].getI())
+
+    assert np.allclose(bl_cor_profiles[19].getI(),
+        sub_profiles[19].getI() - bl_corr[-1].getI())
+
 def test_multi_series(multiseries_buffer, multiseries_sample):
     results = raw.multi_series_calc([multiseries_buffer, multiseries_sample],
         [[1,1]], [[0,0]])
@@ -646,3 +973,26 @@ def test_multi_series_window(multiseries_buffer, multiseries_sample):
 
     assert np.mean(results[1][4]) == 33.90891894075841
     assert np.mean(results[5][4]) == 141.03226108148883
+
+def test_multi_series_chunks(multiseries_buffer, multiseries_sample):
+    results = raw.multi_series_calc([multiseries_buffer, multiseries_sample],
+        [[1,1]], [[0,0]], bin_series=True, series_rebin_factor=2,
+        series_bin_keys=['number',], chunk_size=3)
+
+    assert np.mean(results[1]) == 33.73071423408199
+    assert np.mean(results[5]) == 143.1737688043273
+    assert len(results[5]) == 5
+    assert results[0].getSASM().getParameter('counters')['number'] == 0.5
+
+def test_multi_series_mismatched_q(multiseries_buffer, multiseries_sample):
+    sample = copy.deepcopy(multiseries_sample)
+    sample[3] = raw.rebin([sample[3]], rebin_factor=2)[0]
+
+    results = raw.multi_series_calc([multiseries_buffer, sample],
+        [[1,1]], [[0,0]], chunk_size=5)
+
+    test_results = raw.multi_series_calc([multiseries_buffer,
+        multiseries_sample], [[1,1]], [[0,0]], chunk_size=5)
+
+    assert len(results[0].getSASM(3).getQ()) != len(test_results[0].getSASM(3).getQ())
+    assert all(results[0].getSASM(8).getI() == test_results[0].getSASM(8).getI())
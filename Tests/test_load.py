@@ -1,4 +1,5 @@
 import os
+import copy
 
 import pytest
 import numpy as np
@@ -795,6 +796,45 @@ def test_load_profile_without_settings():
     assert params['config_file'] == "/Users/jesse/Desktop/Tutorial_Data/standards_data/SAXS.cfg"
     assert 'calibration_params' in params
 
+def test_load_profile_with_cache(temp_directory):
+    filenames = [os.path.join('.', 'data', 'glucose_isomerase.dat'),
+        os.path.join('.', 'data', 'crysol.fit')]
+    ref_profiles = raw.load_profiles(filenames)
+
+    raw.enable_load_cache(os.path.join(temp_directory, 'load_cache'))
+
+    try:
+        raw.load_profiles(filenames)
+        profiles = raw.load_profiles(filenames)
+        stats = raw.get_load_cache_stats()
+    finally:
+        raw.disable_load_cache()
+
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert len(profiles) == len(ref_profiles)
+
+    for sasm, ref_sasm in zip(profiles, ref_profiles):
+        assert np.all(sasm.getQ() == ref_sasm.getQ())
+        assert np.all(sasm.getI() == ref_sasm.getI())
+        assert np.all(sasm.getErr() == ref_sasm.getErr())
+        assert sasm.getAllParameters() == ref_sasm.getAllParameters()
+
+def test_load_profile_multiproc():
+    filenames = [os.path.join('.', 'data', 'glucose_isomerase.dat'),
+        os.path.join('.', 'data', 'crysol.fit'),
+        os.path.join('.', 'data', 'glucose_isomerase.dat')]
+    ref_profiles = raw.load_profiles(filenames)
+    profiles = raw.load_profiles(filenames, single_proc=False, nprocs=2)
+
+    assert len(profiles) == len(ref_profiles)
+
+    for sasm, ref_sasm in zip(profiles, ref_profiles):
+        assert np.all(sasm.getQ() == ref_sasm.getQ())
+        assert np.all(sasm.getI() == ref_sasm.getI())
+        assert np.all(sasm.getErr() == ref_sasm.getErr())
+        assert sasm.getParameter('filename') == ref_sasm.getParameter('filename')
+
 def test_load_profile_with_settings(old_settings):
     settings = old_settings
     filenames = [os.path.join('.', 'data', 'glucose_isomerase.dat')]
@@ -1147,6 +1187,114 @@ def test_load_series_new_from_images():
     assert len(secm.use_baseline_subtracted_sasm) == 0
     assert secm.total_i_bcsub.sum() == 0
 
+def test_load_series_lazy():
+    filenames = [os.path.join('.', 'data', 'series_new_images.hdf5')]
+
+    secm = raw.load_series(filenames)[0]
+    lazy_secm = raw.load_series(filenames, lazy=True, cache_size=4)[0]
+
+    assert isinstance(lazy_secm.getAllSASMs(), SECM.LazySASMList)
+    assert len(lazy_secm.getAllSASMs()) == 20
+    assert len(lazy_secm.getAllSASMs('sub')) == 20
+    assert np.allclose(lazy_secm.total_i, secm.total_i)
+    assert np.allclose(lazy_secm.total_i_sub, secm.total_i_sub)
+    assert np.array_equal(lazy_secm.getTime(), secm.getTime())
+    assert lazy_secm.rg_list[5] == secm.rg_list[5]
+
+    for int_type in ['unsub', 'sub']:
+        for idx in [0, 10, 19, -1]:
+            sasm = secm.getSASM(idx, int_type)
+            lazy_sasm = lazy_secm.getSASM(idx, int_type)
+
+            assert np.allclose(lazy_sasm.getQ(), sasm.getQ())
+            assert np.allclose(lazy_sasm.getI(), sasm.getI())
+            assert np.allclose(lazy_sasm.getErr(), sasm.getErr())
+            assert lazy_sasm.getParameter('filename') == sasm.getParameter('filename')
+
+    assert len(lazy_secm.getAllSASMs()._cache) <= 4
+
+@pytest.mark.parametrize('filename', ['series_new_images.hdf5',
+    'clean_BSA_001.hdf5', 'series_with_sasbdb_keywords.hdf5'])
+def test_load_series_lazy_time(filename):
+    filenames = [os.path.join('.', 'data', filename)]
+
+    secm = raw.load_series(filenames)[0]
+    lazy_secm = raw.load_series(filenames, lazy=True, cache_size=4)[0]
+
+    assert len(lazy_secm.getTime()) == len(lazy_secm.getFrames())
+    assert np.array_equal(lazy_secm.getFrames(), secm.getFrames())
+    assert np.array_equal(lazy_secm.getTime(), secm.getTime())
+
+def test_lazy_sasm_list_mutation():
+    filenames = [os.path.join('.', 'data', 'series_new_images.hdf5')]
+
+    lazy_secm = raw.load_series(filenames, lazy=True, cache_size=4)[0]
+
+    sasms = lazy_secm.getAllSASMs()
+    ref_sasms = list(raw.load_series(filenames)[0].getAllSASMs())
+
+    def names(sasm_list):
+        return [sasm.getParameter('filename') for sasm in sasm_list]
+
+    # Profiles set into the list are kept when other profiles are loaded
+    sasm = sasms[2]
+    sasm.setParameter('filename', 'changed.dat')
+    sasms[2] = sasm
+    ref_sasms[2] = sasm
+
+    names(sasms)
+
+    assert sasms[2] is sasm
+    assert sasms[2].getParameter('filename') == 'changed.dat'
+    assert len(sasms._cache) <= 4
+
+    del sasms[0]
+    del ref_sasms[0]
+
+    new_sasm = ref_sasms[5].copy_no_metadata()
+    new_sasm.setParameter('filename', 'new.dat')
+    sasms.insert(3, new_sasm)
+    ref_sasms.insert(3, new_sasm)
+
+    assert sasms.pop().getParameter('filename') == ref_sasms.pop().getParameter('filename')
+    assert sasms.pop(4).getParameter('filename') == ref_sasms.pop(4).getParameter('filename')
+
+    sasms[6:8] = ref_sasms[10:12]
+    ref_sasms[6:8] = ref_sasms[10:12]
+
+    sasms.reverse()
+    ref_sasms.reverse()
+
+    sasms.remove(new_sasm)
+    ref_sasms.remove(new_sasm)
+
+    sasms += [new_sasm]
+    ref_sasms += [new_sasm]
+
+    assert len(sasms) == len(ref_sasms)
+    assert names(sasms) == names(ref_sasms)
+    assert names(sasms[2:10:3]) == names(ref_sasms[2:10:3])
+    assert new_sasm in sasms
+    assert sasms.index(new_sasm) == len(sasms)-1
+
+    sasms.sort(key=lambda sasm: sasm.getParameter('filename'))
+    ref_sasms.sort(key=lambda sasm: sasm.getParameter('filename'))
+
+    assert names(sasms) == names(ref_sasms)
+
+    for sasm, ref_sasm in zip(sasms, ref_sasms):
+        assert np.allclose(sasm.getI(), ref_sasm.getI())
+
+    copy_sasms = copy.deepcopy(sasms)
+
+    assert isinstance(copy_sasms, SECM.LazySASMList)
+    assert names(copy_sasms) == names(ref_sasms)
+
+    sasms.clear()
+
+    assert len(sasms) == 0
+    assert len(copy_sasms) == len(ref_sasms)
+
 def test_load_series_old_from_dats_with_settings(old_settings):
     filenames = [os.path.join('.', 'data', 'series_old_dats.sec')]
 
@@ -1428,6 +1576,17 @@ def test_load_images_biocat_eiger(settings_biocat_eiger):
     assert img2.min() == 0
     assert img2[50, 50] == 0
 
+def test_load_images_biocat_eiger_repeat(settings_biocat_eiger):
+    filenames = [os.path.join('.', 'data', 'vac_007_data_000001.h5')]
+
+    img_list, img_hdr_list = raw.load_images(filenames, settings_biocat_eiger)
+    img_list2, img_hdr_list2 = raw.load_images(filenames, settings_biocat_eiger)
+
+    assert len(img_list2) == len(img_list)
+
+    for img, img2 in zip(img_list, img_list2):
+        assert np.all(img == img2)
+
 def test_load_and_integrate_images(old_settings):
     filenames = [os.path.join('.', 'data', 'GI2_A9_19_001_0000.tiff')]
 
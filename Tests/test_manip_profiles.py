@@ -1215,6 +1215,42 @@ def test_subtract(bsa_series_profiles):
         assert all(sasm.getI() == test_sub_i[j])
         assert np.allclose(sasm.getErr(), test_sub_err[j])
 
+def test_subtract_series_profiles(series_images):
+    profiles = copy.deepcopy(series_images.getAllSASMs())
+
+    nmin, nmax = profiles[3].getQrange()
+    profiles[3].setQrange((nmin, nmax-10))
+
+    bkg_profile = profiles.pop(0)
+
+    sub_profiles = raw.subtract(profiles, bkg_profile, forced=True)
+    test_sub_profiles = [raw.subtract(profile, bkg_profile, forced=True)[0]
+        for profile in profiles]
+
+    assert len(sub_profiles) == len(profiles)
+
+    for sasm, test_sasm in zip(sub_profiles, test_sub_profiles):
+        assert all(sasm.getQ() == test_sasm.getQ())
+        assert all(sasm.getI() == test_sasm.getI())
+        assert np.allclose(sasm.getErr(), test_sasm.getErr())
+        assert sasm.getParameter('filename') == test_sasm.getParameter('filename')
+        assert sasm.getParameter('history') == test_sasm.getParameter('history')
+
+def test_subtract_independent_history(bsa_series_profiles):
+    profiles = copy.deepcopy(bsa_series_profiles)
+
+    bkg_profile = profiles.pop(0)
+    bkg_profile.setParameter('history', {'averaged_files': ['a.dat', 'b.dat']})
+
+    sub_profiles = raw.subtract(profiles, bkg_profile)
+
+    sub_history = sub_profiles[0].getParameter('history')['subtraction']['subtracted_file']
+    sub_history[1]['averaged_files'].append('c.dat')
+
+    other_history = sub_profiles[1].getParameter('history')['subtraction']['subtracted_file']
+
+    assert other_history[1]['averaged_files'] == ['a.dat', 'b.dat']
+
 def test_subtract_forced_first_prof_shift_end(bsa_series_profiles):
     profiles = copy.deepcopy(bsa_series_profiles)
 
@@ -2072,3 +2108,37 @@ def test_scaleq_profile(gi_sub_profile, scale_factor):
     test_profile.scaleQ(scale_factor)
 
     assert all(test_profile.getQ() == q*scale_factor)
+
+def test_scale_series(series_images):
+    series = copy.deepcopy(series_images)
+
+    raw_profiles = copy.deepcopy(series.getAllSASMs())
+    raw_sub_profiles = copy.deepcopy(series.getAllSASMs('sub'))
+
+    nmin, nmax = raw_profiles[0].getQrange()
+
+    series.scale(2.5)
+    series.offset(0.1)
+    series.setQrange(nmin+5, nmax-11)
+
+    for sasm, raw_sasm in zip(series.getAllSASMs(), raw_profiles):
+        raw_sasm.scale(2.5)
+        raw_sasm.offset(0.1)
+        raw_sasm.setQrange((nmin+5, nmax-10))
+
+        assert all(sasm.getQ() == raw_sasm.getQ())
+        assert all(sasm.getI() == raw_sasm.getI())
+
+    assert np.allclose(series.getIntI(),
+        [sasm.getTotalI() for sasm in raw_profiles])
+    assert np.allclose(series.getMeanI(),
+        [sasm.getMeanI() for sasm in raw_profiles])
+
+    for sasm, raw_sasm in zip(series.getAllSASMs('sub'), raw_sub_profiles):
+        raw_sasm.scale(2.5)
+        raw_sasm.offset(0.1)
+
+        assert all(sasm.getI() == raw_sasm.getI())
+
+    assert np.allclose(series.getIntI('sub'),
+        [sasm.getTotalI() for sasm in raw_sub_profiles])
@@ -2,6 +2,7 @@ import os
 
 import pytest
 import numpy as np
+import h5py
 
 raw_path = os.path.abspath(os.path.join('.', __file__, '..', '..'))
 if raw_path not in os.sys.path:
@@ -218,6 +219,70 @@ def test_save_series_images(series_images, temp_directory):
     assert len(test_series.use_baseline_subtracted_sasm) == len(series_images.use_baseline_subtracted_sasm)
     assert all(test_series.total_i_bcsub == series_images.total_i_bcsub)
 
+def test_save_series_v1(series_images, temp_directory):
+    raw.save_series(series_images, 'test_series_v1.hdf5', temp_directory,
+        file_version=1)
+
+    test_series = raw.load_series([os.path.join(temp_directory,
+        'test_series_v1.hdf5')])[0]
+
+    assert test_series.file_list == series_images.file_list
+    assert all(test_series.total_i == series_images.total_i)
+    assert len(test_series.getAllSASMs()) == len(series_images.getAllSASMs())
+    assert all([np.all(test_sasm.getI() == sasm.getI()) for test_sasm, sasm
+        in zip(test_series.getAllSASMs(), series_images.getAllSASMs())])
+
+def test_save_series_v2(series_images, temp_directory):
+    raw.save_series(series_images, 'test_series_v2.hdf5', temp_directory,
+        file_version=2)
+
+    test_series = raw.load_series([os.path.join(temp_directory,
+        'test_series_v2.hdf5')])[0]
+
+    assert test_series.file_list == series_images.file_list
+    assert all(test_series.total_i == series_images.total_i)
+    assert len(test_series.getAllSASMs()) == len(series_images.getAllSASMs())
+    assert all([np.all(test_sasm.getI() == sasm.getI()) for test_sasm, sasm
+        in zip(test_series.getAllSASMs(), series_images.getAllSASMs())])
+
+def test_save_series_default_version(series_images, temp_directory):
+    raw.save_series(series_images, 'test_series_default.hdf5', temp_directory)
+
+    with h5py.File(os.path.join(temp_directory, 'test_series_default.hdf5'),
+        'r') as f:
+        assert f.attrs['series_file_version'] == 1
+
+def test_save_series_uncompressed(series_images, temp_directory):
+    raw.save_series(series_images, 'test_series_uncompressed.hdf5',
+        temp_directory, file_version=2, compression=None)
+
+    test_series = raw.load_series([os.path.join(temp_directory,
+        'test_series_uncompressed.hdf5')])[0]
+
+    assert test_series.file_list == series_images.file_list
+    assert all(test_series.total_i == series_images.total_i)
+    assert len(test_series.getAllSASMs()) == len(series_images.getAllSASMs())
+    assert all([np.all(test_sasm.getI() == sasm.getI()) for test_sasm, sasm
+        in zip(test_series.getAllSASMs(), series_images.getAllSASMs())])
+
+def test_save_series_append(series_images, temp_directory):
+    profiles = series_images.getAllSASMs()
+    partial_series = raw.profiles_to_series(profiles[:len(profiles)//2])
+    full_series = raw.profiles_to_series(profiles)
+
+    raw.save_series(partial_series, 'test_series_append.hdf5', temp_directory,
+        append=True)
+    raw.save_series(full_series, 'test_series_append.hdf5', temp_directory,
+        append=True)
+
+    test_series = raw.load_series([os.path.join(temp_directory,
+        'test_series_append.hdf5')])[0]
+
+    assert len(test_series.getAllSASMs()) == len(profiles)
+    assert all(test_series.total_i == full_series.total_i)
+    assert all([np.all(test_sasm.getI() == sasm.getI()) for test_sasm, sasm
+        in zip(test_series.getAllSASMs(), profiles)])
+
 def test_save_series_sasbdb_keywords(series_sasbdb_keywords, temp_directory):
     raw.save_series(series_sasbdb_keywords, 'test_series_sasbdb_keywords.hdf5', temp_directory)
 
@@ -24,6 +24,8 @@ import six
 import multiprocessing
 import functools
 import threading
+import atexit
+import contextlib
 import os
 import platform
 
@@ -39,6 +41,115 @@ if raw_path not in os.sys.path:
 
 import bioxtasraw.SASM as SASM
 
+# A process pool that is shared by every BIFT calculation, so that the worker
+# processes (and the compiled numba functions) are only started up once.
+_worker_pool = None
+_worker_pool_size = None
+_worker_pool_users = {}
+_worker_pool_lock = threading.Lock()
+
+@contextlib.contextmanager
+def worker_pool(nprocs=0, pool=None):
+    """
+    Gives the pool to use for a calculation. If pool is provided it is used
+    as is. Otherwise the shared BIFT worker pool is used, starting it if it
+    isn't running. If nprocs is 0, the shared pool has one less process
+    than the number of cores. If the shared pool is a different size it is
+    replaced, but a pool is only closed once no calculation is using it.
+    """
+    if pool is not None:
+        yield pool
+        return
+
+    pool = _acquire_pool(nprocs)
+
+    try:
+        yield pool
+    finally:
+        _release_pool(pool)
+
+def _acquire_pool(nprocs):
+    global _worker_pool, _worker_pool_size
+
+    if nprocs == 0:
+        n_proc = max(multiprocessing.cpu_count()-1, 1)
+    else:
+        n_proc = min(nprocs, multiprocessing.cpu_count())
+
+    old_pool = None
+
+    with _worker_pool_lock:
+        if _worker_pool is not None and _worker_pool_size != n_proc:
+            old_pool = _detach_pool()
+
+        if _worker_pool is None:
+            _worker_pool = multiprocessing.Pool(processes=n_proc)
+            _worker_pool_size = n_proc
+
+        pool = _worker_pool
+        _worker_pool_users[pool] = _worker_pool_users.get(pool, 0) + 1
+
+    _close_pool(old_pool)
+
+    return pool
+
+def _release_pool(pool):
+    old_pool = None
+
+    with _worker_pool_lock:
+        _worker_pool_users[pool] -= 1
+
+        if _worker_pool_users[pool] == 0:
+            del _worker_pool_users[pool]
+
+            if pool is not _worker_pool:
+                old_pool = pool
+
+    _close_pool(old_pool)
+
+def _detach_pool():
+    # Stops sharing the current pool. Returns the pool if it can be closed
+    # now, otherwise it is closed when its last user releases it.
+    global _worker_pool, _worker_pool_size
+
+    pool = _worker_pool
+
+    _worker_pool = None
+    _worker_pool_size = None
+
+    if pool is not None and _worker_pool_users.get(pool, 0) == 0:
+        return pool
+    else:
+        return None
+
+def _close_pool(pool):
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+def shutdown_worker_pool():
+    """
+    Stops the shared BIFT worker pool, if it is running. If a calculation is
+    using the pool, it is stopped when the calculation finishes.
+    """
+    with _worker_pool_lock:
+        pool = _detach_pool()
+
+    _close_pool(pool)
+
+atexit.register(shutdown_worker_pool)
+
+def _pool_map(pool, func, pts):
+    # Works for both multiprocessing pools and concurrent.futures executors
+    return list(pool.map(func, pts))
+
+def _pool_imap(pool, func, pts):
+    # Returns the results in order as they finish
+    if hasattr(pool, 'imap'):
+        return pool.imap(func, pts)
+    else:
+        return pool.map(func, pts)
+
 @jit(nopython=True, cache=True)
 def createTransMatrix(q, r):
     """
@@ -154,16 +265,16 @@ def bift_inner_loop(f, p, B, alpha, N, sum_dia):
     return f, p, sigma, dotsp, xprec
 
 @jit(nopython=True, cache=True)
-def getEvidence(params, q, i, orig_err, N):
-    log_alpha, dmax = params
-    alpha = np.exp(log_alpha)
-    err = orig_err**2
-
+def getDmaxOperators(dmax, q, i, err, N):
+    """
+    Calculates everything in the evidence calculation that depends only on
+    dmax (and not alpha): the scaled prior, r, the transformation matrix,
+    and the B and sum_dia terms. err is the squared uncertainty.
+    """
     p, r = makePriorDistribution(i[0], N, dmax, 'sphere') #Note, here I use p for what Hansen calls m
     T = createTransMatrix(q, r)
 
     p[0] = 0
-    f = np.zeros_like(p)
 
     # norm_T = T/err[:,None]  #Slightly faster to create this first
     norm_T = T/err.reshape((err.size, 1))  #Slightly faster to create this first
@@ -180,6 +291,19 @@ def getEvidence(params, q, i, orig_err, N):
     c1 = np.sum(np.sum(T[1:4,1:-1]*p[1:-1], axis=1)/err[1:4])
     c2 = np.sum(i[1:4]/err[1:4])
     p[1:-1] = p[1:-1]*(c2/c1)
+
+    return p, r, T, B, sum_dia
+
+@jit(nopython=True, cache=True)
+def getEvidenceFromOperators(log_alpha, dmax, i, err, N, prior, T, B, sum_dia):
+    """
+    Calculates the evidence for one alpha from the output of getDmaxOperators.
+    Returns the evidence, chi squared, and P(r).
+    """
+    alpha = np.exp(log_alpha)
+
+    p = prior.copy()
+    f = np.zeros_like(p)
     f[1:-1] = p[1:-1]*1.001     #Note: f is called P in the original RAW BIFT code
 
     # Do the optimization
@@ -207,76 +331,118 @@ def getEvidence(params, q, i, orig_err, N):
     elif dotsp < xprec:
         evidence = evidence/30.
 
+    return evidence, c, f
+
+@jit(nopython=True, cache=True)
+def getEvidence(params, q, i, orig_err, N):
+    log_alpha, dmax = params
+    err = orig_err**2
+
+    p, r, T, B, sum_dia = getDmaxOperators(dmax, q, i, err, N)
+
+    evidence, c, f = getEvidenceFromOperators(log_alpha, dmax, i, err, N, p,
+        T, B, sum_dia)
+
     return evidence, c, f, r
 
+@jit(nopython=True, cache=True)
+def getEvidenceRow(log_alphas, dmax, q, i, orig_err, N):
+    """
+    Calculates the evidence for every alpha at one dmax, sharing the dmax
+    dependent calculations. Gives the same results as calling getEvidence
+    for each alpha.
+    """
+    err = orig_err**2
+
+    p, r, T, B, sum_dia = getDmaxOperators(dmax, q, i, err, N)
+
+    n_alpha = log_alphas.size
+    ev_array = np.zeros(n_alpha)
+    c_array = np.zeros(n_alpha)
+    f_array = np.zeros((n_alpha, N+1))
+
+    for j in range(n_alpha):
+        evidence, c, f = getEvidenceFromOperators(log_alphas[j], dmax, i, err,
+            N, p, T, B, sum_dia)
+
+        ev_array[j] = evidence
+        c_array[j] = c
+        f_array[j] = f
+
+    return ev_array, c_array, f_array, r
+
+# The pools pickle these wrappers by name, so the workers call the already
+# compiled numba functions. Pickling the numba functions themselves makes
+# each worker compile them again.
+def _pool_evidence(params, q, i, orig_err, N):
+    return getEvidence(params, q, i, orig_err, N)
+
+def _pool_evidence_row(dmax, log_alphas, q, i, orig_err, N):
+    return getEvidenceRow(log_alphas, dmax, q, i, orig_err, N)
+
 def getEvidenceOptimize(params, q, i, err, N):
     evidence, c, f, r = getEvidence(params, q, i, err, N)
     #Negative so you can minimize on it
     return -evidence
 
 def calc_bift_errors(opt_params, q, i, err, N, mc_runs=300, abort_check=False,
-    single_proc=False, nprocs=0):
+    single_proc=False, nprocs=0, pool=None, retry_failed=False):
+    if not single_proc and pool is None:
+        with worker_pool(nprocs) as pool:
+            return calc_bift_errors(opt_params, q, i, err, N, mc_runs,
+                abort_check, single_proc, nprocs, pool, retry_failed)
+
     #First, randomly generate a set of parameters similar but not quite the same as the best parameters (monte carlo)
     #Then, calculate the evidence, pr, and other results for each set of parameters
     alpha_opt, dmax_opt = opt_params
     mult = 3.0
 
     if not single_proc:
-        if nprocs == 0:
-            n_proc = max(multiprocessing.cpu_count()-1, 1)
-        else:
-            n_proc = min(nprocs, multiprocessing.cpu_count())
-        mp_pool = multiprocessing.Pool(processes=n_proc)
-        mp_get_evidence = functools.partial(getEvidence, q=q, i=i, orig_err=err, N=N)
-    else:
-        n_proc = nprocs
+        mp_get_evidence = functools.partial(_pool_evidence, q=q, i=i, orig_err=err, N=N)
 
     ev_array = np.zeros(mc_runs)
     c_array = np.zeros(mc_runs)
     f_array = np.zeros((mc_runs, N+1))
-    r_array = np.zeros((mc_runs, N+1))
+    alpha_array = np.zeros(mc_runs)
+    dmax_array = np.zeros(mc_runs)
 
     max_dmax = dmax_opt+0.1*dmax_opt*0.5*mult
 
     _, ref_r = makePriorDistribution(i[0], N, max_dmax, 'sphere')
 
+    r_array = np.tile(ref_r, (mc_runs, 1))
+
+    # If retry_failed is True, only the runs where the evidence overflowed are
+    # redrawn (with a smaller spread), otherwise all of the runs are redrawn
+    run_idx = np.arange(mc_runs)
     run_mc = True
 
     while run_mc:
 
-        alpha_array = alpha_opt+0.1*alpha_opt*(np.random.random(mc_runs)-0.5)*mult
-        dmax_array = dmax_opt+0.1*dmax_opt*(np.random.random(mc_runs)-0.5)*mult
+        alpha_array[run_idx] = alpha_opt+0.1*alpha_opt*(np.random.random(run_idx.size)-0.5)*mult
+        dmax_array[run_idx] = dmax_opt+0.1*dmax_opt*(np.random.random(run_idx.size)-0.5)*mult
         alpha_array[0] = alpha_opt
         dmax_array[0] = dmax_opt
 
-        pts = list(zip(alpha_array, dmax_array))
+        pts = list(zip(alpha_array[run_idx], dmax_array[run_idx]))
 
         if not single_proc:
-            try:
-                results = mp_pool.map(mp_get_evidence, pts)
-            except Exception:
-                mp_pool.close()
-                mp_pool.join()
-                raise
+            results = _pool_map(pool, mp_get_evidence, pts)
         else:
             results = [getEvidence(params, q, i, err, N) for params in pts]
 
-        for res_idx, res in enumerate(results):
-            dmax = dmax_array[res_idx]
+        ev_array[run_idx] = [res[0] for res in results]
+        c_array[run_idx] = [res[1] for res in results]
 
-            evidence, c, f, r = res
+        f_array[run_idx] = regridPr(np.array([res[3] for res in results]),
+            np.array([res[2] for res in results]), dmax_array[run_idx], ref_r)
 
-            interp = scipy.interpolate.interp1d(r, f, copy=False)
+        failed = np.abs(ev_array) >= 9e8
 
-            f_interp = np.zeros_like(ref_r)
-            f_interp[ref_r<dmax] = interp(ref_r[ref_r<dmax])
+        if retry_failed:
+            failed[0] = False
 
-            ev_array[res_idx] = evidence
-            c_array[res_idx] = c
-            f_array[res_idx,:] = f_interp
-            r_array[res_idx,:] = ref_r
-
-        if np.abs(ev_array).max() >= 9e8:
+        if np.any(failed):
             mult = mult/2.
 
             if mult < 0.001:
@@ -285,13 +451,12 @@ def calc_bift_errors(opt_params, q, i, err, N, mc_runs=300, abort_check=False,
             if abort_check.is_set():
                 run_mc = False
 
+            if retry_failed:
+                run_idx = np.flatnonzero(failed)
+
         else:
             run_mc = False
 
-    if not single_proc:
-        mp_pool.close()
-        mp_pool.join()
-
     #Then, calculate the probability of each result as exp(evidence - evidence_max)**(1/minimum_chisq), normalized by the sum of all result probabilities
 
     ev_max = ev_array.max()
@@ -329,49 +494,63 @@ def calc_bift_errors(opt_params, q, i, err, N, mc_runs=300, abort_check=False,
 
     return ref_r, p_avg, err, (alpha, sd_alpha), (dmax, sd_dmax), (c, sd_c), (evidence, sd_ev), (rg, sd_rg), (i0, sd_i0)
 
-def make_fit(q, r, pr):
-    qr = np.outer(q, r)
-    sinc_qr = np.where(qr==0, 1, np.sin(qr)/qr)
-    i = 4*np.pi*integrate.trapezoid(pr*sinc_qr, r, axis=1)
+def regridPr(r_array, f_array, dmax_array, ref_r):
+    """
+    Linearly interpolates each P(r) function (the rows of f_array, on the
+    r values in the rows of r_array) onto ref_r, with zeros where ref_r is
+    at or beyond the row's dmax. Gives the same results as np.interp (and
+    scipy's interp1d) for each row.
+    """
+    n_pts = r_array.shape[1]
+    x = np.broadcast_to(ref_r, (r_array.shape[0], ref_r.size))
 
-    return i
+    # Start from the index for evenly spaced r values, then correct for
+    # rounding, so that r[lo] <= x < r[lo+1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lo = np.floor(x*(n_pts-1)/r_array[:,-1:])
 
-def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
-    dmax_max, dmax_n, mc_runs, queue=None, abort_check=threading.Event(),
-    single_proc=False, nprocs=0):
+    lo = np.clip(np.nan_to_num(lo), 0, n_pts-2).astype(int)
 
-    # Clean up data
-    start_idx = 0
+    for _ in range(2):
+        x_lo = np.take_along_axis(r_array, lo, axis=1)
+        lo = np.where((x_lo > x) & (lo > 0), lo-1, lo)
 
-    for j in range(i.size):
-        if i[j] == 0 or err[j] == 0:
-            start_idx = j+1
-        else:
-            break
+        x_hi = np.take_along_axis(r_array, lo+1, axis=1)
+        lo = np.where((x_hi <= x) & (lo < n_pts-2), lo+1, lo)
 
-    end_idx = i.size
+    x_lo = np.take_along_axis(r_array, lo, axis=1)
+    x_hi = np.take_along_axis(r_array, lo+1, axis=1)
+    y_lo = np.take_along_axis(f_array, lo, axis=1)
+    y_hi = np.take_along_axis(f_array, lo+1, axis=1)
 
-    for j in range(i.size, 0, -1):
-        if i[j-1] == 0 or err[j-1] == 0:
-            end_idx = j-1
-        else:
-            break
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (y_hi - y_lo)/(x_hi - x_lo)
+        f_interp = np.where(x_lo == x, y_lo, slope*(x - x_lo) + y_lo)
 
-    q = q[start_idx:end_idx]
-    i = i[start_idx:end_idx]
-    err = err[start_idx:end_idx]
+    f_interp[ref_r[None,:] >= dmax_array[:,None]] = 0
 
-    i_zeros = np.argwhere(i==0)
-    err_zeros = np.argwhere(err==0)
+    return f_interp
 
-    both_zeros = np.intersect1d(i_zeros, err_zeros)
+def make_fit(q, r, pr):
+    qr = np.outer(q, r)
+    sinc_qr = np.where(qr==0, 1, np.sin(qr)/qr)
+    i = 4*np.pi*integrate.trapezoid(pr*sinc_qr, r, axis=1)
 
-    q = np.delete(q, both_zeros)
-    i = np.delete(i, both_zeros)
-    err = np.delete(err, both_zeros)
+    return i
 
-    if npts > len(q)//2:
-        npts = len(q)//2
+def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
+    dmax_max, dmax_n, mc_runs, queue=None, abort_check=threading.Event(),
+    single_proc=False, nprocs=0, pool=None, mc_retry_failed=False):
+
+    # The shared pool is held for the whole calculation, so it isn't closed
+    # by another calculation that asks for a different number of processes
+    if not single_proc and pool is None:
+        with worker_pool(nprocs) as pool:
+            return doBift(q, i, err, filename, npts, alpha_min, alpha_max,
+                alpha_n, dmax_min, dmax_max, dmax_n, mc_runs, queue,
+                abort_check, single_proc, nprocs, pool, mc_retry_failed)
+
+    q, i, err, npts = _cleanBiftData(q, i, err, npts)
 
     #Start by finding the optimal dmax and alpha via minimization of evidence
 
@@ -385,15 +564,10 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
 
     N = npts - 1
 
-    if not single_proc:
-        if nprocs == 0:
-            n_proc = max(multiprocessing.cpu_count()-1, 1)
-        else:
-            n_proc = min(nprocs, multiprocessing.cpu_count())
-        mp_pool = multiprocessing.Pool(processes=n_proc)
-        mp_get_evidence = functools.partial(getEvidence, q=q, i=i, orig_err=err, N=N)
-    else:
-        n_proc = nprocs
+    # Each dmax row of the grid is calculated together, as everything but the
+    # final evidence calculation is the same for all the alphas
+    row_evidence = functools.partial(_pool_evidence_row, log_alphas=alpha_points,
+        q=q, i=i, orig_err=err, N=N)
 
     # Loop through a range of dmax and alpha to get a starting point for the minimization
 
@@ -401,36 +575,25 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
         if queue is not None:
             queue.put({'canceled' : True})
 
-        if not single_proc:
-            mp_pool.close()
-            mp_pool.join()
-
         return None
 
-    for d_idx, dmax in enumerate(dmax_points):
-
-        pts = [(alpha, dmax) for alpha in alpha_points]
+    if not single_proc:
+        rows = _pool_imap(pool, row_evidence, dmax_points)
+    else:
+        rows = map(row_evidence, dmax_points)
 
-        if not single_proc:
-            try:
-                results = mp_pool.map(mp_get_evidence, pts)
-            except Exception:
-                mp_pool.close()
-                mp_pool.join()
-                raise
-        else:
-            results = [getEvidence(params, q, i, err, N) for params in pts]
+    for d_idx, row in enumerate(rows):
+        ev_row, c_row, _, _ = row
 
-        for res_idx, res in enumerate(results):
-            all_posteriors[d_idx, res_idx] = res[0]
+        all_posteriors[d_idx, :] = ev_row
 
         if queue is not None:
             bift_status = {
-                'alpha'     : pts[-1][0],
-                'evidence'  : res[0],
-                'chi'       : res[1],          #Actually chi squared
-                'dmax'      : pts[-1][1],
-                'spoint'    : (d_idx+1)*(res_idx+1),
+                'alpha'     : alpha_points[-1],
+                'evidence'  : ev_row[-1],
+                'chi'       : c_row[-1],          #Actually chi squared
+                'dmax'      : dmax_points[d_idx],
+                'spoint'    : (d_idx+1)*alpha_points.size,
                 'tpoint'    : alpha_points.size*dmax_points.size,
                 }
 
@@ -440,22 +603,14 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
             if queue is not None:
                 queue.put({'canceled' : True})
 
-            if not single_proc:
-                mp_pool.close()
-                mp_pool.join()
-
             return None
 
-    if not single_proc:
-        mp_pool.close()
-        mp_pool.join()
-
     if queue is not None:
         bift_status = {
-            'alpha'     : pts[-1][0],
-            'evidence'  : res[0],
-            'chi'       : res[1],          #Actually chi squared
-            'dmax'      : pts[-1][1],
+            'alpha'     : alpha_points[-1],
+            'evidence'  : ev_row[-1],
+            'chi'       : c_row[-1],          #Actually chi squared
+            'dmax'      : dmax_points[-1],
             'spoint'    : alpha_points.size*dmax_points.size,
             'tpoint'    : alpha_points.size*dmax_points.size,
             'status'    : 'Running minimization',
@@ -477,6 +632,51 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
             queue.put({'canceled' : True})
         return None
 
+    tpoint = alpha_points.size*dmax_points.size
+
+    iftm = _makeBiftIFT(opt_res, q, i, err, N, filename, mc_runs, tpoint,
+        queue, abort_check, single_proc, nprocs, pool, mc_retry_failed)
+
+    return iftm
+
+def _cleanBiftData(q, i, err, npts):
+    # Clean up data
+    start_idx = 0
+
+    for j in range(i.size):
+        if i[j] == 0 or err[j] == 0:
+            start_idx = j+1
+        else:
+            break
+
+    end_idx = i.size
+
+    for j in range(i.size, 0, -1):
+        if i[j-1] == 0 or err[j-1] == 0:
+            end_idx = j-1
+        else:
+            break
+
+    q = q[start_idx:end_idx]
+    i = i[start_idx:end_idx]
+    err = err[start_idx:end_idx]
+
+    i_zeros = np.argwhere(i==0)
+    err_zeros = np.argwhere(err==0)
+
+    both_zeros = np.intersect1d(i_zeros, err_zeros)
+
+    q = np.delete(q, both_zeros)
+    i = np.delete(i, both_zeros)
+    err = np.delete(err, both_zeros)
+
+    if npts > len(q)//2:
+        npts = len(q)//2
+
+    return q, i, err, npts
+
+def _makeBiftIFT(opt_res, q, i, err, N, filename, mc_runs, tpoint, queue,
+    abort_check, single_proc, nprocs, pool, mc_retry_failed=False):
     if opt_res.get('success'):
         alpha, dmax = opt_res.get('x')
 
@@ -489,8 +689,8 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
                     'evidence'  : evidence,
                     'chi'       : c,          #Actually chi squared
                     'dmax'      : dmax,
-                    'spoint'    : alpha_points.size*dmax_points.size,
-                    'tpoint'    : alpha_points.size*dmax_points.size,
+                    'spoint'    : tpoint,
+                    'tpoint'    : tpoint,
                     'status'    : 'Calculating Monte Carlo errors',
                     }
 
@@ -513,7 +713,8 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
 
             # Use a monte carlo method to estimate the errors in pr function, values found
             err_calc = calc_bift_errors((alpha, dmax), q, i, err, N, mc_runs,
-                abort_check=abort_check, single_proc=single_proc, nprocs=n_proc)
+                abort_check=abort_check, single_proc=single_proc, nprocs=nprocs,
+                pool=pool, retry_failed=mc_retry_failed)
 
             if abort_check.is_set():
                 if queue is not None:
@@ -567,3 +768,205 @@ def doBift(q, i, err, filename, npts, alpha_min, alpha_max, alpha_n, dmax_min,
         return None
 
     return iftm
+
+def doBiftBatch(q_list, i_list, err_list, filenames, npts, alpha_min,
+    alpha_max, alpha_n, dmax_min, dmax_max, dmax_n, mc_runs, warm_start=True,
+    abort_check=threading.Event(), single_proc=False, nprocs=0, pool=None,
+    mc_retry_failed=False):
+    """
+    Runs BIFT on a stack of profiles, such as the frames of a series, and
+    returns a BiftBatchResults. If warm_start is True, each frame after the
+    first starts from the previous frame's optimum with a local search,
+    instead of a grid search over the full alpha and dmax range. If
+    single_proc is False, the frames are split into contiguous blocks that
+    are run in parallel, each starting with a full grid search.
+    """
+    frames = list(zip(q_list, i_list, err_list, filenames))
+
+    bift_settings = {
+        'npts'      : npts,
+        'alpha_min' : alpha_min,
+        'alpha_max' : alpha_max,
+        'alpha_n'   : alpha_n,
+        'dmax_min'  : dmax_min,
+        'dmax_max'  : dmax_max,
+        'dmax_n'    : dmax_n,
+        'mc_runs'   : mc_runs,
+        'warm_start': warm_start,
+        'mc_retry_failed' : mc_retry_failed,
+        }
+
+    if single_proc or len(frames) < 2:
+        ifts = _biftFrames(frames, abort_check=abort_check, **bift_settings)
+
+    else:
+        if nprocs == 0:
+            n_blocks = max(multiprocessing.cpu_count()-1, 1)
+        else:
+            n_blocks = min(nprocs, multiprocessing.cpu_count())
+
+        n_blocks = min(n_blocks, len(frames))
+        block_size = -(-len(frames)//n_blocks)
+
+        blocks = [frames[start:start+block_size] for start in
+            range(0, len(frames), block_size)]
+
+        block_bift = functools.partial(_biftFrames, **bift_settings)
+
+        with worker_pool(nprocs, pool) as pool:
+            ifts = [ift for block in _pool_map(pool, block_bift, blocks)
+                for ift in block]
+
+    if abort_check.is_set():
+        return None
+
+    return BiftBatchResults(ifts)
+
+def _biftFrames(frames, npts, alpha_min, alpha_max, alpha_n, dmax_min,
+    dmax_max, dmax_n, mc_runs, warm_start, mc_retry_failed=False,
+    abort_check=None):
+    # Runs the frames in order, warm starting from the last successful frame
+    alpha_points = np.linspace(np.log(alpha_min), np.log(alpha_max), alpha_n)
+    dmax_points = np.linspace(dmax_min, dmax_max, dmax_n)
+    tpoint = alpha_points.size*dmax_points.size
+
+    if abort_check is None:
+        abort_check = threading.Event()
+
+    ifts = []
+    last_opt = None
+
+    for q, i, err, filename in frames:
+        if abort_check.is_set():
+            break
+
+        q, i, err, frame_npts = _cleanBiftData(q, i, err, npts)
+        N = frame_npts - 1
+
+        start = None
+
+        if warm_start and last_opt is not None:
+            start = _localBiftSearch(last_opt, alpha_points, dmax_points, q,
+                i, err, N)
+
+        if start is None:
+            all_posteriors = np.array([getEvidenceRow(alpha_points, dmax, q, i,
+                err, N)[0] for dmax in dmax_points])
+
+            min_idx = np.unravel_index(np.argmax(all_posteriors, axis=None),
+                all_posteriors.shape)
+
+            start = (alpha_points[min_idx[1]], dmax_points[min_idx[0]])
+
+        opt_res = scipy.optimize.minimize(getEvidenceOptimize, start,
+            (q, i, err, N), method='Powell')
+
+        ift = _makeBiftIFT(opt_res, q, i, err, N, filename, mc_runs, tpoint,
+            None, abort_check, True, 0, None, mc_retry_failed)
+
+        if ift is not None:
+            last_opt = (ift.getParameter('alpha'), ift.getParameter('dmax'))
+
+        ifts.append(ift)
+
+    return ifts
+
+def _localBiftSearch(last_opt, alpha_points, dmax_points, q, i, err, N):
+    """
+    Searches a 3x3 grid, one full grid step wide in each direction, around
+    the previous optimum. Returns the best point, or None if it is on the
+    edge of the local grid (but not of the full grid), in which case the
+    optimum may have moved too far for a local search.
+    """
+    last_alpha, last_dmax = last_opt
+
+    if alpha_points.size > 1:
+        alpha_step = alpha_points[1] - alpha_points[0]
+    else:
+        alpha_step = 0
+
+    if dmax_points.size > 1:
+        dmax_step = dmax_points[1] - dmax_points[0]
+    else:
+        dmax_step = 0
+
+    local_alphas = np.clip(last_alpha + np.array([-1., 0., 1.])*alpha_step,
+        alpha_points[0], alpha_points[-1])
+    local_dmaxes = np.clip(last_dmax + np.array([-1., 0., 1.])*dmax_step,
+        dmax_points[0], dmax_points[-1])
+
+    local_alphas = np.unique(local_alphas)
+    local_dmaxes = np.unique(local_dmaxes)
+
+    posteriors = np.array([getEvidenceRow(local_alphas, dmax, q, i, err, N)[0]
+        for dmax in local_dmaxes])
+
+    d_idx, a_idx = np.unravel_index(np.argmax(posteriors, axis=None),
+        posteriors.shape)
+
+    best_alpha = local_alphas[a_idx]
+    best_dmax = local_dmaxes[d_idx]
+
+    on_alpha_edge = (local_alphas.size > 1
+        and a_idx in (0, local_alphas.size-1)
+        and best_alpha not in (alpha_points[0], alpha_points[-1]))
+    on_dmax_edge = (local_dmaxes.size > 1
+        and d_idx in (0, local_dmaxes.size-1)
+        and best_dmax not in (dmax_points[0], dmax_points[-1]))
+
+    if on_alpha_edge or on_dmax_edge:
+        return None
+
+    return best_alpha, best_dmax
+
+class BiftBatchResults(object):
+    """
+    The results of running BIFT on a stack of profiles. Each result is an
+    array with one value per frame, which is nan for frames where BIFT
+    failed. The P(r) functions are stored as 2D arrays (frame x r point),
+    padded with nan if the frames have different numbers of r points. The
+    IFTMs for each frame (None for failed frames) are in ifts.
+    """
+
+    _keys = {
+        'dmax'          : 'dmax',
+        'dmax_err'      : 'dmaxer',
+        'rg'            : 'rg',
+        'rg_err'        : 'rger',
+        'i0'            : 'i0',
+        'i0_err'        : 'i0er',
+        'chisq'         : 'chisq',
+        'chisq_err'     : 'chisq_er',
+        'log_alpha'     : 'alpha',
+        'log_alpha_err' : 'alpha_er',
+        'evidence'      : 'evidence',
+        'evidence_err'  : 'evidence_er',
+        }
+
+    def __init__(self, ifts):
+        self.ifts = ifts
+        self.success = np.array([ift is not None for ift in ifts], dtype=bool)
+
+        for attr, key in self._keys.items():
+            values = np.full(len(ifts), np.nan)
+
+            for idx, ift in enumerate(ifts):
+                if ift is not None:
+                    values[idx] = float(ift.getParameter(key))
+
+            setattr(self, attr, values)
+
+        n_r = max([len(ift.r) for ift in ifts if ift is not None] + [0])
+
+        self.r = np.full((len(ifts), n_r), np.nan)
+        self.p = np.full((len(ifts), n_r), np.nan)
+        self.p_err = np.full((len(ifts), n_r), np.nan)
+
+        for idx, ift in enumerate(ifts):
+            if ift is not None:
+                self.r[idx, :len(ift.r)] = ift.r
+                self.p[idx, :len(ift.p)] = ift.p
+                self.p_err[idx, :len(ift.err)] = ift.err
+
+    def __len__(self):
+        return len(self.ifts)
@@ -406,55 +406,8 @@ class MainFrame(wx.Frame):
         Compiles numba jit functions in startup so that they don't take forever
         to load when the users first run the associated windows.
         """
-        q = np.linspace(0.005, 0.3, 200)
-        i = SASUtils.sphere_intensity(q, 20)
-        err = np.sqrt(i)
-
-        profile = SASM.SASM(i, q, err, {'filename': 'temp'})
-
-        settings = RAWSettings.RawGuiSettings()
-
-        try:
-            SASMask.PolygonMask([(0,0), (0, 2), (2, 0)], -1, (10, 10))
-        except Exception:
-            pass
-        try:
-            SASCalc.autoRg(profile)
-        except Exception:
-            pass
-
-        try:
-            SASCalc.calcRg(q, i, err, transform=False,
-                error_weight=True)
-            SASCalc.calcRg(q, i, err, transform=True,
-                error_weight=True)
-            SASCalc.calcRg(q, i, err, transform=True,
-                error_weight=False)
-            SASCalc.calcRg(q, i, err, transform=False,
-                error_weight=False)
-        except Exception:
-            pass
-
-        alpha_min = settings.get('minAlpha')
-        alpha_max = settings.get('maxAlpha')
-        dmax_min = settings.get('maxDmax')
-        dmax_max = settings.get('minDmax')
-
-        bift_settings = {
-        'npts'      : 4,
-        'alpha_max' : alpha_max,
-        'alpha_min' : alpha_min,
-        'alpha_n'   : 1,
-        'dmax_min'  : dmax_min,
-        'dmax_max'  : dmax_max,
-        'dmax_n'    : 1,
-        'mc_runs'   : 1,
-        'single_proc' : True,
-        'nprocs': 1,
-        }
-
         try:
-            BIFT.doBift(q, i, err, 'test', **bift_settings)
+            RAWAPI.warmup()
         except Exception:
             pass
 
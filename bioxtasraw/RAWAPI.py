@@ -43,6 +43,10 @@ import queue
 import logging
 import time
 import glob
+import functools
+import multiprocessing
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import scipy
@@ -63,6 +67,8 @@ import bioxtasraw.SECM as SECM
 import bioxtasraw.BIFT as BIFT
 import bioxtasraw.DENSS as DENSS
 import bioxtasraw.SASUtils as SASUtils
+import bioxtasraw.SASCache as SASCache
+import bioxtasraw.SASJobs as SASJobs
 import bioxtasraw.RAWReport as RAWReport
 
 __version__ = RAWGlobals.version
@@ -236,7 +242,7 @@ def load_files(filename_list, settings, return_all_images=False):
 
     return profile_list, ift_list, series_list, img_list
 
-def load_profiles(filename_list, settings=None):
+def load_profiles(filename_list, settings=None, single_proc=True, nprocs=0):
     """
     Loads individual scattering profiles from text files. This could be
     .dat files, but other file types such as .fit, .fir, .int, or .csv
@@ -253,6 +259,13 @@ def load_profiles(filename_list, settings=None):
         The RAW settings to be used when loading in the files,
         such as the calibration values used when radially averaging images.
         Default is none, this is commonly not used.
+    single_proc: bool, optional
+        If False, the files are split into chunks that are loaded in parallel
+        using a pool of processes. The profiles are returned in the same order
+        as when loading with a single process. Defaults to True.
+    nprocs: int, optional
+        The number of processes to use if single_proc is False. If 0, one
+        less than the number of available cores is used. Defaults to 0.
 
     Returns
     -------
@@ -264,6 +277,36 @@ def load_profiles(filename_list, settings=None):
     if settings is None:
         settings = __default_settings
 
+    if single_proc or len(filename_list) < 2:
+        profile_list = _load_profiles_chunk(filename_list, settings)
+
+    else:
+        if nprocs == 0:
+            n_proc = max(multiprocessing.cpu_count()-1, 1)
+        else:
+            n_proc = min(nprocs, multiprocessing.cpu_count())
+
+        n_proc = min(n_proc, len(filename_list))
+        chunk_size = -(-len(filename_list)//n_proc)
+
+        chunks = [filename_list[start:start+chunk_size] for start in
+            range(0, len(filename_list), chunk_size)]
+
+        chunk_load = functools.partial(_load_profiles_chunk, settings=settings)
+
+        mp_pool = multiprocessing.Pool(processes=n_proc)
+
+        try:
+            chunk_results = mp_pool.map(chunk_load, chunks)
+        finally:
+            mp_pool.close()
+            mp_pool.join()
+
+        profile_list = [sasm for results in chunk_results for sasm in results]
+
+    return profile_list
+
+def _load_profiles_chunk(filename_list, settings):
     profile_list, iftm_list, secm_list, img_list = load_files(filename_list, settings)
 
     return profile_list
@@ -290,7 +333,7 @@ def load_ifts(filename_list):
 
     return iftm_list
 
-def load_series(filename_list, settings=None):
+def load_series(filename_list, settings=None, lazy=False, cache_size=256):
     """
     Loads in series data. If all filenames provided at individual scattering
     profiles (e.g. .dat files or images that can be radially averaged into
@@ -310,12 +353,31 @@ def load_series(filename_list, settings=None):
         None. This is required if you are loading images into a series or if
         you wish to set the header style of the series loaded in, which is
         necessary for calculating the time point of each frame in the series.
+    lazy: bool, optional
+        If True, series saved as RAW .hdf5 files are loaded without reading
+        in the individual scattering profiles. The series intensities and
+        calculated values are available immediately, while the profiles are
+        read from the file the first time they are accessed (e.g. through
+        :py:meth:`bioxtasraw.SECM.SECM.getSASM` or
+        :py:meth:`bioxtasraw.SECM.SECM.getSASMList`). This makes loading
+        large series much faster and limits memory use. Frame times are read
+        from the file rather than recalculated from the profile headers. The
+        file must not be moved or modified while the series is in use.
+        Default is False.
+    cache_size: int, optional
+        If lazy is True, the maximum number of each type of profile
+        (unsubtracted, subtracted, baseline corrected) held in memory at
+        once. Profiles are removed from memory on a least recently used
+        basis. Default is 256.
 
     Returns
     -------
     series_list: list
         A list of individual series (:class:`bioxtasraw.SECM.SECM`) items
-        loaded in.
+        loaded in. If lazy is True, the profile lists returned by
+        :py:meth:`bioxtasraw.SECM.SECM.getAllSASMs` are
+        :class:`bioxtasraw.SECM.LazySASMList` objects, which can be indexed
+        and iterated over like a list.
 
     Raises
     ------
@@ -332,6 +394,22 @@ def load_series(filename_list, settings=None):
             all_secm = False
             break
 
+    if lazy and all_secm:
+        series_list = []
+
+        for filename in filename_list:
+            filename = os.path.abspath(os.path.expanduser(filename))
+
+            if os.path.splitext(filename)[1] == '.hdf5':
+                secm = SASFileIO.loadSeriesFile(filename, settings, lazy,
+                    cache_size)
+            else:
+                secm = SASFileIO.loadSeriesFile(filename, settings)
+
+            series_list.append(secm)
+
+        return series_list
+
     sasm_list, iftm_list, series_list, img_list = load_files(filename_list, settings)
 
     if not all_secm:
@@ -701,7 +779,8 @@ def save_ift(ift, fname=None, datadir='.'):
     savepath = os.path.abspath(os.path.expanduser(datadir))
     SASFileIO.saveMeasurement(ift, savepath, settings, filetype=newext)
 
-def save_series(series, fname=None, datadir='.'):
+def save_series(series, fname=None, datadir='.', file_version=1,
+    compression='gzip', compression_opts=4, append=False):
     """
     Saves an individual series as a .hdf5 file.
 
@@ -716,19 +795,49 @@ def save_series(series, fname=None, datadir='.'):
     datadir: str, optional
         The directory to save the profile in. If no directory is provided,
         the current directory is used.
-    """
+    file_version: {1, 2} int, optional
+        The layout of the saved file. Version 1 (default) stores each profile
+        as a separate dataset, and can be read by all versions of RAW.
+        Version 2 stores the profiles of the series as chunked, compressed
+        2D (frame x q) datasets, which is much faster to save and load for
+        long series, but can't be read by RAW versions 2.4.0 and earlier.
+        Both versions can be loaded with :py:func:`load_series`.
+    compression: str, optional
+        The HDF5 compression filter used for the profile data in a version
+        2 file, such as 'gzip' (default) or 'lzf'. If None, no compression
+        is used.
+    compression_opts: int, optional
+        Options for the compression filter. For 'gzip' this is the
+        compression level (0-9), default 4.
+    append: bool, optional
+        If True and the file already exists, only profiles in the series
+        beyond those already saved in the file are written, and the series
+        level data (intensities, calculated values, ranges) are updated.
+        This allows a series that is being collected to be checkpointed
+        without rewriting the whole file. Appending always uses file_version
+        2, so an existing file must have been saved with file_version 2. If
+        profiles that are already saved have
+        changed (for example a new buffer range was set), save the series
+        without append. Default is False.
+    """
+    old_fname = series.getParameter('filename')
+
     if fname is not None:
-        series = copy.deepcopy(series)
         series.setParameter('filename', fname)
     else:
-        fname = series.getParameter('filename')
+        fname = old_fname
 
-    fname = '{}.hdf5'.format(os.path.splitext(fname)[0])
+    save_fname = '{}.hdf5'.format(os.path.splitext(fname)[0])
 
     datadir = os.path.abspath(os.path.expanduser(datadir))
-    savepath = os.path.join(datadir, fname)
+    savepath = os.path.join(datadir, save_fname)
 
-    SASFileIO.save_series(savepath, series)
+    try:
+        SASFileIO.save_series(savepath, series, file_version=file_version,
+            compression=compression, compression_opts=compression_opts,
+            append=append)
+    finally:
+        series.setParameter('filename', old_fname)
 
 def save_settings(settings, fname, datadir='.'):
     """
@@ -918,9 +1027,13 @@ def subtract(profiles, bkg_profile, forced=False, full=False, copy_metadata=True
     if not isinstance(profiles, list):
         profiles = [profiles]
 
-    sub_profiles = [SASProc.subtract(profile, bkg_profile, forced, full,
-        copy_params=copy_metadata)
-        for profile in profiles]
+    if full:
+        sub_profiles = [SASProc.subtract(profile, bkg_profile, forced, full,
+            copy_params=copy_metadata)
+            for profile in profiles]
+    else:
+        sub_profiles = SASProc.subtract_multiple(profiles, bkg_profile, forced,
+            copy_params=copy_metadata)
 
     for profile in sub_profiles:
         profile.setParameter('filename',
@@ -1107,6 +1220,233 @@ def superimpose(profiles, ref_profile, scale=True, offset=False):
 
     return sup_profiles
 
+def enable_analysis_cache(cache_dir=None, max_memory_items=256,
+    max_disk_size=500*1024**2):
+    """
+    Turns on caching of expensive per-profile analyses. When the cache is on,
+    :py:func:`auto_guinier`, :py:func:`bift`, :py:func:`denss_ift`,
+    :py:func:`datgnom`, :py:func:`gnom`, and :py:func:`auto_dmax` reuse
+    results for profiles they have already analyzed with the same parameters.
+    Results are keyed on a hash of the profile q, I, and error, the q range,
+    the function, the function parameters, and the RAW version. Calling this
+    again replaces the existing cache.
+
+    Parameters
+    ----------
+    cache_dir: str, optional
+        The directory for an on-disk cache, which persists between sessions.
+        If not provided (default), only the in-memory cache is used.
+    max_memory_items: int, optional
+        The maximum number of results held in memory. Least recently used
+        results are removed first. Default is 256.
+    max_disk_size: int, optional
+        The maximum size in bytes of the on-disk cache. Least recently used
+        results are removed first. Default is 500 MB.
+    """
+    SASCache.enable_cache(max_memory_items, cache_dir, max_disk_size)
+
+def disable_analysis_cache():
+    """
+    Turns off caching of per-profile analyses. Results on disk are not
+    removed, and will be reused if the cache is enabled with the same
+    cache directory.
+    """
+    SASCache.disable_cache()
+
+def clear_analysis_cache(disk=True):
+    """
+    Clears the analysis cache and resets the hit and miss counts.
+
+    Parameters
+    ----------
+    disk: bool, optional
+        If True (default), the on-disk cache is also cleared.
+    """
+    cache = SASCache.get_cache()
+
+    if cache is not None:
+        cache.clear(disk)
+
+def get_analysis_cache_stats():
+    """
+    Gets the hit and miss counts for the analysis cache.
+
+    Returns
+    -------
+    stats: dict
+        A dictionary with the total 'hits' and 'misses', the 'memory_hits'
+        and 'disk_hits', and the number of 'memory_items'. Returns None if
+        the cache is not enabled.
+    """
+    cache = SASCache.get_cache()
+
+    if cache is not None:
+        stats = cache.get_stats()
+    else:
+        stats = None
+
+    return stats
+
+def enable_load_cache(cache_dir=None):
+    """
+    Turns on caching of the data loaded from ASCII profile files (such as
+    .dat, .txt, .csv, .fit, and .int files). When the cache is on,
+    :py:func:`load_profiles` and :py:func:`load_files` store the loaded
+    profiles in binary .npz files, and reuse them the next time the same
+    files are loaded, instead of parsing the files again. Cache entries
+    are ignored if the size or modification time of the file has changed.
+    Calling this again replaces the existing cache.
+
+    Parameters
+    ----------
+    cache_dir: str, optional
+        The directory to store the cache files in. If not provided (default),
+        the cache files are stored next to each loaded file, as hidden
+        files named .<filename>.rawcache.npz.
+    """
+    SASCache.enable_file_cache(cache_dir)
+
+def disable_load_cache():
+    """
+    Turns off caching of loaded profile files. Cache files on disk are not
+    removed, and will be reused if the cache is enabled again.
+    """
+    SASCache.disable_file_cache()
+
+def clear_load_cache():
+    """
+    Clears the load cache directory, if one was provided to
+    :py:func:`enable_load_cache`, and resets the hit and miss counts. Cache
+    files stored next to the loaded files are not removed.
+    """
+    cache = SASCache.get_file_cache()
+
+    if cache is not None:
+        cache.clear()
+
+def get_load_cache_stats():
+    """
+    Gets the hit and miss counts for the load cache.
+
+    Returns
+    -------
+    stats: dict
+        A dictionary with the total 'hits' and 'misses'. Returns None if
+        the cache is not enabled.
+    """
+    cache = SASCache.get_file_cache()
+
+    if cache is not None:
+        stats = cache.get_stats()
+    else:
+        stats = None
+
+    return stats
+
+def warmup(verbose=False):
+    """
+    Compiles the numba JIT functions used in RAW's analysis for the argument
+    types used by the analysis functions. Without this, the first
+    :py:func:`auto_guinier`, :py:func:`bift`, or :py:func:`rebin` call in a
+    new process spends several seconds compiling. Compiled functions are
+    stored in numba's on-disk cache, so after a warmup, later processes
+    (including the BIFT worker processes) load the compiled functions from
+    the cache rather than compiling them again.
+
+    Parameters
+    ----------
+    verbose: bool, optional
+        If True, prints the time taken for each function and whether it was
+        compiled or loaded from the on-disk cache. Default is False.
+
+    Returns
+    -------
+    timings: dict
+        A dictionary where the keys are the function names (e.g.
+        'SASCalc.autoRg_inner') and the values are dictionaries with the
+        'time' in seconds spent warming up the function, and the number of
+        signatures 'compiled' and 'loaded' from the on-disk cache.
+    """
+    q = np.linspace(0.005, 0.3, 200)
+    i = SASUtils.sphere_intensity(q, 20)
+    err = np.sqrt(i)
+
+    profile = SASM.SASM(i, q, err, {'filename': 'warmup'})
+
+    N = 50
+    dmax = 60.
+    log_alpha = np.log(1e10)
+    log_alphas = np.linspace(np.log(1e5), np.log(1e10), 5)
+    err_sqr = err**2
+    r = np.linspace(0, dmax, N+1)
+    ops = {}
+
+    # Functions called by other JIT functions are listed first, so the time
+    # for each entry is the time to compile that function alone
+    stages = [
+        (SASCalc.linear_func, lambda: SASCalc.linear_func(q, 1., 1.)),
+        (SASCalc.lin_reg, lambda: SASCalc.lin_reg(q, i)),
+        (SASCalc.weighted_lin_reg, lambda: SASCalc.weighted_lin_reg(q, i, err)),
+        (SASCalc.calcRg, lambda: [SASCalc.calcRg(q, i, err, transform,
+            error_weight) for transform in [True, False] for error_weight
+            in [True, False]]),
+        (SASCalc.rankdata, lambda: SASCalc.rankdata(i)),
+        (SASCalc.spearmanr, lambda: SASCalc.spearmanr(i, q)),
+        (SASCalc.autoRg_inner, lambda: [SASCalc.autoRg(profile, single_fit,
+            error_weight) for single_fit in [True, False] for error_weight
+            in [True, False]]),
+        (BIFT.distDistribution_Sphere, lambda: BIFT.distDistribution_Sphere(
+            i[0], N, dmax)),
+        (BIFT.makePriorDistribution, lambda: BIFT.makePriorDistribution(i[0],
+            N, dmax, 'sphere')),
+        (BIFT.createTransMatrix, lambda: BIFT.createTransMatrix(q, r)),
+        (BIFT.getDmaxOperators, lambda: ops.update(zip(['p', 'r', 'T', 'B',
+            'sum_dia'], BIFT.getDmaxOperators(dmax, q, i, err_sqr, N)))),
+        (BIFT.bift_inner_loop, lambda: BIFT.bift_inner_loop(ops['p']*1.001,
+            ops['p'].copy(), ops['B'], np.exp(log_alpha), N, ops['sum_dia'])),
+        (BIFT.getEvidenceFromOperators, lambda: BIFT.getEvidenceFromOperators(
+            log_alpha, dmax, i, err_sqr, N, ops['p'], ops['T'], ops['B'],
+            ops['sum_dia'])),
+        (BIFT.getEvidence, lambda: [BIFT.getEvidence(params, q, i, err, N)
+            for params in [(log_alpha, dmax), np.array([log_alpha, dmax])]]),
+        (BIFT.getEvidenceRow, lambda: BIFT.getEvidenceRow(log_alphas, dmax,
+            q, i, err, N)),
+        (SASMask.npnpoly, lambda: SASMask.PolygonMask([(0,0), (0, 2), (2, 0)],
+            -1, (10, 10))),
+        (SASProc.inner_log_bin, lambda: SASProc.logBinning(profile, 50)),
+        (SASProc.inner_bin, lambda: SASProc.rebin(profile, 2)),
+        ]
+
+    timings = {}
+
+    for func, run in stages:
+        name = '{}.{}'.format(func.__module__.split('.')[-1], func.__name__)
+
+        hits = sum(func.stats.cache_hits.values())
+        misses = sum(func.stats.cache_misses.values())
+
+        start = time.time()
+        run()
+        run_time = time.time() - start
+
+        timings[name] = {
+            'time'      : run_time,
+            'compiled'  : sum(func.stats.cache_misses.values()) - misses,
+            'loaded'    : sum(func.stats.cache_hits.values()) - hits,
+            }
+
+        if verbose:
+            print('{:<32} {:>8.3f} s  compiled: {}  loaded: {}'.format(name,
+                run_time, timings[name]['compiled'], timings[name]['loaded']))
+
+    return timings
+
+def warmup_main():
+    """Runs :py:func:`warmup` from the command line."""
+    start = time.time()
+    warmup(verbose=True)
+    print('Total warmup time: {:.3f} s'.format(time.time()-start))
+
 def auto_guinier(profile, error_weight=True, single_fit=True, settings=None):
     """
     Automatically calculates the Rg and I(0) values from the Guinier fit by
@@ -1167,8 +1507,12 @@ def auto_guinier(profile, error_weight=True, single_fit=True, settings=None):
     if settings is not None:
         error_weight = settings.get('errorWeight')
 
-    rg_auto, rger_auto, i0_auto, i0er_auto, idx_min, idx_max = SASCalc.autoRg(profile,
-        single_fit, error_weight)
+    autorg_params = {'single_fit': single_fit, 'error_weight': error_weight}
+
+    (rg_auto, rger_auto, i0_auto, i0er_auto, idx_min,
+        idx_max) = SASCache.cached_call('autoRg', profile.getQ(),
+        profile.getI(), profile.getErr(), profile.getQrange(), autorg_params,
+        SASCalc.autoRg, profile, single_fit, error_weight)
 
     if rg_auto != -1:
         q = profile.getQ()
@@ -2096,7 +2440,8 @@ def mw_datclass(profile, rg=None, i0=None, first=None, atsas_dir=None,
     return mw, shape, dmax
 
 def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5,
-    settings=None, use_atsas=True, single_proc=True):
+    settings=None, use_atsas=True, single_proc=True, concurrent=False,
+    return_timings=False):
     """
     Automatically calculate the maximum dimension (Dmax) value of a profile.
     By default uses BIFT, DATGNOM, and DATCLASS to find a starting value and
@@ -2131,12 +2476,28 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
         found by BIFT. Default is True.
     single_proc: bool, optional
         Whether to use one or multiple processors. Defaults to True.
+    concurrent: bool, optional
+        If True and DATCLASS fails to find a Dmax, the BIFT and DATGNOM
+        initial estimates are run at the same time, rather than one after
+        the other. As in the default mode, they are not run if DATCLASS
+        succeeds. This gives the same Dmax, but is faster when DATCLASS
+        fails. Default is False.
+    return_timings: bool, optional
+        If True, the wall time of each stage is also returned. Default is
+        False.
 
     Returns
     -------
     dmax: int
         The maximum dimension found by this algorithm. Returns -1 if not found.
+    timings: dict
+        Only returned if return_timings is True. The wall time in seconds of
+        each stage that was run, keyed by 'datclass', 'bift', 'datgnom',
+        'initial' (all of the initial estimates), 'refine' (the GNOM
+        refinement), and 'total'.
     """
+    start_time = time.time()
+    timings = {}
 
     if settings is None:
         settings = __default_settings
@@ -2149,6 +2510,55 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
         rg = -1
         i0 = -1
 
+    cache = SASCache.get_cache()
+
+    if cache is not None:
+        try:
+            prev_dc_dmax = analysis_dict['molecularWeight']['ShapeAndSize']['Dmax']
+        except Exception:
+            prev_dc_dmax = None
+
+        try:
+            prev_bift_dmax = analysis_dict['BIFT']['Dmax']
+        except Exception:
+            prev_bift_dmax = None
+
+        cache_settings = ['PrPoints', 'minAlpha', 'maxAlpha', 'AlphaPoints',
+            'maxDmax', 'minDmax', 'DmaxPoints', 'mcRuns', 'ATSASDir',
+            'gnomForceRminZero', 'gnomNPoints', 'gnomSystem', 'gnomRadius56',
+            'gnomRmin']
+
+        cache_params = {
+            'dmax_thresh'       : dmax_thresh,
+            'dmax_low_bound'    : dmax_low_bound,
+            'dmax_high_bound'   : dmax_high_bound,
+            'use_atsas'         : use_atsas,
+            'rg'                : rg,
+            'i0'                : i0,
+            'dc_dmax'           : prev_dc_dmax,
+            'bift_dmax'         : prev_bift_dmax,
+            'settings'          : [settings.get(key) for key in cache_settings],
+            'unit'              : profile.getParameter('unit'),
+            }
+
+        cache_key = cache.make_key('auto_dmax', profile.getQ(), profile.getI(),
+            profile.getErr(), profile.getQrange(), cache_params)
+
+        found, cached = cache.get(cache_key)
+
+        if found:
+            # Apply the analysis results that a full run would have added
+            dmax, analysis_changes = cached
+            _set_auto_dmax_analysis(profile, analysis_changes)
+
+            if return_timings:
+                timings['total'] = time.time() - start_time
+                return dmax, timings
+            else:
+                return dmax
+
+        prev_analysis = _get_auto_dmax_analysis(profile)
+
     units = profile.getParameter('unit')
 
     datadir = os.path.abspath(os.path.expanduser(tempfile.gettempdir()))
@@ -2164,19 +2574,35 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
         SASFileIO.writeRadFile(save_profile, os.path.join(datadir, filename),
             False)
 
-        # Get Dmax from DATCLASS
-        try:
-            dc_dmax = float(analysis_dict['molecularWeight']['ShapeAndSize']['Dmax'])
-        except Exception:
-            dc_dmax = -1
+        initial_start = time.time()
 
-        if dc_dmax == -1 and use_atsas:
-            try:
-                dc_mw, dc_shape, dc_dmax = mw_datclass(profile, rg, i0,
-                    write_profile=False, datadir=datadir, filename=filename)
-            except Exception:
-                # traceback.print_exc()
-                dc_dmax = -1
+        dc_dmax = _time_stage(timings, 'datclass', _auto_dmax_datclass,
+            profile, rg, i0, use_atsas, datadir, filename)
+
+        if dc_dmax == -1:
+            if concurrent:
+                # DATGNOM runs in a thread on a copy of the profile while BIFT
+                # runs here, and its result and timing are returned to this
+                # thread.
+                datgnom_profile = copy.deepcopy(profile)
+
+                with ThreadPoolExecutor(1) as executor:
+                    datgnom_future = executor.submit(_timed_call,
+                        _auto_dmax_datgnom, datgnom_profile, use_atsas,
+                        datadir, filename)
+
+                    bift_dmax = _time_stage(timings, 'bift', _auto_dmax_bift,
+                        profile, settings, single_proc)
+
+                    datgnom_dmax, timings['datgnom'] = datgnom_future.result()
+
+            else:
+                bift_dmax = _time_stage(timings, 'bift', _auto_dmax_bift,
+                    profile, settings, single_proc)
+                datgnom_dmax = _time_stage(timings, 'datgnom',
+                    _auto_dmax_datgnom, profile, use_atsas, datadir, filename)
+
+        timings['initial'] = time.time() - initial_start
 
         if dc_dmax != -1:
 
@@ -2189,35 +2615,6 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
                 dmax = round(dc_dmax/10., 1)
 
         else:
-            #Calculate the IFT using BIFT
-            try:
-                bift_dmax = float(analysis_dict['BIFT']['Dmax'])
-            except Exception:
-                bift_dmax = -1
-
-            if bift_dmax == -1:
-                try:
-                    (bift_ift, bift_dmax, bift_rg, bift_i0, bift_dmax_err,
-                    bift_rg_err, bift_i0_err, bift_chi_sq, bift_log_alpha,
-                    bift_log_alpha_err, bift_evidence,
-                    bift_evidence_err) = bift(profile, use_guinier_start=False,
-                    settings=settings, single_proc=single_proc)
-                except Exception:
-                    bift_dmax = -1
-
-            #Calculate the IFT using DATGNOM
-            if use_atsas:
-                try:
-                    (datgnom_ift, datgnom_dmax, datgnom_rg, datgnom_i0,
-                    datgnom_rg_err, datgnom_i0_err, datgnom_total_est,
-                    datgnom_chi_sq, datgnom_alpha, datgnom_quality) = datgnom(profile,
-                    use_guinier_start=False, write_profile=False,
-                    datadir=datadir, filename=filename)
-                except Exception:
-                    datgnom_dmax = -1
-            else:
-                datgnom_dmax = -1
-
             if bift_dmax != -1 and datgnom_dmax != -1:
                 dmax = np.mean([bift_dmax, datgnom_dmax])
 
@@ -2245,6 +2642,8 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
             increm = 0.1
 
         if dmax != -1 and use_atsas:
+            refine_start = time.time()
+
             # Refine if Dmax is too long
             ift_results = gnom(profile, dmax, use_guinier_start=False,
                 settings=settings, write_profile=False, datadir=datadir,
@@ -2296,6 +2695,8 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
                         write_profile=False, datadir=datadir, filename=filename)
                     ift_unforced = ift_results[0]
 
+            timings['refine'] = time.time() - refine_start
+
     else:
         dmax = -1
 
@@ -2314,12 +2715,122 @@ def auto_dmax(profile, dmax_thresh=0.01, dmax_low_bound=0.5, dmax_high_bound=1.5
         else:
             dmax = round(dmax, 1)
 
-    return dmax
+    if cache is not None:
+        new_analysis = _get_auto_dmax_analysis(profile)
+        analysis_changes = {path: value for path, value in new_analysis.items()
+            if path not in prev_analysis or prev_analysis[path] != value}
+
+        cache.set(cache_key, (dmax, analysis_changes))
+
+    timings['total'] = time.time() - start_time
+
+    if return_timings:
+        return dmax, timings
+    else:
+        return dmax
+
+# The analysis results that auto_dmax can add to the profile
+_auto_dmax_analysis_paths = [('BIFT',), ('GNOM',),
+    ('molecularWeight', 'ShapeAndSize')]
+
+def _get_auto_dmax_analysis(profile):
+    analysis_dict = profile.getParameter('analysis')
+    results = {}
+
+    for path in _auto_dmax_analysis_paths:
+        value = analysis_dict
+
+        try:
+            for key in path:
+                value = value[key]
+        except (KeyError, TypeError):
+            continue
+
+        results[path] = copy.deepcopy(value)
+
+    return results
+
+def _set_auto_dmax_analysis(profile, results):
+    analysis_dict = profile.getParameter('analysis')
+
+    for path, value in results.items():
+        target = analysis_dict
+
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+
+        target[path[-1]] = copy.deepcopy(value)
+
+    profile.setParameter('analysis', analysis_dict)
+
+def _timed_call(func, *args):
+    start = time.time()
+    result = func(*args)
+
+    return result, time.time() - start
+
+def _time_stage(timings, stage, func, *args):
+    result, timings[stage] = _timed_call(func, *args)
+
+    return result
+
+def _auto_dmax_datclass(profile, rg, i0, use_atsas, datadir, filename):
+    analysis_dict = profile.getParameter('analysis')
+
+    try:
+        dc_dmax = float(analysis_dict['molecularWeight']['ShapeAndSize']['Dmax'])
+    except Exception:
+        dc_dmax = -1
+
+    if dc_dmax == -1 and use_atsas:
+        try:
+            dc_mw, dc_shape, dc_dmax = mw_datclass(profile, rg, i0,
+                write_profile=False, datadir=datadir, filename=filename)
+        except Exception:
+            # traceback.print_exc()
+            dc_dmax = -1
+
+    return dc_dmax
+
+def _auto_dmax_bift(profile, settings, single_proc):
+    analysis_dict = profile.getParameter('analysis')
+
+    try:
+        bift_dmax = float(analysis_dict['BIFT']['Dmax'])
+    except Exception:
+        bift_dmax = -1
+
+    if bift_dmax == -1:
+        try:
+            (bift_ift, bift_dmax, bift_rg, bift_i0, bift_dmax_err,
+            bift_rg_err, bift_i0_err, bift_chi_sq, bift_log_alpha,
+            bift_log_alpha_err, bift_evidence,
+            bift_evidence_err) = bift(profile, use_guinier_start=False,
+            settings=settings, single_proc=single_proc)
+        except Exception:
+            bift_dmax = -1
+
+    return bift_dmax
+
+def _auto_dmax_datgnom(profile, use_atsas, datadir, filename):
+    if use_atsas:
+        try:
+            (datgnom_ift, datgnom_dmax, datgnom_rg, datgnom_i0,
+            datgnom_rg_err, datgnom_i0_err, datgnom_total_est,
+            datgnom_chi_sq, datgnom_alpha, datgnom_quality) = datgnom(profile,
+            use_guinier_start=False, write_profile=False,
+            datadir=datadir, filename=filename)
+        except Exception:
+            datgnom_dmax = -1
+    else:
+        datgnom_dmax = -1
+
+    return datgnom_dmax
 
 def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
     alpha_max=1e10, alpha_pts=16, dmax_min=10, dmax_max=400, dmax_pts=10,
     mc_runs=300, use_guinier_start=True, single_proc=True, nprocs=None,
-    settings=None):
+    settings=None, pool=None, mc_retry_failed=False):
     """
     Calculates the Bayesian indirect Fourier transform (BIFT) of a scattering
     profile to generate a P(r) function and determine the maximum dimension
@@ -2385,12 +2896,22 @@ def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
     nprocs: int, optional
         If specified, and single_proc is False, determines the number of processors
         to use for BIFT. Otherwise defaults to number of processors in the computer
-        -1 (minimum 1).
+        -1 (minimum 1). The worker processes are kept running and reused by
+        later BIFT calls until :py:func:`shutdown_bift_pool` is called.
     settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
         RAW settings containing relevant parameters. If provided, the
         pr_Pts, alpha_min, alpha_max, alpha_pts, dmax_min, dmax_max, dmax_pts,
         and mc_runs parameters will be overridden with the values in the
         settings. Default is None.
+    pool: :class:`multiprocessing.pool.Pool`, optional
+        If provided, and single_proc is False, this pool (or a
+        :class:`concurrent.futures.Executor`) is used for the calculation
+        instead of the shared BIFT worker pool. Default is None.
+    mc_retry_failed: bool, optional
+        If some monte carlo runs give an evidence that overflows, the runs
+        are redone with a narrower spread of alpha and Dmax values. By
+        default all of the runs are redone. If True, only the runs that
+        failed are redone. Default is False.
 
     Returns
     -------
@@ -2434,31 +2955,9 @@ def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
         dmax_pts = settings.get('DmaxPoints')
         mc_runs = settings.get('mcRuns')
 
-    q = profile.getQ()
-    i = profile.getI()
-    err = profile.getErr()
+    q, i, err = _get_bift_data(profile, idx_min, idx_max, use_guinier_start)
     filename = profile.getParameter('filename')
 
-    if idx_min is None and use_guinier_start:
-        analysis_dict = profile.getParameter('analysis')
-        if 'guinier' in analysis_dict:
-            guinier_dict = analysis_dict['guinier']
-            idx_min = max(0, int(guinier_dict['nStart']) - profile.getQrange()[0])
-        else:
-            idx_min = 0
-
-    elif idx_min is None:
-        idx_min = 0
-
-    if idx_max is not None:
-        q = q[idx_min:idx_max+1]
-        i = i[idx_min:idx_max+1]
-        err = err[idx_min:idx_max+1]
-    else:
-        q = q[idx_min:]
-        i = i[idx_min:]
-        err = err[idx_min:]
-
     if nprocs is None:
         nprocs = 0
 
@@ -2473,9 +2972,18 @@ def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
         'mc_runs'   : mc_runs,
         'single_proc' : single_proc,
         'nprocs'    : nprocs,
+        'pool'      : pool,
+        'mc_retry_failed' : mc_retry_failed,
         }
 
-    ift = BIFT.doBift(q, i, err, filename, **bift_settings)
+    cache_params = copy.copy(bift_settings)
+    cache_params.pop('single_proc')
+    cache_params.pop('nprocs')
+    cache_params.pop('pool')
+    cache_params['filename'] = filename
+
+    ift = SASCache.cached_call('BIFT', q, i, err, None, cache_params,
+        BIFT.doBift, q, i, err, filename, **bift_settings)
 
     if ift is not None:
 
@@ -2493,24 +3001,7 @@ def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
         qmin = q[0]
         qmax = q[-1]
 
-        results_dict = {}
-        results_dict['Dmax'] = str(dmax)
-        results_dict['Dmax_Err'] = str(dmax_err)
-        results_dict['Real_Space_Rg'] = str(rg)
-        results_dict['Real_Space_Rg_Err'] = str(rg_err)
-        results_dict['Real_Space_I0'] = str(i0)
-        results_dict['Real_Space_I0_Err'] = str(i0_err)
-        results_dict['ChiSquared'] = str(chi_sq)
-        results_dict['LogAlpha'] = str(log_alpha)
-        results_dict['LogAlpha_Err'] = str(log_alpha_err)
-        results_dict['Evidence'] = str(evidence)
-        results_dict['Evidence_Err'] = str(evidence_err)
-        results_dict['qStart'] = str(qmin)
-        results_dict['qEnd'] = str(qmax)
-
-        analysis_dict = profile.getParameter('analysis')
-        analysis_dict['BIFT'] = results_dict
-        profile.setParameter('analysis', analysis_dict)
+        _set_bift_analysis(profile, ift, q)
 
     else:
         dmax = -1
@@ -2530,47 +3021,237 @@ def bift(profile, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
     return (ift, dmax, rg, i0, dmax_err, rg_err, i0_err, chi_sq, log_alpha,
         log_alpha_err, evidence, evidence_err)
 
-def denss_ift(profile, dmax=None, alpha=None, extrapolate=True, idx_min=None, idx_max=None,
-    use_guinier_start=True, settings=None):
+def bift_batch(profiles, idx_min=None, idx_max=None, pr_pts=100, alpha_min=150,
+    alpha_max=1e10, alpha_pts=16, dmax_min=10, dmax_max=400, dmax_pts=10,
+    mc_runs=300, use_guinier_start=True, warm_start=True, single_proc=True,
+    nprocs=None, settings=None, pool=None, mc_retry_failed=False):
     """
-    Calculates the DENSS indirect Fourier transform (DIFT) of a scattering
-    profile to generate a P(r) function and determine the maximum dimension
-    Dmax. Returns None and -1 values if DIFT fails. Includes options for
-    automatic Dmax determination and automatic alpha determination.
+    Calculates the Bayesian indirect Fourier transform (BIFT) for a stack of
+    scattering profiles, such as the frames across an elution peak. This
+    gives the same kind of results as calling :py:func:`bift` on each
+    profile, but neighboring frames are expected to have similar P(r)
+    functions, so each frame can start from the previous frame's result
+    instead of searching the full alpha and Dmax grid.
 
     Parameters
     ----------
-    profile: :class:`bioxtasraw.SASM.SASM`
-        The profile to calculate the DIFT for.
-    dmax: float, optional
-        The maximum dimension of the particle to use for IFT calculation. If
-        not given, dmax will be estimated automatically.
-    alpha: float, optional
-        The smoothing factor alpha to use for IFT calculation. If
-        not given, alpha will be estimated automatically.
-    extrapolate: bool, optional
-        If set to True (default), dift will extrapolate the calculation of the I(q)
-        curve to high q values to improve the smoothness of the P(r) curve.
+    profiles: list
+        A list of :class:`bioxtasraw.SASM.SASM` profiles to calculate the
+        BIFT for, in order (e.g. by frame number).
     idx_min: int, optional
         The index of the q vector that corresponds to the minimum q point
-        to be used in the IFT. Default is to use the first point of the q
-        vector, unless use_guinier_start is set.
+        to be used in each IFT. Default is to use the first point of the
+        q vector, unless use_guinier_start is set.
     idx_max: int, optional
         The index of the q vector that corresponds to the maximum q point
-        to be used in the IFT. Default is to use the last point of the
-        q vector.
+        to be used in each IFT. Default is to use the last point of the q
+        vector.
+    pr_pts: int, optional
+        The number of points in the calculated P(r) functions. This should be
+        less than the number of points in the scattering profiles.
+    alpha_min: float, optional
+        The minimum value of alpha for the parameter search step.
+    alpha_max: float, optional
+        The maximum value of alpha for the parameter search step.
+    alpha_pts: int, optional
+        The number of points in the alpha search space, which is log
+        spaced between alpha_min and alpha_max.
+    dmax_min: float, optional
+        The minimum value of Dmax for the parameter search step.
+    dmax_max: float, optional
+        The maximum value of Dmax for the parameter search step.
+    dmax_pts: int, optional
+        The number of points in the Dmax search space, which is linearly
+        spaced between dmax_min and dmax_max.
+    mc_runs: int, optional
+        The number of monte carlo runs used to generate the uncertainty
+        estimates for each P(r) function.
     use_guiner_start: bool, optional
         If set to True, and no idx_min idx_min is provided, if a Guinier fit has
-        been done for the input profile, the start point of the Guinier fit is
-        used as the start point for the IFT. Default is True.
+        been done for a profile, the start point of the Guinier fit is
+        used as the start point for that profile's IFT.
+    warm_start: bool, optional
+        If True, each frame after the first starts with a local search around
+        the previous frame's optimal alpha and Dmax. If the optimum is at the
+        edge of the local search, the full grid is searched for that frame.
+        If False, every frame does the full grid search. Defaults to True.
+    single_proc: bool, optional
+        If False, the profiles are split into contiguous blocks of frames
+        that are calculated in parallel. The first frame in each block uses
+        the full grid search. Defaults to True.
+    nprocs: int, optional
+        If specified, and single_proc is False, determines the number of
+        processors to use. Otherwise defaults to number of processors in the
+        computer -1 (minimum 1).
     settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
         RAW settings containing relevant parameters. If provided, the
-        extrapolate parameter will be overridden with the value in the
+        pr_Pts, alpha_min, alpha_max, alpha_pts, dmax_min, dmax_max, dmax_pts,
+        and mc_runs parameters will be overridden with the values in the
         settings. Default is None.
+    pool: :class:`multiprocessing.pool.Pool`, optional
+        If provided, and single_proc is False, this pool (or a
+        :class:`concurrent.futures.Executor`) is used for the calculation
+        instead of the shared BIFT worker pool. Default is None.
+    mc_retry_failed: bool, optional
+        If some monte carlo runs give an evidence that overflows, the runs
+        are redone with a narrower spread of alpha and Dmax values. By
+        default all of the runs are redone. If True, only the runs that
+        failed are redone. Default is False.
 
     Returns
     -------
-    ift: :class:`bioxtasraw.SASM.IFTM`
+    results: :class:`bioxtasraw.BIFT.BiftBatchResults`
+        The BIFT results. Each of the dmax, dmax_err, rg, rg_err, i0,
+        i0_err, chisq, chisq_err, log_alpha, log_alpha_err, evidence, and
+        evidence_err attributes is an array with one value per profile (nan
+        if BIFT failed for that profile). The r, p, and p_err attributes are
+        (profile x r point) arrays of the P(r) functions, and the ifts
+        attribute is the list of :class:`bioxtasraw.SASM.IFTM` (None if BIFT
+        failed).
+    """
+
+    if settings is not None:
+        pr_pts = settings.get('PrPoints')
+        alpha_min = settings.get('minAlpha')
+        alpha_max = settings.get('maxAlpha')
+        alpha_pts = settings.get('AlphaPoints')
+        dmax_min = settings.get('maxDmax')
+        dmax_max = settings.get('minDmax')
+        dmax_pts = settings.get('DmaxPoints')
+        mc_runs = settings.get('mcRuns')
+
+    if nprocs is None:
+        nprocs = 0
+
+    bift_data = [_get_bift_data(profile, idx_min, idx_max, use_guinier_start)
+        for profile in profiles]
+
+    q_list = [data[0] for data in bift_data]
+    i_list = [data[1] for data in bift_data]
+    err_list = [data[2] for data in bift_data]
+    filenames = [profile.getParameter('filename') for profile in profiles]
+
+    results = BIFT.doBiftBatch(q_list, i_list, err_list, filenames, pr_pts,
+        alpha_min, alpha_max, alpha_pts, dmax_min, dmax_max, dmax_pts, mc_runs,
+        warm_start=warm_start, single_proc=single_proc, nprocs=nprocs, pool=pool,
+        mc_retry_failed=mc_retry_failed)
+
+    for profile, ift, q in zip(profiles, results.ifts, q_list):
+        if ift is not None:
+            _set_bift_analysis(profile, ift, q)
+
+    return results
+
+def _get_bift_data(profile, idx_min, idx_max, use_guinier_start):
+    q = profile.getQ()
+    i = profile.getI()
+    err = profile.getErr()
+
+    if idx_min is None and use_guinier_start:
+        analysis_dict = profile.getParameter('analysis')
+        if 'guinier' in analysis_dict:
+            guinier_dict = analysis_dict['guinier']
+            idx_min = max(0, int(guinier_dict['nStart']) - profile.getQrange()[0])
+        else:
+            idx_min = 0
+
+    elif idx_min is None:
+        idx_min = 0
+
+    if idx_max is not None:
+        q = q[idx_min:idx_max+1]
+        i = i[idx_min:idx_max+1]
+        err = err[idx_min:idx_max+1]
+    else:
+        q = q[idx_min:]
+        i = i[idx_min:]
+        err = err[idx_min:]
+
+    return q, i, err
+
+def _set_bift_analysis(profile, ift, q):
+    dmax = float(ift.getParameter('dmax'))
+    dmax_err = float(ift.getParameter('dmaxer'))
+    rg = float(ift.getParameter('rg'))
+    rg_err = float(ift.getParameter('rger'))
+    i0 = float(ift.getParameter('i0'))
+    i0_err = float(ift.getParameter('i0er'))
+    chi_sq = float(ift.getParameter('chisq'))
+    log_alpha = float(ift.getParameter('alpha'))
+    log_alpha_err = float(ift.getParameter('alpha_er'))
+    evidence = float(ift.getParameter('evidence'))
+    evidence_err = float(ift.getParameter('evidence_er'))
+    qmin = q[0]
+    qmax = q[-1]
+
+    results_dict = {}
+    results_dict['Dmax'] = str(dmax)
+    results_dict['Dmax_Err'] = str(dmax_err)
+    results_dict['Real_Space_Rg'] = str(rg)
+    results_dict['Real_Space_Rg_Err'] = str(rg_err)
+    results_dict['Real_Space_I0'] = str(i0)
+    results_dict['Real_Space_I0_Err'] = str(i0_err)
+    results_dict['ChiSquared'] = str(chi_sq)
+    results_dict['LogAlpha'] = str(log_alpha)
+    results_dict['LogAlpha_Err'] = str(log_alpha_err)
+    results_dict['Evidence'] = str(evidence)
+    results_dict['Evidence_Err'] = str(evidence_err)
+    results_dict['qStart'] = str(qmin)
+    results_dict['qEnd'] = str(qmax)
+
+    analysis_dict = profile.getParameter('analysis')
+    analysis_dict['BIFT'] = results_dict
+    profile.setParameter('analysis', analysis_dict)
+
+def shutdown_bift_pool():
+    """
+    Stops the worker processes that :py:func:`bift` keeps running between
+    calls when single_proc is False. A new pool is started by the next
+    multiprocessor BIFT call. The pool is also stopped when python exits.
+    """
+    BIFT.shutdown_worker_pool()
+
+def denss_ift(profile, dmax=None, alpha=None, extrapolate=True, idx_min=None, idx_max=None,
+    use_guinier_start=True, settings=None):
+    """
+    Calculates the DENSS indirect Fourier transform (DIFT) of a scattering
+    profile to generate a P(r) function and determine the maximum dimension
+    Dmax. Returns None and -1 values if DIFT fails. Includes options for
+    automatic Dmax determination and automatic alpha determination.
+
+    Parameters
+    ----------
+    profile: :class:`bioxtasraw.SASM.SASM`
+        The profile to calculate the DIFT for.
+    dmax: float, optional
+        The maximum dimension of the particle to use for IFT calculation. If
+        not given, dmax will be estimated automatically.
+    alpha: float, optional
+        The smoothing factor alpha to use for IFT calculation. If
+        not given, alpha will be estimated automatically.
+    extrapolate: bool, optional
+        If set to True (default), dift will extrapolate the calculation of the I(q)
+        curve to high q values to improve the smoothness of the P(r) curve.
+    idx_min: int, optional
+        The index of the q vector that corresponds to the minimum q point
+        to be used in the IFT. Default is to use the first point of the q
+        vector, unless use_guinier_start is set.
+    idx_max: int, optional
+        The index of the q vector that corresponds to the maximum q point
+        to be used in the IFT. Default is to use the last point of the
+        q vector.
+    use_guiner_start: bool, optional
+        If set to True, and no idx_min idx_min is provided, if a Guinier fit has
+        been done for the input profile, the start point of the Guinier fit is
+        used as the start point for the IFT. Default is True.
+    settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
+        RAW settings containing relevant parameters. If provided, the
+        extrapolate parameter will be overridden with the value in the
+        settings. Default is None.
+
+    Returns
+    -------
+    ift: :class:`bioxtasraw.SASM.IFTM`
         The IFT calculated by DIFT from the input profile.
     dmax: float
         The maximum dimension of the P(r) function found by DIFT.
@@ -2619,35 +3300,24 @@ def denss_ift(profile, dmax=None, alpha=None, extrapolate=True, idx_min=None, id
         i = i[idx_min:]
         err = err[idx_min:]
 
-    Iq = np.vstack((q,i,err)).T
-
-    if dmax is None:
-        #guess the initial D and alpha values
-        if use_guinier_start and 'guinier' in analysis_dict:
-            guinier_dict = analysis_dict['guinier']
-            rg = float(guinier_dict['Rg'])
-            dmax, sasrec = DENSS.estimate_dmax(Iq, dmax=3.5*rg)
-        else:
-            dmax, sasrec = DENSS.estimate_dmax(Iq)
-
-    if alpha is None:
-        sasrec = DENSS.Sasrec(Iq, D=dmax, extrapolate=extrapolate)
-        alpha = sasrec.optimize_alpha()
-    else:
-        sasrec = DENSS.Sasrec(Iq, D=dmax, alpha=alpha, extrapolate=extrapolate)
-    #recalculate with the new D, alpha values with extrapolation to high q
-    sasrec.estimate_Vp_etal()
+    guinier_rg = None
 
-    dift_settings = {
-            'first'         : None, #let the given profile itself define the first and last points
-            'last'          : None,
-            'qc'            : None,
-            'alpha'         : alpha,
-            'extrapolate'   : extrapolate,
+    if dmax is None and use_guinier_start:
+        analysis_dict = profile.getParameter('analysis')
+        if 'guinier' in analysis_dict:
+            guinier_rg = float(analysis_dict['guinier']['Rg'])
+
+    cache_params = {
+        'dmax'          : dmax,
+        'alpha'         : alpha,
+        'extrapolate'   : extrapolate,
+        'guinier_rg'    : guinier_rg,
+        'filename'      : filename,
         }
 
-    #now create the SASM iftm object
-    ift = DENSS.doDIFT(Iq=Iq, D=dmax, filename=filename, **dift_settings)
+    ift, sasrec = SASCache.cached_call('denss_ift', q, i, err, None,
+        cache_params, _run_denss_ift, q, i, err, dmax, alpha, extrapolate,
+        guinier_rg, filename)
 
     if sasrec is not None:
 
@@ -2689,6 +3359,38 @@ def denss_ift(profile, dmax=None, alpha=None, extrapolate=True, idx_min=None, id
 
     return (ift, dmax, rg, i0, rg_err, i0_err, chi_sq, alpha)
 
+def _run_denss_ift(q, i, err, dmax, alpha, extrapolate, guinier_rg, filename):
+    """Runs the DENSS IFT, returns the IFT and the Sasrec object."""
+    Iq = np.vstack((q,i,err)).T
+
+    if dmax is None:
+        #guess the initial D and alpha values
+        if guinier_rg is not None:
+            dmax, sasrec = DENSS.estimate_dmax(Iq, dmax=3.5*guinier_rg)
+        else:
+            dmax, sasrec = DENSS.estimate_dmax(Iq)
+
+    if alpha is None:
+        sasrec = DENSS.Sasrec(Iq, D=dmax, extrapolate=extrapolate)
+        alpha = sasrec.optimize_alpha()
+    else:
+        sasrec = DENSS.Sasrec(Iq, D=dmax, alpha=alpha, extrapolate=extrapolate)
+    #recalculate with the new D, alpha values with extrapolation to high q
+    sasrec.estimate_Vp_etal()
+
+    dift_settings = {
+            'first'         : None, #let the given profile itself define the first and last points
+            'last'          : None,
+            'qc'            : None,
+            'alpha'         : alpha,
+            'extrapolate'   : extrapolate,
+        }
+
+    #now create the SASM iftm object
+    ift = DENSS.doDIFT(Iq=Iq, D=dmax, filename=filename, **dift_settings)
+
+    return ift, sasrec
+
 def datgnom(profile, rg=None, idx_min=None, idx_max=None, atsas_dir=None,
     use_rg_from='guinier', use_guinier_start=True, cut_8rg=False,
     write_profile=True, datadir=None, filename=None, save_ift=False,
@@ -2800,38 +3502,8 @@ def datgnom(profile, rg=None, idx_min=None, idx_max=None, atsas_dir=None,
     if write_profile:
         analysis_dict = profile.getParameter('analysis')
 
-        if rg is None:
-            if use_rg_from == 'guinier':
-                guinier_dict = analysis_dict['guinier']
-                rg = float(guinier_dict['Rg'])
-
-            elif use_rg_from == 'gnom':
-                gnom_dict = analysis_dict['GNOM']
-                rg = float(gnom_dict['Real_Space_Rg'])
-
-            elif use_rg_from == 'bift':
-                bift_dict = analysis_dict['BIFT']
-                rg = float(bift_dict['Real_Space_Rg'])
-
-        save_profile = copy.deepcopy(profile)
-
-        if idx_min is None and use_guinier_start:
-            analysis_dict = profile.getParameter('analysis')
-            if 'guinier' in analysis_dict:
-                guinier_dict = analysis_dict['guinier']
-                idx_min = max(0, int(guinier_dict['nStart']) - profile.getQrange()[0])
-            else:
-                idx_min = 0
-
-        elif idx_min is None:
-            idx_min = 0
-
-        if idx_max is None:
-            if cut_8rg:
-                q = save_profile.getQ()
-                idx_max = np.argmin(np.abs(q-(8/rg)))
-            else:
-                idx_max = save_profile.getQrange()[1]
+        save_profile, rg, idx_min, idx_max = _get_datgnom_input(profile, rg,
+            idx_min, idx_max, use_rg_from, use_guinier_start, cut_8rg)
 
         SASFileIO.writeRadFile(save_profile, os.path.join(datadir, filename),
             False)
@@ -2848,8 +3520,12 @@ def datgnom(profile, rg=None, idx_min=None, idx_max=None, atsas_dir=None,
         savename = savename+'.out'
 
 
-    ift = SASCalc.runDatgnom(rg, atsas_dir, datadir, filename, savename,
-        idx_min, idx_max)
+    if write_profile and not save_ift:
+        ift = _run_datgnom(save_profile, rg, atsas_dir, datadir, filename,
+            savename, idx_min, idx_max)
+    else:
+        ift = SASCalc.runDatgnom(rg, atsas_dir, datadir, filename, savename,
+            idx_min, idx_max)
 
 
     if write_profile and os.path.isfile(os.path.join(datadir, filename)):
@@ -2874,6 +3550,68 @@ def datgnom(profile, rg=None, idx_min=None, idx_max=None, atsas_dir=None,
         if ift is not None:
             ift.setParameter('filename', ift_name)
 
+    if write_profile:
+        results = _datgnom_results(ift, profile, save_profile, analysis_dict)
+    else:
+        results = _datgnom_results(ift, None, None, None)
+
+    return results
+
+def _get_datgnom_input(profile, rg, idx_min, idx_max, use_rg_from,
+    use_guinier_start, cut_8rg):
+    analysis_dict = profile.getParameter('analysis')
+
+    if rg is None:
+        if use_rg_from == 'guinier':
+            guinier_dict = analysis_dict['guinier']
+            rg = float(guinier_dict['Rg'])
+
+        elif use_rg_from == 'gnom':
+            gnom_dict = analysis_dict['GNOM']
+            rg = float(gnom_dict['Real_Space_Rg'])
+
+        elif use_rg_from == 'bift':
+            bift_dict = analysis_dict['BIFT']
+            rg = float(bift_dict['Real_Space_Rg'])
+
+    save_profile = copy.deepcopy(profile)
+
+    if idx_min is None and use_guinier_start:
+        if 'guinier' in analysis_dict:
+            guinier_dict = analysis_dict['guinier']
+            idx_min = max(0, int(guinier_dict['nStart']) - profile.getQrange()[0])
+        else:
+            idx_min = 0
+
+    elif idx_min is None:
+        idx_min = 0
+
+    if idx_max is None:
+        if cut_8rg:
+            q = save_profile.getQ()
+            idx_max = np.argmin(np.abs(q-(8/rg)))
+        else:
+            idx_max = save_profile.getQrange()[1]
+
+    return save_profile, rg, idx_min, idx_max
+
+def _run_datgnom(save_profile, rg, atsas_dir, datadir, filename, savename,
+    idx_min, idx_max):
+    cache_params = {
+        'rg'        : rg,
+        'idx_min'   : idx_min,
+        'idx_max'   : idx_max,
+        'atsas_dir' : atsas_dir,
+        }
+
+    ift = SASCache.cached_call('datgnom', save_profile.getQ(),
+        save_profile.getI(), save_profile.getErr(),
+        save_profile.getQrange(), cache_params, SASCalc.runDatgnom, rg,
+        atsas_dir, datadir, filename, savename, idx_min, idx_max)
+
+    return ift
+
+def _datgnom_results(ift, profile, save_profile, analysis_dict):
     if ift is not None:
         dmax = float(ift.getParameter('dmax'))
         rg = float(ift.getParameter('rg'))
@@ -2885,7 +3623,7 @@ def datgnom(profile, rg=None, idx_min=None, idx_max=None, atsas_dir=None,
         total_est = float(ift.getParameter('TE'))
         quality = ift.getParameter('quality')
 
-        if profile is not None and write_profile:
+        if profile is not None:
             results_dict = {}
             results_dict['Dmax'] = str(dmax)
             results_dict['Total_Estimate'] = str(total_est)
@@ -3062,41 +3800,13 @@ def gnom(profile, dmax, rg=None, idx_min=None, idx_max=None, dmax_zero=True, alp
 
     if profile is not None:
         analysis_dict = profile.getParameter('analysis')
+    else:
+        analysis_dict = None
 
     # Save profile if necessary, truncating q range as appropriate
     if write_profile:
-        if rg is None and cut_dam:
-            if use_rg_from == 'guinier':
-                guinier_dict = analysis_dict['guinier']
-                rg = float(guinier_dict['Rg'])
-
-            elif use_rg_from == 'gnom':
-                gnom_dict = analysis_dict['GNOM']
-                rg = float(gnom_dict['Real_Space_Rg'])
-
-            elif use_rg_from == 'bift':
-                bift_dict = analysis_dict['BIFT']
-                rg = float(bift_dict['Real_Space_Rg'])
-
-        save_profile = copy.deepcopy(profile)
-
-        if idx_min is None and use_guinier_start:
-            if 'guinier' in analysis_dict:
-                guinier_dict = analysis_dict['guinier']
-                idx_min = max(0, int(guinier_dict['nStart']) - save_profile.getQrange()[0])
-            else:
-                idx_min = 0
-
-        elif idx_min is None:
-            idx_min = 0
-
-        if idx_max is None:
-            if cut_dam:
-                q = save_profile.getQ()
-                max_q = min(8/rg, 0.3)
-                idx_max = np.argmin(np.abs(q-max_q)) -save_profile.getQrange()[0]
-            else:
-                idx_max = save_profile.getQrange()[1] -save_profile.getQrange()[0]
+        save_profile, rg, idx_min, idx_max = _get_gnom_input(profile, rg,
+            idx_min, idx_max, use_rg_from, use_guinier_start, cut_dam)
 
         SASFileIO.writeRadFile(save_profile, os.path.join(datadir, filename),
             False)
@@ -3122,33 +3832,110 @@ def gnom(profile, dmax, rg=None, idx_min=None, idx_max=None, dmax_zero=True, alp
 
 
     #Initialize settings
-    if settings is not None:
-        gnom_settings = {
-            'rmin_zero'     : settings.get('gnomForceRminZero'),
-            'rmax_zero'     : dmax_zero,
-            'npts'          : settings.get('gnomNPoints'),
-            'alpha'         : alpha,
-            'first'         : idx_min,
-            'last'          : idx_max,
-            'system'        : settings.get('gnomSystem'),
-            'radius56'      : settings.get('gnomRadius56'),
-            'rmin'          : settings.get('gnomRmin'),
-            }
+    gnom_settings = _get_gnom_settings(settings, dmax_zero, alpha, idx_min,
+        idx_max, dmin_zero, npts, system, radius56, rmin)
 
+    # Run the IFT
+    if write_profile and not save_ift:
+        ift = _run_gnom(save_profile, filename, dmax, gnom_settings, datadir,
+            atsas_dir, savename)
     else:
-        if dmin_zero:
-            dmin_zero = 'Y'
-        else:
-            dmin_zero = 'N'
+        ift = SASCalc.runGnom(filename, save_ift, dmax, gnom_settings, datadir,
+            atsas_dir, savename, True)
 
-        if dmax_zero:
-            dmax_zero = 'Y'
-        else:
-            dmax_zero = 'N'
+    # Clean up
+    if write_profile and os.path.isfile(os.path.join(datadir, filename)):
+        try:
+            os.remove(os.path.join(datadir, filename))
+        except Exception:
+            pass
 
-        gnom_settings = {
-            'rmin_zero'     : dmin_zero,
-            'rmax_zero'     : dmax_zero,
+    if not save_ift and os.path.isfile(os.path.join(datadir, savename)):
+        try:
+            os.remove(os.path.join(datadir, savename))
+        except Exception:
+            pass
+
+    # Save results
+    if ift is not None and not save_ift:
+        if write_profile:
+            ift_name = profile.getParameter('filename')
+        else:
+            ift_name = filename
+
+        ift_name = os.path.splitext(ift_name)[0] + '.out'
+        ift.setParameter('filename', ift_name)
+
+    return _gnom_results(ift, profile, analysis_dict, idx_min, idx_max)
+
+def _get_gnom_input(profile, rg, idx_min, idx_max, use_rg_from,
+    use_guinier_start, cut_dam):
+    analysis_dict = profile.getParameter('analysis')
+
+    if rg is None and cut_dam:
+        if use_rg_from == 'guinier':
+            guinier_dict = analysis_dict['guinier']
+            rg = float(guinier_dict['Rg'])
+
+        elif use_rg_from == 'gnom':
+            gnom_dict = analysis_dict['GNOM']
+            rg = float(gnom_dict['Real_Space_Rg'])
+
+        elif use_rg_from == 'bift':
+            bift_dict = analysis_dict['BIFT']
+            rg = float(bift_dict['Real_Space_Rg'])
+
+    save_profile = copy.deepcopy(profile)
+
+    if idx_min is None and use_guinier_start:
+        if 'guinier' in analysis_dict:
+            guinier_dict = analysis_dict['guinier']
+            idx_min = max(0, int(guinier_dict['nStart']) - save_profile.getQrange()[0])
+        else:
+            idx_min = 0
+
+    elif idx_min is None:
+        idx_min = 0
+
+    if idx_max is None:
+        if cut_dam:
+            q = save_profile.getQ()
+            max_q = min(8/rg, 0.3)
+            idx_max = np.argmin(np.abs(q-max_q)) -save_profile.getQrange()[0]
+        else:
+            idx_max = save_profile.getQrange()[1] -save_profile.getQrange()[0]
+
+    return save_profile, rg, idx_min, idx_max
+
+def _get_gnom_settings(settings, dmax_zero, alpha, idx_min, idx_max, dmin_zero,
+    npts, system, radius56, rmin):
+    if settings is not None:
+        gnom_settings = {
+            'rmin_zero'     : settings.get('gnomForceRminZero'),
+            'rmax_zero'     : dmax_zero,
+            'npts'          : settings.get('gnomNPoints'),
+            'alpha'         : alpha,
+            'first'         : idx_min,
+            'last'          : idx_max,
+            'system'        : settings.get('gnomSystem'),
+            'radius56'      : settings.get('gnomRadius56'),
+            'rmin'          : settings.get('gnomRmin'),
+            }
+
+    else:
+        if dmin_zero:
+            dmin_zero = 'Y'
+        else:
+            dmin_zero = 'N'
+
+        if dmax_zero:
+            dmax_zero = 'Y'
+        else:
+            dmax_zero = 'N'
+
+        gnom_settings = {
+            'rmin_zero'     : dmin_zero,
+            'rmax_zero'     : dmax_zero,
             'npts'          : npts,
             'alpha'         : alpha,
             'first'         : idx_min,
@@ -3159,35 +3946,25 @@ def gnom(profile, dmax, rg=None, idx_min=None, idx_max=None, dmax_zero=True, alp
             'rmin'          : rmin,
             }
 
-    # Run the IFT
-    ift = SASCalc.runGnom(filename, save_ift, dmax, gnom_settings, datadir,
-        atsas_dir, savename, True)
-
-    # Clean up
-    if write_profile and os.path.isfile(os.path.join(datadir, filename)):
-        try:
-            os.remove(os.path.join(datadir, filename))
-        except Exception:
-            pass
-
-    if not save_ift and os.path.isfile(os.path.join(datadir, savename)):
-        try:
-            os.remove(os.path.join(datadir, savename))
-        except Exception:
-            pass
+    return gnom_settings
 
-    # Save results
-    if ift is not None:
-        if not save_ift:
-            if write_profile:
-                ift_name = profile.getParameter('filename')
-            else:
-                ift_name = filename
+def _run_gnom(save_profile, filename, dmax, gnom_settings, datadir, atsas_dir,
+    savename):
+    cache_params = {
+        'dmax'          : dmax,
+        'gnom_settings' : gnom_settings,
+        'atsas_dir'     : atsas_dir,
+        }
 
-            ift_name = os.path.splitext(ift_name)[0] + '.out'
-            ift.setParameter('filename', ift_name)
+    ift = SASCache.cached_call('gnom', save_profile.getQ(),
+        save_profile.getI(), save_profile.getErr(),
+        save_profile.getQrange(), cache_params, SASCalc.runGnom, filename,
+        False, dmax, gnom_settings, datadir, atsas_dir, savename, True)
 
+    return ift
 
+def _gnom_results(ift, profile, analysis_dict, idx_min, idx_max):
+    if ift is not None:
         try:
             dmax = float(ift.getParameter('dmax'))
         except Exception:
@@ -3263,6 +4040,285 @@ def gnom(profile, dmax, rg=None, idx_min=None, idx_max=None, dmax_zero=True, alp
 
     return ift, dmax, rg, i0, rg_err, i0_err, total_est, chi_sq, alpha, quality
 
+def datgnom_batch(profiles, rg=None, idx_min=None, idx_max=None,
+    atsas_dir=None, use_rg_from='guinier', use_guinier_start=True,
+    cut_8rg=False, max_jobs=0):
+    """
+    Calculates the IFT and resulting P(r) function for each of a list of
+    profiles using datgnom from the ATSAS package. All of the profiles are
+    written into a single temporary directory, and up to max_jobs datgnom
+    processes are run at once, each one also reading in its own output.
+    This requires a separate installation of the ATSAS package to use. The
+    input profiles need to have a calculated Rg value, either from a Guinier
+    fit or from a IFT P(r) function, so the Rg value is known.
+
+    Parameters
+    ----------
+    profiles: list
+        A list of profiles (:class:`bioxtasraw.SASM.SASM`) to calculate the
+        IFT for.
+    rg: float or list, optional
+        The Rg to be used in calculating the IFT, either one value for all
+        of the profiles or a list with a value for each profile. If not
+        provided, then the Rg is taken from the analysis dictionary of each
+        profile, in conjunction with the use_rg_from setting.
+    idx_min: int or list, optional
+        The index of the q vector that corresponds to the minimum q point
+        to be used in the IFT, either one value for all of the profiles or
+        a list with a value for each profile. Defaults to the first point
+        in the q vector. Overrides use_guinier_start.
+    idx_max: int or list, optional
+        The index of the q vector that corresponds to the maximum q point
+        to be used in the IFT, either one value for all of the profiles or
+        a list with a value for each profile. Defaults to the last point in
+        the q vector. Overrides cut_8rg.
+    atsas_dir: str, optional
+        The directory of the atsas programs (the bin directory). If not provided,
+        the API uses the auto-detected directory.
+    use_rg_from: {'guinier', 'gnom', 'bift'} str, optional
+        Determines whether the Rg value used for the IFT calculation
+        is from the Guinier fit, or the GNOM or BIFT P(r) function. Ignored if
+        the rg parameter is provided.
+    use_guiner_start: bool, optional
+        If set to True, and no idx_min is provided, if a Guinier fit has
+        been done for the input profile, the start point of the Guinier fit is
+        used as the start point for the IFT.
+    cut_8rg: bool, optional
+        If set to True and no idx_max is provided, then the profile is
+        automatically truncated at q=8/Rg.
+    max_jobs: int, optional
+        The maximum number of datgnom processes to run at once. If 0
+        (default), this is the number of cores. All ATSAS runs started
+        through the shared job scheduler also share a limit of one run
+        per core.
+
+    Returns
+    -------
+    results: list
+        A list with the results for each input profile, in the same order
+        as the profiles. Each item is the (ift, dmax, rg, i0, rg_err, i0_err,
+        total_est, chi_sq, alpha, quality) tuple returned by
+        :py:func:`datgnom` for that profile.
+    """
+    settings = __default_settings
+
+    if atsas_dir is None:
+        atsas_dir = settings.get('ATSASDir')
+
+    n_profiles = len(profiles)
+    rg_list = _batch_param(rg, n_profiles)
+    idx_min_list = _batch_param(idx_min, n_profiles)
+    idx_max_list = _batch_param(idx_max, n_profiles)
+
+    save_profiles = []
+    run_args = []
+
+    datadir = tempfile.mkdtemp()
+
+    try:
+        for i, profile in enumerate(profiles):
+            save_profile, p_rg, p_idx_min, p_idx_max = _get_datgnom_input(profile,
+                rg_list[i], idx_min_list[i], idx_max_list[i], use_rg_from,
+                use_guinier_start, cut_8rg)
+
+            filename = 'datgnom_{:05d}.dat'.format(i)
+            savename = 'datgnom_{:05d}.out'.format(i)
+
+            SASFileIO.writeRadFile(save_profile, os.path.join(datadir, filename),
+                False)
+
+            save_profiles.append(save_profile)
+            run_args.append((save_profile, p_rg, atsas_dir, datadir, filename,
+                savename, p_idx_min, p_idx_max))
+
+        ifts = _run_ift_batch(_run_datgnom, run_args, max_jobs)
+
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    results = []
+
+    for profile, save_profile, ift in zip(profiles, save_profiles, ifts):
+        if ift is not None:
+            ift_name = os.path.splitext(profile.getParameter('filename'))[0] + '.out'
+            ift.setParameter('filename', ift_name)
+
+        analysis_dict = profile.getParameter('analysis')
+
+        results.append(_datgnom_results(ift, profile, save_profile,
+            analysis_dict))
+
+    return results
+
+def gnom_batch(profiles, dmax, rg=None, idx_min=None, idx_max=None,
+    dmax_zero=True, alpha=0, atsas_dir=None, use_rg_from='guinier',
+    use_guinier_start=True, cut_dam=False, settings=None, dmin_zero=True,
+    npts=0, system=0, radius56=-1, rmin=-1, max_jobs=0):
+    """
+    Calculates the IFT and resulting P(r) function for each of a list of
+    profiles using gnom from the ATSAS package. All of the profiles are
+    written into a single temporary directory, and up to max_jobs gnom
+    processes are run at once, each one also reading in its own output.
+    This requires a separate installation of the ATSAS package to use.
+
+    Parameters
+    ----------
+    profiles: list
+        A list of profiles (:class:`bioxtasraw.SASM.SASM`) to calculate the
+        IFT for.
+    dmax: float or list
+        The Dmax to be used in calculating the IFT, either one value for all
+        of the profiles or a list with a value for each profile.
+    rg: float or list, optional
+        The Rg to be used in calculating the 8/rg cutoff, if cut_dam is
+        True, either one value for all of the profiles or a list with a value
+        for each profile. If not provided, then the Rg is taken from the
+        analysis dictionary of each profile, in conjunction with the
+        use_rg_from setting.
+    idx_min: int or list, optional
+        The index of the q vector that corresponds to the minimum q point
+        to be used in the IFT, either one value for all of the profiles or
+        a list with a value for each profile. Defaults to the first point
+        in the q vector. Overrides use_guinier_start.
+    idx_max: int or list, optional
+        The index of the q vector that corresponds to the maximum q point
+        to be used in the IFT, either one value for all of the profiles or
+        a list with a value for each profile. Defaults to the last point in
+        the q vector. Overrides cut_dam.
+    dmax_zero: bool, optional
+        If True, force P(r) function to zero at Dmax.
+    alpha: bool, optional
+        If not zero, force alpha value to the input value. If zero (default),
+        then alpha is automatically determined by GNOM.
+    atsas_dir: str, optional
+        The directory of the atsas programs (the bin directory). If not provided,
+        the API uses the auto-detected directory.
+    use_rg_from: {'guinier', 'gnom', 'bift'} str, optional
+        Determines whether the Rg value used for the 8/rg cutoff calculation
+        is from the Guinier fit, or the GNOM or BIFT P(r) function. Ignored if
+        the rg parameter is provided. Only used if cut_dam is True.
+    use_guiner_start: bool, optional
+        If set to True, and no idx_min is provided, if a Guinier fit has
+        been done for the input profile, the start point of the Guinier fit is
+        used as the start point for the IFT.
+    cut_dam: bool, optional
+        If set to True and no idx_max is provided, then the profile is
+        automatically truncated at q=8/Rg or 0.3 1/A, whichever is smaller.
+        This is useful for bead models
+    settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
+        RAW settings containing relevant parameters. If provided, the
+        dmin_zero, npts, system, radius56, and rmin parameters will be
+        overridden with the values in the settings. Default is None.
+    dmin_zero: bool, optional
+        If True, force P(r) function to zero at Dmin.
+    npts: int, optional
+        If provided, fixes the number of points in the P(r) function. If 0
+        (default), number of points in th P(r) function is automatically
+        determined.
+    system: int, optional
+        Defines the job type as in the GNOM manual. Default is 0, a
+        monodisperse system.
+    radius56: float, optional
+        The radius/thickness for system type 5/6. Default is not used.
+    rmin: float, optional
+        Minimum size for system types 1-6. Default is not used.
+    max_jobs: int, optional
+        The maximum number of gnom processes to run at once. If 0 (default),
+        this is the number of cores. All ATSAS runs started through the
+        shared job scheduler also share a limit of one run per core.
+
+    Returns
+    -------
+    results: list
+        A list with the results for each input profile, in the same order
+        as the profiles. Each item is the (ift, dmax, rg, i0, rg_err, i0_err,
+        total_est, chi_sq, alpha, quality) tuple returned by
+        :py:func:`gnom` for that profile.
+    """
+    if settings is None:
+        settings = __default_settings
+
+    if atsas_dir is None:
+        atsas_dir = settings.get('ATSASDir')
+
+    n_profiles = len(profiles)
+    dmax_list = _batch_param(dmax, n_profiles)
+    rg_list = _batch_param(rg, n_profiles)
+    idx_min_list = _batch_param(idx_min, n_profiles)
+    idx_max_list = _batch_param(idx_max, n_profiles)
+
+    idx_ranges = []
+    run_args = []
+
+    datadir = tempfile.mkdtemp()
+
+    try:
+        for i, profile in enumerate(profiles):
+            save_profile, p_rg, p_idx_min, p_idx_max = _get_gnom_input(profile,
+                rg_list[i], idx_min_list[i], idx_max_list[i], use_rg_from,
+                use_guinier_start, cut_dam)
+
+            gnom_settings = _get_gnom_settings(settings, dmax_zero, alpha,
+                p_idx_min, p_idx_max, dmin_zero, npts, system, radius56, rmin)
+
+            filename = 'gnom_{:05d}.dat'.format(i)
+            savename = 'gnom_{:05d}.out'.format(i)
+
+            SASFileIO.writeRadFile(save_profile, os.path.join(datadir, filename),
+                False)
+
+            idx_ranges.append((p_idx_min, p_idx_max))
+            run_args.append((save_profile, filename, dmax_list[i],
+                gnom_settings, datadir, atsas_dir, savename))
+
+        ifts = _run_ift_batch(_run_gnom, run_args, max_jobs)
+
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    results = []
+
+    for profile, (p_idx_min, p_idx_max), ift in zip(profiles, idx_ranges, ifts):
+        if ift is not None:
+            ift_name = os.path.splitext(profile.getParameter('filename'))[0] + '.out'
+            ift.setParameter('filename', ift_name)
+
+        analysis_dict = profile.getParameter('analysis')
+
+        results.append(_gnom_results(ift, profile, analysis_dict, p_idx_min,
+            p_idx_max))
+
+    return results
+
+def _batch_param(value, n_profiles):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        if len(value) != n_profiles:
+            raise ValueError('Expected one value per profile, got %i values '
+                'for %i profiles.' %(len(value), n_profiles))
+
+        return list(value)
+
+    else:
+        return [value]*n_profiles
+
+def _run_ift_batch(run_func, run_args, max_jobs):
+    # The runs go through the shared ATSAS job scheduler, so they count
+    # against the same limit as the other ATSAS batches
+    scheduler = SASJobs.get_scheduler()
+    group = SASJobs.JobGroup(max_jobs)
+
+    jobs = [scheduler.submit_call(functools.partial(run_func, *args),
+        group=group) for args in run_args]
+
+    try:
+        ifts = [job.result() for job in jobs]
+    except BaseException:
+        for job in jobs:
+            job.cancel()
+        raise
+
+    return ifts
+
 def cormap(profiles, ref_profile=None, correction='Bonferroni', settings=None):
     """
     Runs the cormap comparison test between the input profiles. If a reference
@@ -3529,58 +4585,11 @@ def dammif(ift, prefix, datadir, mode='Slow', symmetry='P1', anisometry='Unknown
         ift_name = os.path.join(datadir, ift.getParameter('filename'))
         SASFileIO.writeOutFile(ift, os.path.join(datadir, ift_name))
 
-    if settings is None:
-        dam_settings = {
-            'mode'              : mode,
-            'unit'              : unit,
-            'sym'               : symmetry,
-            'anisometry'        : anisometry,
-            'omitSolvent'       : omit_solvent,
-            'chained'           : chained,
-            'constant'          : constant,
-            'maxBead'           : max_bead_count,
-            'radius'            : dam_radius,
-            'harmonics'         : harmonics,
-            'propFit'           : prop_to_fit,
-            'curveWeight'       : curve_weight,
-            'seed'              : random_seed,
-            'maxSteps'          : max_steps,
-            'maxIters'          : max_iters,
-            'maxSuccess'        : max_success,
-            'minSuccess'        : min_success,
-            'TFactor'           : T_factor,
-            'RgWeight'          : rg_penalty,
-            'cenWeight'         : center_penalty,
-            'looseWeight'       : loose_penalty,
-            'shape'             : expected_shape,
-            'modelFormat'       : model_format,
-            }
-    else:
-        dam_settings = {
-            'mode'              : mode,
-            'unit'              : settings.get('dammifUnit'),
-            'sym'               : symmetry,
-            'anisometry'        : anisometry,
-            'omitSolvent'       : settings.get('dammifOmitSolvent'),
-            'chained'           : settings.get('dammifChained'),
-            'constant'          : settings.get('dammifConstant'),
-            'maxBead'           : settings.get('dammifMaxBeadCount'),
-            'radius'            : settings.get('dammifDummyRadius'),
-            'harmonics'         : settings.get('dammifSH'),
-            'propFit'           : settings.get('dammifPropToFit'),
-            'curveWeight'       : settings.get('dammifCurveWeight'),
-            'seed'              : settings.get('dammifRandomSeed'),
-            'maxSteps'          : settings.get('dammifMaxSteps'),
-            'maxIters'          : settings.get('dammifMaxIters'),
-            'maxSuccess'        : settings.get('dammifMaxStepSuccess'),
-            'minSuccess'        : settings.get('dammifMinStepSuccess'),
-            'TFactor'           : settings.get('dammifTFactor'),
-            'RgWeight'          : settings.get('dammifRgPen'),
-            'cenWeight'         : settings.get('dammifCenPen'),
-            'looseWeight'       : settings.get('dammifLoosePen'),
-            'shape'             : settings.get('dammifExpectedShape'),
-            'modelFormat'       : settings.get('dammifModelFormat'),
-            }
+    dam_settings = _dammif_settings(settings, mode, symmetry, anisometry,
+        unit, omit_solvent, chained, expected_shape, random_seed, constant,
+        max_bead_count, dam_radius, harmonics, prop_to_fit, curve_weight,
+        max_steps, max_iters, max_success, min_success, T_factor, rg_penalty,
+        center_penalty, loose_penalty, model_format)
 
     proc = SASCalc.runDammif(ift_name, prefix, dam_settings, datadir, atsas_dir)
 
@@ -3614,32 +4623,8 @@ def dammif(ift, prefix, datadir, mode='Slow', symmetry='P1', anisometry='Unknown
             pass
 
     if not abort_event.is_set():
-        version = SASCalc.getATSASVersion(atsas_dir).split('.')
-
-        if (int(version[0]) == 3 and int(version[1]) < 1) or int(version[0]) < 3:
-            dam_name = os.path.join(datadir, prefix+'-1.pdb')
-            _, _, model_data = SASFileIO.loadPDBFile(dam_name)
-
-        elif int(version[0]) >= 4:
-            dam_name = os.path.join(datadir, prefix+'-1.{}'.format(model_format))
-
-            if model_format == 'cif':
-                _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
-            else:
-                _, _, model_data = SASFileIO.loadPDBFile(dam_name)
-
-        else:
-            dam_name = os.path.join(datadir, prefix+'-1.cif')
-            _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
-
-        fir_name = os.path.join(datadir, prefix+'.fir')
-        sasm, fit_sasm = SASFileIO.loadFitFile(fir_name)
-        chi_sq = float(sasm.getParameter('counters')['Chi_squared'])
-
-        rg = float(model_data['rg'])
-        dmax = float(model_data['dmax'])
-        excluded_volume=float(model_data['excluded_volume'])
-        mw = float(model_data['mw'])
+        chi_sq, rg, dmax, mw, excluded_volume = _dammif_results(prefix,
+            datadir, atsas_dir, model_format)
     else:
         chi_sq = -1
         rg = -1
@@ -3770,23 +4755,169 @@ def dammin(ift, prefix, datadir, mode='Slow', symmetry='P1', anisometry='Unknown
         The excluded volume of the model.
     """
 
-    if atsas_dir is None:
-        atsas_dir = __default_settings.get('ATSASDir')
+    if atsas_dir is None:
+        atsas_dir = __default_settings.get('ATSASDir')
+
+    if abort_event is None:
+        abort_event = threading.Event()
+    if readback_queue is None:
+        readback_queue = queue.Queue()
+    read_semaphore = threading.BoundedSemaphore(1)
+
+    datadir = os.path.abspath(os.path.expanduser(datadir))
+
+    if write_ift:
+        ift_name = os.path.join(datadir, ift.getParameter('filename'))
+        SASFileIO.writeOutFile(ift, os.path.join(datadir, ift_name))
+
+    dam_settings = _dammin_settings(settings, mode, symmetry, anisometry,
+        initial_dam, unit, constant, random_seed, dam_radius, harmonics,
+        prop_to_fit, curve_weight, max_steps, max_iters, max_success,
+        min_success, T_factor, loose_penalty, knots, sphere_diam, coord_sphere,
+        disconnect_penalty, periph_penalty, model_format)
+
+    proc = SASCalc.runDammin(ift_name, prefix, dam_settings, datadir, atsas_dir)
+
+    readout_t = threading.Thread(target=SASUtils.enqueue_output,
+        args=(proc, readback_queue, read_semaphore))
+    readout_t.daemon = True
+    readout_t.start()
+
+    if proc is not None:
+        while proc.poll() is None:
+            if abort_event.is_set():
+                proc.terminate()
+                break
+            time.sleep(0.1)
+
+        with read_semaphore: #see if there's any last data that we missed
+            new_text = proc.stdout.read()
+
+            if not isinstance(new_text, str):
+                new_text = str(new_text, encoding='UTF-8')
+
+            if new_text != '':
+                readback_queue.put_nowait([new_text])
+
+        proc.stdout.close()
+
+    if write_ift and os.path.isfile(os.path.join(datadir, ift_name)):
+        try:
+            os.remove(os.path.join(datadir, ift_name))
+        except Exception:
+            pass
+
+    if not abort_event.is_set():
+        chi_sq, rg, dmax, mw, excluded_volume = _dammin_results(prefix,
+            datadir, atsas_dir, model_format)
+    else:
+        chi_sq = -1
+        rg = -1
+        dmax = -1
+        mw = -1
+        excluded_volume = -1
+
+    return chi_sq, rg, dmax, mw, excluded_volume
+
+def _dammif_settings(settings, mode='Slow', symmetry='P1', anisometry='Unknown',
+    unit='Unknown', omit_solvent=True, chained=False, expected_shape='u',
+    random_seed='', constant='', max_bead_count=-1, dam_radius=-1, harmonics=-1,
+    prop_to_fit=-1, curve_weight='e', max_steps=-1, max_iters=-1,
+    max_success=-1, min_success=-1, T_factor=-1, rg_penalty=-1,
+    center_penalty=-1, loose_penalty=-1, model_format='cif'):
+    if settings is None:
+        dam_settings = {
+            'mode'              : mode,
+            'unit'              : unit,
+            'sym'               : symmetry,
+            'anisometry'        : anisometry,
+            'omitSolvent'       : omit_solvent,
+            'chained'           : chained,
+            'constant'          : constant,
+            'maxBead'           : max_bead_count,
+            'radius'            : dam_radius,
+            'harmonics'         : harmonics,
+            'propFit'           : prop_to_fit,
+            'curveWeight'       : curve_weight,
+            'seed'              : random_seed,
+            'maxSteps'          : max_steps,
+            'maxIters'          : max_iters,
+            'maxSuccess'        : max_success,
+            'minSuccess'        : min_success,
+            'TFactor'           : T_factor,
+            'RgWeight'          : rg_penalty,
+            'cenWeight'         : center_penalty,
+            'looseWeight'       : loose_penalty,
+            'shape'             : expected_shape,
+            'modelFormat'       : model_format,
+            }
+    else:
+        dam_settings = {
+            'mode'              : mode,
+            'unit'              : settings.get('dammifUnit'),
+            'sym'               : symmetry,
+            'anisometry'        : anisometry,
+            'omitSolvent'       : settings.get('dammifOmitSolvent'),
+            'chained'           : settings.get('dammifChained'),
+            'constant'          : settings.get('dammifConstant'),
+            'maxBead'           : settings.get('dammifMaxBeadCount'),
+            'radius'            : settings.get('dammifDummyRadius'),
+            'harmonics'         : settings.get('dammifSH'),
+            'propFit'           : settings.get('dammifPropToFit'),
+            'curveWeight'       : settings.get('dammifCurveWeight'),
+            'seed'              : settings.get('dammifRandomSeed'),
+            'maxSteps'          : settings.get('dammifMaxSteps'),
+            'maxIters'          : settings.get('dammifMaxIters'),
+            'maxSuccess'        : settings.get('dammifMaxStepSuccess'),
+            'minSuccess'        : settings.get('dammifMinStepSuccess'),
+            'TFactor'           : settings.get('dammifTFactor'),
+            'RgWeight'          : settings.get('dammifRgPen'),
+            'cenWeight'         : settings.get('dammifCenPen'),
+            'looseWeight'       : settings.get('dammifLoosePen'),
+            'shape'             : settings.get('dammifExpectedShape'),
+            'modelFormat'       : settings.get('dammifModelFormat'),
+            }
+
+    return dam_settings
 
-    if abort_event is None:
-        abort_event = threading.Event()
-    if readback_queue is None:
-        readback_queue = queue.Queue()
-    read_semaphore = threading.BoundedSemaphore(1)
+def _dammif_results(prefix, datadir, atsas_dir, model_format):
+    version = SASCalc.getATSASVersion(atsas_dir).split('.')
 
-    datadir = os.path.abspath(os.path.expanduser(datadir))
+    if (int(version[0]) == 3 and int(version[1]) < 1) or int(version[0]) < 3:
+        dam_name = os.path.join(datadir, prefix+'-1.pdb')
+        _, _, model_data = SASFileIO.loadPDBFile(dam_name)
 
-    if write_ift:
-        ift_name = os.path.join(datadir, ift.getParameter('filename'))
-        SASFileIO.writeOutFile(ift, os.path.join(datadir, ift_name))
+    elif int(version[0]) >= 4:
+        dam_name = os.path.join(datadir, prefix+'-1.{}'.format(model_format))
+
+        if model_format == 'cif':
+            _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
+        else:
+            _, _, model_data = SASFileIO.loadPDBFile(dam_name)
+
+    else:
+        dam_name = os.path.join(datadir, prefix+'-1.cif')
+        _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
 
+    fir_name = os.path.join(datadir, prefix+'.fir')
+    sasm, fit_sasm = SASFileIO.loadFitFile(fir_name)
+    chi_sq = float(sasm.getParameter('counters')['Chi_squared'])
+
+    rg = float(model_data['rg'])
+    dmax = float(model_data['dmax'])
+    excluded_volume=float(model_data['excluded_volume'])
+    mw = float(model_data['mw'])
+
+    return chi_sq, rg, dmax, mw, excluded_volume
+
+def _dammin_settings(settings, mode='Slow', symmetry='P1', anisometry='Unknown',
+    initial_dam=None, unit='Unknown', constant=0, random_seed='', dam_radius=-1,
+    harmonics=-1, prop_to_fit=-1, curve_weight='1', max_steps=-1, max_iters=-1,
+    max_success=-1, min_success=-1, T_factor=-1, loose_penalty=-1, knots=20,
+    sphere_diam=-1, coord_sphere=-1, disconnect_penalty=-1, periph_penalty=1,
+    model_format='cif'):
     if initial_dam is None:
-            initial_dam = 's'
+        initial_dam = 's'
 
     if settings is None:
         dam_settings = {
@@ -3843,90 +4974,257 @@ def dammin(ift, prefix, datadir, mode='Slow', symmetry='P1', anisometry='Unknown
             'modelFormat'       : settings.get('dammifModelFormat'),
             }
 
-    proc = SASCalc.runDammin(ift_name, prefix, dam_settings, datadir, atsas_dir)
+    return dam_settings
 
-    readout_t = threading.Thread(target=SASUtils.enqueue_output,
-        args=(proc, readback_queue, read_semaphore))
-    readout_t.daemon = True
-    readout_t.start()
+def _dammin_results(prefix, datadir, atsas_dir, model_format):
+    version = SASCalc.getATSASVersion(atsas_dir).split('.')
 
-    if proc is not None:
-        while proc.poll() is None:
-            if abort_event.is_set():
-                proc.terminate()
-                break
-            time.sleep(0.1)
+    fir_name = os.path.join(datadir, prefix+'.fir')
 
-        with read_semaphore: #see if there's any last data that we missed
-            new_text = proc.stdout.read()
+    if (int(version[0]) == 3 and int(version[1]) < 1) or int(version[0]) < 3:
+        dam_name = os.path.join(datadir, prefix+'-1.pdb')
+        _, _, model_data = SASFileIO.loadPDBFile(dam_name)
 
-            if not isinstance(new_text, str):
-                new_text = str(new_text, encoding='UTF-8')
+    elif int(version[0]) >= 4:
+        dam_name = os.path.join(datadir, prefix+'-1.{}'.format(model_format))
 
-            if new_text != '':
-                readback_queue.put_nowait([new_text])
+        if model_format == 'cif':
+            _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
+        else:
+            _, _, model_data = SASFileIO.loadPDBFile(dam_name)
 
-        proc.stdout.close()
+    else:
+        dam_name = os.path.join(datadir, prefix+'-1.cif')
+        _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
 
-    if write_ift and os.path.isfile(os.path.join(datadir, ift_name)):
-        try:
-            os.remove(os.path.join(datadir, ift_name))
-        except Exception:
-            pass
+    sasm, fit_sasm = SASFileIO.loadFitFile(fir_name)
+    chi_sq = float(sasm.getParameter('counters')['Chi_squared'])
 
-    version = SASCalc.getATSASVersion(atsas_dir).split('.')
+    try:
+        rg = float(model_data['rg'])
+    except Exception:
+        rg = -1
 
-    fir_name = os.path.join(datadir, prefix+'.fir')
+    try:
+        dmax = float(model_data['dmax'])
+    except Exception:
+        dmax = -1
 
-    if not abort_event.is_set():
-        if (int(version[0]) == 3 and int(version[1]) < 1) or int(version[0]) < 3:
-            dam_name = os.path.join(datadir, prefix+'-1.pdb')
-            _, _, model_data = SASFileIO.loadPDBFile(dam_name)
+    try:
+        excluded_volume=float(model_data['excluded_volume'])
+    except Exception:
+        excluded_volume = -1
+
+    try:
+        mw = float(model_data['mw'])
+    except Exception:
+        mw = -1
+
+    return chi_sq, rg, dmax, mw, excluded_volume
+
+def dammif_batch(ift, prefixes, datadir, write_ift=True, ift_name=None,
+    atsas_dir=None, settings=None, max_jobs=0, abort_event=None,
+    readback_queue=None, **kwargs):
+    """
+    Creates several bead model (dummy atom) reconstructions of the same IFT
+    using DAMMIF from the ATSAS package, such as the set of models that is
+    usually averaged with DAMAVER. The runs are submitted to a shared job
+    scheduler which runs at most max_jobs of them at once and reads their
+    output without starting a thread for each run. Requires a separate
+    installation of the ATSAS package. Function blocks until all of the runs
+    finish. Will raise a SASExceptions.NoATSASError if either ATSAS is not
+    found or the ATSAS license is expired.
+
+    Parameters
+    ----------
+    ift: :class:`bioxtasraw.SASM.IFTM`
+        The GNOM IFT to be used as DAMMIF input. If write_ift is False, an IFT already
+        on disk is used and this parameter can be ``None``.
+    prefixes: list
+        A list of output prefixes. One DAMMIF model is made for each prefix.
+    datadir: str
+        The output directory for the DAMMIF models. If using an IFT on disk,
+        then the IFT must be in this directory.
+    write_ift: bool, optional
+        If True, the input IFT is written to disk. If False, an IFT already
+        on disk used, as defined by ift_name (directory must be datadir).
+    ift_name: str, optional
+        The IFT name on disk. Used if write_ift is False.
+    atsas_dir: str, optional
+        The directory of the atsas programs (the bin directory). If not provided,
+        the API uses the auto-detected directory.
+    settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
+        RAW settings containing relevant parameters. If provided, every model
+        parameter except mode, symmetry, and anisometry is overridden with
+        the value in the settings file. Default is None.
+    max_jobs: int, optional
+        The maximum number of DAMMIF runs at once. If 0 (default), this is
+        the number of cores. All ATSAS runs started through the shared job
+        scheduler also share a limit of one run per core.
+    abort_event: :class:`threading.Event`, optional
+        A :class:`threading.Event` or :class:`multiprocessing.Event`. If this
+        event is set it will abort all of the dammif runs.
+    readback_queue: :class:`queue.Queue`, optional
+        If provided, any command line output (STDIN, STDERR) is placed in the
+        queue, with each line prefixed by the prefix of its run.
+    **kwargs
+        Any of the model parameters of :py:func:`dammif`, such as mode,
+        symmetry, or anisometry. They are used for every run.
+
+    Returns
+    -------
+    results: list
+        A list with a (chi_sq, rg, dmax, mw, excluded_volume) tuple for each
+        prefix, as returned by :py:func:`dammif`. Aborted runs have values
+        of -1.
+    run_times: list
+        The time in seconds each run took.
+    """
+    dam_settings = _dammif_settings(settings, **kwargs)
+
+    return _run_dam_batch(SASCalc.runDammif, _dammif_results, dam_settings,
+        ift, prefixes, datadir, write_ift, ift_name, atsas_dir, max_jobs,
+        abort_event, readback_queue)
+
+def dammin_batch(ift, prefixes, datadir, write_ift=True, ift_name=None,
+    atsas_dir=None, settings=None, max_jobs=0, abort_event=None,
+    readback_queue=None, **kwargs):
+    """
+    Creates several bead model (dummy atom) reconstructions of the same IFT
+    using DAMMIN from the ATSAS package. The runs are submitted to a shared
+    job scheduler which runs at most max_jobs of them at once and reads
+    their output without starting a thread for each run. Requires a separate
+    installation of the ATSAS package. Function blocks until all of the runs
+    finish. Will raise a SASExceptions.NoATSASError if either ATSAS is not
+    found or the ATSAS license is expired.
+
+    Parameters
+    ----------
+    ift: :class:`bioxtasraw.SASM.IFTM`
+        The GNOM IFT to be used as DAMMIN input. If write_ift is False, an IFT already
+        on disk is used and this parameter can be ``None``.
+    prefixes: list
+        A list of output prefixes. One DAMMIN model is made for each prefix.
+    datadir: str
+        The output directory for the DAMMIN models. If using an IFT on disk,
+        then the IFT must be in this directory.
+    write_ift: bool, optional
+        If True, the input IFT is written to disk. If False, an IFT already
+        on disk used, as defined by ift_name (directory must be datadir).
+    ift_name: str, optional
+        The IFT name on disk. Used if write_ift is False.
+    atsas_dir: str, optional
+        The directory of the atsas programs (the bin directory). If not provided,
+        the API uses the auto-detected directory.
+    settings: :class:`bioxtasraw.RAWSettings.RAWSettings`, optional
+        RAW settings containing relevant parameters. If provided, every model
+        parameter except mode, symmetry, and anisometry is overridden with
+        the value in the settings file. Default is None.
+    max_jobs: int, optional
+        The maximum number of DAMMIN runs at once. If 0 (default), this is
+        the number of cores. All ATSAS runs started through the shared job
+        scheduler also share a limit of one run per core.
+    abort_event: :class:`threading.Event`, optional
+        A :class:`threading.Event` or :class:`multiprocessing.Event`. If this
+        event is set it will abort all of the dammin runs.
+    readback_queue: :class:`queue.Queue`, optional
+        If provided, any command line output (STDIN, STDERR) is placed in the
+        queue, with each line prefixed by the prefix of its run.
+    **kwargs
+        Any of the model parameters of :py:func:`dammin`, such as mode,
+        symmetry, or initial_dam. They are used for every run.
+
+    Returns
+    -------
+    results: list
+        A list with a (chi_sq, rg, dmax, mw, excluded_volume) tuple for each
+        prefix, as returned by :py:func:`dammin`. Aborted runs have values
+        of -1.
+    run_times: list
+        The time in seconds each run took.
+    """
+    dam_settings = _dammin_settings(settings, **kwargs)
+
+    return _run_dam_batch(SASCalc.runDammin, _dammin_results, dam_settings,
+        ift, prefixes, datadir, write_ift, ift_name, atsas_dir, max_jobs,
+        abort_event, readback_queue)
+
+def _run_dam_batch(run_func, results_func, dam_settings, ift, prefixes,
+    datadir, write_ift, ift_name, atsas_dir, max_jobs, abort_event,
+    readback_queue):
+    if atsas_dir is None:
+        atsas_dir = __default_settings.get('ATSASDir')
+
+    if abort_event is None:
+        abort_event = threading.Event()
 
-        elif int(version[0]) >= 4:
-            dam_name = os.path.join(datadir, prefix+'-1.{}'.format(model_format))
+    datadir = os.path.abspath(os.path.expanduser(datadir))
+
+    if write_ift:
+        ift_name = os.path.join(datadir, ift.getParameter('filename'))
+        SASFileIO.writeOutFile(ift, os.path.join(datadir, ift_name))
+
+    scheduler = SASJobs.get_scheduler()
+    group = SASJobs.JobGroup(max_jobs)
+    jobs = []
+
+    try:
+        for prefix in prefixes:
+            launch = functools.partial(run_func, ift_name, prefix, dam_settings,
+                datadir, atsas_dir)
 
-            if model_format == 'cif':
-                _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
+            if readback_queue is not None:
+                line_callback = functools.partial(_queue_job_output,
+                    readback_queue, prefix)
             else:
-                _, _, model_data = SASFileIO.loadPDBFile(dam_name)
+                line_callback = None
 
-        else:
-            dam_name = os.path.join(datadir, prefix+'-1.cif')
-            _, _, model_data = SASFileIO.loadmmCIFFile(dam_name)
+            jobs.append(scheduler.submit(launch, prefix, line_callback,
+                group=group))
 
+        while not scheduler.wait(jobs, 0.1):
+            if abort_event.is_set():
+                for job in jobs:
+                    job.cancel()
 
-        sasm, fit_sasm = SASFileIO.loadFitFile(fir_name)
-        chi_sq = float(sasm.getParameter('counters')['Chi_squared'])
+        results = []
 
-        try:
-            rg = float(model_data['rg'])
-        except Exception:
-            rg = -1
+        for prefix, job in zip(prefixes, jobs):
+            job.result()
 
-        try:
-            dmax = float(model_data['dmax'])
-        except Exception:
-            dmax = -1
+            if job.state == 'finished' and not abort_event.is_set():
+                results.append(results_func(prefix, datadir, atsas_dir,
+                    dam_settings['modelFormat']))
+            else:
+                results.append((-1, -1, -1, -1, -1))
 
-        try:
-            excluded_volume=float(model_data['excluded_volume'])
-        except Exception:
-            excluded_volume = -1
+    except BaseException:
+        for job in jobs:
+            job.cancel()
+        raise
 
-        try:
-            mw = float(model_data['mw'])
-        except Exception:
-            mw = -1
+    finally:
+        if write_ift and os.path.isfile(os.path.join(datadir, ift_name)):
+            try:
+                os.remove(os.path.join(datadir, ift_name))
+            except Exception:
+                pass
 
-    else:
-        chi_sq = -1
-        rg = -1
-        dmax = -1
-        mw = -1
-        excluded_volume = -1
+    run_times = [job.run_time for job in jobs]
 
-    return chi_sq, rg, dmax, mw, excluded_volume
+    return results, run_times
+
+def _queue_job_output(readback_queue, prefix, line):
+    readback_queue.put_nowait(['%s: %s' %(prefix, line)])
+
+def shutdown_atsas_scheduler():
+    """
+    Stops the job scheduler used by :py:func:`dammif_batch` and
+    :py:func:`dammin_batch`, cancelling any runs that are still going.
+    A new scheduler is started by the next batch call. The scheduler is
+    also stopped when python exits.
+    """
+    SASJobs.shutdown_scheduler()
 
 def damaver(files, prefix, datadir, symmetry='P1', enantiomorphs='YES',
     nbeads=5000, method='NSD', lm=5, ns=51, smax=0.5, model_format='cif',
@@ -4503,14 +5801,15 @@ def crysol(models, profiles=None, lm=20, ns=101, smax=0.5, dns=0.334, dro=0.03,
     energy=None, shell='directional', explicit_hydrogen=False,
     implicit_hydrogen=None, sub_element=None, model_id=None, chain_id=None,
     alternative_names=False, atsas_dir=None, settings=None, save_output=False,
-    output_dir=None, abort_event=None, readback_queue=None):
+    output_dir=None, abort_event=None, readback_queue=None, single_proc=True,
+    nprocs=0):
     """
     Calculates the theoretical scattering profile from an atomic or bead model
     using CRYSOL from the ATSAS package (requires ATSAS >=3.1.0). Can be used
     to fit theoretical scattering profiles to experimental profiles. Note that
     if multiple models and profiles are supplied they are run in a single CRYSOL
-    command. If you want to use multiple processors, you should supply a single
-    model/profile, and instead multithread the function call.
+    command, unless single_proc is False, in which case the models are split
+    between several CRYSOL processes that run at the same time.
 
     Parameters
     ----------
@@ -4581,6 +5880,14 @@ def crysol(models, profiles=None, lm=20, ns=101, smax=0.5, dns=0.334, dro=0.03,
     readback_queue: :class:`queue.Queue`, optional
         If provided, any command line output (STDIN, STDERR) is placed in the
         queue.
+    single_proc: bool, optional
+        If False, and more than one model is provided with no prefix, the
+        models are split between nprocs CRYSOL processes, each run in its
+        own temporary directory, and the output files are read in parallel.
+        The results are the same as for a single CRYSOL run. Default True.
+    nprocs: int, optional
+        The number of CRYSOL processes to use if single_proc is False. If 0,
+        the number of available cores is used. Defaults to 0.
 
     Returns
     -------
@@ -4696,6 +6003,15 @@ def crysol(models, profiles=None, lm=20, ns=101, smax=0.5, dns=0.334, dro=0.03,
         if crysol_settings['chain'] == 'None':
             crysol_settings['chain'] = None
 
+    if not single_proc and prefix is None and len(models) > 1:
+        crysol_results = _crysol_parallel(models, exp_fnames, output_dir,
+            atsas_dir, crysol_settings, save_output, nprocs, abort_event,
+            readback_queue)
+
+        _remove_crysol_profiles(profiles, output_dir)
+
+        return crysol_results
+
     proc = SASCalc.run_crysol(models, output_dir, atsas_dir, exp_fnames,
         **crysol_settings)
 
@@ -4791,129 +6107,257 @@ def crysol(models, profiles=None, lm=20, ns=101, smax=0.5, dns=0.334, dro=0.03,
                             tname = os.path.join(output_dir, '{}{}'.format(
                                 prefix, ext))
 
-                            if os.path.exists(tname):
-                                os.remove(tname)
+                            if os.path.exists(tname):
+                                os.remove(tname)
+
+                        if os.path.exists(os.path.join(output_dir, '{}{}'.format(
+                            prefix, '.fit'))):
+                            os.remove(os.path.join(output_dir, '{}{}'.format(
+                                prefix, '.fit')))
+                else:
+                    for exp_name in exp_fnames:
+                        for fname in models:
+                            name, result = _load_crysol_fit(output_dir, fname,
+                                exp_name, save_output)
+
+                            crysol_results[name] = result
+            else:
+                if prefix is not None:
+                    fit = SASFileIO.loadFitFile(os.path.join(output_dir,
+                        '{}.int'.format(prefix)))
+
+                    log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
+                            '{}.log'.format(prefix)))
+
+                    counters = fit.getParameter('counters')
+                    counters.update(log_results)
+
+                    analysis = fit.getParameter('analysis')
+                    analysis['crysol'] = counters
+                    fit.setParameter('analysis', analysis)
+
+                    abs_prof = SASFileIO.loadIntFile(os.path.join(output_dir,
+                        '{}.abs'.format(prefix)))
+
+                    abs_prof.setParameter('analysis',
+                        copy.deepcopy(fit.getParameter('analysis')))
+
+                    crysol_results[prefix] = [abs_prof, fit]
+
+                    if not save_output:
+                        for ext in crysol_output_exts:
+                            tname = os.path.join(output_dir, '{}{}'.format(
+                                prefix, ext))
+
+                            if os.path.exists(tname):
+                                os.remove(tname)
+
+                else:
+                    for fname in models:
+                        name, result = _load_crysol_int(output_dir, fname,
+                            save_output)
+
+                        crysol_results[name] = result
+
+        except FileNotFoundError:
+            raise SASExceptions.ATSASError(('Failed to find CRYSOL output files. '
+                'May indicate a crysol error. CRYSOL had the following output: '
+                '{}'.format(crysol_output)))
+        except Exception:
+            err = traceback.format_exc()
+            raise SASExceptions.ATSASError(('An unknown error occured while '
+                'running CRYSOL. The error was:\n{}\n\nCRYSOL had the following output:\n'
+                '{}'.format(err, crysol_output)))
+
+    else:
+        crysol_results = {}
+
+    _remove_crysol_profiles(profiles, output_dir)
+
+    return crysol_results
+
+def _crysol_name(fname, exp_name=None):
+    name = os.path.split(os.path.splitext(fname)[0])[1]
+
+    if exp_name is not None:
+        name = '{}_{}'.format(name, os.path.split(os.path.splitext(exp_name)[0])[1])
+
+    return name
+
+def _load_crysol_fit(output_dir, fname, exp_name, save_output):
+    name = _crysol_name(fname, exp_name)
+
+    data, fit = SASFileIO.loadFitFile(os.path.join(output_dir,
+        '{}.fit'.format(name)))
+
+    log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
+        '{}.log'.format(name)))
+
+    counters = fit.getParameter('counters')
+    counters.update(log_results)
+
+    analysis = fit.getParameter('analysis')
+    analysis['crysol'] = counters
+    fit.setParameter('analysis', analysis)
+
+    if not save_output:
+        for ext in ['.abs', '.alm', '.int', '.log']:
+            tname = os.path.join(output_dir, '{}{}'.format(_crysol_name(fname),
+                ext))
+
+            if os.path.exists(tname):
+                os.remove(tname)
 
-                        if os.path.exists(os.path.join(output_dir, '{}{}'.format(
-                            prefix, '.fit'))):
-                            os.remove(os.path.join(output_dir, '{}{}'.format(
-                                prefix, '.fit')))
-                else:
-                    for exp_name in exp_fnames:
-                        for fname in models:
-                            name = '{}_{}'.format(os.path.split(os.path.splitext(fname)[0])[1],
-                                os.path.split(os.path.splitext(exp_name)[0])[1])
+        for ext in ['.fit', '.log']:
+            tname = os.path.join(output_dir, '{}{}'.format(name, ext))
 
-                            data, fit = SASFileIO.loadFitFile(os.path.join(output_dir,
-                                '{}.fit'.format(name)))
+            if os.path.exists(tname):
+                os.remove(tname)
 
-                            log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
-                                '{}.log'.format(name)))
+    return name, [fit]
 
-                            counters = fit.getParameter('counters')
-                            counters.update(log_results)
+def _load_crysol_int(output_dir, fname, save_output):
+    name = _crysol_name(fname)
 
-                            analysis = fit.getParameter('analysis')
-                            analysis['crysol'] = counters
-                            fit.setParameter('analysis', analysis)
+    fit = SASFileIO.loadIntFile(os.path.join(output_dir,
+        '{}.int'.format(name)))
 
-                            crysol_results[name] = [fit]
+    log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
+        '{}.log'.format(name)))
 
-                            if not save_output:
-                                for ext in crysol_output_exts:
-                                    tname = os.path.join(output_dir, '{}{}'.format(
-                                        os.path.split(os.path.splitext(fname)[0])[1],
-                                        ext))
+    counters = fit.getParameter('counters')
+    counters.update(log_results)
 
-                                    if os.path.exists(tname):
-                                        os.remove(tname)
+    analysis = fit.getParameter('analysis')
+    analysis['crysol'] = counters
+    fit.setParameter('analysis', analysis)
 
-                                if os.path.exists(os.path.join(output_dir, '{}{}'.format(
-                                    name, '.fit'))):
-                                    os.remove(os.path.join(output_dir, '{}{}'.format(
-                                        name, '.fit')))
+    abs_prof = SASFileIO.loadIntFile(os.path.join(output_dir,
+        '{}.abs'.format(name)))
 
-                                if os.path.exists(os.path.join(output_dir, '{}{}'.format(
-                                    name, '.log'))):
-                                    os.remove(os.path.join(output_dir, '{}{}'.format(
-                                        name, '.log')))
-            else:
-                if prefix is not None:
-                    fit = SASFileIO.loadFitFile(os.path.join(output_dir,
-                        '{}.int'.format(prefix)))
+    abs_prof.setParameter('analysis',
+        copy.deepcopy(fit.getParameter('analysis')))
 
-                    log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
-                            '{}.log'.format(prefix)))
+    if not save_output:
+        for ext in ['.abs', '.alm', '.int', '.log']:
+            tname = os.path.join(output_dir, '{}{}'.format(name, ext))
 
-                    counters = fit.getParameter('counters')
-                    counters.update(log_results)
+            if os.path.exists(tname):
+                os.remove(tname)
 
-                    analysis = fit.getParameter('analysis')
-                    analysis['crysol'] = counters
-                    fit.setParameter('analysis', analysis)
+    return name, [abs_prof, fit]
 
-                    abs_prof = SASFileIO.loadIntFile(os.path.join(output_dir,
-                        '{}.abs'.format(prefix)))
+def _crysol_parallel(models, exp_fnames, output_dir, atsas_dir,
+    crysol_settings, save_output, nprocs, abort_event, readback_queue):
+    # Each chunk of models is run by its own CRYSOL process in its own
+    # directory, so the output files of different processes can't collide
+    if nprocs <= 0:
+        nprocs = multiprocessing.cpu_count()
 
-                    abs_prof.setParameter('analysis',
-                        copy.deepcopy(fit.getParameter('analysis')))
+    n_chunks = min(nprocs, len(models))
+    chunks = [models[i::n_chunks] for i in range(n_chunks)]
+    run_dirs = [tempfile.mkdtemp(prefix='crysol_') for chunk in chunks]
+    outputs = [[] for chunk in chunks]
 
-                    crysol_results[prefix] = [abs_prof, fit]
+    scheduler = SASJobs.get_scheduler()
+    group = SASJobs.JobGroup(nprocs)
 
-                    if not save_output:
-                        for ext in crysol_output_exts:
-                            tname = os.path.join(output_dir, '{}{}'.format(
-                                prefix, ext))
+    jobs = []
 
-                            if os.path.exists(tname):
-                                os.remove(tname)
+    try:
+        for chunk, run_dir, output in zip(chunks, run_dirs, outputs):
+            launch = functools.partial(SASCalc.run_crysol, chunk, run_dir,
+                atsas_dir, exp_fnames, **crysol_settings)
 
-                else:
-                    for fname in models:
-                        name = os.path.split(os.path.splitext(fname)[0])[1]
+            line_callback = functools.partial(_crysol_job_output,
+                readback_queue, output)
 
-                        fit = SASFileIO.loadIntFile(os.path.join(output_dir,
-                            '{}.int'.format(name)))
+            jobs.append(scheduler.submit(launch, name=chunk[0],
+                line_callback=line_callback, group=group))
 
-                        log_results = SASFileIO.loadCrysolLogFile(os.path.join(output_dir,
-                            '{}.log'.format(name)))
+        while not scheduler.wait(jobs, 0.1):
+            if abort_event.is_set():
+                for job in jobs:
+                    job.cancel()
 
-                        counters = fit.getParameter('counters')
-                        counters.update(log_results)
+        for job, output in zip(jobs, outputs):
+            try:
+                job.result()
+            except Exception:
+                err = traceback.format_exc()
+                raise SASExceptions.ATSASError(('An error occured while '
+                    'starting CRYSOL. The error was:\n{}\n\nCRYSOL had the '
+                    'following output:\n{}'.format(err, ''.join(output))))
 
-                        analysis = fit.getParameter('analysis')
-                        analysis['crysol'] = counters
-                        fit.setParameter('analysis', analysis)
+        if abort_event.is_set():
+            return {}
 
-                        abs_prof = SASFileIO.loadIntFile(os.path.join(output_dir,
-                            '{}.abs'.format(name)))
+        with ThreadPoolExecutor(n_chunks) as executor:
+            futures = [executor.submit(_crysol_chunk_results, chunk, exp_fnames,
+                run_dir, output_dir, save_output) for chunk, run_dir
+                in zip(chunks, run_dirs)]
 
-                        abs_prof.setParameter('analysis',
-                            copy.deepcopy(fit.getParameter('analysis')))
+            chunk_results = {}
 
-                        crysol_results[name] = [abs_prof, fit]
+            for future, output in zip(futures, outputs):
+                try:
+                    chunk_results.update(future.result())
+                except FileNotFoundError:
+                    raise SASExceptions.ATSASError(('Failed to find CRYSOL output '
+                        'files. May indicate a crysol error. CRYSOL had the '
+                        'following output: {}'.format(''.join(output))))
+                except Exception:
+                    err = traceback.format_exc()
+                    raise SASExceptions.ATSASError(('An unknown error occured '
+                        'while running CRYSOL. The error was:\n{}\n\nCRYSOL had '
+                        'the following output:\n{}'.format(err, ''.join(output))))
+
+    finally:
+        for run_dir in run_dirs:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    # Return the results in the order a single CRYSOL run gives them
+    crysol_results = {}
+
+    if exp_fnames is not None:
+        for exp_name in exp_fnames:
+            for fname in models:
+                name = _crysol_name(fname, exp_name)
+                crysol_results[name] = chunk_results[name]
+    else:
+        for fname in models:
+            name = _crysol_name(fname)
+            crysol_results[name] = chunk_results[name]
 
-                        if not save_output:
-                            for ext in crysol_output_exts:
-                                tname = os.path.join(output_dir, '{}{}'.format(
-                                    name, ext))
+    return crysol_results
 
-                                if os.path.exists(tname):
-                                    os.remove(tname)
+def _crysol_job_output(readback_queue, output, line):
+    output.append(line)
+    readback_queue.put_nowait([line])
 
-        except FileNotFoundError:
-            raise SASExceptions.ATSASError(('Failed to find CRYSOL output files. '
-                'May indicate a crysol error. CRYSOL had the following output: '
-                '{}'.format(crysol_output)))
-        except Exception:
-            err = traceback.format_exc()
-            raise SASExceptions.ATSASError(('An unknown error occured while '
-                'running CRYSOL. The error was:\n{}\n\nCRYSOL had the following output:\n'
-                '{}'.format(err, crysol_output)))
+def _crysol_chunk_results(models, exp_fnames, run_dir, output_dir,
+    save_output):
+    results = {}
 
+    if exp_fnames is not None:
+        for exp_name in exp_fnames:
+            for fname in models:
+                name, result = _load_crysol_fit(run_dir, fname, exp_name,
+                    save_output)
+                results[name] = result
     else:
-        crysol_results = {}
+        for fname in models:
+            name, result = _load_crysol_int(run_dir, fname, save_output)
+            results[name] = result
+
+    if save_output:
+        for fname in os.listdir(run_dir):
+            shutil.move(os.path.join(run_dir, fname),
+                os.path.join(output_dir, fname))
 
+    return results
+
+def _remove_crysol_profiles(profiles, output_dir):
     if profiles is not None:
         for prof in profiles:
             if isinstance(prof, SASM.SASM):
@@ -4921,8 +6365,6 @@ def crysol(models, profiles=None, lm=20, ns=101, smax=0.5, dns=0.334, dro=0.03,
                 if os.path.exists(name):
                     os.remove(name)
 
-    return crysol_results
-
 def denss(ift, prefix, datadir, mode='Slow', symmetry=0, sym_axis='X',
     sym_type='Cyclical', initial_model=None, n_electrons=10000, settings=None,
     voxel=5, oversampling=3, steps=None,
@@ -5775,7 +7217,8 @@ def pdb2sas(models,
 # Operations on series
 
 
-def svd(series, profile_type='sub', framei=None, framef=None, norm=True):
+def svd(series, profile_type='sub', framei=None, framef=None, norm=True,
+    nsvs=None):
     """
     Runs singular value decomposition (SVD) on the input series.
 
@@ -5799,6 +7242,12 @@ def svd(series, profile_type='sub', framei=None, framef=None, norm=True):
     norm: bool, optional
         Whether error normalized intensity should be used for EFA. Defaults
         to True. Recommended to not change this.
+    nsvs: int or str, optional
+        If provided, only the largest nsvs singular values and vectors are
+        calculated, which is much faster for large series. If 'auto', the
+        number of components calculated is chosen adaptively based on the
+        number of significant singular values. Defaults to None, which
+        calculates the full SVD.
 
     Returns
     -------
@@ -5853,9 +7302,17 @@ def svd(series, profile_type='sub', framei=None, framef=None, norm=True):
         raise SASExceptions.EFAError(('Initial SVD matrix contained nans or '
             'infinities. SVD could not be carried out'))
 
-    svd_U, svd_s, svd_Vt = np.linalg.svd(D, full_matrices = True)
+    if nsvs is None:
+        svd_U, svd_s, svd_Vt = np.linalg.svd(D, full_matrices = True)
+
+        svd_V = svd_Vt.T
+
+    else:
+        (svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor,
+            success) = SASCalc.doSVDonSASMs(D, False, nsvs)
 
-    svd_V = svd_Vt.T
+        if not success:
+            raise SASExceptions.EFAError('SVD could not be carried out')
 
     return svd_s, svd_U, svd_V
 
@@ -5979,7 +7436,7 @@ def regals(series, comp_settings, profile_type='sub', framei=None,
 
 def efa(series, ranges, profile_type='sub', framei=None, framef=None,
     method='Hybrid', niter=1000, tol=1e-12, norm=True, force_positive=None,
-    previous_results=None):
+    previous_results=None, return_efa_svs=False, efa_nsvs=None):
     """
     Runs evolving factor analysis (EFA) on the input series to deconvolve
     overlapping elution peaks in the data.
@@ -6035,6 +7492,19 @@ def efa(series, ranges, profile_type='sub', framei=None, framef=None,
         is a dictionary of the previous results, corresponding to the
         rotation_data dictionary returned by this function. Defaults to None,
         which should be used if no previous results are available.
+    return_efa_svs: bool, optional
+        If True, the forward and backward evolving singular values are
+        calculated and returned in addition to the normal return values.
+        Defaults to False.
+    efa_nsvs: int, optional
+        Only used if return_efa_svs is True. If provided, only this many
+        forward and backward singular values are calculated, using incremental
+        SVD updates, which is much faster for long series. Significant
+        singular values match the full calculation, noise level values are
+        approximate (within several percent) except every 25 frames and at the
+        last frame, where they are refined to match. If not provided
+        (default), all singular values are calculated using a full SVD for
+        each frame.
 
     Returns
     -------
@@ -6064,6 +7534,14 @@ def efa(series, ranges, profile_type='sub', framei=None, framef=None,
         number. ' err' - Scattering intensity uncertainty. A numpy array where
         the first axis is intensity and the second axis is component number.
         'M' - The EFA M rotation matrix.
+    forward_svs: numpy.array
+        Only returned if return_efa_svs is True. The forward evolving
+        singular values, where the first axis is singular value number and the
+        second axis is frame number.
+    backward_svs: numpy.array
+        Only returned if return_efa_svs is True. The backward evolving
+        singular values, where the first axis is singular value number and the
+        second axis is frame number, in reverse frame order.
 
     Raises
     ------
@@ -6071,11 +7549,11 @@ def efa(series, ranges, profile_type='sub', framei=None, framef=None,
         If initial SVD cannot be carried out.
     """
 
-    efa_profiles, converged, conv_data, rotation_data = SASCalc.run_full_efa(series,
-        ranges, profile_type, framei, framef, method, niter, tol, norm,
-        force_positive, previous_results)
+    results = SASCalc.run_full_efa(series, ranges, profile_type, framei,
+        framef, method, niter, tol, norm, force_positive, previous_results,
+        return_efa_svs, efa_nsvs)
 
-    return efa_profiles, converged, conv_data, rotation_data
+    return results
 
 
 def find_buffer_range(series, profile_type='unsub', int_type='total', q_val=None,
@@ -7564,7 +9042,8 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
     q_log_rebin=False, cal_data=[],window_size=5, settings=None,
     error_weight=True, vp_density=0.83*10**(-3), vp_cutoff='Default', vp_qmax=0.5,
     vc_protein=True, vc_cutoff='Manual', vc_qmax=0.3, vc_a_prot=1.0,
-    vc_b_prot=0.1231, vc_a_rna=0.808, vc_b_rna=0.00934):
+    vc_b_prot=0.1231, vc_a_rna=0.808, vc_b_rna=0.00934, chunk_size=100,
+    single_proc=True, nprocs=0):
     """
     Carries out analysis across multiple series. This is designed for datasets
     where multiple series need to be averaged together, and optionally
@@ -7717,6 +9196,17 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
     vc_b_rna: float
         The volume of correlation B coefficient for RNA. Not recommended to
         be changed. Note that here B is defined as 1/B from the original paper.
+    chunk_size: int, optional
+        The number of profiles from each series that are processed together.
+        If all of the profiles have the same q vector, each chunk is processed
+        as a single (series x profile x q) array. Rounded down to a multiple
+        of series_rebin_factor if bin_series is True. Defaults to 100.
+    single_proc: bool, optional
+        If False, the chunks are processed in parallel using a pool of
+        processes. Defaults to True.
+    nprocs: int, optional
+        The number of processes to use if single_proc is False. If 0, one
+        less than the number of available cores is used. Defaults to 0.
 
     Returns
     -------
@@ -7792,6 +9282,300 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
                 if index < len(series):
                     del series[index]
 
+    # The frames are processed in chunks, which line up with the series bins
+    # so that binning is the same as for the full series
+    if bin_series and series_rebin_factor != 1:
+        bin_factor = series_rebin_factor
+    else:
+        bin_factor = 1
+
+    chunk_frames = max(int(chunk_size)//bin_factor, 1)*bin_factor
+
+    chunks = [[series[start:start+chunk_frames] for series in series_list]
+        for start in range(0, len(series_list[0]), chunk_frames)]
+
+    chunk_calc = functools.partial(_multi_series_chunk_calc,
+        sample_range=sample_range, buffer_range=buffer_range,
+        do_baseline=do_baseline, bl_start_range=bl_start_range,
+        bl_end_range=bl_end_range, baseline_type=baseline_type,
+        set_qrange=set_qrange, qrange=qrange, bin_factor=bin_factor,
+        series_bin_keys=series_bin_keys, do_q_rebin=do_q_rebin, q_npts=q_npts,
+        q_rebin_factor=q_rebin_factor, q_log_rebin=q_log_rebin)
+
+    if single_proc or len(chunks) < 2:
+        chunk_results = [chunk_calc(chunk) for chunk in chunks]
+
+    else:
+        if nprocs == 0:
+            n_proc = max(multiprocessing.cpu_count()-1, 1)
+        else:
+            n_proc = min(nprocs, multiprocessing.cpu_count())
+
+        mp_pool = multiprocessing.Pool(processes=min(n_proc, len(chunks)))
+
+        try:
+            chunk_results = mp_pool.map(chunk_calc, chunks)
+        finally:
+            mp_pool.close()
+            mp_pool.join()
+
+    sub_sasms = [sasm for results in chunk_results for sasm in results]
+
+    # Next do time (or other) point calibration
+    calibration = []
+    if len(cal_data) > 0:
+        x_cal = cal_data[3]
+        y_cal = cal_data[4]
+        cal_interp = scipy.interpolate.interp1d(x_cal, y_cal)
+
+        cal_val_key = cal_data[0]
+        cal_save_key = cal_data[1]
+        cal_offset = cal_data[2]
+
+        for sasm in sub_sasms:
+            ctr_dict = sasm.getParameter('counters')
+            val = float(ctr_dict[cal_val_key])+cal_offset
+            cal_val = cal_interp(val)
+            ctr_dict[cal_save_key] = cal_val
+            sasm.setParameter('counters', ctr_dict)
+            calibration.append(cal_val)
+
+    calibration = np.array(calibration)
+
+    sub_series = profiles_to_series(sub_sasms)
+
+    sub_profiles, rg, rger, i0, i0er, vcmw, vcmwer, vpmw = set_buffer_range(
+        sub_series, [], already_subtracted=True, window_size=window_size,
+        settings=settings, error_weight=error_weight, vp_density=vp_density,
+        vp_cutoff=vp_cutoff, vp_qmax=vp_qmax, vc_protein=vc_protein,
+        vc_cutoff=vc_cutoff, vc_qmax=vc_qmax, vc_a_prot=vc_a_prot,
+        vc_b_prot=vc_b_prot, vc_a_rna=vc_a_rna, vc_b_rna=vc_b_rna,
+        calc_outside_win=True)
+
+    return sub_series, rg, rger, i0, i0er, vcmw, vcmwer, vpmw, calibration
+
+def _multi_series_chunk_calc(series_list, sample_range, buffer_range,
+    do_baseline, bl_start_range, bl_end_range, baseline_type, set_qrange, qrange,
+    bin_factor, series_bin_keys, do_q_rebin, q_npts, q_rebin_factor,
+    q_log_rebin):
+    """
+    Calculates the subtracted profiles of multi_series_calc for a chunk of
+    frames from each series. If all of the profiles have the same q vector
+    this is done on a (series x frame x q) array, otherwise each frame is
+    processed as a separate series.
+    """
+    sample_idx = _range_indices(sample_range)
+    buffer_idx = _range_indices(buffer_range)
+
+    nframes = len(series_list[0])
+    ref_sasm = series_list[0][0]
+
+    stackable = True
+
+    for series in series_list:
+        if len(series) != nframes:
+            stackable = False
+            break
+
+        for sasm in series:
+            if (not np.array_equal(sasm.q, ref_sasm.q)
+                or (not set_qrange and sasm.getQrange() != ref_sasm.getQrange())
+                or (do_q_rebin and sasm.getQErr() is not None)):
+                stackable = False
+                break
+
+        if not stackable:
+            break
+
+    if not stackable:
+        return _multi_series_profiles_calc(series_list, sample_range,
+            buffer_range, do_baseline, bl_start_range, bl_end_range,
+            baseline_type, set_qrange, qrange, bin_factor, series_bin_keys,
+            do_q_rebin, q_npts, q_rebin_factor, q_log_rebin)
+
+    already_subtracted = len(buffer_idx) == 0
+
+    if set_qrange:
+        q_start = ref_sasm.closest(ref_sasm.q, qrange[0])
+        q_end = ref_sasm.closest(ref_sasm.q, qrange[1])
+    else:
+        q_start, q_end = ref_sasm.getQrange()
+
+    q = ref_sasm.q[q_start:q_end]
+
+    # Only the sample and buffer series are needed unless there's a baseline
+    # correction, and only their metadata is needed for the results
+    meta_idx = sorted(set(sample_idx) | set(buffer_idx))
+
+    if do_baseline:
+        used_idx = list(range(len(series_list)))
+    else:
+        used_idx = meta_idx
+
+    sample_rows = [used_idx.index(k) for k in sample_idx]
+    buffer_rows = [used_idx.index(k) for k in buffer_idx]
+
+    intensity = np.array([[sasm.i[q_start:q_end] for sasm in series_list[k]]
+        for k in used_idx])
+    err = np.array([[sasm.err[q_start:q_end] for sasm in series_list[k]]
+        for k in used_idx])
+
+    q_err = [sasm.q_err[q_start:q_end] if sasm.q_err is not None else None
+        for sasm in series_list[sample_idx[0]]]
+
+    params = {k: [sasm.getAllParameters() for sasm in series_list[k]]
+        for k in meta_idx}
+
+    # Bin the profiles in each series
+    if bin_factor != 1:
+        bins = [list(range(start, min(start+bin_factor, nframes)))
+            for start in range(0, nframes, bin_factor)]
+
+        binned = [_average_stack(intensity, err, frames, axis=1)
+            for frames in bins]
+
+        intensity = np.stack([data[0] for data in binned], axis=1)
+        err = np.stack([data[1] for data in binned], axis=1)
+
+        q_err = [q_err[frames[0]] for frames in bins]
+
+        for k in meta_idx:
+            bin_params = []
+
+            for frames in bins:
+                frame_params = [params[k][j] for j in frames]
+                avg_params = SASProc.average_parameters(frame_params)
+                avg_params['filename'] = 'A_{}'.format(avg_params['filename'])
+                _init_parameters(avg_params)
+
+                for ctr_name in series_bin_keys:
+                    vals = [float(p['counters'][ctr_name]) for p in frame_params]
+                    avg_params['counters'][ctr_name] = np.mean(vals)
+
+                bin_params.append(avg_params)
+
+            params[k] = bin_params
+
+    # Rebin the profiles in q
+    if do_q_rebin:
+        initial_pts = len(q)
+
+        q, intensity, err, bin_type, final_pts = _rebin_stack(q, intensity,
+            err, q_npts, q_rebin_factor, q_log_rebin)
+
+        for k in meta_idx:
+            for j, frame_params in enumerate(params[k]):
+                if bin_type is not None:
+                    frame_params = SASProc.binning_parameters(frame_params,
+                        bin_type, initial_pts, final_pts)
+                else:
+                    frame_params = copy.copy(frame_params)
+
+                frame_params['filename'] = 'R_{}'.format(frame_params['filename'])
+                _init_parameters(frame_params)
+
+                params[k][j] = frame_params
+
+    # Average and subtract the buffer, baseline correct and average the sample
+    if not already_subtracted:
+        buffer_i, buffer_err = _average_stack(intensity, err, buffer_rows)
+
+    if not do_baseline:
+        sample_i, sample_err = _average_stack(intensity, err, sample_rows)
+
+        if not already_subtracted:
+            sub_i = sample_i - buffer_i
+            sub_err = np.sqrt(np.square(sample_err) + np.square(buffer_err))
+        else:
+            sub_i = sample_i
+            sub_err = sample_err
+
+    else:
+        if not already_subtracted:
+            unsub_i = intensity - buffer_i
+            unsub_err = np.sqrt(np.square(err) + np.square(buffer_err))
+        else:
+            unsub_i = intensity
+            unsub_err = err
+
+        shape = unsub_i.shape
+
+        bl_i, bl_err = SASCalc.process_baseline_stack(
+            unsub_i.reshape(shape[0], -1), unsub_err.reshape(shape[0], -1),
+            bl_start_range, bl_end_range, baseline_type, 100, 2000, True)[:2]
+
+        sub_i, sub_err = _average_stack(bl_i.reshape(shape),
+            bl_err.reshape(shape), sample_rows)
+
+    # Only the resulting profiles are made
+    sub_sasms = []
+
+    for j in range(sub_i.shape[0]):
+        if not already_subtracted:
+            buffer_params = SASProc.average_parameters([params[k][j]
+                for k in buffer_idx])
+            buffer_params['filename'] = 'A_{}'.format(buffer_params['filename'])
+            _init_parameters(buffer_params)
+
+        if not do_baseline:
+            sample_params = [params[k][j] for k in sample_idx]
+
+            sub_params = SASProc.average_parameters(sample_params)
+            sub_params['filename'] = 'A_{}'.format(sub_params['filename'])
+
+            if not already_subtracted:
+                _init_parameters(sub_params)
+                sub_params = SASProc.subtract_parameters(sub_params,
+                    buffer_params)
+
+            sub_params['filename'] = 'S_{}'.format(sub_params['filename'])
+
+        else:
+            sample_params = []
+
+            for k in sample_idx:
+                frame_params = params[k][j]
+
+                if not already_subtracted:
+                    frame_params = SASProc.subtract_parameters(frame_params,
+                        buffer_params)
+                    frame_params['filename'] = 'S_{}'.format(frame_params['filename'])
+                    _init_parameters(frame_params)
+
+                bl_params = copy.deepcopy(frame_params)
+
+                history1 = [copy.deepcopy(frame_params.get('filename'))]
+                for key in bl_params['history']:
+                    history1.append({key: bl_params['history'][key]})
+
+                bl_params['history'] = {'baseline_correction':
+                    {'initial_file':history1, 'type':baseline_type}}
+                _init_parameters(bl_params)
+
+                sample_params.append(bl_params)
+
+            sub_params = SASProc.average_parameters(sample_params)
+            sub_params['filename'] = 'A_{}'.format(sub_params['filename'])
+
+        _init_parameters(sub_params)
+
+        for key in series_bin_keys:
+            val_list = [float(p['counters'][key]) for p in sample_params]
+            sub_params['counters'][key] = np.mean(val_list)
+
+        sub_sasms.append(SASM.SASM(sub_i[j], copy.deepcopy(q), sub_err[j],
+            sub_params, copy.deepcopy(q_err[j])))
+
+    return sub_sasms
+
+def _multi_series_profiles_calc(series_list, sample_range, buffer_range,
+    do_baseline, bl_start_range, bl_end_range, baseline_type, set_qrange, qrange,
+    bin_factor, series_bin_keys, do_q_rebin, q_npts, q_rebin_factor,
+    q_log_rebin):
+    """
+    Calculates the subtracted profiles of multi_series_calc for a chunk of
+    frames from each series, processing each frame as a separate series.
+    """
     # First set the q range
     if set_qrange:
         orig_qranges = []
@@ -7809,14 +9593,13 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
 
             orig_qranges.append(series_orig_qranges)
 
-    # Would it make everything faster to do this first?
     # Next bin the profiles in the series (e.g. timepoint binning)
     avg_series_list = []
-    if bin_series and series_rebin_factor != 1:
+    if bin_factor != 1:
         for series in series_list:
             avg_data = []
-            for start in range(0, len(series)+1, series_rebin_factor):
-                data_slice = series[start:start+series_rebin_factor]
+            for start in range(0, len(series)+1, bin_factor):
+                data_slice = series[start:start+bin_factor]
 
                 if len(data_slice)>0:
                     avg_data.append(average(data_slice))
@@ -7862,12 +9645,7 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
 
     for series in data_series:
         set_buffer_range(series, buffer_range,
-            already_subtracted=already_subtracted, window_size=window_size,
-            settings=settings, error_weight=error_weight, vp_density=vp_density,
-            vp_cutoff=vp_cutoff, vp_qmax=vp_qmax, vc_protein=vc_protein,
-            vc_cutoff=vc_cutoff, vc_qmax=vc_qmax, vc_a_prot=vc_a_prot,
-            vc_b_prot=vc_b_prot, vc_a_rna=vc_a_rna, vc_b_rna=vc_b_rna,
-            do_calcs=False)
+            already_subtracted=already_subtracted, do_calcs=False)
 
         if not do_baseline:
             sub_sample = set_sample_range(series, sample_range,
@@ -7881,37 +9659,6 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
 
         sub_sasms.append(sub_sample)
 
-    # Next do time (or other) point calibration
-    calibration = []
-    if len(cal_data) > 0:
-        x_cal = cal_data[3]
-        y_cal = cal_data[4]
-        cal_interp = scipy.interpolate.interp1d(x_cal, y_cal)
-
-        cal_val_key = cal_data[0]
-        cal_save_key = cal_data[1]
-        cal_offset = cal_data[2]
-
-        for sasm in sub_sasms:
-            ctr_dict = sasm.getParameter('counters')
-            val = float(ctr_dict[cal_val_key])+cal_offset
-            cal_val = cal_interp(val)
-            ctr_dict[cal_save_key] = cal_val
-            sasm.setParameter('counters', ctr_dict)
-            calibration.append(cal_val)
-
-    calibration = np.array(calibration)
-
-    sub_series = profiles_to_series(sub_sasms)
-
-    sub_profiles, rg, rger, i0, i0er, vcmw, vcmwer, vpmw = set_buffer_range(
-        sub_series, [], already_subtracted=True, window_size=window_size,
-        settings=settings, error_weight=error_weight, vp_density=vp_density,
-        vp_cutoff=vp_cutoff, vp_qmax=vp_qmax, vc_protein=vc_protein,
-        vc_cutoff=vc_cutoff, vc_qmax=vc_qmax, vc_a_prot=vc_a_prot,
-        vc_b_prot=vc_b_prot, vc_a_rna=vc_a_rna, vc_b_rna=vc_b_rna,
-        calc_outside_win=True)
-
     # Reset to original q ranges (to avoid having to deep copy profiles to avoid changes upstream)
     # Seems a little odd but is much faster than a deep copy
     if set_qrange:
@@ -7921,4 +9668,111 @@ def multi_series_calc(series_input, sample_range, buffer_range=[], do_baseline=F
                 qrange = series_orig_qranges[k]
                 profile.setQrange(qrange)
 
-    return sub_series, rg, rger, i0, i0er, vcmw, vcmwer, vpmw, calibration
+    return sub_sasms
+
+def _range_indices(range_list):
+    frame_idx = []
+    for item in range_list:
+        frame_idx = frame_idx + list(range(item[0], item[1]+1))
+
+    return sorted(set(frame_idx))
+
+def _average_stack(intensity, err, index, axis=0):
+    """
+    Averages the intensity and error arrays over the index entries along
+    the axis, the same as SASProc.average does for profiles.
+    """
+    if len(index) == 1:
+        avg_i = np.take(intensity, index[0], axis=axis).copy()
+        avg_err = np.take(err, index[0], axis=axis).copy()
+    else:
+        all_i = np.take(intensity, index, axis=axis)
+        all_err = np.take(err, index, axis=axis)
+
+        avg_i = np.mean(all_i, axis)
+        avg_err = np.sqrt(np.sum(np.square(all_err), axis))/len(index)
+
+    return avg_i, avg_err
+
+def _rebin_stack(q, intensity, err, npts, rebin_factor, log_rebin):
+    """
+    Rebins the last axis of the intensity and error arrays, the same as
+    rebin does for profiles. Returns the rebinned q, intensity, and error,
+    the binning history type (None if no binning was done), and the final
+    number of points.
+    """
+    total_pts = len(q)
+
+    if rebin_factor != 1:
+        if rebin_factor != 0:
+            rb_pts = int(np.floor(total_pts/rebin_factor))
+        else:
+            rb_pts = total_pts
+
+        rb_fac = rebin_factor
+    else:
+        if npts >= 1:
+            rb_fac = int(np.floor(total_pts/float(npts)))
+        else:
+            rb_fac = 1
+
+        rb_pts = npts
+
+    shape = intensity.shape
+    intensity = intensity.reshape(-1, total_pts)
+    err_sqr = err.reshape(-1, total_pts)**2
+
+    if log_rebin:
+        if rb_pts == total_pts:
+            return q, intensity.reshape(shape), err, None, total_pts
+
+        no_points = int(rb_pts)
+
+        if no_points <= 1:
+            no_points = total_pts
+
+        if no_points >= total_pts:
+            return q, intensity.reshape(shape), err, 'log_binning', total_pts
+
+        log_bins = SASProc.calc_log_bins(total_pts, no_points)
+
+        nbins = log_bins.shape[0]-1
+        binned_q = np.empty(nbins)
+        binned_i = np.empty((intensity.shape[0], nbins))
+        binned_err = np.empty((intensity.shape[0], nbins))
+
+        for j in range(intensity.shape[0]):
+            SASProc.inner_log_bin(q, intensity[j], err_sqr[j], None, binned_q,
+                binned_i[j], binned_err[j], None, log_bins)
+
+        bin_type = 'log_binning'
+
+    else:
+        if rb_fac == 1:
+            return q, intensity.reshape(shape), err, None, total_pts
+
+        rb_fac = max(int(rb_fac), 1)
+
+        nbins = max(int(np.floor(total_pts/rb_fac)), 1)
+        end_idx = nbins*rb_fac
+
+        binned_i = np.empty((intensity.shape[0], nbins))
+        binned_err = np.empty((intensity.shape[0], nbins))
+
+        for j in range(intensity.shape[0]):
+            binned_i[j], binned_q, binned_err[j], _ = SASProc.inner_bin(
+                intensity[j, :end_idx], q[:end_idx], err_sqr[j, :end_idx],
+                None, nbins, rb_fac)
+
+        bin_type = 'linear_binning'
+
+    binned_i = binned_i.reshape(shape[:-1]+(nbins,))
+    binned_err = binned_err.reshape(shape[:-1]+(nbins,))
+
+    return binned_q, binned_i, binned_err, bin_type, nbins
+
+def _init_parameters(parameters):
+    # Default metadata added when a profile is made
+    parameters.setdefault('analysis', {})
+    parameters.setdefault('history', {})
+    parameters.setdefault('unit', '')
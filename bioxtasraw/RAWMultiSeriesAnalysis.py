@@ -2829,6 +2829,8 @@ class MultiSeriesProfilesPanel(wx.ScrolledWindow):
                 'vc_cutoff'     : self.series_frame.raw_settings.get('MWVcCutoff'),
                 'vc_qmax'       : self.series_frame.raw_settings.get('MWVcQmax'),
 
+                'single_proc'   : platform.system() == 'Darwin' and RAWGlobals.frozen,
+                'nprocs'        : min(os.cpu_count(), 3),
             }
 
             self._additional_calc_settings = {
@@ -3460,7 +3460,7 @@ class ATSASGeneralPanel(scrolled.ScrolledPanel):
             self.setATSASDir()
 
     def setATSASDir(self):
-        atsasDirectory = SASUtils.findATSASDirectory()
+        atsasDirectory = SASUtils.findATSASDirectory(use_cache=False)
         self.datadir.SetValue(atsasDirectory)
 
     def onDirButton(self, evt):
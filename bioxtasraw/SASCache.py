@@ -0,0 +1,550 @@
+"""
+Created on October 19, 2026
+
+#******************************************************************************
+# This file is part of RAW.
+#
+#    RAW is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    RAW is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with RAW.  If not, see <http://www.gnu.org/licenses/>.
+#
+#******************************************************************************
+
+The purpose of this module is to provide an opt-in cache for the results of
+expensive per-profile analyses (autorg, BIFT, GNOM, DENSS IFT, etc). Results
+are keyed on a hash of the data, the function and its parameters, and the
+RAW version, and are held in an in-memory LRU tier and an optional on-disk tier.
+It also provides an opt-in on-disk cache of the data loaded from profile files,
+so that repeated loads of the same files don't have to parse them again.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+from builtins import object, range, map, zip
+from io import open
+from six.moves import cPickle as pickle
+
+import os
+import copy
+import glob
+import json
+import hashlib
+import threading
+import collections
+
+import numpy as np
+
+raw_path = os.path.abspath(os.path.join('.', __file__, '..', '..'))
+if raw_path not in os.sys.path:
+    os.sys.path.append(raw_path)
+
+import bioxtasraw.RAWGlobals as RAWGlobals
+
+
+class AnalysisCache(object):
+    """
+    A two tier (memory and disk) cache for analysis results. The memory tier
+    is a least recently used cache limited by number of items. The disk tier
+    is optional, and is limited by total size on disk, with the least recently
+    used files removed first.
+    """
+
+    def __init__(self, max_memory_items=256, cache_dir=None,
+        max_disk_size=500*1024**2):
+        """
+        Parameters
+        ----------
+        max_memory_items: int, optional
+            The maximum number of results held in memory.
+        cache_dir: str, optional
+            The directory for the on-disk tier. If None (default), only the
+            memory tier is used.
+        max_disk_size: int, optional
+            The maximum size in bytes of the on-disk tier. Default is 500 MB.
+        """
+        self.max_memory_items = max_memory_items
+        self.max_disk_size = max_disk_size
+
+        if cache_dir is not None:
+            cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+        self.cache_dir = cache_dir
+
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+    def make_key(self, func_name, q, i, err, qrange=None, params=None):
+        """
+        Makes the cache key for a calculation.
+
+        Parameters
+        ----------
+        func_name: str
+            The name of the calculation being cached.
+        q: numpy.array
+            The q vector of the data.
+        i: numpy.array
+            The intensity of the data.
+        err: numpy.array
+            The uncertainty of the data.
+        qrange: tuple, optional
+            The q range of the data used in the calculation.
+        params: dict, optional
+            Any other parameters that affect the calculation result.
+
+        Returns
+        -------
+        key: str
+            The hex digest key for the calculation.
+        """
+        if params is None:
+            params = {}
+
+        hasher = hashlib.sha256()
+
+        for data in (q, i, err):
+            data = np.ascontiguousarray(data, dtype=np.float64)
+            hasher.update(data.tobytes())
+
+        if qrange is not None:
+            qrange = [int(val) for val in qrange]
+
+        header = {
+            'function'  : func_name,
+            'qrange'    : qrange,
+            'params'    : params,
+            'version'   : RAWGlobals.version,
+            }
+
+        hasher.update(json.dumps(header, sort_keys=True, default=str).encode('utf-8'))
+
+        return hasher.hexdigest()
+
+    def get(self, key):
+        """
+        Gets a result from the cache.
+
+        Parameters
+        ----------
+        key: str
+            The key made by :py:meth:`make_key`.
+
+        Returns
+        -------
+        found: bool
+            Whether the key was in the cache.
+        value: object
+            A copy of the cached result, or None if the key was not found.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                value = self._memory[key]
+                self.hits += 1
+                self.memory_hits += 1
+
+                return True, copy.deepcopy(value)
+
+        value = None
+        found = False
+
+        if self.cache_dir is not None:
+            fname = self._disk_path(key)
+
+            if os.path.exists(fname):
+                try:
+                    with open(fname, 'rb') as f:
+                        value = pickle.load(f)
+                    os.utime(fname, None)
+                    found = True
+                except Exception:
+                    found = False
+
+        with self._lock:
+            if found:
+                self.hits += 1
+                self.disk_hits += 1
+                self._add_to_memory(key, value)
+            else:
+                self.misses += 1
+
+        if found:
+            value = copy.deepcopy(value)
+
+        return found, value
+
+    def set(self, key, value):
+        """
+        Stores a result in the cache.
+
+        Parameters
+        ----------
+        key: str
+            The key made by :py:meth:`make_key`.
+        value: object
+            The result to cache. Must be picklable if the disk tier is used.
+        """
+        value = copy.deepcopy(value)
+
+        with self._lock:
+            self._add_to_memory(key, value)
+
+        if self.cache_dir is not None:
+            fname = self._disk_path(key)
+            tmp_fname = '{}.{}.tmp'.format(fname, threading.get_ident())
+
+            try:
+                with open(tmp_fname, 'wb') as f:
+                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_fname, fname)
+            except Exception:
+                if os.path.exists(tmp_fname):
+                    os.remove(tmp_fname)
+            else:
+                self._evict_disk()
+
+    def clear(self, disk=True):
+        """
+        Clears the cache and resets the hit and miss counts.
+
+        Parameters
+        ----------
+        disk: bool, optional
+            If True (default), the on-disk tier is also cleared.
+        """
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+            self.memory_hits = 0
+            self.disk_hits = 0
+
+        if disk and self.cache_dir is not None:
+            for fname in glob.glob(os.path.join(self.cache_dir, '*.pkl')):
+                try:
+                    os.remove(fname)
+                except Exception:
+                    pass
+
+    def get_stats(self):
+        """
+        Returns
+        -------
+        stats: dict
+            A dictionary of the cache hits, misses, memory and disk hits,
+            and the number of items in memory.
+        """
+        with self._lock:
+            stats = {
+                'hits'          : self.hits,
+                'misses'        : self.misses,
+                'memory_hits'   : self.memory_hits,
+                'disk_hits'     : self.disk_hits,
+                'memory_items'  : len(self._memory),
+                }
+
+        return stats
+
+    def _add_to_memory(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, '{}.pkl'.format(key))
+
+    def _evict_disk(self):
+        files = []
+        total_size = 0
+
+        for fname in glob.glob(os.path.join(self.cache_dir, '*.pkl')):
+            try:
+                stat = os.stat(fname)
+            except Exception:
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, fname))
+            total_size += stat.st_size
+
+        files.sort()
+
+        while total_size > self.max_disk_size and len(files) > 0:
+            mtime, size, fname = files.pop(0)
+
+            try:
+                os.remove(fname)
+                total_size -= size
+            except Exception:
+                pass
+
+
+class FileCache(object):
+    """
+    An on-disk cache of the data loaded from profile files, so that files
+    that have already been loaded don't have to be parsed again. Entries are
+    .npz files holding the profile arrays and metadata, stored either next to
+    each file (as a hidden sidecar file) or in a central cache directory.
+    Entries are keyed on the absolute file path and are ignored if the file
+    size or modification time has changed since the entry was made.
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        Parameters
+        ----------
+        cache_dir: str, optional
+            The central cache directory. If None (default), entries are
+            stored next to each file.
+        """
+        if cache_dir is not None:
+            cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+        self.cache_dir = cache_dir
+
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename, tag=''):
+        """
+        Gets the cached data for a file.
+
+        Parameters
+        ----------
+        filename: str
+            The file the data was loaded from.
+        tag: str, optional
+            An identifier for how the file was loaded, such as the file type.
+            Entries are only returned if the tag matches.
+
+        Returns
+        -------
+        data: dict
+            A dictionary with an 'is_list' entry, which is True if the file
+            was loaded as a list of profiles, and a 'profiles' entry, which is
+            a list of dictionaries with the 'i', 'q', 'err', 'q_err' (or None)
+            arrays and 'parameters' of each profile loaded from the file.
+            None if there is no valid entry.
+        """
+        filename = os.path.abspath(filename)
+        cache_fname = self._cache_path(filename)
+
+        data = None
+
+        if os.path.exists(cache_fname):
+            try:
+                with np.load(cache_fname, allow_pickle=False) as npz_data:
+                    info = json.loads(str(npz_data['info']))
+                    is_list = info.pop('is_list')
+                    all_parameters = info.pop('parameters')
+
+                    if info == self._file_info(filename, tag):
+                        profiles = []
+
+                        for j, parameters in enumerate(all_parameters):
+                            prof_data = {'parameters': parameters}
+
+                            for key in ('i', 'q', 'err', 'q_err'):
+                                name = '{}_{}'.format(key, j)
+
+                                if name in npz_data:
+                                    prof_data[key] = npz_data[name]
+                                else:
+                                    prof_data[key] = None
+
+                            profiles.append(prof_data)
+
+                        data = {'is_list': is_list, 'profiles': profiles}
+            except Exception:
+                data = None
+
+        with self._lock:
+            if data is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return data
+
+    def set(self, filename, tag, data):
+        """
+        Stores the data loaded from a file.
+
+        Parameters
+        ----------
+        filename: str
+            The file the data was loaded from.
+        tag: str
+            An identifier for how the file was loaded, such as the file type.
+        data: dict
+            The loaded data, in the format returned by :func:`get`. The
+            parameters must be JSON serializable, otherwise nothing is stored.
+        """
+        filename = os.path.abspath(filename)
+        cache_fname = self._cache_path(filename)
+        tmp_fname = '{}.{}.tmp.npz'.format(cache_fname[:-4],
+            threading.get_ident())
+
+        try:
+            info = self._file_info(filename, tag)
+            info['is_list'] = data['is_list']
+            info['parameters'] = [prof_data['parameters'] for prof_data
+                in data['profiles']]
+
+            arrays = {'info': np.array(json.dumps(info))}
+
+            for j, prof_data in enumerate(data['profiles']):
+                for key in ('i', 'q', 'err', 'q_err'):
+                    if prof_data[key] is not None:
+                        arrays['{}_{}'.format(key, j)] = np.asarray(prof_data[key])
+
+            # Check the parameters round trip, so a cached load is the same as
+            # a fresh load
+            if json.loads(str(arrays['info'])) != info:
+                return
+
+            np.savez(tmp_fname, **arrays)
+            os.replace(tmp_fname, cache_fname)
+
+        except Exception:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+
+    def clear(self):
+        """
+        Clears the central cache directory, if one is used, and resets the
+        hit and miss counts. Sidecar files are not removed.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+        if self.cache_dir is not None:
+            for fname in glob.glob(os.path.join(self.cache_dir, '*.npz')):
+                try:
+                    os.remove(fname)
+                except Exception:
+                    pass
+
+    def get_stats(self):
+        """
+        Returns
+        -------
+        stats: dict
+            A dictionary of the cache hits and misses.
+        """
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses}
+
+        return stats
+
+    def _cache_path(self, filename):
+        if self.cache_dir is not None:
+            key = hashlib.sha256(filename.encode('utf-8')).hexdigest()
+            cache_fname = os.path.join(self.cache_dir, '{}.npz'.format(key))
+        else:
+            path, name = os.path.split(filename)
+            cache_fname = os.path.join(path, '.{}.rawcache.npz'.format(name))
+
+        return cache_fname
+
+    def _file_info(self, filename, tag):
+        stat = os.stat(filename)
+
+        info = {
+            'path'      : filename,
+            'size'      : stat.st_size,
+            'mtime'     : stat.st_mtime_ns,
+            'tag'       : tag,
+            'version'   : RAWGlobals.version,
+            }
+
+        return info
+
+
+_analysis_cache = None
+_file_cache = None
+
+def enable_cache(max_memory_items=256, cache_dir=None, max_disk_size=500*1024**2):
+    """
+    Turns on the global analysis cache, replacing any existing cache.
+    See :py:class:`AnalysisCache` for a description of the parameters.
+    """
+    global _analysis_cache
+
+    _analysis_cache = AnalysisCache(max_memory_items, cache_dir, max_disk_size)
+
+    return _analysis_cache
+
+def disable_cache():
+    """Turns off the global analysis cache."""
+    global _analysis_cache
+
+    _analysis_cache = None
+
+def get_cache():
+    """Returns the global analysis cache, or None if caching is off."""
+    return _analysis_cache
+
+def cached_call(func_name, q, i, err, qrange, params, func, *args, **kwargs):
+    """
+    Calls func(*args, **kwargs) through the global analysis cache. If the
+    cache is off, this just calls the function.
+    """
+    cache = _analysis_cache
+
+    if cache is None:
+        return func(*args, **kwargs)
+
+    key = cache.make_key(func_name, q, i, err, qrange, params)
+
+    found, value = cache.get(key)
+
+    if not found:
+        value = func(*args, **kwargs)
+        cache.set(key, value)
+
+    return value
+
+def enable_file_cache(cache_dir=None):
+    """
+    Turns on the global file cache, replacing any existing cache.
+    See :py:class:`FileCache` for a description of the parameters.
+    """
+    global _file_cache
+
+    _file_cache = FileCache(cache_dir)
+
+    return _file_cache
+
+def disable_file_cache():
+    """Turns off the global file cache."""
+    global _file_cache
+
+    _file_cache = None
+
+def get_file_cache():
+    """Returns the global file cache, or None if caching is off."""
+    return _file_cache
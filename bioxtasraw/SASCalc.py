@@ -50,6 +50,7 @@ import tempfile
 import numpy as np
 import scipy.interpolate
 import scipy.signal
+import scipy.sparse.linalg
 import scipy.stats as stats
 import scipy.integrate as integrate
 from scipy.constants import Avogadro
@@ -74,6 +75,39 @@ import bioxtasraw.SASUtils as SASUtils
 def linear_func(x, a, b):
     return a+b*x
 
+def weighted_lin_reg_multiple(x, y, err):
+    """
+    Does the same weighted linear regression as weighted_lin_reg for each
+    column of y and err (2D arrays with one row per x value) at once.
+    """
+    err = np.array(err, dtype=float)
+
+    # Matches weighted_lin_reg, where errors are only replaced if all are 0
+    err[:, np.all(err == 0, axis=0)] = 1.
+
+    x = np.asarray(x, dtype=float)[:, np.newaxis]
+
+    weights = 1./(err)**2.
+
+    w_sum = weights.sum(axis=0)
+    wy_sum = (weights*y).sum(axis=0)
+    wx_sum = (weights*x).sum(axis=0)
+    wxsq_sum = (weights*x**2.).sum(axis=0)
+    wxy_sum = (weights*x*y).sum(axis=0)
+
+    delta = w_sum*wxsq_sum-(wx_sum)**2.
+
+    valid = delta != 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(valid, (wxsq_sum*wy_sum - wx_sum*wxy_sum)/delta, -1)
+        b = np.where(valid, (w_sum*wxy_sum - wx_sum*wy_sum)/delta, -1)
+
+        cov_a = np.where(valid, wxsq_sum/delta, -1)
+        cov_b = np.where(valid, w_sum/delta, -1)
+
+    return a, b, cov_a, cov_b
+
 @jit(nopython=True, cache=True, parallel=False)
 def weighted_lin_reg(x, y, err):
     err_idx = err == 0
@@ -1041,47 +1075,123 @@ def calcVcMW(sasm, temp_rg, i0, temp_qmax, a_prot, b_prot, a_rna, b_rna,
     return mw, np.sqrt(np.absolute(mw)), vc, qr
 
 
-def getATSASVersion(atsasDir):
-    #Checks if we have gnom4 or gnom5
-    opsys = platform.system()
+_atsas_installs = {}
+_atsas_installs_lock = threading.Lock()
 
-    if opsys == 'Windows':
-        dammifDir = os.path.join(atsasDir, 'dammif.exe')
-    else:
-        dammifDir = os.path.join(atsasDir, 'dammif')
+def getATSASInstall(atsasDir):
+    """
+    Returns a dictionary describing the ATSAS installation in atsasDir, with
+    the directory, the version string and tuple, the set of available
+    programs, and the environment to run them in. The installation is probed
+    once per process, and again only if the directory or its dammif changes.
+    """
+    atsas_dir = os.path.abspath(os.path.expanduser(atsasDir))
 
-    if os.path.exists(dammifDir):
-        my_env = setATSASEnv(atsasDir)
+    if platform.system() == 'Windows':
+        dammifDir = os.path.join(atsas_dir, 'dammif.exe')
+    else:
+        dammifDir = os.path.join(atsas_dir, 'dammif')
 
-        #gnom4 doesn't do a proper -v!!! So use something else
-        with subprocess.Popen('"%s" -v' %(dammifDir), stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE, shell=True, env=my_env) as process:
-            output, error = process.communicate()
+    try:
+        stat = os.stat(dammifDir)
+        signature = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        signature = None
 
-        if not isinstance(output, str):
-            output = str(output, encoding='UTF-8')
+    with _atsas_installs_lock:
+        install = _atsas_installs.get(atsas_dir)
 
-        if not isinstance(error, str):
-            error = str(error, encoding='UTF-8')
+        if install is None or install['signature'] != signature:
+            install = _probeATSASInstall(atsasDir, dammifDir, signature)
 
-        output = output.strip()
-        error = error.strip()
+            # Don't keep a failed probe (e.g. an expired license)
+            if install['version_error'] is None:
+                _atsas_installs[atsas_dir] = install
 
-        if 'expired' in error.lower():
-            raise SASExceptions.NoATSASError('ATSAS license is expired so some functionality will not work')
-        else:
-            dammif_re = r'ATSAS\s*\d+[.]\d+[.]\d*'
-            version_match = re.search(dammif_re, output)
-            version = version_match.group().split()[-1]
+    return install
 
-    return version
+def clearATSASInstallCache():
+    """Forgets all probed ATSAS installations."""
+    with _atsas_installs_lock:
+        _atsas_installs.clear()
 
-def setATSASEnv(atsasDir):
+def _probeATSASInstall(atsasDir, dammifDir, signature):
     my_env = os.environ.copy()
     my_env["PATH"] = my_env["PATH"] + '{}{}'.format(os.pathsep, atsasDir) #Not ideal, what if there's another ATSAS path?
     my_env["ATSAS"] = os.path.split(atsasDir.rstrip(os.sep))[0] #Can only have one thing in ATSAS env variable!
 
-    return my_env
+    executables = set()
+
+    if os.path.isdir(atsasDir):
+        for fname in os.listdir(atsasDir):
+            full_path = os.path.join(atsasDir, fname)
+
+            if os.path.isfile(full_path) and os.access(full_path, os.X_OK):
+                if fname.lower().endswith('.exe'):
+                    fname = fname[:-4]
+                executables.add(fname)
+
+    version = None
+    version_tuple = None
+    version_error = None
+
+    if signature is not None:
+        try:
+            version = _probeATSASVersion(dammifDir, my_env)
+            version_tuple = tuple(int(val) for val in version.split('.') if val != '')
+        except Exception as e:
+            version_error = e
+
+    install = {
+        'dir'           : atsasDir,
+        'version'       : version,
+        'version_tuple' : version_tuple,
+        'version_error' : version_error,
+        'executables'   : executables,
+        'env'           : my_env,
+        'signature'     : signature,
+        }
+
+    return install
+
+def _probeATSASVersion(dammifDir, my_env):
+    #gnom4 doesn't do a proper -v!!! So use something else
+    with subprocess.Popen('"%s" -v' %(dammifDir), stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, shell=True, env=my_env) as process:
+        output, error = process.communicate()
+
+    if not isinstance(output, str):
+        output = str(output, encoding='UTF-8')
+
+    if not isinstance(error, str):
+        error = str(error, encoding='UTF-8')
+
+    output = output.strip()
+    error = error.strip()
+
+    if 'expired' in error.lower():
+        raise SASExceptions.NoATSASError('ATSAS license is expired so some functionality will not work')
+    else:
+        dammif_re = r'ATSAS\s*\d+[.]\d+[.]\d*'
+        version_match = re.search(dammif_re, output)
+        version = version_match.group().split()[-1]
+
+    return version
+
+def getATSASVersion(atsasDir):
+    #Checks if we have gnom4 or gnom5
+    install = getATSASInstall(atsasDir)
+    version = install['version']
+
+    if install['version_error'] is not None:
+        raise install['version_error']
+    elif version is None:
+        raise SASExceptions.NoATSASError('Cannot find dammif.')
+
+    return version
+
+def setATSASEnv(atsasDir):
+    return getATSASInstall(atsasDir)['env'].copy()
 
 def runGnom(fname, save_ift, dmax, args, path, atsasDir, outname=None,
     new_gnom=False):
@@ -1807,22 +1917,23 @@ def runDammif(fname, prefix, args, path, atsasDir):
         else:
             #Solution for non-blocking reads adapted from stack overflow
             #http://stackoverflow.com/questions/375427/non-blocking-read-on-a-subprocess-pipe-in-python
+            #The pipe is read unbuffered, so everything after the prompts is
+            #left in the pipe for whoever reads the output once dammif is running.
             def enqueue_output(out, queue):
                 dammifRunning = False
-                line = 'test'
-                line2=''
-                while line != '' and not dammifRunning:
-                    line = out.read(1)
-
-                    if not isinstance(line, str):
-                        line = str(line, encoding='UTF-8')
+                line = b'test'
+                line2 = b''
+                fd = out.fileno()
+                while line != b'' and not dammifRunning:
+                    line = os.read(fd, 1)
 
                     line2+=line
-                    if line == ':':
+                    if line == b':':
+                        line2 = str(line2, encoding='UTF-8', errors='replace')
                         if line2.find('Log opened') > -1:
                             dammifRunning = True
                         queue.put_nowait([line2])
-                        line2=''
+                        line2 = b''
 
             dammif_q = queue.Queue()
 
@@ -1994,6 +2105,9 @@ def runDammif(fname, prefix, args, path, atsasDir):
             # proc.stdout.close()
             proc.stdin.close()
 
+            #Only one reader of the output at a time
+            dammif_t.join()
+
         return proc
     else:
         print('Cannot find ATSAS')
@@ -2784,8 +2898,9 @@ def inner_secm_calcs(sasm, index, rg, rger, i0, i0er, vcmw, vcmwer,
         vpmw[index], vp[index], vpcor[index] = -1, -1, -1
 
 
-def smooth_data(data, window_length=51, order=5):
-    smoothed_data = scipy.signal.savgol_filter(data, window_length, order)
+def smooth_data(data, window_length=51, order=5, axis=-1):
+    smoothed_data = scipy.signal.savgol_filter(data, window_length, order,
+        axis=axis)
     return smoothed_data
 
 def find_peaks(data, height=0.4, width=10, rel_height=0.5):
@@ -2801,31 +2916,43 @@ def integral_baseline(sasms, start_range, end_range, max_iter, min_iter):
     sasm_bl = SASProc.average(end_sasms, forced=True, copy_params=False)
     i_bl = sasm_bl.getI()
 
-    win_len = len(sasms)//2
+    intensity = np.array([sasm.getI() for sasm in sasms[start_range[-1]:end_range[0]+1]])
+
+    return integral_baseline_stack(intensity, i_bl, len(sasms), max_iter,
+        min_iter)
+
+def integral_baseline_stack(intensity, i_bl, nframes, max_iter, min_iter):
+    """
+    Calculates the integral baseline for each column of the intensity array,
+    which has one row per profile from the end of the start range to the start
+    of the end range. i_bl is the average end range intensity and nframes
+    the total number of profiles in the series.
+    """
+    win_len = nframes//2
     if win_len % 2 == 0:
         win_len = win_len+1
     win_len = min(51, win_len)
 
     order = min(5, win_len-1)
 
-    intensity = np.array([sasm.getI() for sasm in sasms[start_range[-1]:end_range[0]+1]])
-    intensity = np.apply_along_axis(smooth_data, 0, intensity, win_len, order)
+    intensity = smooth_data(intensity, win_len, order, axis=0)
 
     b = np.zeros_like(intensity)
+    i_diff = np.empty_like(intensity)
 
     j = 0
     tols = []
     converged = False
 
     while j<max_iter and not converged:
-        i_diff = intensity - b
+        np.subtract(intensity, b, out=i_diff)
         i_tot = i_diff.sum(axis=0)
 
         gamma = i_bl/i_tot
 
-        d = gamma*i_diff
+        i_diff *= gamma
 
-        b[1:] = d[1:].cumsum(axis=0)
+        np.cumsum(i_diff[1:], axis=0, out=b[1:])
         b[0, :] = 0
 
         old_b = copy.copy(b)
@@ -2859,19 +2986,32 @@ def linear_baseline(sasms, start_range, end_range):
     intensity = np.array([sasm.getI() for sasm in fit_sasms])
     err = np.array([sasm.getErr() for sasm in fit_sasms])
 
-    fit_results = []
+    a, b, cov_a, cov_b = weighted_lin_reg_multiple(frames, intensity, err)
 
-    for j in range(intensity.shape[1]):
-        a, b, cov_a, cov_b = weighted_lin_reg(frames, intensity[:, j], err[:, j])
-        fit_results.append((a, b, cov_a, cov_b))
+    fit_results = list(zip(a, b, cov_a, cov_b))
 
     return fit_results
 
 
 ###############################################################################
 #EFA below here
-def runEFA(A, forward=True):
-    """Runs the forward or backward evolving factor calculations."""
+def runEFA(A, forward=True, nsvs=None):
+    """
+    Runs the forward or backward evolving factor calculations. If nsvs is
+    None the full SVD of each sub-matrix is calculated. Otherwise only the
+    first nsvs singular values are returned, and the rest of the returned
+    array is zero. These are calculated using incremental SVD updates (see
+    runIncrementalEFA), except for short ranges where the full SVD is faster.
+    """
+    if nsvs is not None:
+        if A.shape[1] > 50:
+            return runIncrementalEFA(A, nsvs, forward)
+
+        slist = runEFA(A, forward)
+        slist[nsvs:] = 0
+
+        return slist
+
     slist = np.zeros_like(A)
 
     jmax = A.shape[1]
@@ -2888,6 +3028,96 @@ def runEFA(A, forward=True):
 
     return slist
 
+def runIncrementalEFA(A, nsvs, forward=True, oversample=20, refine_every=25,
+    tol=1e-6, max_iter=100):
+    """
+    Runs the forward or backward evolving factor calculations by updating a
+    truncated SVD one column at a time (Brand, Linear Algebra Appl. 415 (2006)),
+    rather than calculating the full SVD of every sub-matrix. Only the
+    first nsvs singular values are returned, the rest of the array is zero.
+    An extra oversample singular vectors are carried internally. Once the
+    SVD is truncated, every refine_every columns (or only at the last column
+    if refine_every is 0) the vectors are refined by subspace iteration on
+    the sub-matrix until the first nsvs singular values change by less than
+    tol (relative), or for max_iter iterations. Singular values at refined
+    columns match the full calculation, in between noise level singular
+    values are approximate.
+    """
+    slist = np.zeros_like(A)
+
+    nq, jmax = A.shape
+
+    if not forward:
+        A = A[:,::-1]
+
+    nsvs = min(nsvs, nq)
+    nkeep = min(nsvs + oversample, nq)
+
+    U = np.zeros((nq, 0))
+    s = np.zeros(0)
+
+    for j in range(jmax):
+        col = A[:, j]
+
+        # Project onto the current basis, reorthogonalizing once for stability
+        p = np.dot(U.T, col)
+        resid = col - np.dot(U, p)
+        p2 = np.dot(U.T, resid)
+        resid = resid - np.dot(U, p2)
+        p = p + p2
+
+        resid_norm = np.linalg.norm(resid)
+
+        k = s.size
+
+        K = np.zeros((k+1, k+1))
+        K[np.arange(k), np.arange(k)] = s
+        K[:k, k] = p
+        K[k, k] = resid_norm
+
+        Uk, s, _ = np.linalg.svd(K, full_matrices=False)
+
+        if resid_norm > 0:
+            new_vec = resid/resid_norm
+        else:
+            new_vec = np.zeros(nq)
+
+        U = np.dot(np.column_stack((U, new_vec)), Uk)
+
+        rank = min(nq, j+1)
+
+        U = U[:, :min(nkeep, rank)]
+        s = s[:min(nkeep, rank)]
+
+        if refine_every > 0:
+            refine = (j+1) % refine_every == 0 or j == jmax-1
+        else:
+            refine = j == jmax-1
+
+        if refine and U.shape[1] < rank:
+            sub = A[:, :j+1]
+
+            Ub, s, Vt = np.linalg.svd(np.dot(U.T, sub), full_matrices=False)
+
+            for n in range(max_iter):
+                prev_s = s[:nsvs]
+
+                U, _ = np.linalg.qr(np.dot(sub, Vt.T*s))
+                Ub, s, Vt = np.linalg.svd(np.dot(U.T, sub), full_matrices=False)
+
+                if np.all(np.abs(s[:nsvs]-prev_s) <= tol*s[:nsvs]):
+                    break
+
+            U = np.dot(U, Ub)
+
+        nvals = min(nsvs, s.size)
+        slist[:nvals, j] = s[:nvals]
+
+        if j > 0 and rank-1 < nsvs:
+            slist[rank-1:nsvs, j-1] = s[rank-1]
+
+    return slist
+
 def runRotation(D, intensity, err, ranges, force_positive, svd_v, previous_results=None,
     method='Hybrid', niter=1000, tol=1e-12):
     """
@@ -3150,7 +3380,7 @@ def initHybridEFA(M, num_sv, D, C, converged, V_bar):
 
 def run_full_efa(series, ranges, profile_type='sub', framei=None, framef=None,
     method='Hybrid', niter=1000, tol=1e-12, norm=True, force_positive=None,
-    previous_results=None):
+    previous_results=None, return_efa_svs=False, efa_nsvs=None):
     """
     Runs evolving factor analysis (EFA) on the input series to deconvolve
     overlapping elution peaks in the data.
@@ -3206,6 +3436,19 @@ def run_full_efa(series, ranges, profile_type='sub', framei=None, framef=None,
         is a dictionary of the previous results, corresponding to the
         rotation_data dictionary returned by this function. Defaults to None,
         which should be used if no previous results are available.
+    return_efa_svs: bool, optional
+        If True, the forward and backward evolving singular values are
+        calculated and returned in addition to the normal return values.
+        Defaults to False.
+    efa_nsvs: int, optional
+        Only used if return_efa_svs is True. If provided, only this many
+        forward and backward singular values are calculated, using incremental
+        SVD updates, which is much faster for long series. Significant
+        singular values match the full calculation, noise level values are
+        approximate (within several percent) except every 25 frames and at the
+        last frame, where they are refined to match. If not provided
+        (default), all singular values are calculated using a full SVD for
+        each frame.
 
     Returns
     -------
@@ -3235,6 +3478,14 @@ def run_full_efa(series, ranges, profile_type='sub', framei=None, framef=None,
         number. ' err' - Scattering intensity uncertainty. A numpy array where
         the first axis is intensity and the second axis is component number.
         'M' - The EFA M rotation matrix.
+    forward_svs: numpy.array
+        Only returned if return_efa_svs is True. The forward evolving
+        singular values, where the first axis is singular value number and the
+        second axis is frame number.
+    backward_svs: numpy.array
+        Only returned if return_efa_svs is True. The backward evolving
+        singular values, where the first axis is singular value number and the
+        second axis is frame number, in reverse frame order.
 
     Raises
     ------
@@ -3333,16 +3584,37 @@ def run_full_efa(series, ranges, profile_type='sub', framei=None, framef=None,
 
             series.setParameter('analysis', analysis_dict)
 
+    if return_efa_svs:
+        forward_svs = runEFA(svd_a, True, efa_nsvs)
+        backward_svs = runEFA(svd_a, False, efa_nsvs)
+
+        return (efa_profiles, converged, conv_data, rotation_data, forward_svs,
+            backward_svs)
+
     return efa_profiles, converged, conv_data, rotation_data
 
 def validateBuffer(sasms, frame_idx, intensity, sim_test, sim_cor, sim_thresh,
-    fast):
+    fast, context=None):
+    """
+    Validates a buffer range. If context (a SeriesAnalysisContext for the
+    profiles that frame_idx indexes into) is provided, the frame similarity
+    and SVD tests use its stored results instead of recalculating them.
+    """
     median = np.median(intensity)
     median_i_idx = (np.absolute(intensity-median)).argmin()
 
-    ref_sasm = sasms[median_i_idx].copy_no_metadata()
-    buffer_sasms = [sasm.copy_no_metadata() for sasm in sasms]
-    qi, qf = ref_sasm.getQrange()
+    if context is not None:
+        sim_matrix = context.get_similarity_matrix()
+    else:
+        sim_matrix = None
+
+    if sim_matrix is None:
+        ref_sasm = sasms[median_i_idx].copy_no_metadata()
+        buffer_sasms = [sasm.copy_no_metadata() for sasm in sasms]
+        qi, qf = ref_sasm.getQrange()
+    else:
+        ref_idx = frame_idx[median_i_idx]
+        qi, qf = sasms[median_i_idx].getQrange()
 
     #Test for frame correlation
     if len(sasms) > 1:
@@ -3384,7 +3656,27 @@ def validateBuffer(sasms, frame_idx, intensity, sim_test, sim_cor, sim_thresh,
 
 
     #Test for regional frame similarity
-    if len(sasms) > 1:
+    if len(sasms) > 1 and sim_matrix is not None:
+        if qf-qi>200:
+            low_q_similar, low_q_outliers = sim_matrix.similarity_test(ref_idx,
+                frame_idx, (qi, qi+100), sim_thresh)
+
+            if fast and not low_q_similar:
+                return False, {}, {}, intI_results
+
+            high_q_similar, high_q_outliers = sim_matrix.similarity_test(ref_idx,
+                frame_idx, (qf-100, qf), sim_thresh)
+
+            if fast and not high_q_similar:
+                return False, {}, {}, intI_results
+
+        else:
+            low_q_similar = True
+            high_q_similar = True
+            low_q_outliers = []
+            high_q_outliers = []
+
+    elif len(sasms) > 1:
         if qf-qi>200:
             ref_sasm.setQrange((qi, qi+100))
             for sasm in buffer_sasms:
@@ -3425,7 +3717,10 @@ def validateBuffer(sasms, frame_idx, intensity, sim_test, sim_cor, sim_thresh,
 
     #Test for more than one significant singular value
     if len(sasms) > 1:
-        svd_results = significantSingularValues(sasms)
+        if context is not None:
+            svd_results = context.get_svd_results(frame_idx)
+        else:
+            svd_results = significantSingularValues(sasms)
 
         if fast and not svd_results['svals']==1:
             return False, {}, svd_results, intI_results
@@ -3434,7 +3729,10 @@ def validateBuffer(sasms, frame_idx, intensity, sim_test, sim_cor, sim_thresh,
 
 
     #Test for all frame similarity
-    if len(sasms) > 1:
+    if len(sasms) > 1 and sim_matrix is not None:
+        all_similar, all_outliers = sim_matrix.similarity_test(ref_idx,
+            frame_idx, (qi, qf), sim_thresh)
+    elif len(sasms) > 1:
         all_similar, all_outliers = run_similarity_test(ref_sasm,
             buffer_sasms, sim_test, sim_cor, sim_thresh)
     else:
@@ -3468,15 +3766,300 @@ def run_similarity_test(ref_sasm, sasm_list, sim_test, sim_cor, sim_thresh):
 
     return similar, np.argwhere(pvals<sim_thresh).flatten()
 
-def significantSingularValues(sasms):
+class SimilarityMatrix(object):
+    """
+    Pairwise similarity test p values between the profiles of a series,
+    calculated lazily in blocks and stored for reuse. This is used when
+    searching for buffer, sample, or baseline ranges, where the same pairs
+    of frames are compared many times as overlapping windows are validated.
+    Values are stored separately for each q range tested (e.g. the low q,
+    high q, and full q ranges).
+
+    If scale is True, each frame is scaled to the reference frame (as
+    SASProc.superimpose with 'Scale') before the comparison, as is done for
+    sample range validation. In that case the matrix is not symmetric.
+    """
+
+    def __init__(self, sasms, sim_test='CorMap', scale=False, block_size=128):
+        self.sasms = sasms
+        self.sim_test = sim_test
+        self.scale = scale
+        self.block_size = block_size
+
+        self._blocks = {}
+
+    def get_pvals(self, ref_idx, frame_idx, qrange):
+        """
+        Returns the p values for the comparison of the reference profile to
+        each profile in frame_idx over the given q range. Indices are into
+        the profile list used to create the SimilarityMatrix.
+        """
+        qrange = (int(qrange[0]), int(qrange[1]))
+        frame_idx = np.asarray(frame_idx, dtype=int)
+
+        pvals = self._read(ref_idx, frame_idx, qrange)
+
+        missing = np.isnan(pvals)
+
+        if np.any(missing):
+            new_idx = frame_idx[missing]
+            new_pvals = self._calc_pvals(ref_idx, new_idx, qrange)
+
+            self._write(ref_idx, new_idx, qrange, new_pvals)
+
+            if not self.scale:
+                for idx, pval in zip(new_idx, new_pvals):
+                    self._write(idx, np.array([ref_idx]), qrange,
+                        np.array([pval]))
+
+            pvals[missing] = new_pvals
+
+        return pvals
+
+    def similarity_test(self, ref_idx, frame_idx, qrange, sim_thresh):
+        """
+        Equivalent to run_similarity_test for the reference profile and
+        profiles in frame_idx. Outlier indices are relative to frame_idx.
+        """
+        pvals = self.get_pvals(ref_idx, frame_idx, qrange)
+
+        if np.any(pvals<sim_thresh):
+            similar = False
+        else:
+            similar = True
+
+        return similar, np.argwhere(pvals<sim_thresh).flatten()
+
+    def _get_block(self, qrange, row_block, col_block):
+        key = (qrange, row_block, col_block)
+
+        if key not in self._blocks:
+            self._blocks[key] = np.full((self.block_size, self.block_size),
+                np.nan)
+
+        return self._blocks[key]
+
+    def _read(self, ref_idx, frame_idx, qrange):
+        pvals = np.empty(len(frame_idx))
+        row_block, row = divmod(int(ref_idx), self.block_size)
+        col_blocks = frame_idx//self.block_size
+
+        for col_block in np.unique(col_blocks):
+            sel = col_blocks == col_block
+            block = self._get_block(qrange, row_block, int(col_block))
+            pvals[sel] = block[row, frame_idx[sel] % self.block_size]
+
+        return pvals
+
+    def _write(self, ref_idx, frame_idx, qrange, pvals):
+        row_block, row = divmod(int(ref_idx), self.block_size)
+        col_blocks = frame_idx//self.block_size
+
+        for col_block in np.unique(col_blocks):
+            sel = col_blocks == col_block
+            block = self._get_block(qrange, row_block, int(col_block))
+            block[row, frame_idx[sel] % self.block_size] = pvals[sel]
+
+    def _calc_pvals(self, ref_idx, frame_idx, qrange):
+        ref_sasm = self.sasms[ref_idx].copy_no_metadata()
+        sasm_list = [self.sasms[idx].copy_no_metadata() for idx in frame_idx]
+
+        if self.scale:
+            SASProc.superimpose(ref_sasm, sasm_list, 'Scale')
+
+        ref_sasm.setQrange(qrange)
+        for sasm in sasm_list:
+            sasm.setQrange(qrange)
+
+        if self.sim_test == 'CorMap':
+            pvals, corrected_pvals, failed_comparisons = SASProc.run_cormap_ref(sasm_list,
+                ref_sasm)
+
+        return np.asarray(pvals, dtype=float)
+
+class SeriesAnalysisContext(object):
+    """
+    Holds analysis results for the profiles of a series that are reused when
+    validating many overlapping windows of the series, as is done when
+    searching for buffer, sample, or baseline ranges. It holds the frame
+    similarity matrices (see SimilarityMatrix), stacked intensity and
+    uncertainty arrays for the frames, and memoizes the window SVD and
+    signal to noise results keyed by frame range.
+
+    The same context can be passed to multiple find and validate calls. If
+    profiles are added to, removed from, or replaced in the profile list, or
+    a profile's intensity or q range changes (e.g. it is scaled), the stored
+    results are discarded and recalculated as needed.
+    """
+
+    def __init__(self, sasms, sim_test='CorMap'):
+        self.sasms = sasms
+        self.sim_test = sim_test
+
+        self.invalidate()
+
+    def invalidate(self):
+        """Discards all stored results."""
+        self._sim_matrices = {}
+        self._svd_results = {}
+        self._sn_results = {}
+
+        self._stacked = False
+        self._i = None
+        self._err = None
+
+        self._profile_state = self._get_profile_state()
+
+    def _get_profile_state(self):
+        # The intensity and uncertainty arrays are replaced whenever a
+        # profile's scale or offset is changed
+        return [(sasm, sasm.i, sasm.err, tuple(sasm.getQrange()))
+            for sasm in self.sasms]
+
+    def _check_profiles(self):
+        state = self._get_profile_state()
+
+        if len(state) != len(self._profile_state):
+            changed = True
+        else:
+            changed = any(new[-1] != old[-1]
+                or any(val is not old_val for val, old_val
+                    in zip(new[:-1], old[:-1]))
+                for new, old in zip(state, self._profile_state))
+
+        if changed:
+            self.invalidate()
+
+    def get_similarity_matrix(self, scale=False):
+        self._check_profiles()
+
+        if scale not in self._sim_matrices:
+            self._sim_matrices[scale] = SimilarityMatrix(self.sasms,
+                self.sim_test, scale)
+
+        return self._sim_matrices[scale]
+
+    def get_svd_results(self, frame_idx):
+        """
+        Returns the significantSingularValues results for the frames in
+        frame_idx.
+        """
+        self._check_profiles()
+
+        key = self._window_key(frame_idx)
+
+        if key not in self._svd_results:
+            i, err = self._get_window_arrays(frame_idx)
+
+            if i is not None:
+                i = i.T
+                err = err.T
+                err_avg = np.mean(err, axis=1).reshape(i.shape[0], 1)
+                svd_a = i/err_avg
+
+                svd_results = significantSingularValuesFromMatrix(svd_a)
+
+            else:
+                svd_results = significantSingularValues([self.sasms[idx]
+                    for idx in frame_idx])
+
+            self._svd_results[key] = svd_results
+
+        return self._svd_results[key]
+
+    def get_sn_results(self, frame_idx, intensity):
+        """
+        Returns the number of frames (in order of decreasing intensity) that
+        can be averaged while the mean signal to noise keeps increasing, and
+        the sort order used. Equivalent to the signal to noise test in
+        validateSample.
+        """
+        self._check_profiles()
+
+        key = self._window_key(frame_idx)
+
+        if key not in self._sn_results:
+            sort_idx = np.argsort(intensity)[::-1]
+
+            i, err = self._get_window_arrays(frame_idx)
+
+            old_s_to_n = 0
+            sn_valid = True
+            j = 0
+
+            if i is not None:
+                sum_i = np.zeros(i.shape[1])
+                sum_err2 = np.zeros(i.shape[1])
+
+            while sn_valid and j < len(sort_idx):
+                if i is not None:
+                    sum_i = sum_i + i[sort_idx[j]]
+                    sum_err2 = sum_err2 + np.square(err[sort_idx[j]])
+
+                    avg_i = sum_i/(j+1)
+                    avg_err = np.sqrt(sum_err2)/(j+1)
+
+                else:
+                    avg_list = [self.sasms[frame_idx[idx]] for idx in sort_idx[:j+1]]
+
+                    average_sasm = SASProc.average(avg_list, forced=True,
+                        copy_params=False)
+                    avg_i = average_sasm.getI()
+                    avg_err = average_sasm.getErr()
+
+                s_to_n = np.abs(avg_i/avg_err).mean()
+
+                if s_to_n >= old_s_to_n:
+                    old_s_to_n = s_to_n
+                    j = j+1
+                else:
+                    sn_valid = False
+
+            self._sn_results[key] = (sort_idx, j, sn_valid)
+
+        return self._sn_results[key]
+
+    def _window_key(self, frame_idx):
+        return (int(frame_idx[0]), int(frame_idx[-1]), len(frame_idx))
+
+    def _get_window_arrays(self, frame_idx):
+        if not self._stacked:
+            self._stacked = True
+
+            ints = [sasm.getI() for sasm in self.sasms]
+
+            if len(ints) > 0 and all(len(val) == len(ints[0]) for val in ints):
+                self._i = np.array(ints)
+                self._err = np.array([sasm.getErr() for sasm in self.sasms])
+
+        if self._i is None:
+            return None, None
+
+        frame_idx = np.asarray(frame_idx, dtype=int)
+
+        return self._i[frame_idx], self._err[frame_idx]
+
+def significantSingularValues(sasms, nsvs=None):
     """
     Calculates number of significant singular values.
 
     Returns both SVD results and number of significant singular values.
+    If nsvs is provided, only that many singular values and vectors are
+    calculated (see doSVDonSASMs), which can be 'auto' to adaptively choose
+    the number of components.
     """
 
-    (svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor, i, err, svd_a,
-        continue_svd_analysis) = SVDonSASMs(sasms, do_binning=False)
+    svd_a, i, err, q = prepareSASMsforSVD(sasms, do_binning=False)
+
+    return significantSingularValuesFromMatrix(svd_a, nsvs)
+
+def significantSingularValuesFromMatrix(svd_a, nsvs=None):
+    """
+    Calculates number of significant singular values of an already prepared
+    SVD matrix (see prepareSASMsforSVD).
+    """
+    (svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor,
+        continue_svd_analysis) = doSVDonSASMs(svd_a, nsvs=nsvs)
 
     if continue_svd_analysis:
         svals = findSignificantSingularValues(svd_s, svd_U_autocor, svd_V_autocor)
@@ -3533,20 +4116,56 @@ def prepareSASMsforSVD(sasms, err_norm=True, do_binning=True, bin_to=100):
 
     return svd_a, i, err, q
 
-def doSVDonSASMs(svd_a, do_autocorr=True):
+def doSVDonSASMs(svd_a, do_autocorr=True, nsvs=None):
+    """
+    Calculates the SVD of the input matrix and the autocorrelation of the
+    singular vectors. If nsvs is None, the full SVD is calculated. If nsvs
+    is an integer, only the largest nsvs singular values and vectors are
+    calculated. If nsvs is 'auto', the number of components calculated is
+    increased until the number of significant singular values (as determined
+    by findSignificantSingularValues) is well below the number calculated,
+    and small matrices get a full SVD.
+    """
+    if nsvs == 'auto' and min(svd_a.shape) <= 100:
+        nsvs = None
+
     if np.all(np.isfinite(svd_a)):
         try:
-            svd_U, svd_s, svd_Vt = np.linalg.svd(svd_a, full_matrices = True)
+            if nsvs is None:
+                svd_U, svd_s, svd_Vt = np.linalg.svd(svd_a, full_matrices = True)
+
+            elif nsvs == 'auto':
+                k = 10
+                found = False
+
+                while not found:
+                    svd_U, svd_s, svd_Vt = truncatedSVD(svd_a, k)
+
+                    if svd_s.size < k:
+                        found = True
+                    else:
+                        svd_U_autocor = svdAutocorrelation(svd_U)
+                        svd_V_autocor = svdAutocorrelation(svd_Vt.T)
+
+                        svals = findSignificantSingularValues(svd_s,
+                            svd_U_autocor, svd_V_autocor)
+
+                        if svals < k//2:
+                            found = True
+                        else:
+                            k = k*2
+
+            else:
+                svd_U, svd_s, svd_Vt = truncatedSVD(svd_a, nsvs)
+
             success = True
         except Exception:
             success = False
 
         if success and do_autocorr:
             svd_V = svd_Vt.T
-            svd_U_autocor = np.abs(np.array([np.correlate(svd_U[:,k],
-                svd_U[:,k], mode = 'full')[-svd_U.shape[0]+1] for k in range(svd_U.shape[1])]))
-            svd_V_autocor = np.abs(np.array([np.correlate(svd_V[:,k],
-                svd_V[:,k], mode = 'full')[-svd_V.shape[0]+1] for k in range(svd_V.shape[1])]))
+            svd_U_autocor = svdAutocorrelation(svd_U)
+            svd_V_autocor = svdAutocorrelation(svd_V)
 
         elif success:
             svd_V = svd_Vt.T
@@ -3568,12 +4187,53 @@ def doSVDonSASMs(svd_a, do_autocorr=True):
 
     return svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor, success
 
+def truncatedSVD(svd_a, nsvs):
+    """
+    Calculates the largest nsvs singular values and vectors of the input
+    matrix, in descending order. Returns U, s, and V transpose, like
+    numpy.linalg.svd. If nsvs is close to the size of the matrix a full
+    SVD is done and truncated.
+    """
+    nsvs = min(nsvs, min(svd_a.shape))
+
+    if nsvs >= min(svd_a.shape)//2:
+        svd_U, svd_s, svd_Vt = np.linalg.svd(svd_a, full_matrices=False)
+
+        svd_U = svd_U[:, :nsvs]
+        svd_s = svd_s[:nsvs]
+        svd_Vt = svd_Vt[:nsvs, :]
+
+    else:
+        v0 = np.ones(min(svd_a.shape))
+
+        svd_U, svd_s, svd_Vt = scipy.sparse.linalg.svds(svd_a, k=nsvs, v0=v0)
+
+        order = np.argsort(svd_s)[::-1]
+
+        svd_U = svd_U[:, order]
+        svd_s = svd_s[order]
+        svd_Vt = svd_Vt[order, :]
+
+    return svd_U, svd_s, svd_Vt
 
-def SVDonSASMs(sasms, err_norm=True, do_binning=True, bin_to=100, do_autocorr=True):
+def svdAutocorrelation(vectors):
+    """
+    Calculates the absolute value of the lag one autocorrelation of each
+    column of the input array of singular vectors.
+    """
+    if vectors.shape[0] > 1:
+        autocor = np.abs(np.sum(vectors[:-1]*vectors[1:], axis=0))
+    else:
+        autocor = np.abs(np.sum(vectors*vectors, axis=0))
+
+    return autocor
+
+def SVDonSASMs(sasms, err_norm=True, do_binning=True, bin_to=100,
+    do_autocorr=True, nsvs=None):
     svd_a, i, err, q = prepareSASMsforSVD(sasms, err_norm, do_binning, bin_to)
 
     svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor, success = doSVDonSASMs(svd_a,
-        do_autocorr)
+        do_autocorr, nsvs)
 
     return svd_U, svd_s, svd_V, svd_U_autocor, svd_V_autocor, i, err, svd_a, success
 
@@ -3726,10 +4386,13 @@ def findBufferRange(buffer_sasms, intensity, avg_window, sim_test, sim_cor,
 
             search_full_length = False
 
+    context = SeriesAnalysisContext(buffer_sasms, sim_test)
+
     #Initial search
     failed, region_start, region_end = inner_find_buffer_range(intensity,
         buffer_sasms, start_point, end_point, start_window_size,
-        min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, True)
+        min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, True,
+        context)
 
     if use_peak_search and not search_full_length and failed:
         #Start search to the right from edge of rightmost peak and go to end
@@ -3742,7 +4405,8 @@ def findBufferRange(buffer_sasms, intensity, avg_window, sim_test, sim_cor,
         else:
             failed, region_start, region_end = inner_find_buffer_range(intensity,
                 buffer_sasms, start_point, end_point, start_window_size,
-                min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, False)
+                min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, False,
+                context)
 
     if use_peak_search and not search_full_length and failed:
         #Start search to the left from edge of main peak and go to the left edge of the first peak
@@ -3759,7 +4423,8 @@ def findBufferRange(buffer_sasms, intensity, avg_window, sim_test, sim_cor,
             if end_point != start_point:
                 failed, region_start, region_end = inner_find_buffer_range(intensity,
                     buffer_sasms, start_point, end_point, start_window_size,
-                    min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, True)
+                    min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, True,
+                    context)
 
             else:
                 failed = True
@@ -3779,7 +4444,8 @@ def findBufferRange(buffer_sasms, intensity, avg_window, sim_test, sim_cor,
             if end_point != start_point:
                 failed, region_start, region_end = inner_find_buffer_range(intensity,
                     buffer_sasms, start_point, end_point, start_window_size,
-                    min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, False)
+                    min_window_width, peak_pos, sim_test, sim_cor, sim_thresh, False,
+                    context)
             else:
                 failed = True
 
@@ -3789,7 +4455,7 @@ def findBufferRange(buffer_sasms, intensity, avg_window, sim_test, sim_cor,
 
 def inner_find_buffer_range(intensity, buffer_sasms, start_point, end_point,
     start_window_size, min_window_width, peaks, sim_test, sim_cor, sim_thresh,
-    flip_regions):
+    flip_regions, context=None):
 
     found_region = False
     failed = False
@@ -3813,7 +4479,8 @@ def inner_find_buffer_range(intensity, buffer_sasms, start_point, end_point,
 
             if len(peaks) == 0 or np.all([peak not in frame_idx for peak in peaks]):
                 found_region, similarity_results, svd_results, intI_results = validateBuffer(region_sasms,
-                    frame_idx, region_intensity, sim_test, sim_cor, sim_thresh, True)
+                    frame_idx, region_intensity, sim_test, sim_cor, sim_thresh, True,
+                    context)
 
             else:
                 found_region = False
@@ -3831,13 +4498,28 @@ def inner_find_buffer_range(intensity, buffer_sasms, start_point, end_point,
     return failed, region_start, region_end
 
 def validateSample(sub_sasms, frame_idx, intensity, rg, vcmw, vpmw,
-    sim_test, sim_cor, sim_thresh, fast):
+    sim_test, sim_cor, sim_thresh, fast, context=None):
+    """
+    Validates a sample range. If context (a SeriesAnalysisContext for the
+    profiles that frame_idx indexes into) is provided, the frame similarity,
+    SVD, and signal to noise tests use its stored results instead of
+    recalculating them.
+    """
     max_i_idx = np.argmax(intensity)
 
-    ref_sasm = sub_sasms[max_i_idx].copy_no_metadata()
-    superimpose_sub_sasms = [sasm.copy_no_metadata() for sasm in sub_sasms]
-    SASProc.superimpose(ref_sasm, superimpose_sub_sasms, 'Scale')
-    qi, qf = ref_sasm.getQrange()
+    if context is not None:
+        sim_matrix = context.get_similarity_matrix(scale=True)
+    else:
+        sim_matrix = None
+
+    if sim_matrix is None:
+        ref_sasm = sub_sasms[max_i_idx].copy_no_metadata()
+        superimpose_sub_sasms = [sasm.copy_no_metadata() for sasm in sub_sasms]
+        SASProc.superimpose(ref_sasm, superimpose_sub_sasms, 'Scale')
+        qi, qf = ref_sasm.getQrange()
+    else:
+        ref_idx = frame_idx[max_i_idx]
+        qi, qf = sub_sasms[max_i_idx].getQrange()
 
     if np.any(rg==-1):
         param_range_valid = False
@@ -3906,7 +4588,27 @@ def validateSample(sub_sasms, frame_idx, intensity, rg, vcmw, vpmw,
 
 
     #Test for regional frame similarity
-    if len(sub_sasms) > 1:
+    if len(sub_sasms) > 1 and sim_matrix is not None:
+        if qf-qi>200:
+            low_q_similar, low_q_outliers = sim_matrix.similarity_test(ref_idx,
+                frame_idx, (qi, qi+100), sim_thresh)
+
+            if fast and not low_q_similar:
+                return False, {}, param_results, {}, {}
+
+            high_q_similar, high_q_outliers = sim_matrix.similarity_test(ref_idx,
+                frame_idx, (qf-100, qf), sim_thresh)
+
+            if fast and not high_q_similar:
+                return False, {}, param_results, {}, {}
+
+        else:
+            low_q_similar = True
+            high_q_similar = True
+            low_q_outliers = []
+            high_q_outliers = []
+
+    elif len(sub_sasms) > 1:
         if qf-qi>200:
             ref_sasm.setQrange((qi, qi+100))
             for sasm in superimpose_sub_sasms:
@@ -3948,7 +4650,10 @@ def validateSample(sub_sasms, frame_idx, intensity, rg, vcmw, vpmw,
 
     #Test for more than one significant singular value
     if len(sub_sasms) > 1:
-        svd_results = significantSingularValues(sub_sasms)
+        if context is not None:
+            svd_results = context.get_svd_results(frame_idx)
+        else:
+            svd_results = significantSingularValues(sub_sasms)
     else:
         svd_results = {'svals': 1}
 
@@ -3959,7 +4664,10 @@ def validateSample(sub_sasms, frame_idx, intensity, rg, vcmw, vpmw,
     # Test whether averaging all selected frames is helping signal to noise,
     # or if inclusion of some are hurting because they're too noisy
 
-    if len(sub_sasms) > 1:
+    if len(sub_sasms) > 1 and context is not None:
+        sort_idx, i, sn_valid = context.get_sn_results(frame_idx, intensity)
+
+    elif len(sub_sasms) > 1:
         sort_idx = np.argsort(intensity)[::-1]
         old_s_to_n = 0
         sn_valid = True
@@ -3995,7 +4703,10 @@ def validateSample(sub_sasms, frame_idx, intensity, rg, vcmw, vpmw,
 
 
     #Test for all frame similarity
-    if len(sub_sasms) > 1:
+    if len(sub_sasms) > 1 and sim_matrix is not None:
+        all_similar, all_outliers = sim_matrix.similarity_test(ref_idx,
+            frame_idx, (qi, qf), sim_thresh)
+    elif len(sub_sasms) > 1:
         all_similar, all_outliers = run_similarity_test(ref_sasm,
             superimpose_sub_sasms, sim_test, sim_cor, sim_thresh)
     else:
@@ -4050,6 +4761,8 @@ def findSampleRange(sub_sasms, intensity, rg, vcmw, vpmw, avg_window, sim_test,
     found_region = False
     failed = False
 
+    context = SeriesAnalysisContext(sub_sasms, sim_test)
+
     while not found_region and not failed:
         step_size = max(1, int(round(window_size/8.)))
 
@@ -4083,7 +4796,7 @@ def findSampleRange(sub_sasms, intensity, rg, vcmw, vpmw, avg_window, sim_test,
             (valid, similarity_results, param_results, svd_results,
                 sn_results) = validateSample(region_sasms, frame_idx,
                 region_intensity, rg_region, vcmw_region, vpmw_region,
-                sim_test, sim_cor, sim_thresh, True)
+                sim_test, sim_cor, sim_thresh, True, context)
             found_region = valid
 
             if found_region:
@@ -4105,13 +4818,13 @@ def findSampleRange(sub_sasms, intensity, rg, vcmw, vpmw, avg_window, sim_test,
     return success, region_start, region_end
 
 def validateBaseline(sasms, frame_idx, intensity, bl_type, ref_sasms, start,
-    sim_test, sim_cor, sim_thresh, fast):
+    sim_test, sim_cor, sim_thresh, fast, context=None):
     other_results = {}
 
     if bl_type == 'Integral':
         valid, similarity_results, svd_results, intI_results = validateBuffer(sasms,
             frame_idx, intensity, sim_test, sim_cor, sim_thresh,
-    fast)
+            fast, context)
 
         if fast and not valid:
             return valid, similarity_results, svd_results, intI_results, other_results
@@ -4249,6 +4962,8 @@ def findBaselineRange(sub_sasms, intensity, bl_type, avg_window, start_region,
 
     min_window_width = max(10, int(round(avg_window/2.)))
 
+    context = SeriesAnalysisContext(sub_sasms, sim_test)
+
     # Start region
     if len(peaks) == 0:
         window_size =  min_window_width
@@ -4276,7 +4991,7 @@ def findBaselineRange(sub_sasms, intensity, bl_type, avg_window, start_region,
         (valid, similarity_results, svd_results, intI_results,
             other_results) = validateBaseline(region_sasms, frame_idx,
             region_intensity, bl_type, None, True, sim_test, sim_cor,
-            sim_thresh, True)
+            sim_thresh, True, context)
 
         if np.all([peak not in frame_idx for peak in peaks]) and valid:
             found_region = True
@@ -4301,7 +5016,7 @@ def findBaselineRange(sub_sasms, intensity, bl_type, avg_window, start_region,
             (valid, similarity_results, svd_results, intI_results,
                 other_results) = validateBaseline(region_sasms, frame_idx,
                 region_intensity, bl_type, None, True, sim_test, sim_cor,
-                sim_thresh, True)
+                sim_thresh, True, context)
 
             if np.all([peak not in frame_idx for peak in peaks]) and valid:
                 found_region = True
@@ -4356,12 +5071,12 @@ def findBaselineRange(sub_sasms, intensity, bl_type, avg_window, start_region,
                 (valid, similarity_results, svd_results, intI_results,
                     other_results) = validateBaseline(region_sasms, frame_idx,
                     region_intensity, bl_type, start_sasms, False, sim_test,
-                    sim_cor, sim_thresh, True)
+                    sim_cor, sim_thresh, True, context)
             else:
                 (valid, similarity_results, svd_results, intI_results,
                     other_results) = validateBaseline(region_sasms, frame_idx,
                     region_intensity, bl_type, None, True, sim_test, sim_cor,
-                    sim_thresh, True)
+                    sim_thresh, True, context)
 
             if np.all([peak not in frame_idx for peak in peaks]) and valid:
                 found_region = True
@@ -4383,176 +5098,154 @@ def findBaselineRange(sub_sasms, intensity, bl_type, avg_window, start_region,
 
 def processBaseline(unsub_sasms, sub_sasms, r1, r2, bl_type, min_iter, max_iter,
     bl_extrap, int_type, qref, qrange, calc_threshold):
+    bl_q = copy.deepcopy(sub_sasms[0].getQ())
+    bl_err = np.zeros_like(bl_q)
+
+    sub_i = np.array([sasm.getI() for sasm in sub_sasms])
+    sub_err = np.array([sasm.getErr() for sasm in sub_sasms])
+
     if bl_type == 'Integral':
-        fit_results = [] #Need to declare here for integral baselines which don't return fit_results
+        end_sasms = [sub_sasms[j] for j in range(r2[0], r2[1]+1)]
+        i_bl = SASProc.average(end_sasms, forced=True, copy_params=False).getI()
+    else:
+        i_bl = None
 
-        baselines = integral_baseline(sub_sasms, r1, r2, max_iter,
-            min_iter)
+    (bl_i, bl_sub_err, baseline, bl_corr_frames,
+        fit_results) = process_baseline_stack(sub_i, sub_err, r1, r2, bl_type,
+        min_iter, max_iter, bl_extrap, i_bl)
 
-        bl_sasms = []
+    bl_corr = [SASM.SASM(baseline[j], bl_q, bl_err, {}) for j in bl_corr_frames]
 
-        bl_corr = []
-        bl_q = copy.deepcopy(sub_sasms[0].getQ())
-        bl_err = np.zeros_like(baselines[0])
+    bl_sasms = []
 
-        for j, sasm in enumerate(sub_sasms):
-            q = copy.deepcopy(sasm.getQ())
+    for j, sasm in enumerate(sub_sasms):
+        q = copy.deepcopy(sasm.getQ())
 
-            if j < r1[1]:
-                baseline = baselines[0]
-                i = copy.deepcopy(sasm.getI())
-                err = copy.deepcopy(sasm.getErr())
-            elif j >= r1[1] and j <= r2[0]:
-                baseline = baselines[j-r1[1]]
-                i = sasm.getI() - baseline
-                err = sasm.getErr() * i/sasm.getI()
+        parameters = copy.deepcopy(sasm.getAllParameters())
 
-                newSASM = SASM.SASM(baseline, bl_q, bl_err, {})
-                bl_corr.append(newSASM)
-            else:
-                baseline = baselines[-1]
-                i = sasm.getI() - baseline
-                err = sasm.getErr() * i/sasm.getI()
+        old_history = parameters['history']
 
+        history1 = []
+        history1.append(copy.deepcopy(sasm.getParameter('filename')))
 
-            parameters = copy.deepcopy(sasm.getAllParameters())
+        for key in old_history:
+            history1.append({key:old_history[key]})
 
-            old_history = parameters['history']
+        history = {}
+        history['baseline_correction'] = {'initial_file':history1,
+            'type':bl_type}
 
-            history1 = []
-            history1.append(copy.deepcopy(sasm.getParameter('filename')))
+        parameters['history'] = history
 
-            for key in old_history:
-                history1.append({key:old_history[key]})
+        newSASM = SASM.SASM(bl_i[j], q, bl_sub_err[j], parameters,
+            copy.deepcopy(sasm.getQErr()))
 
-            history = {}
-            history['baseline_correction'] = {'initial_file':history1,
-                'type':bl_type}
+        bl_sasms.append(newSASM)
 
-            parameters['history'] = history
+    sub_mean_i = np.array([sasm.getMeanI() for sasm in bl_sasms])
+    sub_total_i = np.array([sasm.getTotalI() for sasm in bl_sasms])
 
-            newSASM = SASM.SASM(i, q, err, parameters, copy.deepcopy(sasm.getQErr()))
+    start_frames = list(range(r1[0], r1[1]+1))
 
-            bl_sasms.append(newSASM)
+    unsub_q = [sasm.getQ() for sasm in unsub_sasms]
 
-    elif bl_type == 'Linear':
-        fit_results = linear_baseline(sub_sasms, r1, r2)
-        bl_sasms = []
-        bl_corr = []
+    if all(np.array_equal(q, bl_q) for q in unsub_q):
+        # The baseline is subtracted from all of the unsubtracted profiles at once
+        bl_unsub_i = np.array([sasm.getI() for sasm in unsub_sasms]) - baseline
 
-        bl_q = copy.deepcopy(sub_sasms[0].getQ())
-        bl_err = np.zeros_like(sub_sasms[0].getQ())
+        sasm_intensity = SASProc.calc_intensity_stack(bl_q, bl_unsub_i,
+            int_type, qref, qrange)
 
-        for j, sasm in enumerate(sub_sasms):
-            q = copy.deepcopy(sasm.getQ())
+        ref_i = bl_unsub_i[start_frames].mean(axis=0)
 
-            if bl_extrap:
-                baseline = np.array([linear_func(j, fit[0], fit[1]) for fit in fit_results])
-                i = sasm.getI() - baseline
-                err = sasm.getErr() * i/sasm.getI()
+        ref_intensity = SASProc.calc_intensity_stack(bl_q,
+            ref_i[np.newaxis, :], int_type, qref, qrange)[0]
 
-                bl_newSASM = SASM.SASM(baseline, bl_q, bl_err, {})
-                bl_corr.append(bl_newSASM)
+    else:
+        bl_unsub_sasms = [SASProc.subtract(unsub_sasms[j],
+            SASM.SASM(baseline[j], bl_q, sub_sasms[0].getErr(), {}),
+            forced=True, copy_params=False) for j in range(len(unsub_sasms))]
 
-            else:
-                if j >= r1[0] and j <= r2[1]:
-                    baseline = np.array([linear_func(j, fit[0], fit[1]) for fit in fit_results])
-                    i = sasm.getI() - baseline
-                    err = sasm.getErr() * i/sasm.getI()
+        bl_unsub_ref_sasm = SASProc.average([bl_unsub_sasms[j] for j in start_frames],
+            forced=True, copy_params=False)
 
-                    bl_newSASM = SASM.SASM(baseline, bl_q, bl_err, {})
-                    bl_corr.append(bl_newSASM)
-                else:
-                    i = copy.deepcopy(sasm.getI())
-                    err = copy.deepcopy(sasm.getErr())
-                    baseline = np.zeros_like(i)
+        sasm_intensity = SECM.SECM._calcIntensities(bl_unsub_sasms, int_type,
+            qref, qrange)
+        ref_intensity = SECM.SECM._calcIntensities([bl_unsub_ref_sasm],
+            int_type, qref, qrange)[0]
 
+    with np.errstate(divide='ignore', invalid='ignore'):
+        use_subtracted_sasms = (np.abs(sasm_intensity/ref_intensity)
+            > calc_threshold).tolist()
 
-            parameters = copy.deepcopy(sasm.getAllParameters())
+    bl_sub_mean_i = np.array([sasm.getMeanI() for sasm in bl_corr])
+    bl_sub_total_i = np.array([sasm.getTotalI() for sasm in bl_corr])
 
-            old_history = parameters['history']
+    return (bl_sasms, use_subtracted_sasms, bl_corr, fit_results, sub_mean_i,
+        sub_total_i, bl_sub_mean_i, bl_sub_total_i)
 
-            history1 = []
-            history1.append(copy.deepcopy(sasm.getParameter('filename')))
 
-            for key in old_history:
-                history1.append({key:old_history[key]})
+def process_baseline_stack(sub_i, sub_err, r1, r2, bl_type, min_iter,
+    max_iter, bl_extrap, i_bl=None):
+    """
+    Calculates and subtracts the baseline for each column of 2D (frame x
+    column) subtracted intensity and error arrays. For integral baselines
+    i_bl is the average intensity of the end range, if None it is calculated
+    from sub_i. Returns the baseline corrected intensity and error, the
+    baseline (zero for uncorrected frames), the frames with a baseline
+    correction profile, and the linear fit results.
+    """
+    nframes = sub_i.shape[0]
+    frames = np.arange(nframes)
 
-            history = {}
-            history['baseline_correction'] = {'initial_file':history1,
-                'type':bl_type}
+    # baseline holds the baseline for every frame, corrected marks the frames
+    # that have it subtracted, and bl_corr_frames the frames that have a
+    # baseline correction profile.
+    if bl_type == 'Integral':
+        fit_results = [] #Need to declare here for integral baselines which don't return fit_results
 
-            parameters['history'] = history
+        if i_bl is None:
+            end_frames = list(range(r2[0], r2[1]+1))
 
-            newSASM = SASM.SASM(i, q, err, parameters, copy.deepcopy(sasm.getQErr()))
+            if len(end_frames) > 1:
+                i_bl = np.mean(sub_i[end_frames], 0)
+            else:
+                i_bl = copy.deepcopy(sub_i[end_frames[0]])
 
-            bl_sasms.append(newSASM)
+        baselines = integral_baseline_stack(sub_i[r1[-1]:r2[0]+1], i_bl,
+            nframes, max_iter, min_iter)
 
+        baseline = baselines[np.clip(frames-r1[1], 0, len(baselines)-1)]
 
-    sub_mean_i = np.array([sasm.getMeanI() for sasm in bl_sasms])
-    sub_total_i = np.array([sasm.getTotalI() for sasm in bl_sasms])
+        corrected = frames >= r1[1]
+        bl_corr_frames = frames[np.logical_and(frames >= r1[1], frames <= r2[0])]
 
-    use_subtracted_sasms = []
-    zeroSASM = SASM.SASM(np.zeros_like(sub_sasms[0].getQ()), sub_sasms[0].getQ(),
-        sub_sasms[0].getErr(), {})
-    bl_unsub_sasms = []
-
-    for j in range(len(unsub_sasms)):
-        if bl_type == 'Integral':
-            if j < r1[1]:
-                bkg_sasm = zeroSASM
-            elif j >= r1[1] and j <= r2[0]:
-                bkg_sasm = bl_corr[j-r1[1]]
-            else:
-                bkg_sasm = bl_corr[-1]
+    elif bl_type == 'Linear':
+        fit_frames = list(range(r1[0], r1[1]+1)) + list(range(r2[0], r2[1]+1))
 
-        elif bl_type == 'Linear':
-            if bl_extrap:
-                bkg_sasm = bl_corr[j]
-            else:
-                if j >= r1[0] and j <= r2[1]:
-                    bkg_sasm = bl_corr[j-r1[0]]
-                else:
-                    bkg_sasm = zeroSASM
+        a, b, cov_a, cov_b = weighted_lin_reg_multiple(fit_frames,
+            sub_i[fit_frames], sub_err[fit_frames])
 
-        bl_unsub_sasms.append(SASProc.subtract(unsub_sasms[j], bkg_sasm,
-            forced=True, copy_params=False))
+        fit_results = list(zip(a, b, cov_a, cov_b))
 
-    start_frames = list(range(r1[0], r1[1]+1))
-    bl_unsub_ref_sasm = SASProc.average([bl_unsub_sasms[j] for j in start_frames],
-        forced=True, copy_params=False)
-
-    if  int_type == 'total':
-        ref_intensity = bl_unsub_ref_sasm.getTotalI()
-    elif int_type == 'mean':
-        ref_intensity = bl_unsub_ref_sasm.getMeanI()
-    elif int_type == 'q_val':
-        ref_intensity = bl_unsub_ref_sasm.getIofQ(qref)
-    elif int_type == 'q_range':
-        q1 = qrange[0]
-        q2 = qrange[1]
-        ref_intensity = bl_unsub_ref_sasm.getIofQRange(q1, q2)
-
-    for sasm in bl_unsub_sasms:
-        if int_type == 'total':
-            sasm_intensity = sasm.getTotalI()
-        elif int_type == 'mean':
-            sasm_intensity = sasm.getMeanI()
-        elif int_type == 'q_val':
-            sasm_intensity = sasm.getIofQ(qref)
-        elif int_type == 'q_range':
-            sasm_intensity = sasm.getIofQRange(q1, q2)
-
-        if abs(sasm_intensity/ref_intensity) > calc_threshold:
-            use_subtracted_sasms.append(True)
+        baseline = linear_func(frames[:, np.newaxis], a, b)
+
+        if bl_extrap:
+            corrected = np.ones(nframes, dtype=bool)
         else:
-            use_subtracted_sasms.append(False)
+            corrected = np.logical_and(frames >= r1[0], frames <= r2[1])
 
-    bl_sub_mean_i = np.array([sasm.getMeanI() for sasm in bl_corr])
-    bl_sub_total_i = np.array([sasm.getTotalI() for sasm in bl_corr])
+        bl_corr_frames = frames[corrected]
 
-    return (bl_sasms, use_subtracted_sasms, bl_corr, fit_results, sub_mean_i,
-        sub_total_i, bl_sub_mean_i, bl_sub_total_i)
+    baseline[np.logical_not(corrected)] = 0
+
+    bl_i = sub_i - baseline
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bl_sub_err = np.where(corrected[:, np.newaxis], sub_err*bl_i/sub_i,
+            sub_err)
+
+    return bl_i, bl_sub_err, baseline, bl_corr_frames, fit_results
 
 
 ###############################################################################
@@ -37,6 +37,9 @@ import struct
 import json
 import copy
 import collections
+import threading
+import itertools
+import operator
 import datetime
 from xml.dom import minidom
 import ast
@@ -61,6 +64,7 @@ import bioxtasraw.SASProc as SASProc
 import bioxtasraw.SECM as SECM
 import bioxtasraw.SASCalib as SASCalib
 import bioxtasraw.SASUtils as SASUtils
+import bioxtasraw.SASCache as SASCache
 
 ############################
 #--- ## Load image files: ##
@@ -1012,11 +1016,7 @@ def loadAllHeaders(filename, image_type, header_type, raw_settings):
         file_type = None
 
     if file_type == 'hdf5':
-        try:
-            hdf5_file = fabio.open(filename)
-            file_type = 'image'
-        except Exception:
-            pass
+        file_type, hdf5_file = openHdf5File(filename, raw_settings)
     else:
         hdf5_file = None
 
@@ -1150,11 +1150,7 @@ def loadFile(filename, raw_settings, no_processing=False, return_all_images=True
         file_type = None
 
     if file_type == 'hdf5':
-        try:
-            hdf5_file = fabio.open(filename)
-            file_type = 'image'
-        except Exception:
-            pass
+        file_type, hdf5_file = openHdf5File(filename, raw_settings)
     else:
         hdf5_file = None
 
@@ -1219,12 +1215,15 @@ def postProcessProfile(sasm, raw_settings, no_processing):
         except SASExceptions.AbsScaleNormFailed:
             raise
 
-# Define regular expressions for ascii files
+# Define regular expressions for ascii files. The number and separator
+# patterns only match a given string one way, so that lines that don't
+# match fail quickly instead of backtracking through every way of splitting
+# up the numbers.
 start_match = r'\s*'
 end_match = r'\s*$'
-num_match = r'[\+-]?\d+\.?\d*[+eE-]*\d*'
-sep_match = r'\s*[\s,]\s*'
-alt_sep_match = r'\s*[\s,]?\s*'
+num_match = r'[\+-]?\d+(?:\.\d*)?(?:[+eE-]+\d*)?'
+sep_match = r'(?:\s*,\s*|\s+)'
+alt_sep_match = r'\s*(?:\s|,)?\s*'
 
 two_col_fit = re.compile(start_match + (num_match+sep_match)*1 + num_match + end_match)
 i_q_match = re.compile(start_match + (num_match+sep_match)*1 + num_match + alt_sep_match)
@@ -1234,6 +1233,215 @@ four_col_fit = re.compile(start_match + (num_match+sep_match)*3 + num_match + en
 five_col_fit = re.compile(start_match + (num_match+sep_match)*4 + num_match + end_match)
 seven_col_fit = re.compile(start_match + (num_match+sep_match)*6 + num_match + end_match)
 
+def _match_lines(lines, fit_list):
+    """
+    Finds the lines that match the ascii regular expressions above, using
+    the first pattern in fit_list that matches each line. Returns the index
+    of each matching line, the matched text, which splits into the same
+    values as pattern.match(line).group(), and an array of the numbers in
+    the matched text of each line. The array is None if the lines don't all
+    have the same number of values or couldn't all be read in bulk.
+
+    Lines that contain only numbers are read in bulk, by counting the numbers
+    on each line and converting all of them at once, which is much faster
+    than the regular expressions. Other lines are matched with the regular
+    expressions.
+    """
+    if len(lines) == 0:
+        return [], [], None
+
+    bulk_data = _match_numeric_lines(lines, fit_list)
+
+    if bulk_data is not None:
+        index, found, values, re_index = bulk_data
+    else:
+        index = []
+        found = []
+        values = None
+        re_index = range(len(lines))
+
+    re_found = []
+
+    for j in re_index:
+        for fit in fit_list:
+            match = fit.match(lines[j])
+
+            if match:
+                re_found.append((j, match.group()))
+                break
+
+    if len(re_found) > 0:
+        all_found = sorted(list(zip(index, found)) + re_found)
+        index = [each[0] for each in all_found]
+        found = [each[1] for each in all_found]
+        values = None
+
+    return index, found, values
+
+def _match_numeric_lines(lines, fit_list):
+    text = ''.join(lines)
+    n_ends = sum(map(str.endswith, lines, itertools.repeat('\n')))
+
+    if (text.count('\n') != n_ends or (n_ends != len(lines)
+        and (n_ends != len(lines)-1 or lines[-1].endswith('\n')))
+        or any(fit not in _fit_columns for fit in fit_list)):
+        return None
+
+    non_numeric = text.translate(_numeric_chars).split('\n')[:len(lines)]
+    is_numeric = list(map(operator.not_, non_numeric))
+
+    bulk_index = list(itertools.compress(range(len(lines)), is_numeric))
+    bulk_lines = list(itertools.compress(lines, is_numeric))
+
+    # Lines are grouped by the number of values, counting comma separated
+    # values separately from whitespace separated values
+    nvals = np.fromiter(map(len, map(str.split, bulk_lines)), dtype=int,
+        count=len(bulk_lines))
+    has_comma = np.zeros(len(bulk_lines), dtype=bool)
+
+    if ',' in text:
+        has_comma[:] = [',' in line for line in bulk_lines]
+
+        for k in np.flatnonzero(has_comma):
+            nvals[k] = bulk_lines[k].count(',') + 1
+
+    group_keys, group_ids = np.unique(nvals*2 + has_comma, return_inverse=True)
+    bulk_index = np.array(bulk_index, dtype=int)
+
+    index = []
+    found = []
+    values = []
+    comma_prefix = False
+    re_index = list(itertools.compress(range(len(lines)),
+        map(operator.not_, is_numeric)))
+
+    for key, group_key in enumerate(group_keys):
+        n = group_key // 2
+        comma = group_key % 2 == 1
+        group_index = np.flatnonzero(group_ids == key)
+
+        ncols = None
+
+        for fit in fit_list:
+            fit_ncols, is_prefix = _fit_columns[fit]
+
+            if n == fit_ncols or (n > fit_ncols and is_prefix):
+                ncols = fit_ncols
+                break
+
+        if ncols is None or n == 0:
+            if comma:
+                # Commas may not separate the values
+                re_index.extend(bulk_index[group_index].tolist())
+            continue
+
+        group_lines = [bulk_lines[k] for k in group_index]
+        group_data = _read_numeric_lines(group_lines, comma)
+
+        if group_data is None:
+            re_index.extend(bulk_index[group_index].tolist())
+            continue
+
+        index.extend(bulk_index[group_index].tolist())
+        values.append(group_data[:,:ncols])
+
+        # Lines with more values than the pattern only match the first values
+        if n == ncols:
+            found.extend(group_lines)
+        elif comma:
+            found.extend([','.join(line.split(',')[:ncols]) + ','
+                for line in group_lines])
+            comma_prefix = True
+        else:
+            prefix = re.compile('^[ \t]*' + '[ \t]+'.join(['[^ \t\n]+']*ncols),
+                re.MULTILINE)
+            found.extend(prefix.findall(''.join(group_lines)))
+
+    if len(values) > 1:
+        all_found = sorted(zip(index, found))
+        index = [each[0] for each in all_found]
+        found = [each[1] for each in all_found]
+
+    if len(values) == 1 and not comma_prefix:
+        values = values[0]
+    else:
+        values = None
+
+    return index, found, values, re_index
+
+def _read_numeric_lines(lines, comma):
+    # Numbers can't start with a decimal point, to match the number regular
+    # expression, and must be valid python floats, which numpy.loadtxt checks
+    text = ' ' + ''.join(lines).replace(',', ' ').replace('\t', ' ').replace('\n', ' ')
+
+    if ' .' in text or ' -.' in text or ' +.' in text:
+        return None
+
+    if comma:
+        delimiter = ','
+    else:
+        delimiter = None
+
+    try:
+        data = np.loadtxt(lines, dtype=float, comments=None, delimiter=delimiter,
+            ndmin=2)
+    except ValueError:
+        data = None
+
+    if data is not None and data.shape[0] != len(lines):
+        data = None
+
+    return data
+
+def _columns_to_array(found, ncols, comma_split=True):
+    """
+    Converts lines of text, such as the matched text from _match_lines, to an
+    array with the first ncols columns of each line. If comma_split is True, lines with a
+    comma are split on the commas instead of on whitespace.
+    """
+    if len(found) == 0:
+        return np.zeros((0, ncols))
+
+    block = '\n'.join(found)
+
+    if ((',' not in block or not comma_split)
+        and len(block.translate(_numeric_chars).replace('\n', '')) == 0):
+        data = _read_numeric_lines(found, False)
+
+        if data is not None and data.shape[1] >= ncols:
+            data = data[:,:ncols]
+        else:
+            data = None
+    else:
+        data = None
+
+    if data is None:
+        data = []
+
+        for each in found:
+            if comma_split and ',' in each:
+                values = each.split(',')
+            else:
+                values = each.split()
+
+            data.append([float(values[col]) for col in range(ncols)])
+
+        data = np.array(data, dtype=float)
+
+    return data
+
+_fit_columns = {
+    two_col_fit     : (2, False),
+    i_q_match       : (2, True),
+    three_col_fit   : (3, False),
+    i_q_err_match   : (3, True),
+    four_col_fit    : (4, False),
+    five_col_fit    : (5, False),
+    seven_col_fit   : (7, False),
+    }
+
+_numeric_chars = {ord(char): None for char in '0123456789.eE+-, \t'}
+
 
 def loadAsciiFile(filename, file_type):
     ascii_formats = {'rad'          : loadRadFile,
@@ -1253,6 +1461,14 @@ def loadAsciiFile(filename, file_type):
     if file_type is None:
         return None
 
+    file_cache = SASCache.get_file_cache()
+
+    if file_cache is not None:
+        cached_data = file_cache.get(filename, file_type)
+
+        if cached_data is not None:
+            return _profilesFromCacheData(cached_data)
+
     sasm = None
 
     if file_type in ascii_formats:
@@ -1275,6 +1491,50 @@ def loadAsciiFile(filename, file_type):
     if sasm is not None and not isinstance(sasm, list):
         sasm.setParameter('filename', os.path.split(filename)[1])
 
+    if file_cache is not None and sasm is not None:
+        cache_data = _profilesToCacheData(sasm)
+
+        if cache_data is not None:
+            file_cache.set(filename, file_type, cache_data)
+
+    return sasm
+
+def _profilesToCacheData(sasm):
+    if isinstance(sasm, list):
+        sasm_list = sasm
+    else:
+        sasm_list = [sasm]
+
+    cache_data = []
+
+    for profile in sasm_list:
+        # Only unmodified profiles can be rebuilt from the raw data
+        if (type(profile) != SASM.SASM or profile.getScale() != 1
+            or profile.getOffset() != 0 or profile.getQrange() != (0, len(profile.getRawQ()))):
+            return None
+
+        cache_data.append({
+            'i'         : profile.getRawI(),
+            'q'         : profile.getRawQ(),
+            'err'       : profile.getRawErr(),
+            'q_err'     : profile.getRawQErr(),
+            'parameters': profile.getAllParameters(),
+            })
+
+    cache_data = {'is_list': isinstance(sasm, list), 'profiles': cache_data}
+
+    return cache_data
+
+def _profilesFromCacheData(cache_data):
+    sasm_list = [SASM.SASM(prof_data['i'], prof_data['q'], prof_data['err'],
+        prof_data['parameters'], prof_data['q_err'])
+        for prof_data in cache_data['profiles']]
+
+    if cache_data['is_list']:
+        sasm = sasm_list
+    else:
+        sasm = sasm_list[0]
+
     return sasm
 
 
@@ -1401,6 +1661,29 @@ def processImage(img, parameters, raw_settings):
 
     return sasm
 
+def matchHdf5Definition(data_file, hdf5_defs):
+    """
+    Returns the name of the first of RAW's hdf5 file definitions that
+    matches the id attribute or dataset of the open h5py file, or None.
+    """
+    for def_type, data_defs in hdf5_defs.items():
+        data_id_name = data_defs['id']['name']
+        data_id_loc = data_defs['id']['location']
+        data_id_attr = data_defs['id']['is_attribute']
+        data_id_val = data_defs['id']['value']
+
+        if data_id_loc in data_file:
+            if data_id_attr:
+                if data_id_name in data_file[data_id_loc].attrs:
+                    if data_id_val == data_file[data_id_loc].attrs[data_id_name]:
+                        return def_type
+            else:
+                dataset = data_file['{}/{}'.format(data_id_loc.rstrip('/'), data_id_name.lstrip('/'))]
+                if data_id_val == dataset[()]:
+                    return def_type
+
+    return None
+
 def loadHdf5File(filename, raw_settings):
     """
     General notes:
@@ -1418,30 +1701,16 @@ def loadHdf5File(filename, raw_settings):
     if not hdf5_defs:
         return []
 
-    is_data_def = False
     loaded_data = []
 
     with h5py.File(filename, 'r') as data_file:
 
         #Figure out which of the definitions files, if any, match the hdf5 file
-        for def_type, data_defs in hdf5_defs.items():
-            data_id_name = data_defs['id']['name']
-            data_id_loc = data_defs['id']['location']
-            data_id_attr = data_defs['id']['is_attribute']
-            data_id_val = data_defs['id']['value']
-
-            if data_id_loc in data_file:
-                if data_id_attr:
-                    if data_id_name in data_file[data_id_loc].attrs:
-                        if data_id_val == data_file[data_id_loc].attrs[data_id_name]:
-                            is_data_def = True
-                else:
-                    dataset = data_file['{}/{}'.format(data_id_loc.rstrip('/'), data_id_name.lstrip('/'))]
-                    if data_id_val == dataset[()]:
-                        is_data_def = True
+        def_type = matchHdf5Definition(data_file, hdf5_defs)
+        is_data_def = def_type is not None
 
-            if is_data_def:
-                break
+        if is_data_def:
+            data_defs = hdf5_defs[def_type]
 
         #If we have definitions for this kind of file, determine what kind of data it is, batch of series
         data_type = None
@@ -1996,10 +2265,9 @@ def load_series_sasm(group, data_name, q_raw=None, use_group_q=True, q_err_raw=N
 
     return sasm_data
 
-def load_series_sasm_list(group, excluded_keys=['raw', 'q', 'q_err']):
+def get_series_group_q(group):
     q_raw = None
     q_err_raw = None
-    sasm_list = []
 
     if 'raw' in group:
         raw_group = group['raw']
@@ -2017,6 +2285,15 @@ def load_series_sasm_list(group, excluded_keys=['raw', 'q', 'q_err']):
         q_err_raw = q_raw[:,1]
         q_raw = q_raw[:,0]
 
+    return q_raw, q_err_raw
+
+def load_series_sasm_list(group, excluded_keys=['raw', 'q', 'q_err']):
+    if group.attrs.get('layout', '') == 'columnar':
+        return load_series_sasm_table(group)
+
+    q_raw, q_err_raw = get_series_group_q(group)
+    sasm_list = []
+
     for data in group:
         if data not in excluded_keys:
             sasm_list.append(load_series_sasm(group, data, q_raw,
@@ -2024,10 +2301,162 @@ def load_series_sasm_list(group, excluded_keys=['raw', 'q', 'q_err']):
 
     return sasm_list
 
-def load_series(name):
+def load_series_sasm_table(group, frames=None):
+    """
+    Loads profiles saved in the columnar (v2) series layout, where the
+    intensity and uncertainty of all profiles in the group are stored as
+    2D (frame x q) datasets. If frames is provided, only those profiles
+    (by index in the group) are loaded.
+    """
+    nframes = group['i'].shape[0]
+
+    if frames is None:
+        frames = np.arange(nframes)
+    else:
+        frames = np.asarray(frames, dtype=int)
+
+    if len(frames) == 0:
+        return []
+
+    # h5py requires increasing indices for fancy indexing
+    order = np.argsort(frames)
+    sorted_frames = frames[order]
+    unique_frames, inverse = np.unique(sorted_frames, return_inverse=True)
+
+    def read_rows(dataset):
+        if (len(unique_frames) == nframes or
+            unique_frames[-1] - unique_frames[0] + 1 == len(unique_frames)):
+            data = dataset[unique_frames[0]:unique_frames[-1]+1]
+        else:
+            data = dataset[unique_frames]
+
+        data = data[inverse]
+        unsorted = np.empty_like(data)
+        unsorted[order] = data
+
+        return unsorted
+
+    i_vals = read_rows(group['i'])
+    err_vals = read_rows(group['err'])
+
+    q_single = group['q'].ndim == 1
+
+    if q_single:
+        q_vals = group['q'][()]
+    else:
+        q_vals = read_rows(group['q'])
+
+    if 'q_err' in group:
+        if q_single:
+            q_err_vals = group['q_err'][()]
+        else:
+            q_err_vals = read_rows(group['q_err'])
+    else:
+        q_err_vals = None
+
+    metadata = group['frame_metadata']
+    scale_factor = read_rows(metadata['scale_factor'])
+    offset_value = read_rows(metadata['offset_value'])
+    q_scale_factor = read_rows(metadata['q_scale_factor'])
+    selected_qrange = read_rows(metadata['selected_qrange'])
+    parameters = read_rows(metadata['parameters'])
+
+    sasm_list = []
+
+    for j in range(len(frames)):
+        sasm_data = {}
+
+        if q_single:
+            sasm_data['q_raw'] = q_vals.copy()
+        else:
+            sasm_data['q_raw'] = q_vals[j]
+
+        sasm_data['i_raw'] = i_vals[j]
+        sasm_data['err_raw'] = err_vals[j]
+
+        if q_err_vals is None:
+            sasm_data['q_err_raw'] = None
+        elif q_single:
+            sasm_data['q_err_raw'] = q_err_vals.copy()
+        else:
+            sasm_data['q_err_raw'] = q_err_vals[j]
+
+        sasm_data['scale_factor'] = float(scale_factor[j])
+        sasm_data['offset_value'] = float(offset_value[j])
+        sasm_data['q_scale_factor'] = float(q_scale_factor[j])
+        sasm_data['selected_qrange'] = list(map(int, selected_qrange[j]))
+
+        header = parameters[j]
+        if isinstance(header, bytes):
+            header = header.decode('utf-8')
+
+        sasm_data['parameters'] = loadDatHeader(header)
+
+        sasm_list.append(sasm_data)
+
+    return sasm_list
+
+class SeriesProfileLoader(object):
+    """
+    Loads profiles from one of the profile groups of a saved series file on
+    demand, for use with :class:`bioxtasraw.SECM.LazySASMList`. The file is
+    opened only for the duration of each load.
+    """
+
+    def __init__(self, filename, group_path, excluded_keys=['raw', 'q', 'q_err'],
+        use_q_err=True):
+        self.filename = filename
+        self.group_path = group_path
+        self.excluded_keys = excluded_keys
+        self.use_q_err = use_q_err
+
+        with h5py.File(self.filename, 'r') as f:
+            group = f[self.group_path]
+
+            self.columnar = group.attrs.get('layout', '') == 'columnar'
+
+            if self.columnar:
+                self.names = None
+                self.length = group['i'].shape[0]
+            else:
+                self.names = [data for data in group if data not in excluded_keys]
+                self.length = len(self.names)
+
+    def __call__(self, frames):
+        with h5py.File(self.filename, 'r') as f:
+            group = f[self.group_path]
+
+            if self.columnar:
+                sasm_data_list = load_series_sasm_table(group, frames)
+            else:
+                q_raw, q_err_raw = get_series_group_q(group)
+
+                sasm_data_list = [load_series_sasm(group, self.names[idx],
+                    q_raw, q_err_raw=q_err_raw) for idx in frames]
+
+        return [make_series_sasm(sasm_data, self.use_q_err)
+            for sasm_data in sasm_data_list]
+
+def load_lazy_series_sasm_list(name, group_path, cache_size,
+    excluded_keys=['raw', 'q', 'q_err'], use_q_err=True):
+    loader = SeriesProfileLoader(name, group_path, excluded_keys, use_q_err)
+
+    if loader.length == 0:
+        return []
+
+    return SECM.LazySASMList(loader.length, loader, cache_size)
+
+def load_series(name, lazy=False, cache_size=256):
+    """
+    Loads a saved series file. If lazy is True, the profiles are not read,
+    and instead are returned as :class:`bioxtasraw.SECM.LazySASMList`
+    objects that load profiles from the file as needed, keeping up to
+    cache_size loaded profiles of each type in memory. The series intensities
+    are read from the file, so they are available without loading profiles.
+    """
     seriesm_data = {}
 
-    with h5py.File(name, 'r', driver='core', backing_store=False) as f:
+    with h5py.File(name, 'r') as f:
         seriesm_data['series_type'] = str(f.attrs['series_type'])
         seriesm_data['parameters'] = loadDatHeader(f.attrs['parameters'])
 
@@ -2037,8 +2466,14 @@ def load_series(name):
 
         # Get data from unsubtracted group
         profiles = f['profiles']
-        seriesm_data['sasm_list'] = load_series_sasm_list(profiles, ['raw', 'q',
-            'q_err', 'average_buffer_profile'])
+
+        if lazy:
+            seriesm_data['sasm_list'] = load_lazy_series_sasm_list(name,
+                'profiles', cache_size, ['raw', 'q', 'q_err',
+                'average_buffer_profile'])
+        else:
+            seriesm_data['sasm_list'] = load_series_sasm_list(profiles, ['raw', 'q',
+                'q_err', 'average_buffer_profile'])
 
         if len(profiles['average_buffer_profile']) > 0:
             seriesm_data['average_buffer_sasm'] = load_series_sasm(profiles,
@@ -2049,13 +2484,23 @@ def load_series(name):
         # Get data from subtracted group
 
         sub_profiles = f['subtracted_profiles']
-        seriesm_data['subtracted_sasm_list'] = load_series_sasm_list(sub_profiles)
+
+        if lazy:
+            seriesm_data['subtracted_sasm_list'] = load_lazy_series_sasm_list(
+                name, 'subtracted_profiles', cache_size)
+        else:
+            seriesm_data['subtracted_sasm_list'] = load_series_sasm_list(sub_profiles)
 
         seriesm_data['use_subtracted_sasm'] = sub_profiles.attrs['use_subtracted_sasm'][()]
 
         # Get data from baseline subtracted group
         baseline_profiles = f['baseline_subtracted_profiles']
-        seriesm_data['baseline_subtracted_sasm_list'] = load_series_sasm_list(baseline_profiles)
+
+        if lazy:
+            seriesm_data['baseline_subtracted_sasm_list'] = load_lazy_series_sasm_list(
+                name, 'baseline_subtracted_profiles', cache_size)
+        else:
+            seriesm_data['baseline_subtracted_sasm_list'] = load_series_sasm_list(baseline_profiles)
 
         seriesm_data['use_baseline_subtracted_sasm'] = baseline_profiles.attrs['use_baseline_subtracted_sasm'][()]
 
@@ -2070,6 +2515,10 @@ def load_series(name):
             seriesm_data['buffer_range'] = list(map(tuple, intensity.attrs['buffer_range'][()]))
 
         seriesm_data['already_subtracted'] = intensity.attrs['already_subtracted'][()]
+
+        if lazy:
+            seriesm_data['mean_i'] = intensity['mean_intensities'][()]
+            seriesm_data['total_i'] = intensity['total_intensities'][()]
         seriesm_data['qref'] = float(intensity['qref_intensities'].attrs['q_value'][()])
         seriesm_data['qrange'] = tuple(intensity['qrange_intensities'].attrs['q_range'][()])
 
@@ -2082,6 +2531,14 @@ def load_series(name):
         else:
             seriesm_data['sample_range'] = list(map(tuple, sub_intensity.attrs['sample_range'][()]))
 
+        if lazy:
+            seriesm_data['mean_i_sub'] = sub_intensity['mean_intensities'][()]
+            seriesm_data['total_i_sub'] = sub_intensity['total_intensities'][()]
+
+            bcsub_intensity = f['baseline_subtracted_intensities']
+            seriesm_data['mean_i_bcsub'] = bcsub_intensity['mean_intensities'][()]
+            seriesm_data['total_i_bcsub'] = bcsub_intensity['total_intensities'][()]
+
         # Get calculated data
         calc_data = f['calculated_data']
         seriesm_data['rg'] = calc_data['rg'][:,0]
@@ -2099,7 +2556,11 @@ def load_series(name):
 
         # Get baseline
         baseline = f['baseline']
-        seriesm_data['baseline_corr'] = load_series_sasm_list(baseline['correction'])
+        if lazy:
+            seriesm_data['baseline_corr'] = load_lazy_series_sasm_list(name,
+                'baseline/correction', cache_size, use_q_err=False)
+        else:
+            seriesm_data['baseline_corr'] = load_series_sasm_list(baseline['correction'])
 
         seriesm_data['baseline_fit_results'] = baseline['fit_parameters'][:]
 
@@ -2158,7 +2619,7 @@ def load_series(name):
 
     return seriesm_data
 
-def loadSeriesFile(filename, settings):
+def loadSeriesFile(filename, settings, lazy=False, cache_size=256):
 
     name, ext = os.path.splitext(filename)
 
@@ -2184,7 +2645,7 @@ def loadSeriesFile(filename, settings):
             file.close()
 
     else:
-        secm_data = load_series(filename)
+        secm_data = load_series(filename, lazy, cache_size)
 
     if secm_data is not None:
         new_secm, line_data, calc_line_data = makeSeriesFile(secm_data, settings)
@@ -2195,6 +2656,38 @@ def loadSeriesFile(filename, settings):
 
     return new_secm
 
+def make_series_sasm(sasm_data, use_q_err=True):
+    if 'q_binned' in sasm_data:
+        q = sasm_data['q_binned']
+        i = sasm_data['i_binned']
+        err = sasm_data['err_binned']
+        q_err = None
+    else:
+        q = sasm_data['q_raw']
+        i = sasm_data['i_raw']
+        err = sasm_data['err_raw']
+
+        if use_q_err:
+            q_err = sasm_data['q_err_raw']
+        else:
+            q_err = None
+
+    new_sasm = SASM.SASM(i, q, err, sasm_data['parameters'], q_err)
+
+    new_sasm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
+        sasm_data['q_scale_factor'])
+
+    new_sasm.setQrange(sasm_data['selected_qrange'])
+
+    try:
+        new_sasm.setParameter('analysis', sasm_data['parameters_analysis'])
+    except KeyError:
+        pass
+
+    new_sasm._update()
+
+    return new_sasm
+
 def makeSeriesFile(secm_data, settings):
 
     default_dict =     {
@@ -2232,42 +2725,35 @@ def makeSeriesFile(secm_data, settings):
         if key not in secm_data:
             secm_data[key] = default_dict[key]
 
-    sasm_list = []
-
-    for sasm_data in secm_data['sasm_list']:
-
-        if 'q_binned' in sasm_data:
-            q = sasm_data['q_binned']
-            i = sasm_data['i_binned']
-            err = sasm_data['err_binned']
-            q_err = None
-        else:
-            q = sasm_data['q_raw']
-            i = sasm_data['i_raw']
-            err = sasm_data['err_raw']
-            q_err = sasm_data['q_err_raw']
+    lazy = isinstance(secm_data['sasm_list'], SECM.LazySASMList)
 
-        new_sasm = SASM.SASM(i, q, err, sasm_data['parameters'], q_err)
+    if lazy:
+        sasm_list = secm_data['sasm_list']
 
-        new_sasm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
-            sasm_data['q_scale_factor'])
+        frame_data = {
+            'mean_i'    : secm_data['mean_i'],
+            'total_i'   : secm_data['total_i'],
+            }
 
-        new_sasm.setQrange(sasm_data['selected_qrange'])
+        new_secm = SECM.SECM(secm_data['file_list'], sasm_list,
+            secm_data['frame_list'], secm_data['parameters'], settings,
+            frame_data)
 
-        try:
-            new_sasm.setParameter('analysis', sasm_data['parameters_analysis'])
-        except KeyError:
-            pass
+        last_sasm = sasm_list[-1]
+        new_secm.setScaleValues(last_sasm.getScale(), last_sasm.getOffset(),
+            last_sasm._q_scale_factor)
 
-        new_sasm._update()
+    else:
+        sasm_list = []
 
-        sasm_list.append(new_sasm)
+        for sasm_data in secm_data['sasm_list']:
+            sasm_list.append(make_series_sasm(sasm_data))
 
-    new_secm = SECM.SECM(secm_data['file_list'], sasm_list,
-        secm_data['frame_list'], secm_data['parameters'], settings)
+        new_secm = SECM.SECM(secm_data['file_list'], sasm_list,
+            secm_data['frame_list'], secm_data['parameters'], settings)
 
-    new_secm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
-            sasm_data['q_scale_factor'])
+        new_secm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
+                sasm_data['q_scale_factor'])
 
     new_secm.series_type = secm_data['series_type']
     new_secm.window_size = secm_data['window_size']
@@ -2294,41 +2780,24 @@ def makeSeriesFile(secm_data, settings):
             secm_data['vpmw'])
 
 
-    subtracted_sasm_list = []
+    if lazy and isinstance(secm_data['subtracted_sasm_list'], SECM.LazySASMList):
+        new_secm.subtracted_sasm_list = secm_data['subtracted_sasm_list']
+        new_secm.use_subtracted_sasm = list(secm_data['use_subtracted_sasm'])
+        new_secm.mean_i_sub = np.array(secm_data['mean_i_sub'], dtype=float)
+        new_secm.total_i_sub = np.array(secm_data['total_i_sub'], dtype=float)
 
-    for sasm_data in secm_data['subtracted_sasm_list']:
+    else:
+        subtracted_sasm_list = []
 
-        if sasm_data != -1:
-            if 'q_binned' in sasm_data:
-                q = sasm_data['q_binned']
-                i = sasm_data['i_binned']
-                err = sasm_data['err_binned']
-                q_err = None
+        for sasm_data in secm_data['subtracted_sasm_list']:
+            if sasm_data != -1:
+                new_sasm = make_series_sasm(sasm_data)
             else:
-                q = sasm_data['q_raw']
-                i = sasm_data['i_raw']
-                err = sasm_data['err_raw']
-                q_err = sasm_data['q_err_raw']
-
-            new_sasm = SASM.SASM(i, q, err, sasm_data['parameters'], q_err)
+                new_sasm = -1
 
-            new_sasm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
-                sasm_data['q_scale_factor'])
-
-            new_sasm.setQrange(sasm_data['selected_qrange'])
-
-            try:
-                new_sasm.setParameter('analysis', sasm_data['parameters_analysis'])
-            except KeyError:
-                pass
-
-            new_sasm._update()
-        else:
-            new_sasm = -1
-
-        subtracted_sasm_list.append(new_sasm)
+            subtracted_sasm_list.append(new_sasm)
 
-    new_secm.setSubtractedSASMs(subtracted_sasm_list, secm_data['use_subtracted_sasm'])
+        new_secm.setSubtractedSASMs(subtracted_sasm_list, secm_data['use_subtracted_sasm'])
 
     new_secm.baseline_start_range = secm_data['baseline_start_range']
     new_secm.baseline_end_range = secm_data['baseline_end_range']
@@ -2336,67 +2805,41 @@ def makeSeriesFile(secm_data, settings):
     new_secm.baseline_extrap = secm_data['baseline_extrap']
     new_secm.baseline_fit_results = secm_data['baseline_fit_results']
 
-    baseline_subtracted_sasm_list = []
+    if (lazy and isinstance(secm_data['baseline_subtracted_sasm_list'],
+        SECM.LazySASMList)):
+        new_secm.baseline_subtracted_sasm_list = secm_data['baseline_subtracted_sasm_list']
+        new_secm.use_baseline_subtracted_sasm = list(secm_data['use_baseline_subtracted_sasm'])
+        new_secm.mean_i_bcsub = np.array(secm_data['mean_i_bcsub'], dtype=float)
+        new_secm.total_i_bcsub = np.array(secm_data['total_i_bcsub'], dtype=float)
 
-    for sasm_data in secm_data['baseline_subtracted_sasm_list']:
+    else:
+        baseline_subtracted_sasm_list = []
 
-        if sasm_data != -1:
-            if 'q_binned' in sasm_data:
-                q = sasm_data['q_binned']
-                i = sasm_data['i_binned']
-                err = sasm_data['err_binned']
-                q_err = None
+        for sasm_data in secm_data['baseline_subtracted_sasm_list']:
+            if sasm_data != -1:
+                new_sasm = make_series_sasm(sasm_data)
             else:
-                q = sasm_data['q_raw']
-                i = sasm_data['i_raw']
-                err = sasm_data['err_raw']
-                q_err = sasm_data['q_err_raw']
-
-            new_sasm = SASM.SASM(i, q, err, sasm_data['parameters'], q_err)
-
-            new_sasm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
-                sasm_data['q_scale_factor'])
-
-            new_sasm.setQrange(sasm_data['selected_qrange'])
-
-            try:
-                new_sasm.setParameter('analysis', sasm_data['parameters_analysis'])
-            except KeyError:
-                pass
-
-            new_sasm._update()
-        else:
-            new_sasm = -1
-
-        baseline_subtracted_sasm_list.append(new_sasm)
-
-    new_secm.setBCSubtractedSASMs(baseline_subtracted_sasm_list, secm_data['use_baseline_subtracted_sasm'])
-
-    baseline_corr = []
+                new_sasm = -1
 
-    for sasm_data in secm_data['baseline_corr']:
+            baseline_subtracted_sasm_list.append(new_sasm)
 
-        if sasm_data != -1:
-            new_sasm = SASM.SASM(sasm_data['i_raw'], sasm_data['q_raw'],
-                sasm_data['err_raw'], sasm_data['parameters'])
-
-            new_sasm.setScaleValues(sasm_data['scale_factor'], sasm_data['offset_value'],
-                sasm_data['q_scale_factor'])
+        new_secm.setBCSubtractedSASMs(baseline_subtracted_sasm_list, secm_data['use_baseline_subtracted_sasm'])
 
-            new_sasm.setQrange(sasm_data['selected_qrange'])
+    if lazy and isinstance(secm_data['baseline_corr'], SECM.LazySASMList):
+        new_secm.baseline_corr = secm_data['baseline_corr']
 
-            try:
-                new_sasm.setParameter('analysis', sasm_data['parameters_analysis'])
-            except KeyError:
-                pass
+    else:
+        baseline_corr = []
 
-            new_sasm._update()
-        else:
-            new_sasm = -1
+        for sasm_data in secm_data['baseline_corr']:
+            if sasm_data != -1:
+                new_sasm = make_series_sasm(sasm_data, use_q_err=False)
+            else:
+                new_sasm = -1
 
-        baseline_corr.append(new_sasm)
+            baseline_corr.append(new_sasm)
 
-    new_secm.baseline_corr = baseline_corr
+        new_secm.baseline_corr = baseline_corr
 
     sasm_data = secm_data['average_buffer_sasm']
 
@@ -2430,7 +2873,16 @@ def makeSeriesFile(secm_data, settings):
 
     new_secm.average_buffer_sasm = new_sasm
 
-    new_secm._update()
+    if lazy:
+        # Intensities were read from the file, so only the series scale,
+        # offset, and q range need to be passed on to the unloaded profiles
+        new_secm._update_lazy_transforms()
+
+        if new_secm.average_buffer_sasm is not None:
+            new_secm.average_buffer_sasm.scale(new_secm._scale_factor)
+            new_secm.average_buffer_sasm.offset(new_secm._offset_value)
+    else:
+        new_secm._update()
 
     try:
         line_data = {'line_color' : secm_data['line_color'],
@@ -3109,10 +3561,6 @@ def loadDatFile(filename):
 def makeDatFile(lines, filename):
     iq_pattern = i_q_err_match
 
-    i = []
-    q = []
-    err = []
-
     comment = ''
     line = lines[0]
     j=0
@@ -3129,75 +3577,64 @@ def makeDatFile(lines, filename):
         #FoXS file with a fit! has four data columns
         is_foxs_fit=True
         is_sans_data = False
-        imodel = []
 
     elif comment.find('dQ') > -1:
         #ORNL SANS instrument file
         is_foxs_fit = False
         is_sans_data = True
-        qerr = []
     else:
         is_foxs_fit = False
         is_sans_data = False
 
+    data_index, data_found, data_values = _match_lines(lines, [iq_pattern])
+    data_lines = set(data_index)
+
+    #Check to see if there is any header from RAW, and if so get that.
     header = []
-    header_start = False
+    header_start = None
+    data_end = len(lines)
 
-    for j, line in enumerate(lines):
-        iq_match = iq_pattern.match(line)
+    markers = itertools.compress(range(len(lines)), map(str.__contains__,
+        lines, itertools.repeat('### ')))
+    markers = [j for j in markers if '### HEADER:' in lines[j]
+        or '### DATA:' in lines[j]]
 
-        if iq_match:
-            if is_foxs_fit:
-                if ',' in line:
-                    found = line.split(',')
-                else:
-                    found = line.split()
-                q.append(float(found[0]))
-                i.append(float(found[1]))
-                imodel.append(float(found[2]))
-                err.append(abs(float(found[3])))
-
-            elif is_sans_data:
-                found = iq_match.group()
-                if ',' in found:
-                    found = line.split(',')
-                else:
-                    found = line.split()
-                q.append(float(found[0]))
-                i.append(float(found[1]))
-                err.append(abs(float(found[2])))
-                qerr.append(abs(float(found[3])))
+    for j in markers:
+        line = lines[j]
+        has_data = len(data_index) > 0 and data_index[0] <= j
 
-            else:
-                found = iq_match.group()
-                if ',' in found:
-                    found = found.split(',')
-                else:
-                    found = found.split()
-                q.append(float(found[0]))
-                i.append(float(found[1]))
-                err.append(abs(float(found[2])))
+        #Header at the bottom, stop reading data
+        if '### HEADER:' in line and has_data:
+            header = lines[j+1:]
+            data_end = j+1
+            break
 
+        # Header at top
+        elif '### HEADER:' in line:
+            if header_start is not None:
+                header.extend(_get_header_lines(lines, header_start, j,
+                    data_lines))
 
+            header_start = j
 
-        #Check to see if there is any header from RAW, and if so get that.
-        #Header at the bottom
-        if '### HEADER:' in line and len(q) > 0:
-            header = lines[j+1:]
+        elif header_start is not None and '### DATA:' in line:
+            header.extend(_get_header_lines(lines, header_start, j,
+                data_lines))
 
-            # For headers at the bottom, stop trying the regex
-            if len(q) > 0:
-                break
+            header_start = None
 
-        # Header at top
-        elif '### HEADER:' in line and len(q) == 0:
-            header_start = True
+    else:
+        if header_start is not None:
+            header.extend(_get_header_lines(lines, header_start, len(lines),
+                data_lines))
 
-        elif header_start and '### DATA:' in line:
-            header_start = False
+    if data_end < len(lines):
+        npts = int(np.searchsorted(data_index, data_end))
+        data_index = data_index[:npts]
+        data_found = data_found[:npts]
 
-        elif header_start and not iq_match:
-            header.append(lines[j])
+        if data_values is not None:
+            data_values = data_values[:npts]
 
     if len(header)>0:
         hdr_str = ''
@@ -3210,9 +3647,45 @@ def makeDatFile(lines, filename):
             if each != 'filename':
                 parameters[each] = hdict[each]
 
-    i = np.array(i)
-    q = np.array(q)
-    err = np.array(err)
+    if is_foxs_fit:
+        data = _columns_to_array([lines[j] for j in data_index], 4)
+        q = data[:,0]
+        i = data[:,1]
+        imodel = data[:,2]
+        err = np.abs(data[:,3])
+
+    elif is_sans_data:
+        data_lines = [lines[j] for j in data_index]
+
+        if ',' not in ''.join(data_lines):
+            data = _columns_to_array(data_lines, 4)
+
+        else:
+            data = []
+
+            for line, found in zip(data_lines, data_found):
+                if ',' in found:
+                    found = line.split(',')
+                else:
+                    found = line.split()
+
+                data.append([float(found[col]) for col in range(4)])
+
+            data = np.array(data, dtype=float).reshape((-1, 4))
+        q = data[:,0]
+        i = data[:,1]
+        err = np.abs(data[:,2])
+        qerr = np.abs(data[:,3])
+
+    else:
+        if data_values is not None:
+            data = data_values
+        else:
+            data = _columns_to_array(data_found, 3)
+
+        q = data[:,0]
+        i = data[:,1]
+        err = np.abs(data[:,2])
 
     sasm = SASM.SASM(i, q, err, parameters)
 
@@ -3230,6 +3703,9 @@ def makeDatFile(lines, filename):
 
     return sasm
 
+def _get_header_lines(lines, start, end, data_lines):
+    return [lines[j] for j in range(start+1, end) if j not in data_lines]
+
 def loadDatHeader(header):
     try:
         hdict = dict(json.loads(header))
@@ -3251,60 +3727,56 @@ def loadRadFile(filename):
     iq_pattern = four_col_fit
     param_pattern = re.compile(r'[a-zA-Z0-9_]*\s*[:]\s+.*')
 
-    i = []
-    q = []
-    err = []
-    parameters = {'filename' : os.path.split(filename)[1]}
-
-    fileheader = {}
-
     with open(filename, 'r') as f:
+        lines = f.readlines()
 
-        for line in f:
+    data_index, data_found, data_values = _match_lines(lines, [iq_pattern])
 
-            iq_match = iq_pattern.match(line)
-            param_match = param_pattern.match(line)
+    fileheader = {}
 
-            if iq_match:
-                found = iq_match.group().split()
-                q.append(float(found[0]))
+    for line in lines:
+        if ':' not in line:
+            continue
 
-                i.append(float(found[1]))
+        param_match = param_pattern.match(line)
 
-                err.append(float(found[2]))
+        if param_match:
+            found = param_match.group().split()
+
+            if len(found) == 3:
+                try:
+                    val = float(found[2])
+                except ValueError:
+                    val = found[2]
 
-            if param_match:
-                found = param_match.group().split()
+                fileheader[found[0]] = val
 
-                if len(found) == 3:
+            elif len(found) > 3:
+                arr = []
+                for each in range(2,len(found)):
                     try:
-                        val = float(found[2])
+                        val = float(found[each])
                     except ValueError:
-                        val = found[2]
+                        val = found[each]
 
-                    fileheader[found[0]] = val
+                    arr.append(val)
 
-                elif len(found) > 3:
-                    arr = []
-                    for each in range(2,len(found)):
-                        try:
-                            val = float(found[each])
-                        except ValueError:
-                            val = found[each]
-
-                        arr.append(val)
-
-                    fileheader[found[0]] = arr
-                else:
-                    fileheader[found[0]] = ''
+                fileheader[found[0]] = arr
+            else:
+                fileheader[found[0]] = ''
 
 
     parameters = {'filename' : os.path.split(filename)[1],
                   'fileHeader' : fileheader}
 
-    i = np.array(i)
-    q = np.array(q)
-    err = np.array(err)
+    if data_values is not None and ',' not in ''.join(data_found):
+        data = data_values[:,:3]
+    else:
+        data = _columns_to_array(data_found, 3, comma_split=False)
+
+    q = data[:,0]
+    i = data[:,1]
+    err = data[:,2]
 
     return SASM.SASM(i, q, err, parameters)
 
@@ -3316,60 +3788,56 @@ def loadNewRadFile(filename):
     iq_pattern = three_col_fit
     param_pattern = re.compile(r'[a-zA-Z0-9_]*\s*[:]\s+.*')
 
-    i = []
-    q = []
-    err = []
-    parameters = {'filename' : os.path.split(filename)[1]}
-
-    fileheader = {}
-
     with open(filename, 'r') as f:
+        lines = f.readlines()
 
-        for line in f:
+    data_index, data_found, data_values = _match_lines(lines, [iq_pattern])
 
-            iq_match = iq_pattern.match(line)
-            param_match = param_pattern.match(line)
+    fileheader = {}
 
-            if iq_match:
-                found = iq_match.group().split()
-                q.append(float(found[0]))
+    for line in lines:
+        if ':' not in line:
+            continue
 
-                i.append(float(found[1]))
+        param_match = param_pattern.match(line)
 
-                err.append(float(found[2]))
+        if param_match:
+            found = param_match.group().split()
+
+            if len(found) == 3:
+                try:
+                    val = float(found[2])
+                except ValueError:
+                    val = found[2]
 
-            if param_match:
-                found = param_match.group().split()
+                fileheader[found[0]] = val
 
-                if len(found) == 3:
+            elif len(found) > 3:
+                arr = []
+                for each in range(2,len(found)):
                     try:
-                        val = float(found[2])
+                        val = float(found[each])
                     except ValueError:
-                        val = found[2]
+                        val = found[each]
 
-                    fileheader[found[0]] = val
+                    arr.append(val)
 
-                elif len(found) > 3:
-                    arr = []
-                    for each in range(2,len(found)):
-                        try:
-                            val = float(found[each])
-                        except ValueError:
-                            val = found[each]
-
-                        arr.append(val)
-
-                    fileheader[found[0]] = arr
-                else:
-                    fileheader[found[0]] = ''
+                fileheader[found[0]] = arr
+            else:
+                fileheader[found[0]] = ''
 
 
     parameters = {'filename' : os.path.split(filename)[1],
                   'counters' : fileheader}
 
-    i = np.array(i)
-    q = np.array(q)
-    err = np.array(err)
+    if data_values is not None and ',' not in ''.join(data_found):
+        data = data_values[:,:3]
+    else:
+        data = _columns_to_array(data_found, 3, comma_split=False)
+
+    q = data[:,0]
+    i = data[:,1]
+    err = data[:,2]
 
     return SASM.SASM(i, q, err, parameters)
 
@@ -3464,48 +3932,60 @@ def loadTxtFile(filename):
     ''' Loads a generic two or three column text file with space, tab, or comma separated values'''
     fit_list = [three_col_fit, i_q_err_match, two_col_fit, i_q_match]
 
-    i = []
-    q = []
-    err = []
-
     with open(filename, 'r') as f:
+        lines = f.readlines()
 
-        firstLine = f.readline()
+    if len(lines) > 0:
+        firstLine = lines[0]
+    else:
+        firstLine = ''
 
-        match = [fit.match(firstLine) for fit in fit_list]
+    match = [fit.match(firstLine) for fit in fit_list]
 
-        if any(match):
-            fileHeader = {}
-        else:
-            fileHeader = {'comment':firstLine}
-            firstline_l = firstLine.lower()
-            if 'chi^2' in firstline_l:
-                chisq = firstline_l.split('chi^2')[-1].strip(':= ').split()[0].strip()
-                fileHeader['Chi_squared'] = float(chisq)
+    if any(match):
+        fileHeader = {}
+    else:
+        fileHeader = {'comment':firstLine}
+        firstline_l = firstLine.lower()
+        if 'chi^2' in firstline_l:
+            chisq = firstline_l.split('chi^2')[-1].strip(':= ').split()[0].strip()
+            fileHeader['Chi_squared'] = float(chisq)
 
-            if 'rg' in firstline_l:
-                rg = firstline_l.split('rg')[-1].strip('t:= ').split()[0].strip()
-                fileHeader['Rg'] = float(rg)
+        if 'rg' in firstline_l:
+            rg = firstline_l.split('rg')[-1].strip('t:= ').split()[0].strip()
+            fileHeader['Rg'] = float(rg)
 
-            if 'dro' in firstline_l:
-                dro = firstline_l.split('dro')[-1].strip(':= ').split()[0].strip()
-                fileHeader['Hydration_shell_contrast'] = float(dro)
+        if 'dro' in firstline_l:
+            dro = firstline_l.split('dro')[-1].strip(':= ').split()[0].strip()
+            fileHeader['Hydration_shell_contrast'] = float(dro)
 
-            if 'vol' in firstline_l:
-                vol = firstline_l.split('vol')[-1].strip(':= ').split()[0].strip()
-                fileHeader['Excluded_volume'] = float(vol)
+        if 'vol' in firstline_l:
+            vol = firstline_l.split('vol')[-1].strip(':= ').split()[0].strip()
+            fileHeader['Excluded_volume'] = float(vol)
 
-        parameters = {'filename' : os.path.split(filename)[1],
-                      'counters' : fileHeader}
+    parameters = {'filename' : os.path.split(filename)[1],
+                  'counters' : fileHeader}
 
-        if len(fileHeader) == 0:
-            q, i, err = _match_txt_lines(firstLine, q, i, err, fit_list)
+    if len(fileHeader) != 0:
+        lines = lines[1:]
 
-        for line in f:
-            q, i, err = _match_txt_lines(line, q, i, err, fit_list)
+    data_index, data_found, data_values = _match_lines(lines, fit_list)
 
-    i = np.array(i)
-    q = np.array(q)
+    if data_values is not None:
+        q = data_values[:,0]
+        i = data_values[:,1]
+
+        if data_values.shape[1] == 3:
+            err = data_values[:,2]
+        else:
+            err = []
+
+    else:
+        data = _columns_to_array(data_found, 2)
+        q = data[:,0]
+        i = data[:,1]
+
+        err = _txt_errors(data_found)
 
     if len(err) == len(i):
         err = np.array(err)
@@ -3514,29 +3994,33 @@ def loadTxtFile(filename):
 
     return SASM.SASM(i, q, err, parameters)
 
-def _match_txt_lines(line, q, i, err, fit_list):
-    for fit in fit_list:
-        match = fit.match(line)
+def _txt_errors(data_found):
+    if ',' not in ''.join(data_found):
+        counts = list(map(len, map(str.split, data_found)))
 
-        if match:
-            data = match.group()
-            if ',' in data:
-                data = data.split(',')
-            else:
-                data = data.split()
+        if counts.count(3) == len(counts):
+            try:
+                err = _columns_to_array(data_found, 3)[:,2]
+            except ValueError:
+                err = []
 
-            q.append(float(data[0]))
-            i.append(float(data[1]))
+            return err
 
-            if len(data) == 3:
-                try:
-                    err.append(float(data[2]))
-                except Exception:
-                    pass
+    err = []
 
-            break
+    for data in data_found:
+        if ',' in data:
+            data = data.split(',')
+        else:
+            data = data.split()
 
-    return q, i, err
+        if len(data) == 3:
+            try:
+                err.append(float(data[2]))
+            except Exception:
+                pass
+
+    return err
 
 #####################################
 #--- ## Write RAW Generated Files: ##
@@ -3730,7 +4214,252 @@ def save_series_sasm_list(profile_group, sasm_list, frame_num_offset=0):
         save_series_sasm(profile_group, sasm_data, "{:06d}".format(frame_num),
             save_single_q=save_single_q, save_single_q_raw=save_single_q_raw)
 
-def save_series(save_name, seriesm, save_gui_data=False):
+def save_series_sasm_table(profile_group, sasm_list, compression='gzip',
+    compression_opts=4, chunk_frames=64):
+    """
+    Saves a list of profiles in the columnar (v2) series layout. The raw
+    intensity and uncertainty of all profiles are stored as 2D (frame x q)
+    datasets, chunked by frame and compressed, and the per-profile scale,
+    offset, q range, and header are stored as one dataset per column in the
+    frame_metadata group. The datasets are resizable along the frame axis,
+    so that profiles can be appended later (see append_series_sasm_table).
+    If the profiles can't be stored as a table (for example if they have
+    different numbers of q points), they are saved with save_series_sasm_list.
+    """
+    if (len(sasm_list) == 0
+        or any([not isinstance(sasm, dict) for sasm in sasm_list])
+        or any([len(sasm['q_raw']) != len(sasm_list[0]['q_raw']) for sasm in sasm_list])):
+        save_series_sasm_list(profile_group, sasm_list)
+        return
+
+    nframes = len(sasm_list)
+    nq = len(sasm_list[0]['q_raw'])
+
+    if compression is None:
+        compression_opts = None
+
+    chunks = (max(1, min(chunk_frames, nframes)), max(1, nq))
+
+    dset_kwargs = {'shape': (0, nq), 'maxshape': (None, nq), 'dtype': float,
+        'chunks': chunks, 'compression': compression,
+        'compression_opts': compression_opts, 'shuffle': compression is not None}
+
+    q_single = all([np.array_equal(sasm['q_raw'], sasm_list[0]['q_raw'])
+        for sasm in sasm_list[1:]])
+
+    q_err_exists = all([sasm['q_err_raw'] is not None for sasm in sasm_list])
+
+    if q_err_exists:
+        q_single = q_single and all([np.array_equal(sasm['q_err_raw'],
+            sasm_list[0]['q_err_raw']) for sasm in sasm_list[1:]])
+
+    profile_group.attrs['layout'] = 'columnar'
+    profile_group.attrs['layout_description'] = ('Profiles are stored as '
+        'tables: the "i" and "err" datasets have one row per profile and '
+        'one column per q value and hold the raw (unscaled, untrimmed) '
+        'intensity and uncertainty. Scale factors, offsets, selected q '
+        'ranges, and headers for each profile are in the frame_metadata '
+        'group.')
+
+    if q_single:
+        q_dset = profile_group.create_dataset('q', data=sasm_list[0]['q_raw'])
+
+        if q_err_exists:
+            profile_group.create_dataset('q_err', data=sasm_list[0]['q_err_raw'])
+
+    else:
+        q_dset = profile_group.create_dataset('q', **dset_kwargs)
+
+        if q_err_exists:
+            profile_group.create_dataset('q_err', **dset_kwargs)
+
+    q_dset.attrs['description'] = ('The q vector for the profiles. If 1D, '
+        'shared by all profiles, otherwise one row per profile.')
+
+    i_dset = profile_group.create_dataset('i', **dset_kwargs)
+    i_dset.attrs['description'] = 'Raw intensity, one row per profile.'
+
+    err_dset = profile_group.create_dataset('err', **dset_kwargs)
+    err_dset.attrs['description'] = 'Raw uncertainty, one row per profile.'
+
+    metadata = profile_group.create_group('frame_metadata')
+    metadata.attrs['description'] = ('Per profile values, one dataset per '
+        'value with one entry per profile.')
+
+    for key in ['scale_factor', 'offset_value', 'q_scale_factor']:
+        metadata.create_dataset(key, shape=(0,), maxshape=(None,), dtype=float,
+            chunks=(chunks[0],))
+
+    metadata.create_dataset('selected_qrange', shape=(0, 2), maxshape=(None, 2),
+        dtype=int, chunks=(chunks[0], 2))
+
+    try:
+        dtype = h5py.string_dtype() #h5py 2.10, python 3
+    except Exception:
+        if six.PY3:
+            dtype = h5py.special_dtype(vlen=str) #h5py < 2.10, python3
+        else:
+            dtype = h5py.special_dtype(vlen=unicode) #h5py < 2.10, python2
+
+    metadata.create_dataset('parameters', shape=(0,), maxshape=(None,),
+        dtype=dtype, chunks=(chunks[0],))
+
+    write_series_sasm_table_rows(profile_group, sasm_list, 0)
+
+def append_series_sasm_table(profile_group, sasm_list, compression='gzip',
+    compression_opts=4, chunk_frames=64):
+    """
+    Appends the profiles in sasm_list that are not already in the profile
+    group (i.e. those past the number of profiles already saved) to a group
+    saved in the columnar (v2) series layout. Profiles already saved are
+    not rewritten. If the group is empty, the profiles are saved with
+    save_series_sasm_table.
+    """
+    if 'i' not in profile_group:
+        if len([key for key in profile_group if key not in ['raw',
+            'average_buffer_profile']]) > 0:
+            raise SASExceptions.DataNotCompatible('Profiles can only be '
+                'appended to a series file saved in the columnar layout.')
+
+        save_series_sasm_table(profile_group, sasm_list, compression,
+            compression_opts, chunk_frames)
+        return
+
+    nframes = profile_group['i'].shape[0]
+    nq = profile_group['i'].shape[1]
+
+    if len(sasm_list) < nframes:
+        raise SASExceptions.DataNotCompatible('The series has fewer profiles '
+            'than the file it is being appended to.')
+
+    new_sasms = sasm_list[nframes:]
+
+    if len(new_sasms) == 0:
+        return
+
+    if any([not isinstance(sasm, dict) or len(sasm['q_raw']) != nq
+        for sasm in new_sasms]):
+        raise SASExceptions.DataNotCompatible('The new profiles have a '
+            'different number of q points than the saved profiles.')
+
+    if profile_group['q'].ndim == 1:
+        q = profile_group['q'][()]
+
+        if not all([np.array_equal(sasm['q_raw'], q) for sasm in new_sasms]):
+            raise SASExceptions.DataNotCompatible('The new profiles have a '
+                'different q vector than the saved profiles.')
+
+    if ('q_err' in profile_group) != all([sasm['q_err_raw'] is not None
+        for sasm in new_sasms]):
+        raise SASExceptions.DataNotCompatible('The new profiles do not match '
+            'the saved profiles q uncertainty.')
+
+    write_series_sasm_table_rows(profile_group, new_sasms, nframes)
+
+def write_series_sasm_table_rows(profile_group, sasm_list, start):
+    """
+    Writes the profiles in sasm_list into the rows of a columnar (v2) profile
+    group starting at row start, resizing the datasets as needed. Data is
+    written one chunk of frames at a time.
+    """
+    i_dset = profile_group['i']
+    err_dset = profile_group['err']
+    metadata = profile_group['frame_metadata']
+
+    row_dsets = [i_dset, err_dset]
+
+    q_rows = profile_group['q'].ndim == 2
+    q_err_rows = 'q_err' in profile_group and profile_group['q_err'].ndim == 2
+
+    if q_rows:
+        row_dsets.append(profile_group['q'])
+    if q_err_rows:
+        row_dsets.append(profile_group['q_err'])
+
+    row_dsets.extend([metadata[key] for key in ['scale_factor', 'offset_value',
+        'q_scale_factor', 'selected_qrange', 'parameters']])
+
+    nframes = start + len(sasm_list)
+
+    for dset in row_dsets:
+        dset.resize(nframes, axis=0)
+
+    chunk_frames = i_dset.chunks[0]
+
+    for j in range(0, len(sasm_list), chunk_frames):
+        block = sasm_list[j:j+chunk_frames]
+        rows = slice(start+j, start+j+len(block))
+
+        i_dset[rows] = np.array([sasm['i_raw'] for sasm in block])
+        err_dset[rows] = np.array([sasm['err_raw'] for sasm in block])
+
+        if q_rows:
+            profile_group['q'][rows] = np.array([sasm['q_raw'] for sasm in block])
+        if q_err_rows:
+            profile_group['q_err'][rows] = np.array([sasm['q_err_raw'] for sasm in block])
+
+        metadata['scale_factor'][rows] = [sasm['scale_factor'] for sasm in block]
+        metadata['offset_value'][rows] = [sasm['offset_value'] for sasm in block]
+        metadata['q_scale_factor'][rows] = [sasm['q_scale_factor'] for sasm in block]
+        metadata['selected_qrange'][rows] = [list(sasm['selected_qrange']) for sasm in block]
+        metadata['parameters'][rows] = [formatHeader(sasm['parameters']) for sasm in block]
+
+def create_series_dataset(group, name, **kwargs):
+    """
+    Creates a dataset in the group, replacing any existing dataset of the
+    same name (used when updating an existing series file).
+    """
+    if name in group:
+        del group[name]
+
+    return group.create_dataset(name, **kwargs)
+
+def save_series(save_name, seriesm, save_gui_data=False, file_version=1,
+    compression='gzip', compression_opts=4, append=False):
+    """
+    Saves a series as a .hdf5 file. If file_version is 1 (default), each
+    profile is saved as a separate dataset. If file_version is 2, the
+    profiles are saved in the columnar layout (see save_series_sasm_table)
+    with the given HDF5 compression filter (None for no compression).
+    Version 2 files can't be read by RAW versions 2.4.0 and earlier.
+
+    The file is written directly to disk, one chunk of profiles at a time.
+
+    If append is True the file is saved as version 2, and if the file exists
+    it must be a version 2 series file. Only profiles beyond those already
+    in the file are written, while
+    the series level values (intensities, calculated values, ranges, etc)
+    are rewritten. This is intended for checkpointing a series as new
+    frames are added; if previously saved profiles have changed (for
+    example a new buffer range), the series should be saved without append.
+    """
+    if append:
+        file_version = 2
+
+    append = append and os.path.exists(save_name)
+
+    if append:
+        with h5py.File(save_name, 'r') as f:
+            if f.attrs.get('series_file_version', 1) != 2:
+                raise SASExceptions.DataNotCompatible('Profiles can only be '
+                    'appended to a version 2 series file.')
+
+        mode = 'a'
+
+        def save_profiles(group, sasm_list):
+            append_series_sasm_table(group, sasm_list, compression,
+                compression_opts)
+
+    elif file_version == 2:
+        mode = 'w'
+
+        def save_profiles(group, sasm_list):
+            save_series_sasm_table(group, sasm_list, compression,
+                compression_opts)
+    else:
+        mode = 'w'
+        save_profiles = save_series_sasm_list
+
 
     seriesm_dict = seriesm.extractAll()
 
@@ -3761,13 +4490,15 @@ def save_series(save_name, seriesm, save_gui_data=False):
 
     seriesm_dict['parameters_analysis'] = seriesm_dict['parameters']['analysis']  #pickle wont save this unless its raised up
 
-    seriesm_data = copy.deepcopy(seriesm_dict)
+    # Profile data is only read while saving, so the data is not copied
+    seriesm_data = seriesm_dict
 
-    with h5py.File(save_name, 'w', driver='core', libver='earliest') as f:
+    with h5py.File(save_name, mode, libver='earliest') as f:
         f.attrs['file_type'] = 'RAW_Series'
         f.attrs['raw_version'] = RAWGlobals.version
         f.attrs['parameters'] = formatHeader(seriesm_data['parameters'])
         f.attrs['series_type'] = seriesm_data['series_type']
+        f.attrs['series_file_version'] = file_version
 
         if save_gui_data:
             try:
@@ -3777,8 +4508,7 @@ def save_series(save_name, seriesm, save_gui_data=False):
                 pass
 
         # Add filename info
-        for j in range(len(seriesm_data['file_list'])):
-            seriesm_data['file_list'][j] = seriesm_data['file_list'][j].encode('utf-8')
+        file_names = [fname.encode('utf-8') for fname in seriesm_data['file_list']]
 
         try:
             dtype = h5py.string_dtype() #h5py 2.10, python 3
@@ -3788,28 +4518,34 @@ def save_series(save_name, seriesm, save_gui_data=False):
             else:
                 dtype = h5py.special_dtype(vlen=unicode) #h5py < 2.10, python2
 
-        fname_data = f.create_dataset('file_names', data=seriesm_data['file_list'],
+        fname_data = create_series_dataset(f, 'file_names', data=file_names,
             dtype=dtype)
         fname_data.attrs['description'] = ('Ordered list of filenames, '
             'corresponding to profile numbering order.')
 
         # Add frame numbers
-        frames = f.create_dataset('frame_numbers', data=seriesm_data['frame_list'])
+        frames = create_series_dataset(f, 'frame_numbers', data=seriesm_data['frame_list'])
         frames.attrs['description'] = ('List of frame numbers, corresponding to '
             'profile numbers.')
 
         # Add time
-        times = f.create_dataset('times', data=seriesm_data['time'])
+        times = create_series_dataset(f, 'times', data=seriesm_data['time'])
         times.attrs['description'] = ('Ordered list of acquisition time of the profiles, '
             'corresponding to the profile numbering order (may not be available).')
         times.attrs['unit'] = 's'
 
 
         # Add individual profiles
-        profiles = f.create_group('profiles')
+        profiles = f.require_group('profiles')
         profiles.attrs['profile_type'] = 'input'
         profiles.attrs['description'] = ('Input scattering profiles without processing.')
-        save_series_sasm_list(profiles, seriesm_data['sasm_list'])
+        save_profiles(profiles, seriesm_data['sasm_list'])
+
+        if 'raw' in profiles and 'average_buffer_profile' in profiles['raw']:
+            del profiles['raw']['average_buffer_profile']
+
+        if 'average_buffer_profile' in profiles:
+            del profiles['average_buffer_profile']
 
         if (seriesm_data['average_buffer_sasm'] is None
             or seriesm_data['average_buffer_sasm'] == -1):
@@ -3836,102 +4572,102 @@ def save_series(save_name, seriesm, save_gui_data=False):
             except Exception:
                 pass
 
-        sub_profiles = f.create_group('subtracted_profiles')
+        sub_profiles = f.require_group('subtracted_profiles')
         sub_profiles.attrs['profile_type'] = 'subtracted'
         sub_profiles.attrs['description'] = ('Subtracted scattering profiles.')
         sub_profiles.attrs['use_subtracted_sasm'] = seriesm_data['use_subtracted_sasm']
-        save_series_sasm_list(sub_profiles, seriesm_data['subtracted_sasm_list'])
+        save_profiles(sub_profiles, seriesm_data['subtracted_sasm_list'])
 
-        baseline_profiles = f.create_group('baseline_subtracted_profiles')
+        baseline_profiles = f.require_group('baseline_subtracted_profiles')
         baseline_profiles.attrs['profile_type'] = 'subtracted_and_baseline_corrected'
         baseline_profiles.attrs['description'] = ('Baseline corrected and subtracted '
             'scattering profiles.')
         baseline_profiles.attrs['use_baseline_subtracted_sasm'] = seriesm_data['use_baseline_subtracted_sasm']
-        save_series_sasm_list(baseline_profiles, seriesm_data['baseline_subtracted_sasm_list'])
+        save_profiles(baseline_profiles, seriesm_data['baseline_subtracted_sasm_list'])
 
 
         # Add intensities
-        intensity = f.create_group('intensities')
+        intensity = f.require_group('intensities')
         intensity.attrs['intensity_type'] = 'input'
         intensity.attrs['description'] = ('Intensities for each input scattering profile')
         intensity.attrs['buffer_range'] = seriesm_data['buffer_range']
         intensity.attrs['already_subtracted'] = seriesm_data['already_subtracted']
 
-        total_i_dset = intensity.create_dataset('total_intensities',
+        total_i_dset = create_series_dataset(intensity, 'total_intensities',
             data=seriesm_data['total_i'])
         total_i_dset.attrs['description'] = ('Total integrated intensity for each '
             'input scattering profile.')
 
-        mean_i_dset = intensity.create_dataset('mean_intensities',
+        mean_i_dset = create_series_dataset(intensity, 'mean_intensities',
             data=seriesm_data['mean_i'])
         mean_i_dset.attrs['description'] = ('Mean intensity for each input '
             'scattering profile.')
 
-        qref_i_dset = intensity.create_dataset('qref_intensities',
+        qref_i_dset = create_series_dataset(intensity, 'qref_intensities',
             data=seriesm_data['i_of_q'])
         qref_i_dset.attrs['description'] = ('Intensity at a single q value for each input '
             'scattering profile (may not be available).')
         qref_i_dset.attrs['q_value'] = seriesm_data['qref']
 
-        qrange_i_dset = intensity.create_dataset('qrange_intensities',
+        qrange_i_dset = create_series_dataset(intensity, 'qrange_intensities',
             data=seriesm_data['qrange_I'])
         qrange_i_dset.attrs['description'] = ('Intensity in a range q values '
             'for each input scattering profile (may not be available).')
         qrange_i_dset.attrs['q_range'] = seriesm_data['qrange']
 
         # Add subtracted intensities
-        intensity = f.create_group('subtracted_intensities')
+        intensity = f.require_group('subtracted_intensities')
         intensity.attrs['intensity_type'] = 'subtracted'
         intensity.attrs['description'] = ('Intensities for each subtracted '
             'scattering profile (if available)')
         intensity.attrs['sample_range'] = seriesm_data['sample_range']
 
-        total_i_dset = intensity.create_dataset('total_intensities',
+        total_i_dset = create_series_dataset(intensity, 'total_intensities',
             data=seriesm_data['total_i_sub'])
         total_i_dset.attrs['description'] = ('Total integrated intensity for each '
             'subtracted scattering profile.')
 
-        mean_i_dset = intensity.create_dataset('mean_intensities',
+        mean_i_dset = create_series_dataset(intensity, 'mean_intensities',
             data=seriesm_data['mean_i_sub'])
         mean_i_dset.attrs['description'] = ('Mean intensity for each subtracted '
             'scattering profile.')
 
-        qref_i_dset = intensity.create_dataset('qref_intensities',
+        qref_i_dset = create_series_dataset(intensity, 'qref_intensities',
             data=seriesm_data['I_of_q_sub'])
         qref_i_dset.attrs['description'] = ('Intensity at a single q value for '
             'each subtracted scattering profile (may not be available).')
         qref_i_dset.attrs['q_value'] = seriesm_data['qref']
 
-        qrange_i_dset = intensity.create_dataset('qrange_intensities',
+        qrange_i_dset = create_series_dataset(intensity, 'qrange_intensities',
             data=seriesm_data['qrange_I_sub'])
         qrange_i_dset.attrs['description'] = ('Intensity in a range of q values for '
             'each subtracted scattering profile (may not be available).')
         qrange_i_dset.attrs['q_range'] = seriesm_data['qrange']
 
         # Add baseline corrected intensities
-        intensity = f.create_group('baseline_subtracted_intensities')
+        intensity = f.require_group('baseline_subtracted_intensities')
         intensity.attrs['intensity_type'] = 'subtracted_and_baseline_corrected'
         intensity.attrs['description'] = ('Intensities for each baseline '
             'corrected and subtracted scattering profile (if available)')
 
-        total_i_dset = intensity.create_dataset('total_intensities',
+        total_i_dset = create_series_dataset(intensity, 'total_intensities',
             data=seriesm_data['total_i_bcsub'])
         total_i_dset.attrs['description'] = ('Total integrated intensity for each '
             'subtracted scattering profile.')
 
-        mean_i_dset = intensity.create_dataset('mean_intensities',
+        mean_i_dset = create_series_dataset(intensity, 'mean_intensities',
             data=seriesm_data['mean_i_bcsub'])
         mean_i_dset.attrs['description'] = ('Mean intensity for each baseline '
             'corrected and subtracted scattering profile.')
 
-        qref_i_dset = intensity.create_dataset('qref_intensities',
+        qref_i_dset = create_series_dataset(intensity, 'qref_intensities',
             data=seriesm_data['I_of_q_bcsub'])
         qref_i_dset.attrs['description'] = ('Intensity at a single q value for '
             'each baseline corrected and subtracted scattering profile (may not '
             'be available).')
         qref_i_dset.attrs['q_value'] = seriesm_data['qref']
 
-        qrange_i_dset = intensity.create_dataset('qrange_intensities',
+        qrange_i_dset = create_series_dataset(intensity, 'qrange_intensities',
             data=seriesm_data['qrange_I_bcsub'])
         qrange_i_dset.attrs['description'] = ('Intensity in a range of q values for '
             'each baseline corrected and subtracted scattering profile (may not '
@@ -3940,7 +4676,7 @@ def save_series(save_name, seriesm, save_gui_data=False):
 
 
         # Add calculated data
-        calc_data = f.create_group('calculated_data')
+        calc_data = f.require_group('calculated_data')
         calc_data.attrs['description'] = ('Automatically calculated parameters '
             'for subtracted or baseline corrected data. Default value of -1 '
             'for any value indiciates either no calculation or an unsuccessful '
@@ -3964,23 +4700,23 @@ def save_series(save_name, seriesm, save_gui_data=False):
             except Exception:
                 pass
 
-        rg_data = calc_data.create_dataset('rg',
+        rg_data = create_series_dataset(calc_data, 'rg',
             data=np.column_stack((seriesm_data['rg'], seriesm_data['rger'])))
         rg_data.attrs['description'] = ('Radius of gyration (Rg) calculated on a '
             'frame by frame basis. Column 0 and 1 are Rg and Rg uncertainty '
             'respectively')
 
-        rg_data = calc_data.create_dataset('I0',
+        rg_data = create_series_dataset(calc_data, 'I0',
             data=np.column_stack((seriesm_data['i0'], seriesm_data['i0er'])))
         rg_data.attrs['description'] = ('Scattering intensity at zero angle '
             '(I(0)) calculated on a frame by frame basis. Column 0 and 1 are '
             'I(0) and I(0) uncertainty respectively')
 
-        vp_data = calc_data.create_dataset('vp_mw', data=seriesm_data['vpmw'])
+        vp_data = create_series_dataset(calc_data, 'vp_mw', data=seriesm_data['vpmw'])
         vp_data.attrs['description'] = ('Molecular weight calculated using the '
             'adjusted Porod volume method calculated on a frame by frame basis.')
 
-        vc_data = calc_data.create_dataset('vc_mw',
+        vc_data = create_series_dataset(calc_data, 'vc_mw',
             data=np.column_stack((seriesm_data['vcmw'], seriesm_data['vcmwer'])))
         vc_data.attrs['description'] = ('Molecular weight calculated using the '
             'adjusted Porod volume method calculated on a frame by frame basis. '
@@ -3988,14 +4724,14 @@ def save_series(save_name, seriesm, save_gui_data=False):
 
 
         # Add baseline
-        baseline = f.create_group('baseline')
+        baseline = f.require_group('baseline')
         baseline.attrs['description'] = ('Values for the baseline correction.')
         baseline.attrs['baseline_start_range'] = seriesm_data['baseline_start_range']
         baseline.attrs['baseline_end_range'] = seriesm_data['baseline_end_range']
         baseline.attrs['baseline_type'] = seriesm_data['baseline_type']
         baseline.attrs['baseline_extrapolation'] = seriesm_data['baseline_extrap']
 
-        correction = baseline.create_group('correction')
+        correction = baseline.require_group('correction')
         correction.attrs['description'] = ('The q dependent baseline correction '
             'on a frame by frame basis.')
 
@@ -4006,9 +4742,9 @@ def save_series(save_name, seriesm, save_gui_data=False):
         else:
             frame_num_offset = 0
 
-        save_series_sasm_list(correction, seriesm_data['baseline_corr'])
+        save_profiles(correction, seriesm_data['baseline_corr'])
 
-        fit_params = baseline.create_dataset("fit_parameters",
+        fit_params = create_series_dataset(baseline, "fit_parameters",
             data=seriesm_data['baseline_fit_results'])
         fit_params.attrs['description'] = ('Fit parameters for each q value '
             'for a linear baseline correction. Columns 0-4 correspond to '
@@ -5205,12 +5941,161 @@ def checkFileType(filename):
     elif ext == '.hdf5':
         return 'hdf5'
     else:
-        try:
-            f = fabio.open(filename)
+        if _isFabioImage(filename):
             return 'image'
-        except Exception:
+        else:
             try:
                 float(ext.strip('.'))
             except Exception:
                 return 'txt'
             return 'csv'
+
+# The file type checks that have to look at the contents of a file are cached
+# by path, so that loading the same files again doesn't reopen them. Entries
+# are only used if the file's size and modification time haven't changed.
+_file_type_cache = collections.OrderedDict()
+_file_type_cache_size = 4096
+_file_type_lock = threading.Lock()
+
+_hdf5_signature = b'\x89HDF\r\n\x1a\n'
+
+def _getCachedFileType(filename, key):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None, None
+
+    path = (os.path.abspath(filename), key)
+    file_id = (stat.st_size, stat.st_mtime_ns)
+
+    with _file_type_lock:
+        if path in _file_type_cache and _file_type_cache[path][0] == file_id:
+            _file_type_cache.move_to_end(path)
+            return _file_type_cache[path][1], (path, file_id)
+
+    return None, (path, file_id)
+
+def _setCachedFileType(cache_key, value):
+    if cache_key is None:
+        return
+
+    path, file_id = cache_key
+
+    with _file_type_lock:
+        _file_type_cache[path] = (file_id, value)
+        _file_type_cache.move_to_end(path)
+
+        while len(_file_type_cache) > _file_type_cache_size:
+            _file_type_cache.popitem(last=False)
+
+def clearFileTypeCache():
+    with _file_type_lock:
+        _file_type_cache.clear()
+
+def _isFabioImage(filename):
+    """
+    Checks whether fabio can open a file. fabio identifies files by their
+    first bytes or their extension, so files that match neither are
+    rejected without opening them with fabio.
+    """
+    is_image, cache_key = _getCachedFileType(filename, 'fabio')
+
+    if is_image is not None:
+        return is_image
+
+    if _hasFabioMagic(filename):
+        could_be_image = True
+    else:
+        try:
+            file_obj = fabio.fabioutils.FilenameObject(filename=filename)
+            could_be_image = file_obj.format is not None
+        except Exception:
+            could_be_image = False
+
+    is_image = False
+
+    if could_be_image:
+        try:
+            fabio_img = fabio.open(filename)
+            fabio_img.close()
+            is_image = True
+        except Exception:
+            pass
+
+    _setCachedFileType(cache_key, is_image)
+
+    return is_image
+
+def _hasFabioMagic(filename):
+    with open(filename, 'rb') as f:
+        magic_bytes = f.read(18)
+
+    return any(magic_bytes.startswith(magic) for magic, _ in
+        fabio.openimage.MAGIC_NUMBERS)
+
+def isHdf5File(filename):
+    """
+    Checks for the HDF5 signature, which is at the start of the file or
+    after a user block of 512, 1024, 2048, ... bytes.
+    """
+    size = os.path.getsize(filename)
+    offset = 0
+
+    with open(filename, 'rb') as f:
+        while offset + len(_hdf5_signature) <= size:
+            f.seek(offset)
+
+            if f.read(len(_hdf5_signature)) == _hdf5_signature:
+                return True
+
+            offset = max(offset*2, 512)
+
+    return False
+
+def openHdf5File(filename, raw_settings):
+    """
+    Works out whether an hdf5 file is an image or RAW hdf5 data. Returns
+    'image' and the file opened with fabio, or 'hdf5' and None. Files that
+    aren't hdf5 files, or that match one of RAW's hdf5 file definitions,
+    aren't opened with fabio. Which type the file is gets cached, so other
+    hdf5 data files are only opened with fabio once.
+    """
+    file_defs = raw_settings.get('fileDefinitions')
+
+    if file_defs is not None and 'hdf5' in file_defs:
+        hdf5_defs = file_defs['hdf5']
+    else:
+        hdf5_defs = {}
+
+    is_image, cache_key = _getCachedFileType(filename,
+        ('hdf5', tuple(sorted(hdf5_defs.keys()))))
+
+    if is_image is None:
+        try:
+            if not isHdf5File(filename):
+                if not _hasFabioMagic(filename):
+                    is_image = False
+
+            elif hdf5_defs:
+                with h5py.File(filename, 'r') as data_file:
+                    is_image = matchHdf5Definition(data_file, hdf5_defs) is None
+        except Exception:
+            pass
+
+    hdf5_file = None
+
+    if is_image is None or is_image:
+        try:
+            hdf5_file = fabio.open(filename)
+            is_image = True
+        except Exception:
+            is_image = False
+
+    _setCachedFileType(cache_key, is_image)
+
+    if is_image:
+        file_type = 'image'
+    else:
+        file_type = 'hdf5'
+
+    return file_type, hdf5_file
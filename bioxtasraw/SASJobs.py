@@ -0,0 +1,407 @@
+"""
+Created on October 19, 2026
+
+#******************************************************************************
+# This file is part of RAW.
+#
+#    RAW is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    RAW is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with RAW.  If not, see <http://www.gnu.org/licenses/>.
+#
+#******************************************************************************
+
+The purpose of this module is to run local subprocesses, such as the ATSAS
+programs, through a single asyncio event loop. The number of processes running
+at once is limited (by default to the number of cores), and a batch of jobs
+can be limited further with a JobGroup. The output of each process is
+streamed line by line to an optional callback, and each job can be cancelled
+and records when it was submitted, started, and finished. All jobs share the
+one event loop thread, so submitting many jobs doesn't start a reader thread
+for every process.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+from builtins import object, range, map, zip
+
+import asyncio
+import atexit
+import concurrent.futures
+import multiprocessing
+import platform
+import threading
+import time
+
+
+class Job(object):
+    """
+    A subprocess or blocking call submitted to a :class:`JobScheduler`. The
+    state is one of 'pending', 'running', 'finished', 'cancelled', or
+    'failed'.
+    """
+
+    def __init__(self, launch, name=None, line_callback=None,
+        done_callback=None, group=None, call=False):
+        self.launch = launch
+        self.name = name
+        self.line_callback = line_callback
+        self.done_callback = done_callback
+        self.group = group
+        self.call = call
+
+        self.state = 'pending'
+        self.returncode = None
+        self.value = None
+        self.error = None
+
+        self.submit_time = time.time()
+        self.start_time = None
+        self.end_time = None
+
+        self._proc = None
+        self._cancel_event = threading.Event()
+        self._future = None
+
+    @property
+    def wait_time(self):
+        """Time in seconds the job waited for a free slot."""
+        if self.start_time is None:
+            end = self.end_time if self.end_time is not None else time.time()
+        else:
+            end = self.start_time
+
+        return end - self.submit_time
+
+    @property
+    def run_time(self):
+        """Time in seconds the job's process has been running."""
+        if self.start_time is None:
+            return 0.
+
+        end = self.end_time if self.end_time is not None else time.time()
+
+        return end - self.start_time
+
+    def cancel(self):
+        """
+        Cancels the job. A pending job is never started, a running job
+        has its process terminated. A running call can't be stopped.
+        """
+        self._cancel_event.set()
+
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def done(self):
+        return self._future is not None and self._future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the job to finish and returns the process return code, or
+        for a call the value it returned. Raises any exception from starting
+        or reading the process, or from the call.
+        """
+        return self._future.result(timeout)
+
+
+class JobGroup(object):
+    """
+    Limits how many of a batch of jobs run at once, on top of the limit of
+    the scheduler. If max_jobs is 0 only the scheduler limit applies.
+    """
+
+    def __init__(self, max_jobs=0):
+        self.max_jobs = max_jobs
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Only called from the scheduler thread, so the semaphore is made
+        # for the scheduler event loop
+        if self.max_jobs <= 0:
+            return None
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_jobs)
+
+        return self._semaphore
+
+
+class JobScheduler(object):
+    """
+    Runs subprocesses from an asyncio event loop in a background thread.
+    At most max_jobs processes run at once, if max_jobs is 0 this is the
+    number of cores.
+    """
+
+    def __init__(self, max_jobs=0):
+        if max_jobs <= 0:
+            max_jobs = multiprocessing.cpu_count()
+
+        self.max_jobs = max_jobs
+
+        self._jobs = set()
+        self._jobs_lock = threading.Lock()
+
+        # Launching a process (e.g. answering the interactive DAMMIF prompts)
+        # blocks, so it's done in a pool no bigger than the number of jobs
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_jobs)
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(started,))
+        self._thread.daemon = True
+        self._thread.start()
+        started.wait()
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        self._loop.call_soon(started.set)
+        self._loop.run_forever()
+
+    def submit(self, launch, name=None, line_callback=None, done_callback=None,
+        group=None):
+        """
+        Submits a job and returns the :class:`Job`. launch is called with
+        no arguments once the job has a free slot, and should start the
+        process and return the :class:`subprocess.Popen` object, as the
+        SASCalc.run* ATSAS functions do. line_callback is called with each
+        line of output from the process, and done_callback with the job
+        when it ends. Both callbacks are called from the scheduler thread.
+        If a :class:`JobGroup` is given, the job also waits for a free slot
+        in the group.
+        """
+        if not self._loop.is_running():
+            raise RuntimeError('Job scheduler has been shut down.')
+
+        job = Job(launch, name, line_callback, done_callback, group)
+
+        with self._jobs_lock:
+            self._jobs.add(job)
+
+        job._future = asyncio.run_coroutine_threadsafe(self._run(job),
+            self._loop)
+
+        return job
+
+    def submit_call(self, func, name=None, done_callback=None, group=None):
+        """
+        Submits a job that calls func with no arguments in the scheduler's
+        thread pool, and returns the :class:`Job`. This is for functions
+        that run a process and wait for it themselves, such as
+        SASCalc.runDatgnom, so they share the limits on running jobs.
+        """
+        if not self._loop.is_running():
+            raise RuntimeError('Job scheduler has been shut down.')
+
+        job = Job(func, name, None, done_callback, group, call=True)
+
+        with self._jobs_lock:
+            self._jobs.add(job)
+
+        job._future = asyncio.run_coroutine_threadsafe(self._run(job),
+            self._loop)
+
+        return job
+
+    def jobs(self):
+        """Returns the jobs that haven't finished yet."""
+        with self._jobs_lock:
+            return list(self._jobs)
+
+    def wait(self, jobs=None, timeout=None):
+        """
+        Waits for the given jobs, or all submitted jobs, to finish. Returns
+        True if they all finished before the timeout.
+        """
+        if jobs is None:
+            jobs = self.jobs()
+
+        futures = [job._future for job in jobs]
+        _, not_done = concurrent.futures.wait(futures, timeout)
+
+        return len(not_done) == 0
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def shutdown(self, cancel=True):
+        """
+        Stops the scheduler. If cancel is True, outstanding jobs are
+        cancelled, otherwise they're allowed to finish first.
+        """
+        if not self._loop.is_running():
+            return
+
+        if cancel:
+            self.cancel_all()
+
+        self.wait()
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, job):
+        group_semaphore = None
+
+        try:
+            if job.group is not None:
+                group_semaphore = job.group._get_semaphore()
+
+            # The group slot is taken first, so jobs waiting on their group
+            # don't hold one of the scheduler slots
+            if group_semaphore is not None:
+                await group_semaphore.acquire()
+
+            try:
+                async with self._semaphore:
+                    if job.cancelled():
+                        job.state = 'cancelled'
+                    elif job.call:
+                        await self._run_call(job)
+                    else:
+                        await self._run_process(job)
+            finally:
+                if group_semaphore is not None:
+                    group_semaphore.release()
+        finally:
+            job.end_time = time.time()
+
+            with self._jobs_lock:
+                self._jobs.discard(job)
+
+        if job.done_callback is not None:
+            job.done_callback(job)
+
+        if job.error is not None:
+            raise job.error
+
+        if job.call:
+            return job.value
+
+        return job.returncode
+
+    async def _run_call(self, job):
+        job.start_time = time.time()
+        job.state = 'running'
+
+        try:
+            job.value = await self._loop.run_in_executor(None, job.launch)
+            job.state = 'finished'
+
+        except Exception as e:
+            job.error = e
+            job.state = 'failed'
+
+    async def _run_process(self, job):
+        job.start_time = time.time()
+        job.state = 'running'
+
+        try:
+            job._proc = await self._loop.run_in_executor(None, job.launch)
+
+            if job._proc is None:
+                raise RuntimeError('Job %s did not start a process.' %(job.name))
+
+            if job.cancelled():
+                job._proc.terminate()
+
+            if job._proc.stdout is not None:
+                await self._read_output(job)
+
+            while job._proc.poll() is None:
+                await asyncio.sleep(0.05)
+
+            job.returncode = job._proc.returncode
+
+            if job.cancelled():
+                job.state = 'cancelled'
+            else:
+                job.state = 'finished'
+
+        except Exception as e:
+            job.error = e
+            job.state = 'failed'
+
+            if job._proc is not None and job._proc.poll() is None:
+                job._proc.terminate()
+
+    async def _read_output(self, job):
+        out = job._proc.stdout
+
+        if platform.system() == 'Windows':
+            # Windows pipes from Popen can't be added to the event loop
+            while True:
+                line = await self._loop.run_in_executor(None, out.readline)
+                if not line:
+                    break
+                self._send_line(job, line)
+
+            out.close()
+
+        else:
+            reader = asyncio.StreamReader(limit=2**20)
+            transport, _ = await self._loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), out)
+
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._send_line(job, line)
+            finally:
+                transport.close()
+
+    def _send_line(self, job, line):
+        if job.line_callback is not None:
+            if not isinstance(line, str):
+                line = str(line, encoding='UTF-8', errors='replace')
+
+            job.line_callback(line)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Returns the shared job scheduler, starting it if it isn't running. The
+    shared scheduler runs at most one job per core, use a :class:`JobGroup`
+    to limit a batch of jobs further.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+
+        return _scheduler
+
+def shutdown_scheduler():
+    """Stops the shared job scheduler, cancelling any outstanding jobs."""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.shutdown()
+
+        _scheduler = None
+
+atexit.register(shutdown_scheduler)
@@ -31,9 +31,11 @@ from io import open
 
 import copy
 import traceback
+import itertools
 import os
 import numpy as np
 import scipy.interpolate as interp
+import scipy.integrate as integrate
 import numba
 
 raw_path = os.path.abspath(os.path.join('.', __file__, '..', '..'))
@@ -72,32 +74,105 @@ def subtract(sasm1, sasm2, forced=False, full=False, copy_params=True):
     q_err = copy.deepcopy(prof1.getQErr())
 
     if copy_params:
-        sub_parameters = get_shared_header([sasm1, sasm2])
+        sub_parameters = subtract_parameters(sasm1.getAllParameters(),
+            sasm2.getAllParameters())
 
-        sub_parameters['filename'] = copy.deepcopy(sasm1.getParameter('filename'))
+    else:
+        sub_parameters = {'filename': copy.deepcopy(sasm1.getParameter('filename'))}
 
-        history = {}
+    newSASM = SASM.SASM(i, q, err, sub_parameters, q_err)
 
-        history1 = []
-        history1.append(copy.deepcopy(sasm1.getParameter('filename')))
-        for key in sasm1.getParameter('history'):
-            history1.append({ key : copy.deepcopy(sasm1.getParameter('history')[key])})
+    return newSASM
 
-        history2 = []
-        history2.append(copy.deepcopy(sasm2.getParameter('filename')))
-        for key in sasm2.getParameter('history'):
-            history2.append({key : copy.deepcopy(sasm2.getParameter('history')[key])})
+def subtract_multiple(sasm_list, sasm2, forced=False, copy_params=True):
+    '''
+    Subtract one SASM object from each of a list of SASM objects and propagate
+    errors. Equivalent to calling subtract for each item in the list, but
+    profiles with q vectors matching sasm2 are subtracted as a single array.
+    '''
+    sub_sasms = [None for sasm in sasm_list]
 
-        history['subtraction'] = {'initial_file':history1, 'subtracted_file':history2}
+    ref_q = sasm2.getQ()
+    ref_i = sasm2.getI()
+    ref_err = sasm2.getErr()
 
-        sub_parameters['history'] = history
+    stack_idx = [index for index, sasm in enumerate(sasm_list)
+        if len(sasm.getQ()) == len(ref_q)]
 
-    else:
-        sub_parameters = {'filename': copy.deepcopy(sasm1.getParameter('filename'))}
+    if len(stack_idx) > 0:
+        q_stack = np.array([sasm_list[index].getQ() for index in stack_idx])
 
-    newSASM = SASM.SASM(i, q, err, sub_parameters, q_err)
+        # Same criteria as test_equal_q_ranges
+        q_match = np.logical_not(np.all(np.round(q_stack, 5)
+            != np.round(ref_q, 5), axis=1))
 
-    return newSASM
+        stack_idx = list(itertools.compress(stack_idx, q_match))
+
+    if len(stack_idx) > 0:
+        i_stack = np.array([sasm_list[index].getI() for index in stack_idx])
+        err_stack = np.array([sasm_list[index].getErr() for index in stack_idx])
+
+        sub_i = i_stack - ref_i
+        sub_err = np.sqrt(np.square(err_stack) + np.square(ref_err))
+
+        if copy_params:
+            history2 = []
+            history2.append(copy.deepcopy(sasm2.getParameter('filename')))
+            for key in sasm2.getParameter('history'):
+                history2.append({key : copy.deepcopy(sasm2.getParameter('history')[key])})
+
+        for j, index in enumerate(stack_idx):
+            sasm1 = sasm_list[index]
+
+            if copy_params:
+                sub_parameters = get_shared_header([sasm1, sasm2])
+
+                sub_parameters['filename'] = copy.deepcopy(sasm1.getParameter('filename'))
+
+                history1 = []
+                history1.append(copy.deepcopy(sasm1.getParameter('filename')))
+                for key in sasm1.getParameter('history'):
+                    history1.append({ key : copy.deepcopy(sasm1.getParameter('history')[key])})
+
+                sub_parameters['history'] = {'subtraction': {'initial_file':history1,
+                    'subtracted_file':copy.deepcopy(history2)}}
+
+            else:
+                sub_parameters = {'filename': copy.deepcopy(sasm1.getParameter('filename'))}
+
+            sub_sasms[index] = SASM.SASM(sub_i[j], copy.deepcopy(sasm1.getQ()),
+                sub_err[j], sub_parameters, copy.deepcopy(sasm1.getQErr()))
+
+    for index, sasm in enumerate(sasm_list):
+        if sub_sasms[index] is None:
+            sub_sasms[index] = subtract(sasm, sasm2, forced,
+                copy_params=copy_params)
+
+    return sub_sasms
+
+def calc_intensity_stack(q, intensity, int_type, qref=None, qrange=None):
+    '''
+    Calculates the total, mean, single q ('q_val'), or q range ('q_range')
+    intensity for each row of a 2D (profile x q) intensity array with a
+    shared q vector. Matches the corresponding SASM methods.
+    '''
+    if int_type == 'total':
+        result = integrate.trapezoid(intensity, q, axis=1)
+
+    elif int_type == 'mean':
+        result = intensity.mean(axis=1)
+
+    elif int_type == 'q_val':
+        result = intensity[:, SASM.SASM.closest(q, qref)]
+
+    elif int_type == 'q_range':
+        index1 = SASM.SASM.closest(q, qrange[0])
+        index2 = SASM.SASM.closest(q, qrange[1])
+
+        result = integrate.trapezoid(intensity[:, index1:index2+1],
+            q[index1:index2+1], axis=1)
+
+    return result
 
 def average(sasm_list, forced=False, copy_params=True, full=False):
     ''' Average the intensity of a list of sasm objects '''
@@ -148,32 +223,97 @@ def average(sasm_list, forced=False, copy_params=True, full=False):
         avg_err = np.sqrt(np.sum(np.square(all_err), 0))/len(all_err)
 
         if copy_params:
-            avg_parameters = get_shared_header(sasm_list)
+            avg_parameters = average_parameters([sasm.getAllParameters()
+                for sasm in sasm_list])
 
-            avg_parameters['filename'] = copy.deepcopy(sasm_list[0].getParameter('filename'))
+        else:
+            avg_parameters = {'filename': copy.deepcopy(sasm_list[0].getParameter('filename'))}
 
-            history = {}
+    avgSASM = SASM.SASM(avg_i, avg_q, avg_err, avg_parameters, avg_q_err)
 
-            history_list = []
+    return avgSASM
 
-            for eachsasm in sasm_list:
-                each_history = []
-                each_history.append(copy.deepcopy(eachsasm.getParameter('filename')))
+def average_parameters(params_list):
+    '''
+    Returns the metadata for the average of profiles with the input metadata
+    (as from sasm.getAllParameters()), the same as average with copy_params.
+    '''
+    if len(params_list) == 1:
+        return copy.deepcopy(params_list[0])
 
-                for key in eachsasm.getParameter('history'):
-                    each_history.append({key : copy.deepcopy(eachsasm.getParameter('history')[key])})
+    avg_parameters = get_shared_values(params_list)
 
-                history_list.append(each_history)
+    if 'analysis' in avg_parameters:
+        del avg_parameters['analysis']
 
-            history['averaged_files'] = history_list
-            avg_parameters['history'] = history
+    avg_parameters['filename'] = copy.deepcopy(params_list[0].get('filename'))
 
-        else:
-            avg_parameters = {'filename': copy.deepcopy(sasm_list[0].getParameter('filename'))}
+    history_list = []
 
-    avgSASM = SASM.SASM(avg_i, avg_q, avg_err, avg_parameters, avg_q_err)
+    for params in params_list:
+        each_history = []
+        each_history.append(copy.deepcopy(params.get('filename')))
 
-    return avgSASM
+        for key in params['history']:
+            each_history.append({key : copy.deepcopy(params['history'][key])})
+
+        history_list.append(each_history)
+
+    avg_parameters['history'] = {'averaged_files': history_list}
+
+    return avg_parameters
+
+def subtract_parameters(params1, params2):
+    '''
+    Returns the metadata for the subtraction of profiles with the input
+    metadata (as from sasm.getAllParameters()), the same as subtract with
+    copy_params.
+    '''
+    sub_parameters = get_shared_values([params1, params2])
+
+    if 'analysis' in sub_parameters:
+        del sub_parameters['analysis']
+
+    sub_parameters['filename'] = copy.deepcopy(params1.get('filename'))
+
+    history1 = []
+    history1.append(copy.deepcopy(params1.get('filename')))
+    for key in params1['history']:
+        history1.append({ key : copy.deepcopy(params1['history'][key])})
+
+    history2 = []
+    history2.append(copy.deepcopy(params2.get('filename')))
+    for key in params2['history']:
+        history2.append({key : copy.deepcopy(params2['history'][key])})
+
+    sub_parameters['history'] = {'subtraction': {'initial_file':history1,
+        'subtracted_file':history2}}
+
+    return sub_parameters
+
+def binning_parameters(params, bin_type, initial_points, final_points):
+    '''
+    Returns the metadata for a profile with the input metadata rebinned
+    using bin_type ('linear_binning' or 'log_binning'), the same as rebin
+    and logBinning with copy_params.
+    '''
+    parameters = copy.deepcopy(params)
+
+    old_history = parameters['history']
+
+    history1 = []
+    history1.append(copy.deepcopy(params.get('filename')))
+
+    for key in old_history:
+        history1.append({key:old_history[key]})
+
+    history = {}
+    history[bin_type] = {'initial_file' : history1,
+        'initial_points' : initial_points, 'final_points': final_points}
+
+    parameters['history'] = history
+
+    return parameters
 
 def weightedAverage(sasm_list, weightByError, weightCounter, forced=False,
     copy_params=True, full=False):
@@ -573,25 +713,7 @@ def logBinning(sasm, no_points, copy_params=True):
         bins = np.empty_like(q)
 
     else:
-        bins_calc = False
-        min_pt = 1
-
-        while not bins_calc:
-            bins = np.geomspace(min_pt, total_pts, no_points+1-min_pt)
-
-            pos_min_diff = np.argwhere(np.ediff1d(bins)>1)[0][0]
-
-            if pos_min_diff == 0:
-                bins_calc = True
-
-            else:
-                pos_min_diff = pos_min_diff + 1
-                min_pt = int(np.floor(bins[pos_min_diff]))
-
-        bins = bins.astype(int)
-        bins[0] = min_pt
-
-        log_bins = np.concatenate((np.arange(min_pt, dtype=int), bins))
+        log_bins = calc_log_bins(total_pts, no_points)
 
         binned_q = np.empty(log_bins.shape[0]-1)
         binned_i = np.empty(log_bins.shape[0]-1)
@@ -606,28 +728,39 @@ def logBinning(sasm, no_points, copy_params=True):
             q_err, binned_q, binned_i, binned_err, binned_q_err, log_bins)
 
     if copy_params:
-        parameters = copy.deepcopy(sasm.getAllParameters())
+        parameters = binning_parameters(sasm.getAllParameters(), 'log_binning',
+            total_pts, len(binned_q))
 
-        old_history = parameters['history']
+    else:
+        parameters = {'filename' : copy.deepcopy(sasm.getParameter('filename'))}
 
-        history1 = []
-        history1.append(copy.deepcopy(sasm.getParameter('filename')))
+    newSASM = SASM.SASM(binned_i, binned_q, binned_err, parameters, binned_q_err)
 
-        for key in old_history:
-            history1.append({key:old_history[key]})
+    return newSASM
 
-        history = {}
-        history['log_binning'] = {'initial_file' : history1,
-            'initial_points' : total_pts, 'final_points': len(binned_q)}
+def calc_log_bins(total_pts, no_points):
+    ''' Returns the bin edge indices used by logBinning '''
+    bins_calc = False
+    min_pt = 1
 
-        parameters['history'] = history
+    while not bins_calc:
+        bins = np.geomspace(min_pt, total_pts, no_points+1-min_pt)
 
-    else:
-        parameters = {'filename' : copy.deepcopy(sasm.getParameter('filename'))}
+        pos_min_diff = np.argwhere(np.ediff1d(bins)>1)[0][0]
 
-    newSASM = SASM.SASM(binned_i, binned_q, binned_err, parameters, binned_q_err)
+        if pos_min_diff == 0:
+            bins_calc = True
 
-    return newSASM
+        else:
+            pos_min_diff = pos_min_diff + 1
+            min_pt = int(np.floor(bins[pos_min_diff]))
+
+    bins = bins.astype(int)
+    bins[0] = min_pt
+
+    log_bins = np.concatenate((np.arange(min_pt, dtype=int), bins))
+
+    return log_bins
 
 @numba.jit(nopython=True, cache=True)
 def inner_log_bin(q, i, err_sqr, q_err, binned_q, binned_i,
@@ -684,21 +817,8 @@ def rebin(sasm, rebin_factor, copy_params=True):
 
 
     if copy_params:
-        parameters = copy.deepcopy(sasm.getAllParameters())
-
-        old_history = parameters['history']
-
-        history1 = []
-        history1.append(copy.deepcopy(sasm.getParameter('filename')))
-
-        for key in old_history:
-            history1.append({key:old_history[key]})
-
-        history = {}
-        history['linear_binning'] = {'initial_file' : history1,
-            'initial_points' : len_iq, 'final_points': no_of_bins}
-
-        parameters['history'] = history
+        parameters = binning_parameters(sasm.getAllParameters(),
+            'linear_binning', len_iq, no_of_bins)
 
     else:
         parameters = {'filename' : copy.deepcopy(sasm.getParameter('filename'))}
@@ -854,6 +974,34 @@ def cormap_pval(data1, data2):
 #questions from stack overflow:
 #https://stackoverflow.com/questions/4494404/find-large-number-of-consecutive-values-fulfilling-condition-in-a-numpy-array
 #https://stackoverflow.com/questions/12427146/combine-two-arrays-and-sort
+def cormap_pval_multiple(ref_data, data):
+    """Calculate the probability for each row of a 2D data array to be
+    equivalent to the reference data. Equivalent to calling cormap_pval for
+    each row, but the longest runs are found for all rows at once.
+
+    :param ref_data: 1D numpy array
+    :param data: 2D numpy array, where each row is a dataset
+    :return: number of points, array of longest runs, array of probabilities
+    """
+
+    data = np.atleast_2d(data)
+
+    if data.shape[1] != ref_data.shape[0]:
+        raise SASExceptions.CorMapError
+
+    diff_data = data - ref_data
+    c = measure_longest_multiple(diff_data)
+    n = diff_data.shape[1]
+
+    prob = np.ones(len(c), dtype=float)
+
+    # Only a few distinct run lengths occur, so probabilities are calculated once per length
+    for c_val in np.unique(c):
+        if c_val > 0:
+            prob[c == c_val] = round(sascalc_exts.LROH.probaB(n, int(c_val)), 6)
+
+    return n, c, prob
+
 def contiguous_regions(data):
     """Finds contiguous regions of the difference data. Returns
     a 1D array where each value represents a change in the condition."""
@@ -894,6 +1042,30 @@ def measure_longest(data):
         max_len = 0
     return max_len
 
+def measure_longest_multiple(data):
+    """Find the longest consecutive region of positive, negative, or zero
+    values in each row of a 2D array, with the same conventions as
+    measure_longest"""
+    nrows, ncols = data.shape
+
+    if ncols == 0:
+        return np.zeros(nrows, dtype=np.int_)
+
+    sign = np.zeros(data.shape, dtype=np.int8)
+    sign[data>0] = 1
+    sign[data<0] = -1
+
+    new_region = np.ones(data.shape, dtype=bool)
+    new_region[:, 1:] = sign[:, 1:] != sign[:, :-1]
+
+    idx = np.arange(ncols)
+    region_start = np.maximum.accumulate(np.where(new_region, idx, 0), axis=1)
+    max_len = (idx - region_start + 1).max(axis=1)
+
+    max_len[np.all(data==0, axis=1)] = 0
+
+    return max_len
+
 def run_cormap_all(sasm_list, correction='None'):
     pvals = np.ones((len(sasm_list), len(sasm_list)))
     corrected_pvals = np.ones_like(pvals)
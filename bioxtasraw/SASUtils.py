@@ -38,6 +38,7 @@ import platform
 import copy
 import os
 import subprocess
+import threading
 import glob
 import json
 import sys
@@ -327,7 +328,25 @@ class GnomeSessionInhibitor(DBusInhibitor):
                                     GnomeSessionInhibitor.INHIBIT_SUSPEND)
 
 
-def findATSASDirectory():
+_atsas_dir = None
+_atsas_dir_lock = threading.Lock()
+
+def findATSASDirectory(use_cache=True):
+    """
+    Returns the ATSAS bin directory, or '' if ATSAS can't be found. The
+    search is done once per process unless use_cache is False or the found
+    directory has since been removed.
+    """
+    global _atsas_dir
+
+    with _atsas_dir_lock:
+        if (not use_cache or _atsas_dir is None
+            or (_atsas_dir != '' and not os.path.exists(_atsas_dir))):
+            _atsas_dir = _searchATSASDirectory()
+
+        return _atsas_dir
+
+def _searchATSASDirectory():
     opsys= platform.system()
 
     if opsys== 'Darwin':
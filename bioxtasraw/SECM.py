@@ -34,6 +34,8 @@ import os
 import copy
 import threading
 import itertools
+import collections
+import collections.abc
 
 import numpy as np
 
@@ -125,7 +127,8 @@ class SECM(object):
 
     """
 
-    def __init__(self, file_list, sasm_list, frame_list, parameters, settings):
+    def __init__(self, file_list, sasm_list, frame_list, parameters, settings,
+        frame_data=None):
         """
         Constructor
 
@@ -146,6 +149,12 @@ class SECM(object):
         settings: bioxtasraw.RAWSettings.RawGuiSettings
             RAW settings. Used to try compute the time associated with each
             input profile.
+        frame_data: dict, optional
+            Precalculated 'mean_i' and 'total_i' arrays for the profiles (for
+            example, read from a saved series file). If provided, these are
+            used instead of calculating them from the profiles, so the
+            profiles in sasm_list are only accessed if needed to calculate
+            the time (as for a :class:`LazySASMList`).
         """
 
         #Raw inputs variables
@@ -173,8 +182,12 @@ class SECM(object):
             self._parameters['filename'] = filename
 
         #Extract initial mean and total intensity variables
-        self.mean_i = np.array([sasm.getMeanI() for sasm in self._sasm_list])
-        self.total_i = np.array([sasm.getTotalI() for sasm in self._sasm_list])
+        if frame_data is not None:
+            self.mean_i = np.array(frame_data['mean_i'], dtype=float)
+            self.total_i = np.array(frame_data['total_i'], dtype=float)
+        else:
+            self.mean_i = np.array([sasm.getMeanI() for sasm in self._sasm_list])
+            self.total_i = np.array([sasm.getTotalI() for sasm in self._sasm_list])
 
         #Make sure we have as many frame numbers as sasm objects
 
@@ -282,68 +295,132 @@ class SECM(object):
     def _update(self):
         ''' updates modified intensity after scale, normalization and offset changes '''
 
-        for i, sasm in enumerate(self._sasm_list):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
+        # Profiles are only rescaled when they're next accessed (see
+        # SASMList), the intensities are calculated directly from the data
+        self._update_lazy_transforms()
 
-            if self._q_range is not None:
-                sasm.setQrange((self._q_range[0], self._q_range[1]+1))
+        intensity_lists = [
+            (self._sasm_list, self._q_range, 'mean_i', 'total_i', 'I_of_q',
+                'qrange_I'),
+            (self.subtracted_sasm_list, self._sub_q_range, 'mean_i_sub',
+                'total_i_sub', 'I_of_q_sub', 'qrange_I_sub'),
+            (self.baseline_subtracted_sasm_list, self._bc_sub_q_range,
+                'mean_i_bcsub', 'total_i_bcsub', 'I_of_q_bcsub', 'qrange_I_bcsub'),
+            ]
+
+        for sasm_list, q_range, mean_key, total_key, qref_key, qrange_key in intensity_lists:
+            if len(sasm_list) == 0:
+                continue
 
-            self.mean_i[i] = sasm.getMeanI()
-            self.total_i[i] = sasm.getTotalI()
+            mean_i, total_i, I_of_q, qrange_I = self._calcSeriesIntensities(
+                sasm_list, q_range)
+
+            setattr(self, mean_key, mean_i)
+            setattr(self, total_key, total_i)
 
             if self.qref > 0:
-                self.I_of_q[i] = sasm.getIofQ(self.qref)
+                setattr(self, qref_key, I_of_q)
 
             if self.qrange[0] != 0 and self.qrange[1] != 0:
-                self.qrange_I[i] = sasm.getIofQRange(self.qrange[0], self.qrange[1])
+                setattr(self, qrange_key, qrange_I)
 
-        for i, sasm in enumerate(self.subtracted_sasm_list):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
+        if self.average_buffer_sasm is not None:
+            self.average_buffer_sasm.scale(self._scale_factor)
+            self.average_buffer_sasm.offset(self._offset_value)
 
             if self._sub_q_range is not None:
-                sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
+                self.average_buffer_sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
 
-            self.mean_i_sub[i] = sasm.getMeanI()
-            self.total_i_sub[i] = sasm.getTotalI()
 
-            if self.qref > 0:
-                self.I_of_q_sub[i] = sasm.getIofQ(self.qref)
+    def _update_lazy_transforms(self):
+        lazy_lists = [('_sasm_list', self._q_range),
+            ('subtracted_sasm_list', self._sub_q_range),
+            ('baseline_subtracted_sasm_list', self._bc_sub_q_range),
+            ('baseline_corr', self._sub_q_range),
+            ]
 
-            if self.qrange[0] != 0 and self.qrange[1] != 0:
-                self.qrange_I_sub[i] = sasm.getIofQRange(self.qrange[0], self.qrange[1])
+        for list_name, q_range in lazy_lists:
+            sasm_list = getattr(self, list_name)
 
-        for i, sasm in enumerate(self.baseline_subtracted_sasm_list):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
+            if not isinstance(sasm_list, (SASMList, LazySASMList)):
+                sasm_list = SASMList(sasm_list)
+                setattr(self, list_name, sasm_list)
 
-            if self._bc_sub_q_range is not None:
-                sasm.setQrange((self._bc_sub_q_range[0], self._bc_sub_q_range[1]+1))
+            if q_range is not None:
+                q_range = (q_range[0], q_range[1]+1)
+
+            sasm_list.set_transform(self._scale_factor, self._offset_value,
+                q_range)
+
+    def _calcSeriesIntensities(self, sasm_list, q_range):
+        """
+        Calculates the mean, total, q_val, and q range intensities of the
+        profiles in the list with the series transforms applied. Where
+        possible this is done on the stacked raw data, so the profiles
+        themselves don't have to be updated.
+        """
+        if q_range is not None:
+            q_range = (q_range[0], q_range[1]+1)
+
+        if isinstance(sasm_list, SASMList):
+            sasms = list(list.__iter__(sasm_list))
+            raw_i = [sasm.getRawI() for sasm in sasms]
+            q_vals = [sasm.q for sasm in sasms]
+
+            if q_range is None and len(sasms) > 0:
+                q_ranges = [tuple(sasm.getQrange()) for sasm in sasms]
+
+                if all(qr == q_ranges[0] for qr in q_ranges[1:]):
+                    q_range = q_ranges[0]
+
+            stackable = (len(sasms) > 0 and q_range is not None
+                and q_range[0] >= 0
+                and q_range[0] < q_range[1]
+                and all(len(i) == len(raw_i[0]) for i in raw_i)
+                and q_range[1] <= len(raw_i[0])
+                and all(np.array_equal(q, q_vals[0]) for q in q_vals[1:]))
+
+        else:
+            stackable = False
+
+        if stackable:
+            q = q_vals[0][q_range[0]:q_range[1]]
+            intensity = (np.array(raw_i)[:, q_range[0]:q_range[1]]
+                *self._scale_factor + self._offset_value)
 
-            self.mean_i_bcsub[i] = sasm.getMeanI()
-            self.total_i_bcsub[i] = sasm.getTotalI()
+            mean_i = intensity.mean(axis=1)
+            total_i = SASProc.calc_intensity_stack(q, intensity, 'total')
 
             if self.qref > 0:
-                self.I_of_q_bcsub[i] = sasm.getIofQ(self.qref)
+                I_of_q = SASProc.calc_intensity_stack(q, intensity, 'q_val',
+                    qref=self.qref)
+            else:
+                I_of_q = None
 
             if self.qrange[0] != 0 and self.qrange[1] != 0:
-                self.qrange_I_bcsub[i] = sasm.getIofQRange(self.qrange[0], self.qrange[1])
+                qrange_I = SASProc.calc_intensity_stack(q, intensity, 'q_range',
+                    qrange=self.qrange)
+            else:
+                qrange_I = None
 
-        for i, sasm in enumerate(self.baseline_corr):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
+        else:
+            sasms = list(sasm_list)
 
-            if self._sub_q_range is not None:
-                sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
+            mean_i = np.array([sasm.getMeanI() for sasm in sasms])
+            total_i = np.array([sasm.getTotalI() for sasm in sasms])
 
-        if self.average_buffer_sasm is not None:
-            self.average_buffer_sasm.scale(self._scale_factor)
-            self.average_buffer_sasm.offset(self._offset_value)
+            if self.qref > 0:
+                I_of_q = np.array([sasm.getIofQ(self.qref) for sasm in sasms])
+            else:
+                I_of_q = None
 
-            if self._sub_q_range is not None:
-                self.average_buffer_sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
+            if self.qrange[0] != 0 and self.qrange[1] != 0:
+                qrange_I = np.array([sasm.getIofQRange(self.qrange[0],
+                    self.qrange[1]) for sasm in sasms])
+            else:
+                qrange_I = None
 
+        return mean_i, total_i, I_of_q, qrange_I
 
     def append(self, filename_list, sasm_list, frame_list):
         """
@@ -1494,14 +1571,32 @@ class SECM(object):
             qi_ref, qf_ref = ref_sasm.getQrange()
             pvals = np.ones(len(sasm_list[1:]), dtype=float)
 
-            for index, sasm in enumerate(sasm_list[1:]):
-                qi, qf = sasm.getQrange()
-                if not np.all(np.round(sasm.q[qi:qf], 5) == np.round(ref_sasm.q[qi_ref:qf_ref], 5)):
+            qranges = [sasm.getQrange() for sasm in sasm_list[1:]]
+
+            if len(qranges) > 0 and all(qf-qi == qf_ref-qi_ref for qi, qf in qranges):
+                # Compare all of the profiles to the reference at once
+                ref_q = np.round(ref_sasm.q[qi_ref:qf_ref], 5)
+                q_stack = np.array([sasm.q[qi:qf] for sasm, (qi, qf)
+                    in zip(sasm_list[1:], qranges)])
+
+                if not np.all(np.round(q_stack, 5) == ref_q):
                     return None, False, ('q_vector', '')
 
                 if sim_test == 'CorMap':
-                    n, c, pval = SASProc.cormap_pval(ref_sasm.i[qi_ref:qf_ref], sasm.i[qi:qf])
-                pvals[index] = pval
+                    i_stack = np.array([sasm.i[qi:qf] for sasm, (qi, qf)
+                        in zip(sasm_list[1:], qranges)])
+                    n, c, pvals = SASProc.cormap_pval_multiple(
+                        ref_sasm.i[qi_ref:qf_ref], i_stack)
+
+            else:
+                for index, sasm in enumerate(sasm_list[1:]):
+                    qi, qf = sasm.getQrange()
+                    if not np.all(np.round(sasm.q[qi:qf], 5) == np.round(ref_sasm.q[qi_ref:qf_ref], 5)):
+                        return None, False, ('q_vector', '')
+
+                    if sim_test == 'CorMap':
+                        n, c, pval = SASProc.cormap_pval(ref_sasm.i[qi_ref:qf_ref], sasm.i[qi:qf])
+                    pvals[index] = pval
 
             if sim_cor == 'Bonferroni':
                 pvals = pvals*len(sasm_list[1:])
@@ -1586,44 +1681,8 @@ class SECM(object):
             buffer greater than the threshold, and so should be used when
             calculating Rg, M.W., and other parameters.
         """
-        subtracted_sasms = []
-        use_subtracted_sasms = []
-
-        if int_type == 'total':
-            ref_intensity = buffer_sasm.getTotalI()
-
-        elif int_type == 'mean':
-            ref_intensity = buffer_sasm.getMeanI()
-
-        elif int_type == 'q_val':
-            ref_intensity = buffer_sasm.getIofQ(qref)
-        elif int_type == 'q_range':
-            ref_intensity = buffer_sasm.getIofQRange(qrange[0], qrange[1])
-
-        for sasm in self.getAllSASMs():
-            subtracted_sasm = SASProc.subtract(sasm, buffer_sasm, forced = True)
-            subtracted_sasm.setParameter('filename', 'S_{}'.format(subtracted_sasm.getParameter('filename')))
-
-            subtracted_sasms.append(subtracted_sasm)
-
-            #check to see whether we actually need to subtract this curve
-            if int_type == 'total':
-                sasm_intensity = sasm.getTotalI()
-
-            elif int_type == 'mean':
-                sasm_intensity = sasm.getMeanI()
-
-            elif int_type == 'q_val':
-                sasm_intensity = sasm.getIofQ(qref)
-            elif int_type == 'q_range':
-                sasm_intensity = sasm.getIofQRange(qrange[0], qrange[1])
-
-            if abs(sasm_intensity/ref_intensity) > threshold:
-                use_subtracted_sasms.append(True)
-            else:
-                use_subtracted_sasms.append(False)
-
-        return subtracted_sasms, use_subtracted_sasms
+        return self.subtractSASMs(buffer_sasm, self.getAllSASMs(), int_type,
+            threshold, qref, qrange)
 
     @staticmethod
     def subtractSASMs(buffer_sasm, sasms, int_type, threshold, qref=None,
@@ -1669,44 +1728,52 @@ class SECM(object):
             buffer greater than the threshold, and so should be used when
             calculating Rg, M.W., and other parameters.
         """
-        subtracted_sasms = []
-        use_subtracted_sasms = []
+        sasms = list(sasms)
 
-        if int_type == 'total':
-            ref_intensity = buffer_sasm.getTotalI()
+        subtracted_sasms = SASProc.subtract_multiple(sasms, buffer_sasm,
+            forced=True)
 
-        elif int_type == 'mean':
-            ref_intensity = buffer_sasm.getMeanI()
+        for subtracted_sasm in subtracted_sasms:
+            subtracted_sasm.setParameter('filename', 'S_{}'.format(subtracted_sasm.getParameter('filename')))
 
-        elif int_type == 'q_val':
-           ref_intensity = buffer_sasm.getIofQ(qref)
-        elif int_type == 'q_range':
-            ref_intensity = buffer_sasm.getIofQRange(qrange[0], qrange[1])
+        #check to see whether we actually need to subtract each curve
+        ref_intensity = SECM._calcIntensities([buffer_sasm], int_type, qref,
+            qrange)[0]
+        sasm_intensity = SECM._calcIntensities(sasms, int_type, qref, qrange)
 
-        for sasm in sasms:
-            subtracted_sasm = SASProc.subtract(sasm, buffer_sasm, forced = True)
-            subtracted_sasm.setParameter('filename', 'S_{}'.format(subtracted_sasm.getParameter('filename')))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            use_subtracted_sasms = (np.abs(sasm_intensity/ref_intensity)
+                > threshold).tolist()
+
+        return subtracted_sasms, use_subtracted_sasms
+
+    @staticmethod
+    def _calcIntensities(sasms, int_type, qref=None, qrange=None):
+        if int_type == 'total':
+            intensity = np.array([sasm.getTotalI() for sasm in sasms], dtype=float)
+
+        elif int_type == 'mean':
+            intensity = np.array([sasm.getMeanI() for sasm in sasms], dtype=float)
 
-            subtracted_sasms.append(subtracted_sasm)
+        else:
+            q_list = [sasm.getQ() for sasm in sasms]
 
-            #check to see whether we actually need to subtract this curve
-            if int_type == 'total':
-                sasm_intensity = sasm.getTotalI()
+            if all(len(q) == len(q_list[0]) and np.array_equal(q, q_list[0])
+                for q in q_list[1:]):
+                i_stack = np.array([sasm.getI() for sasm in sasms])
 
-            elif int_type == 'mean':
-                sasm_intensity = sasm.getMeanI()
+                intensity = SASProc.calc_intensity_stack(q_list[0], i_stack,
+                    int_type, qref, qrange)
 
             elif int_type == 'q_val':
-                sasm_intensity = sasm.getIofQ(qref)
-            elif int_type == 'q_range':
-                sasm_intensity = sasm.getIofQRange(qrange[0], qrange[1])
+                intensity = np.array([sasm.getIofQ(qref) for sasm in sasms],
+                    dtype=float)
 
-            if abs(sasm_intensity/ref_intensity) > threshold:
-                use_subtracted_sasms.append(True)
-            else:
-                use_subtracted_sasms.append(False)
+            elif int_type == 'q_range':
+                intensity = np.array([sasm.getIofQRange(qrange[0], qrange[1])
+                    for sasm in sasms], dtype=float)
 
-        return subtracted_sasms, use_subtracted_sasms
+        return intensity
 
     def setSubtractedSASMs(self, sub_sasm_list, use_sub_sasm):
         """
@@ -1720,24 +1787,23 @@ class SECM(object):
             A list of bools indicating whether or not the subtracted profiles
             should be used when calculating parameters such as Rg.
         """
-        for i, sasm in enumerate(sub_sasm_list):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
-
-            if self._sub_q_range is not None:
-                sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
+        if not isinstance(sub_sasm_list, LazySASMList):
+            sub_sasm_list = SASMList(sub_sasm_list)
 
-        self.subtracted_sasm_list = list(sub_sasm_list)
+        self.subtracted_sasm_list = sub_sasm_list
         self.use_subtracted_sasm = list(use_sub_sasm)
 
-        self.mean_i_sub = np.array([sasm.getMeanI() for sasm in sub_sasm_list])
-        self.total_i_sub = np.array([sasm.getTotalI() for sasm in sub_sasm_list])
+        self._update_lazy_transforms()
+
+        (self.mean_i_sub, self.total_i_sub, I_of_q_sub,
+            qrange_I_sub) = self._calcSeriesIntensities(sub_sasm_list,
+            self._sub_q_range)
 
         if self.qref>0:
-            self.I_of_q_sub = np.array([sasm.getIofQ(self.qref) for sasm in sub_sasm_list])
+            self.I_of_q_sub = I_of_q_sub
 
         if self.qrange != (0,0):
-            self.qrange_I_sub = np.array([sasm.getIofQRange(self.qrange[0], self.qrange[1]) for sasm in sub_sasm_list])
+            self.qrange_I_sub = qrange_I_sub
 
     def appendSubtractedSASMs(self, sub_sasm_list, use_sasm_list, window_size):
         """
@@ -1761,7 +1827,9 @@ class SECM(object):
             if self._sub_q_range is not None:
                 sasm.setQrange((self._sub_q_range[0], self._sub_q_range[1]+1))
 
-        self.subtracted_sasm_list = self.subtracted_sasm_list[:-window_size] + sub_sasm_list
+        self.subtracted_sasm_list = SASMList(self.subtracted_sasm_list[:-window_size]
+            + sub_sasm_list)
+        self._update_lazy_transforms()
         self.use_subtracted_sasm = self.use_subtracted_sasm[:-window_size] + use_sasm_list
 
         self.mean_i_sub = np.concatenate((self.mean_i_sub[:-window_size],
@@ -1791,24 +1859,23 @@ class SECM(object):
             A list of bools indicating whether or not the profiles should be
             used when calculating parameters such as Rg.
         """
-        for i, sasm in enumerate(sub_sasm_list):
-            sasm.scale(self._scale_factor)
-            sasm.offset(self._offset_value)
-
-            if self._bc_sub_q_range is not None:
-                sasm.setQrange((self._bc_sub_q_range[0], self._bc_sub_q_range[1]+1))
+        if not isinstance(sub_sasm_list, LazySASMList):
+            sub_sasm_list = SASMList(sub_sasm_list)
 
-        self.baseline_subtracted_sasm_list = list(sub_sasm_list)
+        self.baseline_subtracted_sasm_list = sub_sasm_list
         self.use_baseline_subtracted_sasm = list(use_sub_sasm)
 
-        self.mean_i_bcsub = np.array([sasm.getMeanI() for sasm in sub_sasm_list])
-        self.total_i_bcsub = np.array([sasm.getTotalI() for sasm in sub_sasm_list])
+        self._update_lazy_transforms()
+
+        (self.mean_i_bcsub, self.total_i_bcsub, I_of_q_bcsub,
+            qrange_I_bcsub) = self._calcSeriesIntensities(sub_sasm_list,
+            self._bc_sub_q_range)
 
         if self.qref>0:
-            self.I_of_q_bcsub = np.array([sasm.getIofQ(self.qref) for sasm in sub_sasm_list])
+            self.I_of_q_bcsub = I_of_q_bcsub
 
         if self.qrange != (0,0):
-            self.qrange_I_bcsub = np.array([sasm.getIofQRange(self.qrange[0], self.qrange[1]) for sasm in sub_sasm_list])
+            self.qrange_I_bcsub = qrange_I_bcsub
 
     def appendBCSubtractedSASMs(self, sub_sasm_list, use_sasm_list, window_size):
         """
@@ -1833,7 +1900,9 @@ class SECM(object):
             if self._bc_sub_q_range is not None:
                 sasm.setQrange((self._bc_sub_q_range[0], self._bc_sub_q_range[1]+1))
 
-        self.baseline_subtracted_sasm_list = self.baseline_subtracted_sasm_list[:-window_size] + sub_sasm_list
+        self.baseline_subtracted_sasm_list = SASMList(self.baseline_subtracted_sasm_list[:-window_size]
+            + sub_sasm_list)
+        self._update_lazy_transforms()
         self.use_baseline_subtracted_sasm = self.use_baseline_subtracted_sasm[:-window_size] + use_sasm_list
 
         self.mean_i_bcsub = np.concatenate((self.mean_i_bcsub[:-window_size],
@@ -1850,3 +1919,245 @@ class SECM(object):
             qrange_I_bcsub = np.array([sasm.getIofQRange(self.qrange[0], self.qrange[1]) for sasm in sub_sasm_list])
             self.qrange_I_bcsub = np.concatenate((self.qrange_I_bcsub[:-window_size],
                 qrange_I_bcsub))
+
+
+class SASMList(list):
+    """
+    A list of the profiles in a series. The series scale, offset, and q range
+    (see :func:`set_transform`) are stored on the list and applied to each
+    profile when it is accessed by indexing or iteration, rather than being
+    applied to every profile each time they change.
+    """
+
+    def __init__(self, sasm_list=()):
+        list.__init__(self, sasm_list)
+
+        self._scale_factor = None
+        self._offset_value = None
+        self._q_range = None
+
+    def __getitem__(self, index):
+        item = list.__getitem__(self, index)
+
+        if isinstance(index, slice):
+            for sasm in item:
+                self._apply_transform(sasm)
+        else:
+            self._apply_transform(item)
+
+        return item
+
+    def __iter__(self):
+        for sasm in list.__iter__(self):
+            self._apply_transform(sasm)
+            yield sasm
+
+    def __deepcopy__(self, memo):
+        # Copies are plain lists of the transformed profiles, so they aren't
+        # changed by the series transform afterwards
+        return [copy.deepcopy(sasm, memo) for sasm in self]
+
+    def set_transform(self, scale_factor, offset_value, q_range):
+        """
+        Sets the scale, offset, and q range (a tuple of start and end index,
+        or None for no change) applied to profiles when they are accessed.
+        """
+        self._scale_factor = scale_factor
+        self._offset_value = offset_value
+        self._q_range = q_range
+
+    def _apply_transform(self, sasm):
+        if sasm == -1:
+            return
+
+        if self._scale_factor is not None and sasm.getScale() != self._scale_factor:
+            sasm.scale(self._scale_factor)
+
+        if self._offset_value is not None and sasm.getOffset() != self._offset_value:
+            sasm.offset(self._offset_value)
+
+        if (self._q_range is not None
+            and tuple(sasm.getQrange()) != tuple(self._q_range)):
+            sasm.setQrange(self._q_range)
+
+
+class LazySASMList(collections.abc.MutableSequence):
+    """
+    A list of scattering profiles that are loaded on first access, used for
+    series whose profiles are read from a saved series file as needed rather
+    than all at once. Loaded profiles are kept in a least recently used
+    cache of limited size, so memory use is bounded regardless of the length
+    of the series. Profiles are loaded in blocks of consecutive frames, which
+    makes iterating over the list efficient.
+
+    The list supports the full list API. Profiles that are set, inserted, or
+    appended are kept in memory and are never removed from the cache.
+    Deleting, reordering, or sorting the list only changes which saved
+    profile each position refers to, so it doesn't load the profiles.
+
+    Series level scale, offset, and q range (see :func:`set_transform`) are
+    applied to each profile as it is accessed, so they persist when a
+    profile is removed from the cache and reloaded. Other changes made to a
+    loaded profile are lost if it is removed from the cache, unless the
+    profile is set back into the list (e.g. ``sasm_list[i] = sasm``).
+    """
+
+    def __init__(self, length, loader, cache_size=256, block_size=32):
+        """
+        Parameters
+        ----------
+        length: int
+            The number of profiles available from the loader.
+        loader: callable
+            A function that takes a list of profile indices and returns a
+            list of the corresponding bioxtasraw.SASM.SASM profiles.
+        cache_size: int, optional
+            The maximum number of loaded profiles to keep in memory.
+        block_size: int, optional
+            The number of consecutive profiles loaded at once.
+        """
+        self._length = length
+        self._loader = loader
+        self.cache_size = max(cache_size, 1)
+        self.block_size = max(min(block_size, self.cache_size), 1)
+
+        # Each item is either the index of a profile in the loader (int) or
+        # a (profile,) tuple for a profile held in memory
+        self._items = list(range(length))
+        self._cache = collections.OrderedDict()
+
+        self._scale_factor = None
+        self._offset_value = None
+        self._q_range = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_item(item) for item in self._items[index]]
+
+        return self._get_item(self._items[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._items[index] = [(sasm,) for sasm in value]
+        else:
+            self._items[index] = (value,)
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __deepcopy__(self, memo):
+        new_list = self.copy()
+        new_list._items = copy.deepcopy(self._items, memo)
+
+        return new_list
+
+    def insert(self, index, value):
+        self._items.insert(index, (value,))
+
+    def extend(self, values):
+        self._items.extend([(sasm,) for sasm in values])
+
+    def clear(self):
+        del self._items[:]
+
+    def reverse(self):
+        self._items.reverse()
+
+    def sort(self, key=None, reverse=False):
+        """
+        Sorts the list in place, as list.sort. Profiles are loaded to
+        evaluate key, but aren't kept in memory.
+        """
+        if key is None:
+            item_key = self._get_item
+        else:
+            item_key = lambda item: key(self._get_item(item))
+
+        self._items.sort(key=item_key, reverse=reverse)
+
+    def copy(self):
+        """
+        Returns a shallow copy of the list, which shares the loader (but not
+        the cache) and any profiles held in memory.
+        """
+        new_list = LazySASMList(self._length, self._loader, self.cache_size,
+            self.block_size)
+        new_list._items = list(self._items)
+        new_list.set_transform(self._scale_factor, self._offset_value,
+            self._q_range)
+
+        return new_list
+
+    def set_transform(self, scale_factor, offset_value, q_range):
+        """
+        Sets the scale, offset, and q range (a tuple of start and end index,
+        or None for no change) applied to profiles when they are accessed.
+        This is also applied to any profiles already loaded.
+        """
+        self._scale_factor = scale_factor
+        self._offset_value = offset_value
+        self._q_range = q_range
+
+        for sasm in self._cache.values():
+            self._apply_transform(sasm)
+
+    def clear_cache(self):
+        """
+        Removes all loaded profiles from memory, except for profiles that
+        were set into the list.
+        """
+        self._cache.clear()
+
+    def _get_item(self, item):
+        if isinstance(item, tuple):
+            sasm = item[0]
+            self._apply_transform(sasm)
+
+            return sasm
+
+        if item not in self._cache:
+            self._load_block(item)
+
+        self._cache.move_to_end(item)
+
+        return self._cache[item]
+
+    def _apply_transform(self, sasm):
+        if sasm == -1:
+            return
+
+        if self._scale_factor is not None and sasm.getScale() != self._scale_factor:
+            sasm.scale(self._scale_factor)
+
+        if self._offset_value is not None and sasm.getOffset() != self._offset_value:
+            sasm.offset(self._offset_value)
+
+        if (self._q_range is not None
+            and tuple(sasm.getQrange()) != tuple(self._q_range)):
+            sasm.setQrange(self._q_range)
+
+    def _load_block(self, index):
+        start = (index//self.block_size)*self.block_size
+        end = min(start+self.block_size, self._length)
+
+        frames = [idx for idx in range(start, end) if idx not in self._cache]
+
+        for idx, sasm in zip(frames, self._loader(frames)):
+            self._apply_transform(sasm)
+            self._cache[idx] = sasm
+
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -67,6 +67,7 @@ setup(
         language_level=language_level),
     entry_points={
         'gui_scripts': [ 'bioxtas_raw = bioxtasraw.RAW:main'],
+        'console_scripts': [ 'bioxtas_raw_warmup = bioxtasraw.RAWAPI:warmup_main'],
         },
     include_package_data=True,
 )